@@ -21,6 +21,19 @@ Uso:
 
   # Ver lista de AOI disponibles
   python run_batch_aoi_workflow.py --list
+
+Descarga compartida:
+  Por defecto los SLC de todo el lote se planifican y descargan una sola vez
+  (scripts/batch_download_planner.py): una búsqueda por dirección de órbita
+  sobre la unión de los AOI, productos asignados a cada AOI que cubren y una
+  cola sin duplicados. --per-aoi-download recupera la descarga por AOI.
+
+Recorte compartido (fan-out):
+  Por defecto el recorte InSAR al AOI se difiere hasta procesar todo el lote
+  y se hace de una vez (scripts/crop_engine.py): los AOI se agrupan por los
+  interferogramas que usan, cada interferograma se lee una sola vez y de sus
+  bloques se escriben los recortes de todas las series. --per-aoi-crop
+  recupera el recorte por serie.
 """
 
 import os
@@ -122,6 +135,65 @@ def calculate_date_range(months=3):
     return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
 
 
+def run_shared_download(aoi_files, config, logger):
+    """
+    Planifica y descarga una sola vez los SLC de todos los AOI del lote
+
+    Args:
+        aoi_files: Lista de Paths a los GeoJSON
+        config: Diccionario con la configuración del workflow
+        logger: Logger configurado
+
+    Returns:
+        bool: True si la descarga compartida terminó sin fallos
+    """
+    from download_copernicus import CopernicusAuth
+    from batch_download_planner import (
+        plan_batch_downloads, filter_processed_queue, save_plan, download_batch_queue
+    )
+
+    logger.info(f"\n{Colors.BLUE}{'=' * 80}{Colors.NC}")
+    logger.info(f"{Colors.BLUE}DESCARGA COMPARTIDA DEL LOTE{Colors.NC}")
+    logger.info(f"{Colors.BLUE}{'=' * 80}{Colors.NC}\n")
+
+    username = os.environ.get('COPERNICUS_USER')
+    password = os.environ.get('COPERNICUS_PASSWORD')
+    if not username or not password:
+        logger.error(f"{Colors.RED}✗ Credenciales de Copernicus no encontradas "
+                     f"(COPERNICUS_USER / COPERNICUS_PASSWORD en .env){Colors.NC}")
+        return False
+
+    if config['orbit_direction'] == 'BOTH':
+        orbit_directions = ['DESCENDING', 'ASCENDING']
+    else:
+        orbit_directions = [config['orbit_direction']]
+
+    auth = CopernicusAuth(username, password)
+    plan = plan_batch_downloads(
+        auth,
+        aoi_files,
+        start_date=datetime.strptime(config['start_date'], '%Y-%m-%d'),
+        end_date=datetime.strptime(config['end_date'], '%Y-%m-%d'),
+        orbit_directions=orbit_directions,
+        satellites=config['satellites'],
+        min_coverage_pct=config['min_coverage']
+    )
+    if plan is None:
+        return False
+
+    # Igual que --skip-processed en la descarga por AOI
+    filter_processed_queue(plan)
+    save_plan(plan, str(Path("processing") / "batch_download_plan.json"))
+
+    stats = download_batch_queue(plan, auth)
+    if stats.get('failed', 0) > 0:
+        logger.warning(f"{Colors.YELLOW}⚠️  {stats['failed']} productos fallaron en la descarga compartida{Colors.NC}")
+        return False
+
+    logger.info(f"{Colors.GREEN}✓ Descarga compartida completada{Colors.NC}")
+    return True
+
+
 def process_single_aoi(aoi_file, config, logger):
     """
     Procesa un único AOI con la configuración especificada
@@ -172,7 +244,8 @@ def process_single_aoi(aoi_file, config, logger):
                 log=logger
             )
 
-            # PASO 2: Descargar productos SLC
+        # PASO 2: Descargar productos SLC (ya descargados para todo el lote si shared_download)
+        if config['download'] and not config.get('shared_download'):
             logger.info(f"\n{Colors.BLUE}Descargando productos SLC...{Colors.NC}")
             workflow.download_products(
                 aoi_file=aoi_file,
@@ -216,69 +289,11 @@ def process_single_aoi(aoi_file, config, logger):
             if not workflow.run_processing(project_name, orbit_direction=orbit_dir, log=logger):
                 overall_success = False
 
-        # PASO 5: Recorte urbano (si procesamiento exitoso)
-        if overall_success:
-            logger.info(f"\n{Colors.BLUE}{'=' * 80}{Colors.NC}")
-            logger.info(f"{Colors.BLUE}RECORTE A SUELO URBANO{Colors.NC}")
-            logger.info(f"{Colors.BLUE}{'=' * 80}{Colors.NC}\n")
-            
-            mcc_file = Path("data/cobertes-sol-v1r0-2023.gpkg")
-            
-            if mcc_file.exists():
-                logger.info(f"{Colors.GREEN}✓ MCC encontrado{Colors.NC}")
-                
-                try:
-                    import subprocess
-                    result = subprocess.run(
-                        ["bash", "scripts/workflow_urban_crop.sh", str(project_dir), str(mcc_file)],
-                        cwd=Path.cwd(),
-                        capture_output=True,
-                        text=True
-                    )
-                    
-                    if result.returncode == 0:
-                        logger.info(f"{Colors.GREEN}✓ Recorte urbano completado{Colors.NC}")
-                        urban_dir = project_dir / "urban_products"
-                        if urban_dir.exists():
-                            n_products = len(list(urban_dir.rglob("*.tif")))
-                            logger.info(f"{Colors.GREEN}  Productos urbanos: {n_products}{Colors.NC}")
-                    else:
-                        logger.warning(f"{Colors.YELLOW}⚠️  Recorte urbano con advertencias{Colors.NC}")
-                except Exception as e:
-                    logger.warning(f"{Colors.YELLOW}⚠️  Error en recorte urbano: {e}{Colors.NC}")
-            else:
-                logger.warning(f"{Colors.YELLOW}⚠️  MCC no encontrado, saltando recorte urbano{Colors.NC}")
-        
-        # PASO 6: Limpieza (siempre se ejecuta)
-        logger.info(f"\n{Colors.BLUE}{'=' * 80}{Colors.NC}")
-        logger.info(f"{Colors.BLUE}LIMPIEZA DE ARCHIVOS INTERMEDIOS{Colors.NC}")
-        logger.info(f"{Colors.BLUE}{'=' * 80}{Colors.NC}\n")
-        
-        try:
-            import subprocess
-            result = subprocess.run(
-                ["python3", "scripts/cleanup_after_urban_crop.py", str(project_dir)],
-                cwd=Path.cwd(),
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                logger.info(f"{Colors.GREEN}✓ Limpieza completada{Colors.NC}")
-                if "liberado:" in result.stdout:
-                    for line in result.stdout.split('\n'):
-                        if "liberado:" in line:
-                            logger.info(f"{Colors.GREEN}  {line.strip()}{Colors.NC}")
-                            break
-            else:
-                logger.warning(f"{Colors.YELLOW}⚠️  Limpieza con advertencias{Colors.NC}")
-        except Exception as e:
-            logger.warning(f"{Colors.YELLOW}⚠️  Error en limpieza: {e}{Colors.NC}")
-
-        # Resumen
-        workflow.print_summary(project_name, overall_success, log=logger)
+        # El recorte InSAR del lote se hace al final; urbano y limpieza después
+        if config.get('fanout_crop'):
+            return overall_success
 
-        return overall_success
+        return finalize_single_aoi(aoi_file, overall_success, logger)
 
     except Exception as e:
         logger.error(f"\n{Colors.RED}✗ Error procesando AOI {project_name}: {e}{Colors.NC}")
@@ -287,6 +302,151 @@ def process_single_aoi(aoi_file, config, logger):
         return False
 
 
+def finalize_single_aoi(aoi_file, overall_success, logger):
+    """
+    Recorte urbano, limpieza de intermedios y resumen de un AOI procesado
+
+    Args:
+        aoi_file: Path al archivo GeoJSON
+        overall_success: Resultado del procesamiento de las series
+        logger: Logger configurado
+
+    Returns:
+        bool: overall_success
+    """
+    project_name = aoi_file.stem
+    project_dir = Path("processing") / project_name
+
+    # PASO 5: Recorte urbano (si procesamiento exitoso)
+    if overall_success:
+        logger.info(f"\n{Colors.BLUE}{'=' * 80}{Colors.NC}")
+        logger.info(f"{Colors.BLUE}RECORTE A SUELO URBANO{Colors.NC}")
+        logger.info(f"{Colors.BLUE}{'=' * 80}{Colors.NC}\n")
+        
+        mcc_file = Path("data/cobertes-sol-v1r0-2023.gpkg")
+        
+        if mcc_file.exists():
+            logger.info(f"{Colors.GREEN}✓ MCC encontrado{Colors.NC}")
+            
+            try:
+                import subprocess
+                result = subprocess.run(
+                    ["bash", "scripts/workflow_urban_crop.sh", str(project_dir), str(mcc_file)],
+                    cwd=Path.cwd(),
+                    capture_output=True,
+                    text=True
+                )
+                
+                if result.returncode == 0:
+                    logger.info(f"{Colors.GREEN}✓ Recorte urbano completado{Colors.NC}")
+                    urban_dir = project_dir / "urban_products"
+                    if urban_dir.exists():
+                        n_products = len(list(urban_dir.rglob("*.tif")))
+                        logger.info(f"{Colors.GREEN}  Productos urbanos: {n_products}{Colors.NC}")
+                else:
+                    logger.warning(f"{Colors.YELLOW}⚠️  Recorte urbano con advertencias{Colors.NC}")
+            except Exception as e:
+                logger.warning(f"{Colors.YELLOW}⚠️  Error en recorte urbano: {e}{Colors.NC}")
+        else:
+            logger.warning(f"{Colors.YELLOW}⚠️  MCC no encontrado, saltando recorte urbano{Colors.NC}")
+    
+    # PASO 6: Limpieza (siempre se ejecuta)
+    logger.info(f"\n{Colors.BLUE}{'=' * 80}{Colors.NC}")
+    logger.info(f"{Colors.BLUE}LIMPIEZA DE ARCHIVOS INTERMEDIOS{Colors.NC}")
+    logger.info(f"{Colors.BLUE}{'=' * 80}{Colors.NC}\n")
+    
+    try:
+        import subprocess
+        result = subprocess.run(
+            ["python3", "scripts/cleanup_after_urban_crop.py", str(project_dir)],
+            cwd=Path.cwd(),
+            capture_output=True,
+            text=True
+        )
+        
+        if result.returncode == 0:
+            logger.info(f"{Colors.GREEN}✓ Limpieza completada{Colors.NC}")
+            if "liberado:" in result.stdout:
+                for line in result.stdout.split('\n'):
+                    if "liberado:" in line:
+                        logger.info(f"{Colors.GREEN}  {line.strip()}{Colors.NC}")
+                        break
+        else:
+            logger.warning(f"{Colors.YELLOW}⚠️  Limpieza con advertencias{Colors.NC}")
+    except Exception as e:
+        logger.warning(f"{Colors.YELLOW}⚠️  Error en limpieza: {e}{Colors.NC}")
+
+    # Resumen
+    workflow.print_summary(project_name, overall_success, log=logger)
+
+    return overall_success
+
+
+def run_fanout_insar_crop(aoi_files, config, logger):
+    """
+    Recorta al AOI los interferogramas de todas las series del lote de una vez
+
+    Cada serie (processing/<aoi>/insar_*_iw*) aporta su AOI (config.txt) y sus
+    productos insar/{short,long}/Ifg_*.dim; los enlaces al mismo producto del
+    repositorio se agrupan y cada interferograma se lee una sola vez para
+    escribir los recortes de todas las series en <serie>/insar/cropped/.
+
+    Args:
+        aoi_files: Lista de Paths a los GeoJSON procesados
+        config: Diccionario con la configuración del workflow
+        logger: Logger configurado
+
+    Returns:
+        dict: {nombre del AOI: True si no falló ningún recorte de sus series}
+    """
+    from crop_engine import build_product_targets, crop_products_multi_aoi
+    from crop_insar_to_aoi import load_config, find_insar_products
+
+    logger.info(f"\n{Colors.BLUE}{'=' * 80}{Colors.NC}")
+    logger.info(f"{Colors.BLUE}RECORTE InSAR COMPARTIDO DEL LOTE{Colors.NC}")
+    logger.info(f"{Colors.BLUE}{'=' * 80}{Colors.NC}\n")
+
+    aoi_products = {}
+    for aoi_file in aoi_files:
+        project_dir = Path("processing") / aoi_file.stem
+        for series_dir in sorted(project_dir.glob("insar_*_iw*")):
+            config_file = series_dir / "config.txt"
+            if not config_file.exists():
+                continue
+            aoi_wkt = load_config(str(config_file)).get('AOI')
+            products = find_insar_products(str(series_dir))
+            if aoi_wkt and products:
+                aoi_products[f"{aoi_file.stem}/{series_dir.name}"] = (
+                    aoi_wkt, str(series_dir / "insar" / "cropped"), products
+                )
+
+    crop_ok = {aoi_file.stem: True for aoi_file in aoi_files}
+    if not aoi_products:
+        logger.info("  No hay productos InSAR para recortar")
+        return crop_ok
+
+    product_targets = build_product_targets(aoi_products)
+    references = sum(len(products) for _, _, products in aoi_products.values())
+    logger.info(f"  Series: {len(aoi_products)}")
+    logger.info(f"  Interferogramas únicos: {len(product_targets)} (referenciados {references} veces)")
+
+    summary = crop_products_multi_aoi(product_targets, workers=config['crop_workers'], log=logger)
+
+    logger.info(f"\n  Recortes: {summary['cropped']} nuevos, {summary['skipped']} existentes, "
+                f"{summary['no_overlap']} sin intersección, {summary['failed']} fallidos")
+    for series_name, series_summary in summary['by_aoi'].items():
+        if series_summary['failed'] > 0:
+            crop_ok[series_name.split('/')[0]] = False
+            logger.warning(f"{Colors.YELLOW}⚠️  {series_name}: {series_summary['failed']} "
+                           f"recortes fallaron{Colors.NC}")
+
+    if summary['failed'] > 0:
+        logger.warning(f"{Colors.YELLOW}⚠️  {summary['failed']} recortes fallaron{Colors.NC}")
+    else:
+        logger.info(f"{Colors.GREEN}✓ Recorte compartido completado{Colors.NC}")
+    return crop_ok
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Ejecuta el workflow completo para múltiples AOI con configuración unificada',
@@ -346,6 +506,8 @@ Ejemplos de uso:
     parser.add_argument('--orbit-type', choices=['POEORB', 'RESORB'],
                        default='POEORB',
                        help='Tipo de órbita (default: POEORB - precisas)')
+    parser.add_argument('--min-coverage', type=float, default=100.0,
+                       help='Cobertura mínima del AOI para asignarle un producto (default: 100.0)')
 
     # Opciones de procesamiento
     parser.add_argument('--skip-download', action='store_true',
@@ -354,6 +516,15 @@ Ejemplos de uso:
                        help='Limpiar proyectos existentes antes de procesar')
     parser.add_argument('--skip-existing', action='store_true',
                        help='Saltar AOI que ya tienen proyecto existente')
+    parser.add_argument('--per-aoi-download', action='store_true',
+                       help='Buscar y descargar productos por AOI en lugar de una cola '
+                            'compartida y sin duplicados para todo el lote')
+
+    parser.add_argument('--per-aoi-crop', action='store_true',
+                       help='Recortar los productos InSAR por serie durante el procesamiento '
+                            'en lugar de un recorte compartido al final del lote')
+    parser.add_argument('--crop-workers', type=int, default=None,
+                       help='Procesos para el recorte compartido (default: crop_engine)')
 
     # Opciones de logging
     parser.add_argument('--verbose', '-v', action='store_true',
@@ -407,9 +578,13 @@ Ejemplos de uso:
         'satellites': satellites,
         'orbit_direction': args.orbit,
         'orbit_type': args.orbit_type,
+        'min_coverage': args.min_coverage,
         'download': not args.skip_download,
+        'shared_download': not args.skip_download and not args.per_aoi_download,
         'clean_existing': args.clean_existing,
-        'skip_existing': args.skip_existing
+        'skip_existing': args.skip_existing,
+        'fanout_crop': not args.per_aoi_crop,
+        'crop_workers': args.crop_workers
     }
 
     # Configurar logger global
@@ -430,6 +605,9 @@ Ejemplos de uso:
     print(f"  Órbita: {Colors.BOLD}{args.orbit}{Colors.NC}")
     print(f"  Tipo órbita: {Colors.BOLD}{args.orbit_type}{Colors.NC}")
     print(f"  Descargar productos: {Colors.BOLD}{'Sí' if config['download'] else 'No'}{Colors.NC}")
+    if config['download']:
+        print(f"  Descarga compartida: {Colors.BOLD}{'Sí' if config['shared_download'] else 'No (por AOI)'}{Colors.NC}")
+    print(f"  Recorte compartido: {Colors.BOLD}{'Sí' if config['fanout_crop'] else 'No (por serie)'}{Colors.NC}")
 
     print(f"\n{Colors.BOLD}AOI en la cola:{Colors.NC}")
     for i, aoi_name in enumerate(aoi_list, 1):
@@ -457,6 +635,21 @@ Ejemplos de uso:
 
     print(f"\n{Colors.GREEN}✓ Se procesarán {len(aoi_files)} AOI{Colors.NC}\n")
 
+    # Descarga compartida: una sola cola sin duplicados para todo el lote
+    if config['shared_download']:
+        pending_aois = [f for f in aoi_files
+                        if not (config['skip_existing'] and workflow.check_project_exists(f.stem))]
+        if pending_aois and not run_shared_download(pending_aois, config, logger):
+            logger.warning(f"{Colors.YELLOW}⚠️  Descarga compartida incompleta, "
+                           f"se procesará con los productos disponibles{Colors.NC}")
+
+    # Recorte compartido: las series no recortan, se hace al final para todo el lote
+    if config['fanout_crop']:
+        from crop_engine import DEFER_INSAR_CROP_ENV, DEFAULT_CROP_WORKERS
+        os.environ[DEFER_INSAR_CROP_ENV] = '1'
+        if config['crop_workers'] is None:
+            config['crop_workers'] = DEFAULT_CROP_WORKERS
+
     # Procesar cada AOI
     results = {}
     total = len(aoi_files)
@@ -475,6 +668,18 @@ Ejemplos de uso:
         success = process_single_aoi(aoi_file, config, logger)
         results[aoi_file.stem] = 'SUCCESS' if success else 'FAILED'
 
+    # Recorte compartido y cierre (urbano, limpieza) de los AOI procesados
+    if config['fanout_crop']:
+        processed = [f for f in aoi_files if results.get(f.stem) == 'SUCCESS']
+        crop_ok = run_fanout_insar_crop(processed, config, logger) if processed else {}
+        for aoi_file in aoi_files:
+            if results.get(aoi_file.stem) == 'SUCCESS':
+                if not finalize_single_aoi(aoi_file, crop_ok.get(aoi_file.stem, False), logger):
+                    results[aoi_file.stem] = 'FAILED'
+            elif results.get(aoi_file.stem) == 'FAILED':
+                # La limpieza se ejecuta siempre, como en el modo por AOI
+                finalize_single_aoi(aoi_file, False, logger)
+
     # Resumen final
     print(f"\n{Colors.CYAN}{Colors.BOLD}{'=' * 80}{Colors.NC}")
     print(f"{Colors.CYAN}{Colors.BOLD}RESUMEN FINAL DEL BATCH{Colors.NC}")
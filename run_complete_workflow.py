@@ -1059,6 +1059,8 @@ def process_msavi_for_project(project_name, aoi_file, start_date, end_date, log=
     Returns:
         bool: True si se procesó al menos un producto exitosamente
     """
+    from scripts.process_sentinel2_msavi import process_msavi_batch
+
     _logger = log if log is not None else logger
     _logger.info(f"{'=' * 80}")
     _logger.info(f"PASO 5.6: PROCESAMIENTO SENTINEL-2 → MSAVI")
@@ -1115,46 +1117,33 @@ def process_msavi_for_project(project_name, aoi_file, start_date, end_date, log=
         _logger.info(f"  - {date_str}: {product.name}")
     _logger.info("")
     
-    # Procesar cada producto
+    # Saltar productos ya calculados
     success_count = 0
+    tasks = []
     for product, date_str in filtered_products:
         output_file = msavi_dir / f"MSAVI_{date_str}.tif"
         
-        # Saltar si ya existe
         if output_file.exists():
             _logger.info(f"✓ {date_str}: MSAVI ya calculado")
             success_count += 1
             continue
         
-        _logger.info(f"Procesando {date_str}...")
-        
+        tasks.append((product, output_file))
+    
+    # Procesar el resto en un pool de procesos (AOI y GDAL inicializados una vez por worker)
+    if tasks:
+        _logger.info(f"Procesando {len(tasks)} productos...")
         try:
-            # Ejecutar process_sentinel2_msavi.py
-            cmd = [
-                sys.executable,
-                "scripts/process_sentinel2_msavi.py",
-                "--s2-product", str(product),
-                "--output", str(output_file),
-                "--aoi-geojson", str(aoi_file)
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                check=False,
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                success_count += 1
-                _logger.info(f"  ✓ MSAVI calculado: {output_file.name}")
-            else:
-                _logger.warning(f"  Error procesando {date_str}")
-                if result.stderr:
-                    _logger.debug(f"  Error: {result.stderr[:200]}")
-                    
+            batch = process_msavi_batch(tasks, aoi_geojson=aoi_file)
+            success_count += batch['processed']
+            for result in batch['results']:
+                name = Path(result['output'] or result['product']).name
+                if result['success']:
+                    _logger.info(f"  ✓ MSAVI calculado: {name}")
+                else:
+                    _logger.warning(f"  Error procesando {Path(result['product']).name}: {result['error']}")
         except Exception as e:
-            _logger.warning(f"  Excepción procesando {date_str}: {e}")
+            _logger.warning(f"  Excepción en el batch MSAVI: {e}")
     
     # Resumen
     _logger.info(f"{'=' * 60}")
@@ -1187,6 +1176,8 @@ def calculate_closure_phase_for_project(project_name, log=None):
     Returns:
         bool: True si se calculó al menos un closure phase exitosamente
     """
+    from scripts.calculate_closure_phase import calculate_closure_phase_stack
+
     _logger = log if log is not None else logger
     _logger.info(f"{'=' * 80}")
     _logger.info(f"PASO 5.5: CÁLCULO DE CLOSURE PHASE")
@@ -1220,110 +1211,24 @@ def calculate_closure_phase_for_project(project_name, log=None):
             _logger.warning(f"  Directorio InSAR no existe: {insar_dir}")
             continue
         
-        # Buscar archivos .dim de interferogramas
-        ifg_files = sorted(insar_dir.glob("Ifg_*.dim"))
-        
-        if len(ifg_files) < 3:
-            _logger.warning(f"  Insuficientes interferogramas ({len(ifg_files)}) para closure phase (se necesitan ≥3)")
-            continue
-        
-        _logger.info(f"  Interferogramas encontrados: {len(ifg_files)}")
-        
-        # Extraer fechas de los interferogramas
-        ifg_info = []
-        for ifg_file in ifg_files:
-            # Nombre formato: Ifg_20220101_20220113.dim
-            import re
-            match = re.search(r'Ifg_(\d{8})_(\d{8})', ifg_file.name)
-            if match:
-                date1, date2 = match.groups()
-                ifg_info.append({
-                    'file': ifg_file,
-                    'date1': date1,
-                    'date2': date2,
-                    'baseline_days': (
-                        datetime.strptime(date2, '%Y%m%d') - 
-                        datetime.strptime(date1, '%Y%m%d')
-                    ).days
-                })
+        closure_dir = series_dir / "fusion" / "closure_phase"
         
-        if len(ifg_info) < 3:
-            _logger.warning(f"  No se pudieron extraer fechas de los interferogramas")
+        # Todos los tripletes de la serie en un solo proceso (lectura por bloques)
+        try:
+            summary = calculate_closure_phase_stack(insar_dir, closure_dir)
+        except Exception as e:
+            _logger.warning(f"  Excepción: {e}")
             continue
         
-        # Ordenar por fecha de inicio
-        ifg_info.sort(key=lambda x: x['date1'])
-        
-        # Buscar tripletes válidos: necesitamos Ifg(1→2), Ifg(2→3), Ifg(1→3)
-        # donde 1, 2, 3 son fechas consecutivas en orden temporal
-        triplets = []
-        
-        for i in range(len(ifg_info)):
-            for j in range(i + 1, len(ifg_info)):
-                for k in range(j + 1, len(ifg_info)):
-                    ifg1 = ifg_info[i]
-                    ifg2 = ifg_info[j]
-                    ifg3 = ifg_info[k]
-                    
-                    # Verificar si forman un triplete válido
-                    # Triplete: A→B (corto), B→C (corto), A→C (largo)
-                    if (ifg1['date2'] == ifg2['date1'] and 
-                        ifg1['date1'] == ifg3['date1'] and 
-                        ifg2['date2'] == ifg3['date2']):
-                        
-                        triplets.append({
-                            'ifg_12': ifg1['file'],
-                            'ifg_23': ifg2['file'],
-                            'ifg_13': ifg3['file'],
-                            'dates': (ifg1['date1'], ifg1['date2'], ifg2['date2'])
-                        })
-        
-        if not triplets:
+        if not summary['triplets']:
             _logger.warning(f"  No se encontraron tripletes válidos (necesario: pares consecutivos + par largo)")
             _logger.info(f"  Estructura esperada: Ifg(A→B) + Ifg(B→C) + Ifg(A→C)")
             continue
         
-        _logger.info(f"  Tripletes válidos encontrados: {len(triplets)}")
-        
-        # Crear directorio de salida para closure phase
-        closure_dir = series_dir / "fusion" / "closure_phase"
-        closure_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Calcular closure phase para cada triplete
-        for idx, triplet in enumerate(triplets, 1):
-            total_triplets += 1
-            
-            _logger.info(f"  Triplete {idx}/{len(triplets)}:")
-            _logger.info(f"    {triplet['dates'][0]} → {triplet['dates'][1]} → {triplet['dates'][2]}")
-            
-            try:
-                # Ejecutar calculate_closure_phase.py
-                cmd = [
-                    sys.executable,
-                    "scripts/calculate_closure_phase.py",
-                    str(triplet['ifg_12']),
-                    str(triplet['ifg_23']),
-                    str(triplet['ifg_13']),
-                    "--output", str(closure_dir)
-                ]
-                
-                result = subprocess.run(
-                    cmd,
-                    check=False,
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode == 0:
-                    success_count += 1
-                    _logger.info(f"    ✓ Closure phase calculado")
-                else:
-                    _logger.warning(f"    Error calculando closure phase")
-                    if result.stderr:
-                        _logger.debug(f"    Error: {result.stderr[:200]}")
-                        
-            except Exception as e:
-                _logger.warning(f"    Excepción: {e}")
+        total_triplets += summary['triplets']
+        success_count += summary['computed'] + summary['skipped']
+        _logger.info(f"  ✓ {summary['computed']} calculados, {summary['skipped']} ya existentes, "
+                     f"{summary['failed']} fallidos")
     
     # Resumen
     _logger.info(f"{'=' * 60}")
@@ -35,6 +35,7 @@ sys.path.insert(0, str(script_dir))
 
 # Import local modules
 from scripts.db_integration import GoshawkDBIntegration
+from scripts.db_queries import register_s2_downloads, register_slc_downloads
 from scripts.logging_utils import LoggerConfig
 
 # Logger will be configured in main()
@@ -135,7 +136,10 @@ def sync_s1_products_to_db(copernicus_products: List[Dict],
     - If product exists in DB: skip
     - If product NOT exists: INSERT with downloaded=False
 
-    This maintains DB as comprehensive list of available products.
+    This maintains DB as comprehensive list of available products. All
+    products go in one bulk upsert (ON CONFLICT DO NOTHING) instead of a
+    status query plus an insert per product. If the bulk upsert fails the
+    error is logged and nothing is counted as existing.
 
     Args:
         copernicus_products: List from query_copernicus_s1()
@@ -144,27 +148,34 @@ def sync_s1_products_to_db(copernicus_products: List[Dict],
     Returns:
         (new_count, existing_count)
     """
-    new_count = 0
-    existing_count = 0
+    if not db.enabled:
+        logger.warning("  ⚠️  Database not available, sync skipped")
+        return (0, 0)
 
-    for product in copernicus_products:
-        scene_id = product['scene_id']
-        status = db.get_slc_status(scene_id)
+    inserted = register_slc_downloads(
+        [
+            {
+                'scene_id': product['scene_id'],
+                'acquisition_date': product['acquisition_date'],
+                'orbit_direction': product['orbit_direction'],
+                'track_number': product['track_number'],
+                'file_path': '',  # Empty until downloaded
+                'downloaded': False
+            }
+            for product in copernicus_products
+        ],
+        update_existing=False
+    )
+    if inserted is None:
+        logger.error(f"  ✗ Sync failed: could not register {len(copernicus_products)} SLC products "
+                     f"(transaction rolled back, see errors above)")
+        return (0, 0)
 
-        if not status:
-            # New product, register in DB
-            db.register_slc_download(
-                scene_id=scene_id,
-                acquisition_date=product['acquisition_date'],
-                orbit_direction=product['orbit_direction'],
-                track_number=product['track_number'],
-                file_path='',  # Empty until downloaded
-                # downloaded=False is default in DB
-            )
-            logger.info(f"  + New product: {scene_id}")
-            new_count += 1
-        else:
-            existing_count += 1
+    for scene_id in inserted:
+        logger.info(f"  + New product: {scene_id}")
+
+    new_count = len(inserted)
+    existing_count = len({p['scene_id'] for p in copernicus_products}) - new_count
 
     logger.info(f"  ✓ Sync complete: {new_count} new, {existing_count} existing")
     return (new_count, existing_count)
@@ -180,26 +191,35 @@ def sync_s2_products_to_db(copernicus_products: List[Dict],
     Returns:
         (new_count, existing_count)
     """
-    new_count = 0
-    existing_count = 0
+    if not db.enabled:
+        logger.warning("  ⚠️  Database not available, sync skipped")
+        return (0, 0)
 
-    for product in copernicus_products:
-        scene_id = product['scene_id']
-        status = db.get_s2_status(scene_id)
+    inserted = register_s2_downloads(
+        [
+            {
+                'scene_id': product['scene_id'],
+                'acquisition_date': product['acquisition_date'],
+                'satellite_id': product['satellite_id'],
+                'cloud_cover_percent': product['cloud_cover'],
+                'aoi_coverage_percent': product['aoi_coverage'],
+                'file_path': '',  # Empty until downloaded
+                'downloaded': False
+            }
+            for product in copernicus_products
+        ],
+        update_existing=False
+    )
+    if inserted is None:
+        logger.error(f"  ✗ Sync failed: could not register {len(copernicus_products)} S2 products "
+                     f"(transaction rolled back, see errors above)")
+        return (0, 0)
 
-        if not status:
-            db.register_s2_download(
-                scene_id=scene_id,
-                acquisition_date=product['acquisition_date'],
-                satellite_id=product['satellite_id'],
-                cloud_cover_percent=product['cloud_cover'],
-                aoi_coverage_percent=product['aoi_coverage'],
-                file_path=''  # Empty until downloaded
-            )
-            logger.info(f"  + New product: {scene_id}")
-            new_count += 1
-        else:
-            existing_count += 1
+    for scene_id in inserted:
+        logger.info(f"  + New product: {scene_id}")
+
+    new_count = len(inserted)
+    existing_count = len({p['scene_id'] for p in copernicus_products}) - new_count
 
     logger.info(f"  ✓ Sync complete: {new_count} new, {existing_count} existing")
     return (new_count, existing_count)
@@ -224,10 +244,11 @@ def generate_s1_download_queue(copernicus_products: List[Dict],
         ['scene_id1', 'scene_id2', ...]
     """
     queue = []
+    statuses = db.get_slc_status_many(p['scene_id'] for p in copernicus_products)
 
     for product in copernicus_products:
         scene_id = product['scene_id']
-        status = db.get_slc_status(scene_id)
+        status = statuses.get(scene_id)
 
         if not status or not status['downloaded']:
             queue.append(scene_id)
@@ -257,11 +278,12 @@ def generate_s1_process_queue(db: GoshawkDBIntegration,
 
     # Query all SLC for this track/orbit
     all_slc = db.query_slc_by_track_orbit(track, orbit)
+    statuses = db.get_slc_status_many(slc.scene_id for slc in all_slc)
 
     for slc in all_slc:
-        status = db.get_slc_status(slc.scene_id)
+        status = statuses.get(slc.scene_id)
 
-        if not status['downloaded']:
+        if not status or not status['downloaded']:
             continue  # Not downloaded yet, skip
 
         # Check if full-swath processing is needed
@@ -281,10 +303,11 @@ def generate_s2_download_queue(copernicus_products: List[Dict],
     Filter: downloaded=False in DB
     """
     queue = []
+    statuses = db.get_s2_status_many(p['scene_id'] for p in copernicus_products)
 
     for product in copernicus_products:
         scene_id = product['scene_id']
-        status = db.get_s2_status(scene_id)
+        status = statuses.get(scene_id)
 
         if not status or not status['downloaded']:
             queue.append(scene_id)
@@ -312,11 +335,12 @@ def generate_s2_msavi_queue(db: GoshawkDBIntegration,
 
     # Query all S2 in date range
     all_s2 = db.query_s2_by_date_range(start_date, end_date)
+    statuses = db.get_s2_status_many(s2.scene_id for s2 in all_s2)
 
     for s2 in all_s2:
-        status = db.get_s2_status(s2.scene_id)
+        status = statuses.get(s2.scene_id)
 
-        if status['downloaded'] and not status['msavi_processed']:
+        if status and status['downloaded'] and not status['msavi_processed']:
             queue.append(s2.scene_id)
 
     return queue
@@ -491,7 +515,7 @@ def execute_s2_msavi_processing(msavi_queue: List[str],
     """
     Process MSAVI for S2 products in queue.
 
-    After each processing:
+    Products run in a process pool (process_msavi_batch). After the batch:
     - Register msavi_file_path
     - Mark msavi_processed=True
 
@@ -508,24 +532,42 @@ def execute_s2_msavi_processing(msavi_queue: List[str],
     logger.info(f"PROCESSING {len(msavi_queue)} S2 PRODUCTS FOR MSAVI")
     logger.info(f"{'='*80}\n")
 
-    for scene_id in msavi_queue:
-        logger.info(f"Processing MSAVI for {scene_id}...")
+    from scripts.process_sentinel2_msavi import process_msavi_batch
 
-        # TODO: Call process_sentinel2_msavi.py
+    # Resolve SAFE path and output file for each scene
+    tasks = []
+    statuses = db.get_s2_status_many(msavi_queue)
+    for scene_id in msavi_queue:
+        status = statuses.get(scene_id, {})
+        product_path = status.get('file_path') or f"data/sentinel2_l2a/{scene_id}.SAFE"
+        if not os.path.exists(product_path):
+            logger.warning(f"  ⚠️  {scene_id}: SAFE not found ({product_path}), skipping")
+            continue
+        date_str = scene_id.split('_')[2][:8]
+        tasks.append((product_path, f"data/sentinel2_msavi/MSAVI_{date_str}.tif"))
+
+    if not tasks:
+        return
 
-        # Simulate MSAVI processing
-        s2 = db.get_s2_by_scene_id(scene_id)
-        msavi_file = f"data/sentinel2_msavi/MSAVI_{s2.acquisition_date.strftime('%Y%m%d')}.tif"
+    # One process pool for the whole queue; DB is updated once at the end
+    batch = process_msavi_batch(tasks, aoi_geojson=aoi_geojson, update_db=False)
 
+    msavi_date = datetime.now()
+    for result in batch['results']:
+        scene_id = Path(result['product']).name.replace('.SAFE', '')
+        if not result['success']:
+            logger.warning(f"  ✗ {scene_id}: {result['error']}")
+            continue
         db.update_s2(
             scene_id=scene_id,
             msavi_processed=True,
-            msavi_file_path=msavi_file,
-            msavi_date=datetime.now(),
-            msavi_version='1.0',
-            msavi_valid_pixels_percent=87.3  # TODO: Calculate from actual processing
+            msavi_file_path=result['output'],
+            msavi_date=msavi_date,
+            msavi_version='1.0'
         )
-        logger.info(f"  ✓ MSAVI processed and registered in DB\n")
+
+    logger.info(f"  ✓ MSAVI processed and registered in DB: "
+                f"{batch['processed']}/{len(tasks)} ({batch['failed']} failed)\n")
 
 
 def execute_msavi_alignment(project_name: str,
@@ -700,31 +742,33 @@ def main():
     logger.info("PHASE 2: GENERATE WORK QUEUES")
     logger.info("="*80)
 
-    # 2.1 S1 Download Queue
-    s1_download_queue = generate_s1_download_queue(copernicus_s1, db)
-    logger.info(f"\nS1 Download Queue: {len(s1_download_queue)} products")
+    # One status cache for the whole phase: IW1/IW2 queues share their SLC lookups
+    with db.status_cache():
+        # 2.1 S1 Download Queue
+        s1_download_queue = generate_s1_download_queue(copernicus_s1, db)
+        logger.info(f"\nS1 Download Queue: {len(s1_download_queue)} products")
 
-    # 2.2 S1 Process Queues (extract track/orbit from first product)
-    if copernicus_s1:
-        track = copernicus_s1[0]['track_number']
-        orbit = copernicus_s1[0]['orbit_direction']
+        # 2.2 S1 Process Queues (extract track/orbit from first product)
+        if copernicus_s1:
+            track = copernicus_s1[0]['track_number']
+            orbit = copernicus_s1[0]['orbit_direction']
 
-        s1_process_iw1_queue = generate_s1_process_queue(db, 'IW1', track, orbit)
-        s1_process_iw2_queue = generate_s1_process_queue(db, 'IW2', track, orbit)
+            s1_process_iw1_queue = generate_s1_process_queue(db, 'IW1', track, orbit)
+            s1_process_iw2_queue = generate_s1_process_queue(db, 'IW2', track, orbit)
 
-        logger.info(f"S1 Process IW1 Queue: {len(s1_process_iw1_queue)} products")
-        logger.info(f"S1 Process IW2 Queue: {len(s1_process_iw2_queue)} products")
-    else:
-        logger.warning("No S1 products found in Copernicus")
-        return 1
+            logger.info(f"S1 Process IW1 Queue: {len(s1_process_iw1_queue)} products")
+            logger.info(f"S1 Process IW2 Queue: {len(s1_process_iw2_queue)} products")
+        else:
+            logger.warning("No S1 products found in Copernicus")
+            return 1
 
-    # 2.3 S2 Download Queue
-    s2_download_queue = generate_s2_download_queue(copernicus_s2, db)
-    logger.info(f"\nS2 Download Queue: {len(s2_download_queue)} products")
+        # 2.3 S2 Download Queue
+        s2_download_queue = generate_s2_download_queue(copernicus_s2, db)
+        logger.info(f"\nS2 Download Queue: {len(s2_download_queue)} products")
 
-    # 2.4 S2 MSAVI Queue
-    s2_msavi_queue = generate_s2_msavi_queue(db, args.start_date, args.end_date)
-    logger.info(f"S2 MSAVI Queue: {len(s2_msavi_queue)} products")
+        # 2.4 S2 MSAVI Queue
+        s2_msavi_queue = generate_s2_msavi_queue(db, args.start_date, args.end_date)
+        logger.info(f"S2 MSAVI Queue: {len(s2_msavi_queue)} products")
 
     # ========================================
     # PHASE 3: EXECUTE BATCHES
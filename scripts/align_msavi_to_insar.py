@@ -16,10 +16,12 @@ Workflow:
 2. For each pair (master_date, slave_date):
    - Find closest S2 product with MSAVI within ±N days (configurable window)
    - For master and slave:
-     a. Align MSAVI (pre-processed)
-     b. Extract and align raw bands B04, B08, B11 from .SAFE
-     c. Calculate NDVI = (NIR - RED) / (NIR + RED)
-     d. Calculate NDMI = (NIR - SWIR) / (NIR + SWIR)
+     a. Compute MSAVI, NDVI, NDMI + bands B04, B08, B11 from .SAFE in one
+        pass (s2_indices), over the InSAR grid bounds only, as one COG per
+        S2 scene (reused by every pair/grid that needs it)
+     b. Reproject that single multi-band file to the InSAR grid
+        (band 1 = MSAVI; falls back to the pre-processed MSAVI if the .SAFE
+        is no longer available)
    - Register relationship in insar_pair_msavi table
 3. Report statistics: aligned pairs, missing S2, products created
 
@@ -58,6 +60,8 @@ if str(script_dir) not in sys.path:
     sys.path.insert(0, str(script_dir))
 
 from logging_utils import LoggerConfig
+from s2_indices import compute_indices, evaluate_indices, REFLECTANCE_SCALE
+from alignment_cache import AlignmentCache, insar_grid_hash
 
 # Database integration
 try:
@@ -74,6 +78,13 @@ except ImportError as e:
 
 logger = None
 
+# Caché de alineación (se crea en main() bajo --output-dir; None = reproyectar siempre)
+alignment_cache = None
+
+# Stack S2 que se alinea a cada par (band 1 = MSAVI, se registra como fichero MSAVI)
+S2_STACK_INDICES = ('MSAVI', 'NDVI', 'NDMI')
+S2_STACK_BANDS = ('B04', 'B08', 'B11')
+
 
 def extract_insar_grid_info(insar_dim_path: Path) -> Optional[Dict]:
     """
@@ -154,45 +165,27 @@ def calculate_index(
     """
     Calculate vegetation/water index from band data.
 
+    Thin wrapper over s2_indices.evaluate_indices (same formulas as the
+    multi-index engine). Inputs are L2A digital numbers (reflectance * 10000).
+
     Args:
-        band1_data: First band array
-        band2_data: Second band array
+        band1_data: First band array (NIR for NDVI, NDMI and MSAVI)
+        band2_data: Second band array (RED for NDVI/MSAVI, SWIR for NDMI)
         index_type: 'NDVI', 'NDMI', or 'MSAVI'
 
     Returns:
         Index array (float32)
     """
-    # Avoid division by zero
-    epsilon = 1e-10
-
-    if index_type == 'NDVI':
-        # NDVI = (NIR - RED) / (NIR + RED)
-        nir = band1_data.astype(np.float32)
-        red = band2_data.astype(np.float32)
-        ndvi = (nir - red) / (nir + red + epsilon)
-        return np.clip(ndvi, -1, 1)
-
-    elif index_type == 'NDMI':
-        # NDMI = (NIR - SWIR) / (NIR + SWIR)
-        nir = band1_data.astype(np.float32)
-        swir = band2_data.astype(np.float32)
-        ndmi = (nir - swir) / (nir + swir + epsilon)
-        return np.clip(ndmi, -1, 1)
-
-    elif index_type == 'MSAVI':
-        # MSAVI = (2*NIR + 1 - sqrt((2*NIR + 1)² - 8*(NIR - RED))) / 2
-        nir = band1_data.astype(np.float32)
-        red = band2_data.astype(np.float32)
-
-        term1 = 2 * nir + 1
-        term2 = np.sqrt(term1**2 - 8 * (nir - red) + epsilon)
-        msavi = (term1 - term2) / 2
-
-        return np.clip(msavi, -1, 1)
-
-    else:
+    second_band = {'NDVI': 'B04', 'NDMI': 'B11', 'MSAVI': 'B04'}.get(index_type)
+    if second_band is None:
         raise ValueError(f"Unknown index type: {index_type}")
 
+    bands = {
+        'B08': np.multiply(band1_data, REFLECTANCE_SCALE, dtype=np.float32),
+        second_band: np.multiply(band2_data, REFLECTANCE_SCALE, dtype=np.float32)
+    }
+    return evaluate_indices(bands, [index_type])[0]
+
 
 def align_raster_to_insar(
     source_path: Path,
@@ -220,12 +213,21 @@ def align_raster_to_insar(
         # Create output directory
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
+        if alignment_cache is not None:
+            # Reproject once per (source content, grid); later pairs get a hardlink
+            alignment_cache.align(source_path, insar_grid, output_path)
+            band_desc = f" ({band_name})" if band_name else ""
+            logger.info(f"  ✓ Aligned{band_desc}: {output_path.name}")
+            return True
+
         with rasterio.open(source_path) as src:
-            # Read data
-            source_data = src.read(1)
+            # Read all bands (multi-band index stacks are reprojected in one call)
+            source_data = src.read(out_dtype=np.float32)
+            descriptions = src.descriptions
 
-            # Prepare output array
-            aligned_data = np.zeros((insar_grid['height'], insar_grid['width']), dtype=np.float32)
+            # Prepare output array (NaN outside the source footprint)
+            aligned_data = np.full((src.count, insar_grid['height'], insar_grid['width']),
+                                   np.nan, dtype=np.float32)
 
             # Reproject to InSAR grid
             reproject(
@@ -233,8 +235,10 @@ def align_raster_to_insar(
                 destination=aligned_data,
                 src_transform=src.transform,
                 src_crs=src.crs,
+                src_nodata=src.nodata,
                 dst_transform=insar_grid['transform'],
                 dst_crs=insar_grid['crs'],
+                dst_nodata=np.nan,
                 resampling=Resampling.bilinear
             )
 
@@ -244,9 +248,10 @@ def align_raster_to_insar(
                 'dtype': np.float32,
                 'width': insar_grid['width'],
                 'height': insar_grid['height'],
-                'count': 1,
+                'count': src.count,
                 'crs': insar_grid['crs'],
                 'transform': insar_grid['transform'],
+                'nodata': np.nan,
                 'compress': 'lzw',
                 'tiled': True,
                 'blockxsize': 256,
@@ -254,7 +259,10 @@ def align_raster_to_insar(
             }
 
             with rasterio.open(output_path, 'w', **profile) as dst:
-                dst.write(aligned_data, 1)
+                dst.write(aligned_data)
+                for i, description in enumerate(descriptions, 1):
+                    if description:
+                        dst.set_band_description(i, description)
 
         band_desc = f" ({band_name})" if band_name else ""
         logger.info(f"  ✓ Aligned{band_desc}: {output_path.name}")
@@ -336,6 +344,67 @@ def align_msavi_to_insar(
         return False
 
 
+def build_s2_index_stack(
+    s2_info: Dict,
+    insar_grid: Dict,
+    indices_dir: Path
+) -> Optional[Path]:
+    """
+    Multi-index COG of one S2 scene over the InSAR grid bounds.
+
+    Every band is read once (s2_indices.compute_indices). The file is named
+    after scene and grid, so all pairs sharing both reuse it.
+
+    Returns:
+        Path to the COG, or None if the .SAFE is not available
+    """
+    safe_path = Path(s2_info['file_path']) if s2_info.get('file_path') else None
+    if safe_path is None or not safe_path.exists():
+        return None
+
+    stack_path = indices_dir / f"{s2_info['scene_id']}_{insar_grid_hash(insar_grid)}.tif"
+    if stack_path.exists():
+        return stack_path
+
+    result = compute_indices(
+        safe_path, stack_path,
+        indices=S2_STACK_INDICES,
+        include_bands=S2_STACK_BANDS,
+        bounds=tuple(insar_grid['bounds']),
+        bounds_crs=insar_grid['crs']
+    )
+    return stack_path if result else None
+
+
+def align_s2_for_pair(
+    s2_info: Dict,
+    role: str,
+    insar_grid: Dict,
+    aligned_dir: Path,
+    indices_dir: Path,
+    pair_name: str
+) -> Dict:
+    """
+    Align one S2 scene (master or slave side of a pair) to the InSAR grid.
+
+    Returns:
+        Dict {'msavi': path, 'bands': [...]} ('msavi' missing if alignment failed)
+    """
+    stack_path = build_s2_index_stack(s2_info, insar_grid, indices_dir)
+    if stack_path is not None:
+        aligned = aligned_dir / f"S2_{pair_name}_{role}.tif"
+        if align_raster_to_insar(stack_path, insar_grid, aligned, "+".join(S2_STACK_INDICES + S2_STACK_BANDS)):
+            return {'msavi': str(aligned), 'bands': list(S2_STACK_INDICES + S2_STACK_BANDS)}
+        return {}
+
+    # .SAFE gone (cleanup): only the pre-processed MSAVI is left
+    logger.warning(f"  ⚠️  {s2_info['scene_id'][:40]}... .SAFE not available, aligning MSAVI only")
+    aligned = aligned_dir / f"MSAVI_{pair_name}_{role}.tif"
+    if align_raster_to_insar(Path(s2_info['msavi_file_path']), insar_grid, aligned, "MSAVI"):
+        return {'msavi': str(aligned), 'bands': ['MSAVI']}
+    return {}
+
+
 def process_insar_pair(
     pair: Dict,
     window_days: int,
@@ -412,123 +481,14 @@ def process_insar_pair(
     aligned_dir = output_base_dir / f"aligned_s2/{pair['orbit_direction'].lower()}_{pair['subswath'].lower()}/t{pair['track_number']:03d}/{pair['pair_type']}"
     aligned_dir.mkdir(parents=True, exist_ok=True)
 
-    # Get S2 .SAFE paths
-    master_s2_path = Path(master_msavi['file_path'])  # S2 .SAFE directory
-    slave_s2_path = Path(slave_msavi['file_path'])
-
     logger.info(f"  Processing S2 products:")
-    logger.info(f"    Master: {master_s2_path.name[:50]}...")
-    logger.info(f"    Slave:  {slave_s2_path.name[:50]}...")
-
-    # === MASTER: Process indices and raw bands ===
-    master_products = {}
-
-    # 1. Align MSAVI (already processed)
-    master_msavi_path = Path(master_msavi['msavi_file_path'])
-    aligned_master_msavi = aligned_dir / f"MSAVI_{pair_name}_master.tif"
-    if align_raster_to_insar(master_msavi_path, insar_grid, aligned_master_msavi, "MSAVI"):
-        master_products['msavi'] = str(aligned_master_msavi)
-
-    # 2. Extract and align raw bands (B04, B08, B11)
-    for band_name in ['B04', 'B08', 'B11']:
-        band_file = find_s2_band_file(master_s2_path, band_name)
-        if band_file:
-            aligned_band = aligned_dir / f"{band_name}_{pair_name}_master.tif"
-            if align_raster_to_insar(band_file, insar_grid, aligned_band, band_name):
-                master_products[band_name.lower()] = str(aligned_band)
-
-    # 3. Calculate NDVI from aligned bands (if available)
-    if 'b08' in master_products and 'b04' in master_products:
-        logger.info(f"  Calculating NDVI (master)...")
-        with rasterio.open(master_products['b08']) as nir_src, \
-             rasterio.open(master_products['b04']) as red_src:
-            nir_data = nir_src.read(1)
-            red_data = red_src.read(1)
-            ndvi_data = calculate_index(nir_data, red_data, 'NDVI')
-
-            aligned_ndvi = aligned_dir / f"NDVI_{pair_name}_master.tif"
-            profile = nir_src.profile.copy()
-            profile.update(dtype=np.float32, compress='lzw')
-
-            with rasterio.open(aligned_ndvi, 'w', **profile) as dst:
-                dst.write(ndvi_data, 1)
-
-            master_products['ndvi'] = str(aligned_ndvi)
-            logger.info(f"  ✓ Calculated NDVI: {aligned_ndvi.name}")
-
-    # 4. Calculate NDMI from aligned bands (if available)
-    if 'b08' in master_products and 'b11' in master_products:
-        logger.info(f"  Calculating NDMI (master)...")
-        with rasterio.open(master_products['b08']) as nir_src, \
-             rasterio.open(master_products['b11']) as swir_src:
-            nir_data = nir_src.read(1)
-            swir_data = swir_src.read(1)
-            ndmi_data = calculate_index(nir_data, swir_data, 'NDMI')
-
-            aligned_ndmi = aligned_dir / f"NDMI_{pair_name}_master.tif"
-            profile = nir_src.profile.copy()
-            profile.update(dtype=np.float32, compress='lzw')
-
-            with rasterio.open(aligned_ndmi, 'w', **profile) as dst:
-                dst.write(ndmi_data, 1)
-
-            master_products['ndmi'] = str(aligned_ndmi)
-            logger.info(f"  ✓ Calculated NDMI: {aligned_ndmi.name}")
-
-    # === SLAVE: Process indices and raw bands ===
-    slave_products = {}
-
-    # 1. Align MSAVI
-    slave_msavi_path = Path(slave_msavi['msavi_file_path'])
-    aligned_slave_msavi = aligned_dir / f"MSAVI_{pair_name}_slave.tif"
-    if align_raster_to_insar(slave_msavi_path, insar_grid, aligned_slave_msavi, "MSAVI"):
-        slave_products['msavi'] = str(aligned_slave_msavi)
-
-    # 2. Extract and align raw bands
-    for band_name in ['B04', 'B08', 'B11']:
-        band_file = find_s2_band_file(slave_s2_path, band_name)
-        if band_file:
-            aligned_band = aligned_dir / f"{band_name}_{pair_name}_slave.tif"
-            if align_raster_to_insar(band_file, insar_grid, aligned_band, band_name):
-                slave_products[band_name.lower()] = str(aligned_band)
-
-    # 3. Calculate NDVI
-    if 'b08' in slave_products and 'b04' in slave_products:
-        logger.info(f"  Calculating NDVI (slave)...")
-        with rasterio.open(slave_products['b08']) as nir_src, \
-             rasterio.open(slave_products['b04']) as red_src:
-            nir_data = nir_src.read(1)
-            red_data = red_src.read(1)
-            ndvi_data = calculate_index(nir_data, red_data, 'NDVI')
-
-            aligned_ndvi = aligned_dir / f"NDVI_{pair_name}_slave.tif"
-            profile = nir_src.profile.copy()
-            profile.update(dtype=np.float32, compress='lzw')
-
-            with rasterio.open(aligned_ndvi, 'w', **profile) as dst:
-                dst.write(ndvi_data, 1)
-
-            slave_products['ndvi'] = str(aligned_ndvi)
-            logger.info(f"  ✓ Calculated NDVI: {aligned_ndvi.name}")
-
-    # 4. Calculate NDMI
-    if 'b08' in slave_products and 'b11' in slave_products:
-        logger.info(f"  Calculating NDMI (slave)...")
-        with rasterio.open(slave_products['b08']) as nir_src, \
-             rasterio.open(slave_products['b11']) as swir_src:
-            nir_data = nir_src.read(1)
-            swir_data = swir_src.read(1)
-            ndmi_data = calculate_index(nir_data, swir_data, 'NDMI')
-
-            aligned_ndmi = aligned_dir / f"NDMI_{pair_name}_slave.tif"
-            profile = nir_src.profile.copy()
-            profile.update(dtype=np.float32, compress='lzw')
-
-            with rasterio.open(aligned_ndmi, 'w', **profile) as dst:
-                dst.write(ndmi_data, 1)
-
-            slave_products['ndmi'] = str(aligned_ndmi)
-            logger.info(f"  ✓ Calculated NDMI: {aligned_ndmi.name}")
+    logger.info(f"    Master: {master_msavi['scene_id'][:50]}...")
+    logger.info(f"    Slave:  {slave_msavi['scene_id'][:50]}...")
+
+    # One index COG per S2 scene and grid, then one reprojection per side
+    indices_dir = output_base_dir / "aligned_s2" / "s2_indices"
+    master_products = align_s2_for_pair(master_msavi, 'master', insar_grid, aligned_dir, indices_dir, pair_name)
+    slave_products = align_s2_for_pair(slave_msavi, 'slave', insar_grid, aligned_dir, indices_dir, pair_name)
 
     # Check minimum requirements
     if 'msavi' not in master_products or 'msavi' not in slave_products:
@@ -548,8 +508,8 @@ def process_insar_pair(
     if integration_id:
         logger.info(f"  ✓ Registered in DB (integration_id={integration_id})")
         logger.info(f"  Products created:")
-        logger.info(f"    Master: {len(master_products)} files (MSAVI, {', '.join([k.upper() for k in master_products.keys() if k != 'msavi'])})")
-        logger.info(f"    Slave:  {len(slave_products)} files (MSAVI, {', '.join([k.upper() for k in slave_products.keys() if k != 'msavi'])})")
+        logger.info(f"    Master: {Path(master_products['msavi']).name} ({', '.join(master_products['bands'])})")
+        logger.info(f"    Slave:  {Path(slave_products['msavi']).name} ({', '.join(slave_products['bands'])})")
 
         return {
             'status': 'aligned',
@@ -592,6 +552,8 @@ def main():
                         help='Base directory for aligned MSAVI outputs')
     parser.add_argument('--dry-run', action='store_true',
                         help='Dry run: show what would be processed without executing')
+    parser.add_argument('--no-align-cache', action='store_true',
+                        help='Reproject every pair from scratch (disable alignment cache)')
 
     args = parser.parse_args()
 
@@ -649,6 +611,10 @@ def main():
     # Process each pair
     output_base_dir = Path(args.output_dir)
 
+    global alignment_cache
+    if not args.dry_run and not args.no_align_cache:
+        alignment_cache = AlignmentCache(output_base_dir / "aligned_s2" / "cache")
+
     stats = {
         'aligned': 0,
         'no_msavi_master': 0,
@@ -689,6 +655,8 @@ def main():
     logger.info(f"  ✗ Alignment failed: {stats['alignment_failed']}")
     logger.info(f"  ✗ Registration failed: {stats['registration_failed']}")
     logger.info(f"  ✗ Errors: {stats['error']}")
+    if alignment_cache is not None:
+        logger.info(f"  {alignment_cache.summary()}")
 
     if stats['aligned'] > 0:
         logger.info(f"\n✅ {stats['aligned']} InSAR pairs successfully linked with MSAVI")
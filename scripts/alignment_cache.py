@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Script: alignment_cache.py
+Descripción: Caché de alineación S2 → rejilla InSAR (reproyectar una sola vez)
+
+Todos los pares de un track/sub-swath comparten la misma rejilla InSAR y
+varios pares usan la misma fecha S2, así que la misma reproyección se
+repetía por cada par. Esta caché:
+
+- Guarda cada raster alineado una sola vez, con clave
+  (checksum del raster origen, hash de la rejilla destino, remuestreo),
+  y entrega hardlinks (o copia si el destino está en otro disco).
+- Precalcula los mapas de coordenadas del warp (fila/columna origen de cada
+  píxel destino) por par de rejillas (origen, destino) y los reutiliza: los
+  stacks de índices de un mismo tile tienen todos la misma rejilla, así que
+  la transformación de coordenadas se hace una vez por tile y rejilla InSAR.
+- El remuestreo es bilineal con pesos renormalizados sobre los píxeles
+  válidos (los NaN/nodata no contaminan a sus vecinos, como GDAL).
+
+Estructura en disco:
+    <cache_dir>/aligned/<clave>.tif
+    <cache_dir>/maps/<hash origen>_<hash destino>.npz
+
+El límite de tamaño (LRU por mtime) cuenta rasters alineados y mapas.
+
+Configuración (variables de entorno):
+    GOSHAWK_ALIGN_CACHE_GB      Tamaño máximo en GB (default: 50)
+
+Uso:
+    cache = AlignmentCache('/mnt/satelit_data/aligned_products/aligned_s2/cache')
+    cache.align(source_tif, insar_grid, output_tif)   # hardlink al raster alineado
+    logger.info(cache.summary())
+
+    python scripts/alignment_cache.py <cache_dir> --stats
+    python scripts/alignment_cache.py <cache_dir> --evict
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import rasterio
+from rasterio.warp import transform as transform_coords
+from scipy.ndimage import map_coordinates
+
+logger = logging.getLogger(__name__)
+
+ALIGN_CACHE_MAX_GB = float(os.environ.get('GOSHAWK_ALIGN_CACHE_GB', '50'))
+
+# Cambiar al modificar el remuestreo: invalida las entradas previas
+ALIGN_VERSION = 'bilinear-nan-v1'
+
+# Filas por bloque al calcular mapas de coordenadas y remuestrear
+MAP_BLOCK_ROWS = 512
+
+# Mapas de warp en memoria por instancia (LRU); cada par de mapas float32
+# ocupa 8 bytes por píxel de la rejilla InSAR
+MEMORY_MAPS = 4
+
+# Memo por proceso del checksum: (ruta real, tamaño, mtime) → sha1
+_CHECKSUM_MEMO = {}
+
+
+def grid_hash(crs, transform, width: int, height: int) -> str:
+    """Hash corto y estable de una rejilla (CRS, transform y tamaño)"""
+    key = '|'.join([
+        crs.to_string() if crs else '',
+        ','.join(f"{v:.9g}" for v in tuple(transform)[:6]),
+        f"{width}x{height}"
+    ])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def insar_grid_hash(insar_grid: Dict) -> str:
+    """Hash de la rejilla de extract_insar_grid_info()"""
+    return grid_hash(insar_grid['crs'], insar_grid['transform'],
+                     insar_grid['width'], insar_grid['height'])
+
+
+def file_checksum(path: Union[Path, str]) -> str:
+    """
+    SHA-1 del contenido de un fichero, memorizado por (ruta, tamaño, mtime)
+
+    Un mismo raster origen se lee entero como mucho una vez por proceso.
+    """
+    real = os.path.realpath(str(path))
+    stat = os.stat(real)
+    memo_key = (real, stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _CHECKSUM_MEMO:
+        digest = hashlib.sha1()
+        with open(real, 'rb') as f:
+            for chunk in iter(lambda: f.read(4 * 1024 * 1024), b''):
+                digest.update(chunk)
+        _CHECKSUM_MEMO[memo_key] = digest.hexdigest()
+    return _CHECKSUM_MEMO[memo_key]
+
+
+def compute_warp_maps(src_crs, src_transform, dst_crs, dst_transform,
+                      dst_width: int, dst_height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fila/columna (fraccionarias, centro de píxel = entero) en el raster origen
+    de cada píxel de la rejilla destino
+
+    Returns:
+        tuple: (rows, cols) float32 de forma (dst_height, dst_width)
+    """
+    rows = np.empty((dst_height, dst_width), dtype=np.float32)
+    cols = np.empty((dst_height, dst_width), dtype=np.float32)
+    inverse_src = ~src_transform
+    col_centers = np.arange(dst_width, dtype=np.float64) + 0.5
+
+    for row_start in range(0, dst_height, MAP_BLOCK_ROWS):
+        row_end = min(row_start + MAP_BLOCK_ROWS, dst_height)
+        grid_cols, grid_rows = np.meshgrid(col_centers, np.arange(row_start, row_end, dtype=np.float64) + 0.5)
+        xs, ys = dst_transform * (grid_cols.ravel(), grid_rows.ravel())
+        if src_crs != dst_crs:
+            xs, ys = transform_coords(dst_crs, src_crs, xs, ys)
+        src_cols, src_rows = inverse_src * (np.asarray(xs), np.asarray(ys))
+        shape = (row_end - row_start, dst_width)
+        rows[row_start:row_end] = np.asarray(src_rows).reshape(shape) - 0.5
+        cols[row_start:row_end] = np.asarray(src_cols).reshape(shape) - 0.5
+
+    return rows, cols
+
+
+def resample_bilinear(band: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+                      nodata: Optional[float] = None) -> np.ndarray:
+    """
+    Bilineal con pesos renormalizados sobre píxeles válidos
+
+    Args:
+        band: Banda origen 2D
+        rows, cols: Mapas de compute_warp_maps()
+        nodata: Valor nodata del origen (además de NaN)
+
+    Returns:
+        Array float32 en la rejilla destino (NaN fuera del origen o sin vecinos válidos)
+    """
+    band = np.asarray(band, dtype=np.float32)
+    valid = np.isfinite(band)
+    if nodata is not None and not np.isnan(nodata):
+        valid &= band != nodata
+    filled = np.where(valid, band, 0.0).astype(np.float32)
+    weights = valid.astype(np.float32)
+
+    height, width = band.shape
+    out = np.full(rows.shape, np.nan, dtype=np.float32)
+
+    for row_start in range(0, rows.shape[0], MAP_BLOCK_ROWS):
+        block = slice(row_start, min(row_start + MAP_BLOCK_ROWS, rows.shape[0]))
+        coords = np.stack([rows[block], cols[block]])
+        numerator = map_coordinates(filled, coords, order=1, mode='grid-constant', cval=0.0, prefilter=False)
+        denominator = map_coordinates(weights, coords, order=1, mode='grid-constant', cval=0.0, prefilter=False)
+
+        inside = ((rows[block] >= -0.5) & (rows[block] <= height - 0.5) &
+                  (cols[block] >= -0.5) & (cols[block] <= width - 0.5) &
+                  (denominator > 1e-6))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[block] = np.where(inside, numerator / denominator, np.nan)
+
+    return out
+
+
+class AlignmentCache:
+    """Rasters alineados a rejillas InSAR, uno por (origen, rejilla), entregados por hardlink"""
+
+    def __init__(self, cache_dir: Union[Path, str], max_gb: float = ALIGN_CACHE_MAX_GB):
+        self.cache_dir = Path(cache_dir)
+        self.aligned_dir = self.cache_dir / 'aligned'
+        self.maps_dir = self.cache_dir / 'maps'
+        self.max_bytes = int(max_gb * 1024 ** 3)
+        self.aligned_dir.mkdir(parents=True, exist_ok=True)
+        self.maps_dir.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.map_hits = 0
+        self.map_misses = 0
+        self._maps = OrderedDict()
+
+    def make_key(self, source_path: Union[Path, str], insar_grid: Dict) -> str:
+        """Clave del raster alineado: contenido del origen + rejilla destino + versión"""
+        canonical = '|'.join([file_checksum(source_path), insar_grid_hash(insar_grid), ALIGN_VERSION])
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+    def warp_maps(self, src, insar_grid: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """Mapas de coordenadas para (rejilla de src, rejilla InSAR), en memoria o disco"""
+        map_key = f"{grid_hash(src.crs, src.transform, src.width, src.height)}_{insar_grid_hash(insar_grid)}"
+        if map_key in self._maps:
+            self.map_hits += 1
+            self._maps.move_to_end(map_key)
+            return self._maps[map_key]
+
+        map_file = self.maps_dir / f"{map_key}.npz"
+        if map_file.exists():
+            try:
+                with np.load(map_file) as data:
+                    maps = (data['rows'], data['cols'])
+                self.map_hits += 1
+                os.utime(map_file)
+                self._remember_maps(map_key, maps)
+                return maps
+            except (OSError, ValueError, KeyError):
+                logger.warning(f"⚠️  Mapa de warp ilegible, se recalcula: {map_file.name}")
+
+        self.map_misses += 1
+        maps = compute_warp_maps(
+            src.crs, src.transform,
+            insar_grid['crs'], insar_grid['transform'],
+            insar_grid['width'], insar_grid['height']
+        )
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.maps_dir, suffix='.npz')
+        os.close(fd)
+        try:
+            np.savez(tmp_path, rows=maps[0], cols=maps[1])
+            os.replace(tmp_path, map_file)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict(keep=map_file.name)
+
+        self._remember_maps(map_key, maps)
+        return maps
+
+    def _remember_maps(self, map_key: str, maps: Tuple[np.ndarray, np.ndarray]) -> None:
+        """Guarda los mapas en memoria, descartando los menos usados por encima de MEMORY_MAPS"""
+        self._maps[map_key] = maps
+        self._maps.move_to_end(map_key)
+        while len(self._maps) > MEMORY_MAPS:
+            self._maps.popitem(last=False)
+
+    def _render(self, source_path: Union[Path, str], insar_grid: Dict, dest: Path) -> None:
+        """Alinea todas las bandas del origen a la rejilla InSAR y las escribe en dest"""
+        with rasterio.open(source_path) as src:
+            rows, cols = self.warp_maps(src, insar_grid)
+            profile = {
+                'driver': 'GTiff',
+                'dtype': 'float32',
+                'width': insar_grid['width'],
+                'height': insar_grid['height'],
+                'count': src.count,
+                'crs': insar_grid['crs'],
+                'transform': insar_grid['transform'],
+                'nodata': np.nan,
+                'compress': 'lzw',
+                'tiled': True,
+                'blockxsize': 256,
+                'blockysize': 256
+            }
+            with rasterio.open(dest, 'w', **profile) as dst:
+                for band_idx in range(1, src.count + 1):
+                    dst.write(resample_bilinear(src.read(band_idx), rows, cols, src.nodata), band_idx)
+                    description = src.descriptions[band_idx - 1]
+                    if description:
+                        dst.set_band_description(band_idx, description)
+                dst.update_tags(ALIGN_SOURCE=os.path.basename(str(source_path)), ALIGN_VERSION=ALIGN_VERSION)
+
+    def align(self, source_path: Union[Path, str], insar_grid: Dict,
+              output_path: Union[Path, str]) -> Path:
+        """
+        Raster origen alineado a la rejilla InSAR en output_path
+
+        Si ya existe en la caché se entrega sin reproyectar (hardlink).
+
+        Returns:
+            Path: output_path
+        """
+        key = self.make_key(source_path, insar_grid)
+        cached = self.aligned_dir / f"{key}.tif"
+
+        if cached.exists():
+            self.hits += 1
+            os.utime(cached)
+        else:
+            self.misses += 1
+            fd, tmp_path = tempfile.mkstemp(dir=self.aligned_dir, suffix='.tif.tmp')
+            os.close(fd)
+            try:
+                self._render(source_path, insar_grid, Path(tmp_path))
+                os.replace(tmp_path, cached)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self.evict(keep=cached.name)
+
+        return self.link(cached, output_path)
+
+    @staticmethod
+    def link(cached: Path, output_path: Union[Path, str]) -> Path:
+        """Hardlink del raster cacheado en output_path (copia si es otro sistema de ficheros)"""
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if output_path.exists() or output_path.is_symlink():
+            if output_path.exists() and os.path.samefile(cached, output_path):
+                return output_path
+            output_path.unlink()
+        try:
+            os.link(cached, output_path)
+        except OSError:
+            shutil.copy2(cached, output_path)
+        return output_path
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Aplica el límite de tamaño borrando las entradas menos usadas (LRU por mtime)
+
+        Cuenta y desaloja tanto rasters alineados como mapas de warp. Los pares
+        ya enlazados conservan su hardlink: solo se pierde la entrada.
+
+        Args:
+            keep: Nombre de fichero que no se desaloja (la entrada recién creada)
+
+        Returns:
+            int: Entradas eliminadas
+        """
+        entries = sorted(list(self.aligned_dir.glob('*.tif')) + list(self.maps_dir.glob('*.npz')),
+                         key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in entries)
+        removed = 0
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep:
+                continue
+            total -= entry.stat().st_size
+            entry.unlink()
+            removed += 1
+        if removed:
+            logger.info(f"🧹 Caché de alineación: {removed} entradas desalojadas (LRU)")
+        return removed
+
+    def stats(self) -> Dict:
+        """Tamaño y contadores de la caché"""
+        aligned = list(self.aligned_dir.glob('*.tif'))
+        maps = list(self.maps_dir.glob('*.npz'))
+        return {
+            'entries': len(aligned),
+            'maps': len(maps),
+            'size_gb': sum(p.stat().st_size for p in aligned + maps) / 1024 ** 3,
+            'hits': self.hits,
+            'misses': self.misses,
+            'map_hits': self.map_hits,
+            'map_misses': self.map_misses
+        }
+
+    def summary(self) -> str:
+        """Resumen de uso para logs"""
+        return (f"caché alineación: {self.hits} hits, {self.misses} misses, "
+                f"mapas de warp {self.map_hits} reutilizados / {self.map_misses} calculados")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Caché de alineación S2 → rejilla InSAR')
+    parser.add_argument('cache_dir', help='Directorio de la caché (ej: <output-dir>/aligned_s2/cache)')
+    parser.add_argument('--stats', action='store_true', help='Mostrar tamaño y entradas')
+    parser.add_argument('--evict', action='store_true', help='Aplicar el límite de tamaño ahora')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    cache = AlignmentCache(args.cache_dir)
+
+    if args.evict:
+        cache.evict()
+
+    stats = cache.stats()
+    print(f"Caché de alineación: {cache.cache_dir}")
+    print(f"  Rasters alineados: {stats['entries']}")
+    print(f"  Mapas de warp:     {stats['maps']}")
+    print(f"  Tamaño:            {stats['size_gb']:.2f} GB (límite {ALIGN_CACHE_MAX_GB:.0f} GB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
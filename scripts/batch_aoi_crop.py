@@ -7,7 +7,8 @@ Description: Batch crop InSAR products to AOI using database queries
 This script:
 1. Queries the database for processed InSAR pairs
 2. Filters by track, orbit direction, subswath, pair type
-3. Crops all matching products to the AOI
+3. Crops all matching products to the AOI (or, with several AOIs, reads
+   each product once and fans the crop out to every AOI)
 4. Saves cropped GeoTIFFs for urban analysis
 
 Author: goshawk_ETL
@@ -22,15 +23,15 @@ from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Dict
 
-import rasterio
-from rasterio.mask import mask
-from shapely import wkt
-from shapely.geometry import mapping
-
 # Add scripts directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from logging_utils import LoggerConfig
+from crop_engine import (
+    DEFAULT_CROP_WORKERS, build_product_targets, crop_product, crop_products,
+    crop_products_multi_aoi, log_crop_result
+)
+from aoi_utils import geojson_to_wkt
 from db_queries import get_insar_pairs
 from db_integration import init_db
 
@@ -45,116 +46,42 @@ def crop_insar_to_aoi(
 ) -> Optional[str]:
     """
     Crop a single InSAR product to AOI.
-    
+
+    Only the AOI window of the band is read (see crop_engine).
+
     Args:
         insar_file: Path to .dim file or .data directory
         aoi_wkt: WKT string of AOI geometry
         output_dir: Output directory for cropped products
         band_pattern: Pattern to find band (default: 'coh' for coherence)
-        
+
     Returns:
         Path to cropped file if successful, None otherwise
     """
+    basename = os.path.basename(insar_file.rstrip(os.sep)).replace('.dim', '').replace('.data', '')
+    output_file = os.path.join(output_dir, f"{basename}_cropped.tif")
+
     try:
-        # Determine product name
-        if insar_file.endswith('.dim'):
-            basename = os.path.basename(insar_file).replace('.dim', '')
-            data_dir = insar_file.replace('.dim', '.data')
-        else:
-            # Assume it's already a .data directory
-            data_dir = insar_file
-            basename = os.path.basename(insar_file.replace('.data', ''))
-        
-        output_file = os.path.join(output_dir, f"{basename}_cropped.tif")
-        
-        # Skip if already exists
-        if os.path.exists(output_file):
-            logger.info(f"  ⏭️  Already cropped: {basename}")
-            return output_file
-        
-        # Find coherence band (or other specified band)
-        band_file = None
-        if os.path.isdir(data_dir):
-            for root, dirs, files in os.walk(data_dir):
-                for f in files:
-                    if band_pattern in f.lower() and f.endswith('.img'):
-                        band_file = os.path.join(root, f)
-                        break
-                if band_file:
-                    break
-        
-        if not band_file:
-            logger.warning(f"  ⚠️  No {band_pattern} band found: {basename}")
-            return None
-        
-        # Parse AOI geometry
-        aoi_geom = wkt.loads(aoi_wkt)
-        geoms = [mapping(aoi_geom)]
-        
-        # Open raster and crop
-        with rasterio.open(band_file) as src:
-            if src.crs is None:
-                logger.warning(f"  ⚠️  No CRS in product: {basename}")
-                return None
-            
-            # Crop to AOI
-            out_image, out_transform = mask(src, geoms, crop=True, all_touched=True)
-            out_meta = src.meta.copy()
-            
-            # Update metadata
-            out_meta.update({
-                "driver": "GTiff",
-                "height": out_image.shape[1],
-                "width": out_image.shape[2],
-                "transform": out_transform,
-                "compress": "lzw",
-                "tiled": True,
-                "blockxsize": 512,
-                "blockysize": 512
-            })
-            
-            # Save cropped product
-            with rasterio.open(output_file, "w", **out_meta) as dest:
-                dest.write(out_image)
-            
-            original_size = src.shape[0] * src.shape[1]
-            cropped_size = out_image.shape[1] * out_image.shape[2]
-            reduction = (1 - cropped_size / original_size) * 100
-            
-            logger.info(f"  ✓ Cropped: {basename}")
-            logger.info(f"    {src.shape[0]}x{src.shape[1]} → {out_image.shape[1]}x{out_image.shape[2]} "
-                       f"({reduction:.1f}% reduction)")
-            
-            return output_file
-            
+        result = crop_product(insar_file, aoi_wkt, output_file, (band_pattern,))
     except Exception as e:
         logger.error(f"  ✗ Error cropping {basename}: {e}")
         return None
 
+    log_crop_result(result, logger)
+    return output_file if result['status'] in ('cropped', 'exists') else None
 
-def batch_crop_by_query(
+
+def query_insar_pairs(
     track_number: int,
     orbit_direction: str,
     subswath: str,
-    aoi_wkt: str,
-    output_dir: str,
-    pair_type: Optional[str] = None,
-    band_pattern: str = 'coh'
-) -> Dict[str, int]:
+    pair_type: Optional[str] = None
+) -> List[Dict]:
     """
-    Batch crop InSAR products based on database query.
+    Query the database for InSAR pairs and log a short summary.
     
-    Args:
-        track_number: Track number (1-175)
-        orbit_direction: ASCENDING or DESCENDING
-        subswath: IW1, IW2, or IW3
-        aoi_wkt: WKT string of AOI
-        output_dir: Output directory
-        pair_type: Optional filter for 'short' or 'long'
-        band_pattern: Band to extract (default: 'coh')
-        
     Returns:
-        Dictionary with statistics
+        List of pair dictionaries (empty if none found)
     """
     logger.info("=" * 80)
     logger.info("DATABASE QUERY")
@@ -179,7 +106,7 @@ def batch_crop_by_query(
         logger.info("  - No products processed yet")
         logger.info("  - Wrong track/orbit/subswath combination")
         logger.info("  - Database not populated (run processing first)")
-        return {"found": 0, "cropped": 0, "failed": 0, "skipped": 0}
+        return []
     
     logger.info(f"✓ Found {len(pairs)} InSAR pair(s) in database")
     logger.info("")
@@ -196,6 +123,50 @@ def batch_crop_by_query(
         logger.info(f"  ... and {len(pairs) - 5} more")
     logger.info("")
     
+    return pairs
+
+
+def existing_pair_products(pairs: List[Dict]) -> List[str]:
+    """Product paths of the pairs whose file exists on disk."""
+    products = []
+    for pair in pairs:
+        if not os.path.exists(pair['file_path']):
+            logger.warning(f"  ⚠️  File not found (pair {pair['id']}): {pair['file_path']}")
+            continue
+        products.append(pair['file_path'])
+    return products
+
+
+def batch_crop_by_query(
+    track_number: int,
+    orbit_direction: str,
+    subswath: str,
+    aoi_wkt: str,
+    output_dir: str,
+    pair_type: Optional[str] = None,
+    band_pattern: str = 'coh',
+    workers: int = DEFAULT_CROP_WORKERS
+) -> Dict[str, int]:
+    """
+    Batch crop InSAR products based on database query.
+    
+    Args:
+        track_number: Track number (1-175)
+        orbit_direction: ASCENDING or DESCENDING
+        subswath: IW1, IW2, or IW3
+        aoi_wkt: WKT string of AOI
+        output_dir: Output directory
+        pair_type: Optional filter for 'short' or 'long'
+        band_pattern: Band to extract (default: 'coh')
+        workers: Products cropped in parallel
+        
+    Returns:
+        Dictionary with statistics
+    """
+    pairs = query_insar_pairs(track_number, orbit_direction, subswath, pair_type)
+    if not pairs:
+        return {"found": 0, "cropped": 0, "failed": 0, "skipped": 0, "no_overlap": 0}
+    
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
@@ -208,40 +179,113 @@ def batch_crop_by_query(
         "found": len(pairs),
         "cropped": 0,
         "failed": 0,
-        "skipped": 0
+        "skipped": 0,
+        "no_overlap": 0
     }
     
-    for i, pair in enumerate(pairs, 1):
-        logger.info(f"\n[{i}/{len(pairs)}] Processing pair {pair['id']}")
-        logger.info(f"  Master: {pair['master_scene_id'][:40]}...")
-        logger.info(f"  Slave:  {pair['slave_scene_id'][:40]}...")
-        logger.info(f"  File: {os.path.basename(pair['file_path'])}")
-        
-        # Check if file exists
-        if not os.path.exists(pair['file_path']):
-            logger.warning(f"  ⚠️  File not found: {pair['file_path']}")
-            stats['failed'] += 1
-            continue
-        
-        # Crop the product
-        result = crop_insar_to_aoi(
-            insar_file=pair['file_path'],
-            aoi_wkt=aoi_wkt,
-            output_dir=output_dir,
-            band_pattern=band_pattern
-        )
+    products = existing_pair_products(pairs)
+    stats['failed'] += len(pairs) - len(products)
+    
+    # Crop in a process pool; products whose grid misses the AOI are skipped
+    logger.info(f"Cropping {len(products)} product(s) with {workers} worker(s)")
+    summary = crop_products(
+        products, aoi_wkt, output_dir,
+        band_patterns=(band_pattern,),
+        workers=workers,
+        log=logger
+    )
+    
+    stats['cropped'] = summary['cropped']
+    stats['skipped'] = summary['skipped']
+    stats['no_overlap'] = summary['no_overlap']
+    stats['failed'] += summary['failed']
+    
+    return stats
+
+
+def batch_crop_multi_aoi_by_query(
+    track_number: int,
+    orbit_direction: str,
+    subswath: str,
+    aois: Dict[str, str],
+    output_dir: str,
+    pair_type: Optional[str] = None,
+    band_pattern: str = 'coh',
+    workers: int = DEFAULT_CROP_WORKERS
+) -> Dict:
+    """
+    Fan-out crop: each repository product is read once for all AOIs.
+    
+    AOIs are grouped by the products they intersect; every product is read
+    block by block a single time and all AOI crops are written from the
+    in-memory blocks (see crop_engine.crop_products_multi_aoi).
+    
+    Args:
+        track_number: Track number (1-175)
+        orbit_direction: ASCENDING or DESCENDING
+        subswath: IW1, IW2, or IW3
+        aois: AOI name -> WKT string
+        output_dir: Output directory (one subdirectory per AOI)
+        pair_type: Optional filter for 'short' or 'long'
+        band_pattern: Band to extract (default: 'coh')
+        workers: Products cropped in parallel
         
-        if result:
-            if "Already cropped" in str(result):
-                stats['skipped'] += 1
-            else:
-                stats['cropped'] += 1
-        else:
-            stats['failed'] += 1
+    Returns:
+        Dictionary with overall statistics plus 'by_aoi'
+    """
+    stats = {"found": 0, "cropped": 0, "failed": 0, "skipped": 0, "no_overlap": 0, "by_aoi": {}}
+    
+    pairs = query_insar_pairs(track_number, orbit_direction, subswath, pair_type)
+    if not pairs:
+        return stats
+    
+    logger.info("=" * 80)
+    logger.info(f"CROPPING PRODUCTS FOR {len(aois)} AOI(S)")
+    logger.info("=" * 80)
+    
+    products = existing_pair_products(pairs)
+    aoi_products = {
+        aoi_name: (aoi_wkt, os.path.join(output_dir, aoi_name), products)
+        for aoi_name, aoi_wkt in aois.items()
+    }
+    product_targets = build_product_targets(aoi_products)
+    
+    logger.info(f"Cropping {len(product_targets)} product(s) x {len(aois)} AOI(s) "
+                f"with {workers} worker(s)")
+    summary = crop_products_multi_aoi(
+        product_targets,
+        band_patterns=(band_pattern,),
+        workers=workers,
+        log=logger
+    )
+    
+    stats['found'] = len(pairs)
+    stats['cropped'] = summary['cropped']
+    stats['skipped'] = summary['skipped']
+    stats['no_overlap'] = summary['no_overlap']
+    stats['failed'] = summary['failed'] + (len(pairs) - len(products)) * len(aois)
+    stats['by_aoi'] = summary['by_aoi']
     
     return stats
 
 
+def read_workspace_aoi(workspace: str) -> Optional[str]:
+    """Read the AOI WKT from a workspace config.txt."""
+    config_file = os.path.join(workspace, 'config.txt')
+    if not os.path.exists(config_file):
+        logger.error(f"Config file not found: {config_file}")
+        return None
+    
+    with open(config_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('AOI='):
+                return line.split('=', 1)[1].strip().strip('"')
+    
+    logger.error(f"AOI not found in {config_file}")
+    return None
+
+
 def main():
     global logger
     
@@ -258,6 +302,10 @@ Examples:
   
   # Use AOI from workspace config.txt
   python scripts/batch_aoi_crop.py --track 110 --orbit DESCENDING --subswath IW1 --workspace /path/to/aoi
+  
+  # Fan-out: read each product once and crop it for several AOIs
+  python scripts/batch_aoi_crop.py --track 110 --orbit DESCENDING --subswath IW1 --aoi-files aoi/*.geojson
+  python scripts/batch_aoi_crop.py --track 110 --orbit DESCENDING --subswath IW1 --workspaces processing/a processing/b
         """
     )
     
@@ -277,12 +325,18 @@ Examples:
                           help='AOI as WKT string')
     aoi_group.add_argument('--workspace', type=str,
                           help='Workspace directory (reads AOI from config.txt)')
+    aoi_group.add_argument('--workspaces', nargs='+', metavar='WORKSPACE',
+                          help='Several workspaces: fan-out crop, one output subdirectory per AOI')
+    aoi_group.add_argument('--aoi-files', nargs='+', metavar='GEOJSON',
+                          help='Several GeoJSON AOIs: fan-out crop, one output subdirectory per AOI')
     
     # Output
     parser.add_argument('--output', type=str,
                        help='Output directory (default: data/cropped/{track}_{orbit}_{subswath})')
     parser.add_argument('--band', type=str, default='coh',
                        help='Band pattern to extract (default: coh)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_CROP_WORKERS,
+                       help=f'Products cropped in parallel (default: {DEFAULT_CROP_WORKERS})')
     
     args = parser.parse_args()
     
@@ -307,24 +361,22 @@ Examples:
     logger.info("✓ Database connection established")
     logger.info("")
     
-    # Get AOI
-    if args.workspace:
-        config_file = os.path.join(args.workspace, 'config.txt')
-        if not os.path.exists(config_file):
-            logger.error(f"Config file not found: {config_file}")
-            return 1
-        
-        # Read AOI from config
-        aoi_wkt = None
-        with open(config_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('AOI='):
-                    aoi_wkt = line.split('=', 1)[1].strip().strip('"')
-                    break
-        
+    # Get AOI(s)
+    aois = {}
+    if args.workspaces:
+        for workspace in args.workspaces:
+            workspace_wkt = read_workspace_aoi(workspace)
+            if not workspace_wkt:
+                return 1
+            aois[Path(workspace).resolve().name] = workspace_wkt
+        logger.info(f"✓ Loaded {len(aois)} AOI(s) from workspaces")
+    elif args.aoi_files:
+        for aoi_file in args.aoi_files:
+            aois[Path(aoi_file).stem] = geojson_to_wkt(aoi_file)
+        logger.info(f"✓ Loaded {len(aois)} AOI(s) from GeoJSON files")
+    elif args.workspace:
+        aoi_wkt = read_workspace_aoi(args.workspace)
         if not aoi_wkt:
-            logger.error("AOI not found in config.txt")
             return 1
         
         logger.info(f"✓ Loaded AOI from workspace: {args.workspace}")
@@ -332,7 +384,11 @@ Examples:
         aoi_wkt = args.aoi_wkt
         logger.info(f"✓ Using provided AOI WKT")
     
-    logger.info(f"  AOI: {aoi_wkt[:80]}...")
+    if aois:
+        for aoi_name, aoi_wkt in aois.items():
+            logger.info(f"  {aoi_name}: {aoi_wkt[:70]}...")
+    else:
+        logger.info(f"  AOI: {aoi_wkt[:80]}...")
     logger.info("")
     
     # Determine output directory
@@ -349,15 +405,28 @@ Examples:
     logger.info("")
     
     # Run batch crop
-    stats = batch_crop_by_query(
-        track_number=args.track,
-        orbit_direction=args.orbit,
-        subswath=args.subswath,
-        aoi_wkt=aoi_wkt,
-        output_dir=output_dir,
-        pair_type=args.pair_type,
-        band_pattern=args.band
-    )
+    if aois:
+        stats = batch_crop_multi_aoi_by_query(
+            track_number=args.track,
+            orbit_direction=args.orbit,
+            subswath=args.subswath,
+            aois=aois,
+            output_dir=output_dir,
+            pair_type=args.pair_type,
+            band_pattern=args.band,
+            workers=args.workers
+        )
+    else:
+        stats = batch_crop_by_query(
+            track_number=args.track,
+            orbit_direction=args.orbit,
+            subswath=args.subswath,
+            aoi_wkt=aoi_wkt,
+            output_dir=output_dir,
+            pair_type=args.pair_type,
+            band_pattern=args.band,
+            workers=args.workers
+        )
     
     # Summary
     logger.info("")
@@ -367,6 +436,10 @@ Examples:
     logger.info(f"Pairs found in DB:    {stats['found']}")
     logger.info(f"Successfully cropped: {stats['cropped']}")
     logger.info(f"Already existed:      {stats['skipped']}")
+    logger.info(f"Outside AOI:          {stats['no_overlap']}")
+    for aoi_name, aoi_stats in stats.get('by_aoi', {}).items():
+        logger.info(f"  {aoi_name}: {aoi_stats['cropped']} cropped, {aoi_stats['skipped']} existing, "
+                    f"{aoi_stats['no_overlap']} outside, {aoi_stats['failed']} failed")
     logger.info(f"Failed:               {stats['failed']}")
     logger.info(f"Output directory:     {output_dir}")
     logger.info("")
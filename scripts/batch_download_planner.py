@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Planificador de descargas compartido para lotes de AOIs
+
+En un batch de AOIs vecinos (p.ej. municipios de Catalunya) todos comparten
+los mismos tracks y, muchas veces, los mismos SLCs. En lugar de buscar y
+descargar por AOI, este módulo:
+
+1. Une las huellas de todos los AOIs y hace UNA búsqueda en el catálogo por
+   dirección de órbita (servida desde la CatalogueCache si ya está cubierta).
+2. Agrupa los productos por track (órbita relativa).
+3. Asigna cada producto a todos los AOIs que cubre (>= min_coverage_pct).
+4. Genera una única cola de descarga sin duplicados.
+
+Cada SLC se descarga una sola vez para N AOIs; el preprocesado posterior lo
+reutiliza a través de la caché global de productos preprocesados.
+
+Uso:
+    plan = plan_batch_downloads(auth, aoi_files, start_date, end_date, ['DESCENDING'])
+    filter_processed_queue(plan)
+    save_plan(plan, 'processing/batch_download_plan.json')
+    download_batch_queue(plan, auth)
+"""
+
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from shapely.geometry import box
+from shapely.ops import unary_union
+
+from catalogue_cache import CatalogueCache
+from download_copernicus import (
+    BASE_DIR,
+    CATALOGUE_CACHE_DIR,
+    DEFAULT_DOWNLOAD_WORKERS,
+    CopernicusAuth,
+    calculate_product_coverage,
+    download_all_products,
+    filter_products_for_complete_processing,
+    load_aoi_from_geojson,
+    parse_product_name,
+    search_products,
+)
+
+logger = logging.getLogger(__name__)
+
+# Órbita absoluta en el nombre: S1A_IW_SLC__1SDV_<inicio>_<fin>_<órbita>_...
+ABSOLUTE_ORBIT_PATTERN = re.compile(r'^S1([ABC])_\w+?_\d{8}T\d{6}_\d{8}T\d{6}_(\d{6})_')
+
+
+def product_track(product: Dict) -> Optional[int]:
+    """
+    Track (órbita relativa) de un producto Sentinel-1.
+
+    Usa el atributo relativeOrbitNumber si el catálogo lo devuelve y, si no,
+    lo calcula desde la órbita absoluta del nombre (misma fórmula que
+    InSARRepository.extract_track_from_slc).
+    """
+    for attr in product.get('Attributes', []) or []:
+        if attr.get('Name') == 'relativeOrbitNumber':
+            try:
+                return int(attr.get('Value'))
+            except (TypeError, ValueError):
+                break
+
+    match = ABSOLUTE_ORBIT_PATTERN.match(product.get('Name', ''))
+    if not match:
+        return None
+    satellite, absolute_orbit = match.group(1), int(match.group(2))
+    offset = 27 if satellite == 'B' else 73
+    return (absolute_orbit - offset) % 175 + 1
+
+
+def load_batch_aois(aoi_files: List) -> Dict[str, Dict]:
+    """
+    Carga los bbox de los AOIs del lote.
+
+    Returns:
+        Dict {nombre_proyecto (stem del GeoJSON): bbox}
+    """
+    aois = {}
+    for aoi_file in aoi_files:
+        bbox = load_aoi_from_geojson(str(aoi_file))
+        if not bbox:
+            logger.warning(f"⚠️  AOI ignorado en el plan (no se pudo leer): {aoi_file}")
+            continue
+        aois[os.path.splitext(os.path.basename(str(aoi_file)))[0]] = bbox
+    return aois
+
+
+def union_bbox(aois: Dict[str, Dict]) -> Dict:
+    """Bbox envolvente de la unión de huellas de todos los AOIs"""
+    union = unary_union([
+        box(b['min_lon'], b['min_lat'], b['max_lon'], b['max_lat']) for b in aois.values()
+    ])
+    min_lon, min_lat, max_lon, max_lat = union.bounds
+    return {
+        'min_lon': min_lon,
+        'min_lat': min_lat,
+        'max_lon': max_lon,
+        'max_lat': max_lat,
+        'aoi_name': f"Lote de {len(aois)} AOIs"
+    }
+
+
+def plan_batch_downloads(
+    auth: CopernicusAuth,
+    aoi_files: List,
+    start_date: datetime,
+    end_date: datetime,
+    orbit_directions: List[str],
+    satellites: Optional[List[str]] = None,
+    min_coverage_pct: float = 10.0,
+    product_type: str = 'SLC',
+    use_cache: bool = True
+) -> Optional[Dict]:
+    """
+    Planifica la descarga conjunta de un lote de AOIs.
+
+    Args:
+        auth: CopernicusAuth
+        aoi_files: Rutas a los GeoJSON de los AOIs
+        start_date: Inicio del periodo
+        end_date: Fin del periodo
+        orbit_directions: Direcciones de órbita a buscar (ASCENDING/DESCENDING)
+        satellites: Filtrar por satélites (ej: ['S1A', 'S1C'])
+        min_coverage_pct: Cobertura mínima de un AOI para asignarle un producto
+        product_type: Tipo de producto Sentinel-1 (SLC, GRD)
+        use_cache: Usar la caché local de búsquedas del catálogo
+
+    Returns:
+        Dict con:
+            'queue': productos a descargar (sin duplicados), cada uno con '_aois'
+            'aois': {aoi: [nombres de producto]}
+            'tracks': {"DESCENDING/110": [nombres de producto]}
+            'stats': búsquedas, productos por AOI sumados, únicos...
+        o None si no hay AOIs válidos o todas las búsquedas fallan
+    """
+    aois = load_batch_aois(aoi_files)
+    if not aois:
+        logger.error("❌ Ningún AOI válido para planificar la descarga")
+        return None
+
+    search_bbox = union_bbox(aois)
+    cache = CatalogueCache(CATALOGUE_CACHE_DIR) if use_cache else None
+
+    logger.info(f"🗺️  Plan de descarga compartido: {len(aois)} AOIs, "
+                f"bbox unión [{search_bbox['min_lon']:.3f}, {search_bbox['min_lat']:.3f}, "
+                f"{search_bbox['max_lon']:.3f}, {search_bbox['max_lat']:.3f}]")
+
+    queue = {}
+    aoi_products = {name: [] for name in aois}
+    tracks = {}
+    searches = 0
+    failed_searches = 0
+
+    for orbit_direction in orbit_directions:
+        searches += 1
+        products = search_products(
+            auth=auth,
+            collection="SENTINEL-1",
+            product_type=product_type,
+            start_date=start_date,
+            end_date=end_date,
+            bbox=search_bbox,
+            orbit_direction=orbit_direction,
+            aoi_name=search_bbox['aoi_name'],
+            cache=cache
+        )
+        if products is None:
+            failed_searches += 1
+            continue
+
+        if satellites:
+            products = [p for p in products if parse_product_name(p['Name'])['satellite'] in satellites]
+
+        for product in products:
+            covered = []
+            for aoi_name, bbox in aois.items():
+                coverage_pct, _ = calculate_product_coverage(product, bbox)
+                if coverage_pct >= min_coverage_pct:
+                    covered.append(aoi_name)
+            if not covered:
+                continue
+
+            name = product['Name']
+            if product['Id'] not in queue:
+                product['_aois'] = covered
+                product['_orbit_direction'] = orbit_direction
+                product['_track'] = product_track(product)
+                queue[product['Id']] = product
+                track_key = f"{orbit_direction}/{product['_track'] or 'N/A'}"
+                tracks.setdefault(track_key, []).append(name)
+            for aoi_name in covered:
+                if name not in aoi_products[aoi_name]:
+                    aoi_products[aoi_name].append(name)
+
+    if failed_searches == searches:
+        logger.error("❌ Todas las búsquedas del plan fallaron")
+        return None
+
+    queue_list = sorted(queue.values(), key=lambda p: (p.get('ContentDate') or {}).get('Start', ''))
+    per_aoi_total = sum(len(names) for names in aoi_products.values())
+
+    stats = {
+        'aois': len(aois),
+        'catalogue_searches': searches,
+        'per_aoi_products': per_aoi_total,
+        'unique_products': len(queue_list),
+        'deduplicated': per_aoi_total - len(queue_list),
+        'aois_without_products': sorted(name for name, names in aoi_products.items() if not names)
+    }
+
+    logger.info(f"📋 Plan: {stats['unique_products']} productos únicos en {len(tracks)} tracks "
+                f"({stats['per_aoi_products']} sumando AOIs por separado, "
+                f"{stats['deduplicated']} descargas evitadas)")
+    for track_key, names in sorted(tracks.items()):
+        logger.info(f"   Track {track_key}: {len(names)} productos")
+    if stats['aois_without_products']:
+        logger.warning(f"⚠️  AOIs sin productos con cobertura >= {min_coverage_pct}%: "
+                       f"{', '.join(stats['aois_without_products'])}")
+    if cache is not None:
+        logger.info(f"   {cache.stats()}")
+
+    return {
+        'created_at': datetime.now().isoformat(),
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d'),
+        'orbit_directions': orbit_directions,
+        'product_type': product_type,
+        'min_coverage_pct': min_coverage_pct,
+        'queue': queue_list,
+        'aois': aoi_products,
+        'tracks': tracks,
+        'stats': stats
+    }
+
+
+def filter_processed_queue(
+    plan: Dict,
+    repo_base_dir: str = "data/processed_products"
+) -> Dict:
+    """
+    Quita de la cola del plan los SLCs que ya no hacen falta.
+
+    Aplica el mismo filtro que el modo inteligente de download_copernicus.py
+    (filter_products_for_complete_processing) por dirección de órbita, de modo
+    que la descarga compartida no baja SLCs de tracks ya procesados.
+
+    Args:
+        plan: Plan devuelto por plan_batch_downloads (se modifica in situ)
+        repo_base_dir: Directorio base del repositorio de productos procesados
+
+    Returns:
+        El mismo plan con 'queue' filtrada y stats['already_processed']
+    """
+    by_direction = {}
+    for product in plan['queue']:
+        by_direction.setdefault(product.get('_orbit_direction'), []).append(product)
+
+    needed_ids = set()
+    for orbit_direction, products in by_direction.items():
+        to_download, _ = filter_products_for_complete_processing(
+            products,
+            orbit_direction=orbit_direction,
+            repo_base_dir=repo_base_dir
+        )
+        needed_ids.update(p['Id'] for p in to_download)
+
+    original = len(plan['queue'])
+    plan['queue'] = [p for p in plan['queue'] if p['Id'] in needed_ids]
+    plan['stats']['already_processed'] = original - len(plan['queue'])
+
+    if plan['stats']['already_processed']:
+        logger.info(f"⏭️  {plan['stats']['already_processed']} productos omitidos "
+                    f"(procesamiento completo en el repositorio), "
+                    f"{len(plan['queue'])} pendientes de descarga")
+    return plan
+
+
+def save_plan(plan: Dict, output_file: str) -> None:
+    """Guarda el plan (sin footprints completos) como JSON legible"""
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    summary = dict(plan)
+    summary['queue'] = [
+        {
+            'Id': p['Id'],
+            'Name': p['Name'],
+            'orbit_direction': p.get('_orbit_direction'),
+            'track': p.get('_track'),
+            'aois': p.get('_aois', [])
+        }
+        for p in plan['queue']
+    ]
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    logger.info(f"📋 Plan guardado: {output_file}")
+
+
+def download_batch_queue(
+    plan: Dict,
+    auth: CopernicusAuth,
+    workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    pipeline_extract: bool = False
+) -> Dict:
+    """
+    Descarga la cola deduplicada del plan una sola vez para todo el lote.
+
+    Los productos van al mismo directorio que usa download_copernicus.py, de
+    modo que los proyectos de cada AOI los encuentran sin volver a descargar.
+    """
+    product_type = plan.get('product_type', 'SLC')
+    download_dir = os.path.join(BASE_DIR, f"sentinel1_{product_type.lower()}")
+
+    if not plan['queue']:
+        logger.info("✓ Plan sin productos pendientes de descarga")
+        return {"successful": 0, "failed": 0}
+
+    return download_all_products(
+        plan['queue'], auth, download_dir, product_type,
+        auto_confirm=True,
+        workers=workers,
+        pipeline_extract=pipeline_extract
+    )
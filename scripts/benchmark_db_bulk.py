@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escrituras en BD: funciones fila a fila vs variantes bulk de db_queries
+
+Registra N productos SLC/S2 sintéticos, sus pares InSAR y enlaces MSAVI, y
+marca los SLC como procesados, primero con register_slc_download(),
+update_slc(), register_insar_pair()... en bucle (una sesión y un commit por
+fila) y después con register_slc_downloads(), update_slc_many(),
+register_insar_pairs()... (una transacción, INSERT multi-fila por bloques).
+Verifica que ambas pasadas dejan las tablas con el mismo contenido.
+
+Por defecto usa SQLite como sustituto local (el esquema 'satelit' se monta con
+ATTACH); con --url se puede medir contra un PostgreSQL local. La base de datos
+debe estar vacía: el benchmark crea las tablas y las elimina al terminar.
+
+Uso:
+    python scripts/benchmark_db_bulk.py
+    python scripts/benchmark_db_bulk.py --products 5000 --chunk-size 1000
+    python scripts/benchmark_db_bulk.py --url postgresql://localhost/goshawk_bench
+
+Requiere sqlalchemy (y psycopg2 para PostgreSQL); no necesita satelit_db.
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import bindparam, create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+# Add scripts to path
+script_dir = Path(__file__).parent
+if str(script_dir) not in sys.path:
+    sys.path.insert(0, str(script_dir))
+
+import db_queries
+
+TABLES = ('insar_pair_msavi', 'insar_pairs', 's2_products', 'slc_products')
+
+# Esquema mínimo con las columnas y restricciones únicas que usa db_queries
+SCHEMA = """
+CREATE TABLE satelit.slc_products (
+    id {pk},
+    scene_id VARCHAR(100) NOT NULL UNIQUE,
+    acquisition_date TIMESTAMP NOT NULL,
+    satellite_id VARCHAR(3),
+    orbit_direction VARCHAR(10),
+    track_number INTEGER,
+    subswath VARCHAR(3),
+    file_path TEXT,
+    downloaded BOOLEAN DEFAULT false,
+    downloaded_date TIMESTAMP,
+    fullswath_iw1_processed BOOLEAN DEFAULT false,
+    fullswath_iw1_date TIMESTAMP,
+    fullswath_iw1_version VARCHAR(20),
+    fullswath_iw2_processed BOOLEAN DEFAULT false,
+    fullswath_iw2_date TIMESTAMP,
+    fullswath_iw2_version VARCHAR(20),
+    fullswath_iw3_processed BOOLEAN DEFAULT false,
+    fullswath_iw3_date TIMESTAMP,
+    fullswath_iw3_version VARCHAR(20),
+    polarimetry_processed BOOLEAN DEFAULT false,
+    polarimetry_date TIMESTAMP,
+    polarimetry_version VARCHAR(20)
+);
+CREATE TABLE satelit.insar_pairs (
+    id {pk},
+    master_slc_id INTEGER NOT NULL,
+    slave_slc_id INTEGER NOT NULL,
+    pair_type VARCHAR(10) NOT NULL,
+    subswath VARCHAR(3) NOT NULL,
+    temporal_baseline_days INTEGER,
+    perpendicular_baseline_m FLOAT,
+    file_path TEXT,
+    processed_date TIMESTAMP,
+    processing_version VARCHAR(20),
+    coherence_mean FLOAT,
+    coherence_std FLOAT,
+    UNIQUE (master_slc_id, slave_slc_id, subswath, pair_type)
+);
+CREATE TABLE satelit.s2_products (
+    id {pk},
+    scene_id VARCHAR(100) NOT NULL UNIQUE,
+    acquisition_date TIMESTAMP NOT NULL,
+    satellite_id VARCHAR(3),
+    cloud_cover_percent FLOAT,
+    aoi_coverage_percent FLOAT,
+    file_path TEXT,
+    downloaded BOOLEAN DEFAULT false,
+    downloaded_date TIMESTAMP,
+    msavi_processed BOOLEAN DEFAULT false,
+    msavi_file_path TEXT,
+    msavi_date TIMESTAMP,
+    msavi_version VARCHAR(20)
+);
+CREATE TABLE satelit.insar_pair_msavi (
+    id {pk},
+    insar_pair_id INTEGER NOT NULL UNIQUE,
+    master_s2_id INTEGER,
+    slave_s2_id INTEGER,
+    master_msavi_file TEXT,
+    slave_msavi_file TEXT,
+    master_date_offset_days INTEGER,
+    slave_date_offset_days INTEGER,
+    aligned_date TIMESTAMP
+)
+"""
+
+# Columnas que dependen del momento de la escritura: no se comparan
+VOLATILE_COLUMNS = {'id', 'downloaded_date', 'processed_date', 'fullswath_iw1_date'}
+
+
+def connect(url):
+    """Engine + get_session() equivalente al de satelit_db para la URL dada"""
+    if url is None:
+        workdir = Path(tempfile.mkdtemp(prefix='goshawk_db_bench_'))
+        engine = create_engine(f"sqlite:///{workdir / 'main.sqlite'}")
+        satelit_file = workdir / 'satelit.sqlite'
+
+        @event.listens_for(engine, "connect")
+        def attach_schema(dbapi_connection, _):
+            dbapi_connection.execute(f"ATTACH DATABASE '{satelit_file}' AS satelit")
+
+        pk = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    else:
+        engine = create_engine(url)
+        pk = "SERIAL PRIMARY KEY"
+
+    factory = sessionmaker(bind=engine)
+
+    @contextmanager
+    def get_session():
+        session = factory()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    return engine, get_session, pk
+
+
+def create_schema(engine, pk):
+    with engine.begin() as conn:
+        if engine.dialect.name == 'postgresql':
+            conn.execute(text("CREATE SCHEMA IF NOT EXISTS satelit"))
+            existing = conn.execute(text("""
+                SELECT table_name FROM information_schema.tables
+                WHERE table_schema = 'satelit' AND table_name IN :tables
+            """).bindparams(bindparam('tables', expanding=True)),
+                {'tables': list(TABLES)}).fetchall()
+            if existing:
+                raise SystemExit(f"✗ La base de datos ya contiene satelit.{existing[0][0]}: "
+                                 f"usa una base de datos vacía")
+        for statement in SCHEMA.format(pk=pk).split(';'):
+            conn.execute(text(statement))
+
+
+def clear_tables(engine):
+    with engine.begin() as conn:
+        for table in TABLES:
+            conn.execute(text(f"DELETE FROM satelit.{table}"))
+
+
+def drop_schema(engine):
+    with engine.begin() as conn:
+        for table in TABLES:
+            conn.execute(text(f"DROP TABLE IF EXISTS satelit.{table}"))
+
+
+def snapshot(engine):
+    """Contenido de las tablas (sin ids ni fechas de escritura) para comparar pasadas"""
+    queries = {
+        'slc_products': "SELECT * FROM satelit.slc_products",
+        's2_products': "SELECT * FROM satelit.s2_products",
+        'insar_pairs': """
+            SELECT ip.*, m.scene_id AS master_scene, s.scene_id AS slave_scene
+            FROM satelit.insar_pairs ip
+            JOIN satelit.slc_products m ON ip.master_slc_id = m.id
+            JOIN satelit.slc_products s ON ip.slave_slc_id = s.id
+        """,
+        'insar_pair_msavi': """
+            SELECT l.master_msavi_file, l.slave_msavi_file, l.master_date_offset_days,
+                   l.slave_date_offset_days, l.aligned_date, m.scene_id AS master_scene
+            FROM satelit.insar_pair_msavi l
+            JOIN satelit.insar_pairs ip ON l.insar_pair_id = ip.id
+            JOIN satelit.slc_products m ON ip.master_slc_id = m.id
+        """,
+    }
+    volatile = VOLATILE_COLUMNS | {'master_slc_id', 'slave_slc_id'}
+    result = {}
+    with engine.connect() as conn:
+        for table, query in queries.items():
+            rows = conn.execute(text(query)).fetchall()
+            result[table] = sorted(
+                tuple(sorted((k, str(v)) for k, v in row._mapping.items() if k not in volatile))
+                for row in rows
+            )
+    return result
+
+
+def synthetic_workload(n_products):
+    """Productos SLC/S2 diarios, pares short (consecutivos) y un enlace MSAVI por par"""
+    start = datetime(2023, 1, 1, 6, 1, 36)
+    slc, s2, pairs = [], [], []
+    for i in range(n_products):
+        date = start + timedelta(days=i)
+        stamp = date.strftime('%Y%m%dT%H%M%S')
+        slc.append({
+            'scene_id': f"S1A_IW_SLC__1SDV_{stamp}_{stamp}_{46714 + i:06d}_{i:06X}_F5B0",
+            'acquisition_date': date,
+            'orbit_direction': 'DESCENDING',
+            'track_number': 110,
+            'file_path': f"data/sentinel1_slc/{stamp}.SAFE",
+        })
+        s2.append({
+            'scene_id': f"S2A_MSIL2A_{stamp}_N0509_R008_T31TDF_{i:06d}",
+            'acquisition_date': date,
+            'file_path': f"data/sentinel2_l2a/{stamp}.SAFE",
+            'cloud_cover_percent': float(i % 40),
+            'aoi_coverage_percent': 100.0,
+        })
+    for master, slave in zip(slc, slc[1:]):
+        pairs.append({
+            'master_scene_id': master['scene_id'],
+            'slave_scene_id': slave['scene_id'],
+            'pair_type': 'short',
+            'subswath': 'IW1',
+            'temporal_baseline_days': 1,
+            'file_path': f"insar/short/Ifg_{master['scene_id'][17:25]}_{slave['scene_id'][17:25]}.dim",
+            'processing_version': '2.0',
+        })
+    updates = [{'scene_id': p['scene_id'], 'fullswath_iw1_processed': True,
+                'fullswath_iw1_date': datetime.now(), 'fullswath_iw1_version': '2.0'} for p in slc]
+    return slc, s2, pairs, updates
+
+
+def msavi_links(pair_ids, s2_ids, s2):
+    """Un enlace por par usando el S2 del mismo índice como master y el siguiente como slave"""
+    links = []
+    for i, pair_id in enumerate(pair_ids):
+        links.append({
+            'insar_pair_id': pair_id,
+            'master_s2_id': s2_ids[s2[i]['scene_id']],
+            'slave_s2_id': s2_ids[s2[i + 1]['scene_id']],
+            'master_msavi_file': f"MSAVI_{i:05d}.tif",
+            'slave_msavi_file': f"MSAVI_{i + 1:05d}.tif",
+            'master_date_offset_days': 0,
+            'slave_date_offset_days': 0,
+        })
+    return links
+
+
+def run_row_by_row(slc, s2, pairs, updates):
+    timings = {}
+    start = time.perf_counter()
+    for product in slc:
+        db_queries.register_slc_download(**product)
+    timings['register_slc'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    s2_ids = {p['scene_id']: db_queries.register_s2_download(**p) for p in s2}
+    timings['register_s2'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pair_ids = [db_queries.register_insar_pair(**pair) for pair in pairs]
+    timings['register_insar_pair'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for link in msavi_links(pair_ids, s2_ids, s2):
+        db_queries.register_pair_msavi(**link)
+    timings['register_pair_msavi'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for update in updates:
+        fields = dict(update)
+        db_queries.update_slc(fields.pop('scene_id'), **fields)
+    timings['update_slc'] = time.perf_counter() - start
+    return timings
+
+
+def run_bulk(slc, s2, pairs, updates, chunk_size):
+    timings = {}
+    start = time.perf_counter()
+    db_queries.register_slc_downloads(slc, chunk_size=chunk_size)
+    timings['register_slc'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    s2_ids = db_queries.register_s2_downloads(s2, chunk_size=chunk_size)
+    timings['register_s2'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pair_ids = db_queries.register_insar_pairs(pairs, chunk_size=chunk_size)
+    timings['register_insar_pair'] = time.perf_counter() - start
+    if s2_ids is None or pair_ids is None:
+        raise RuntimeError("El registro masivo falló (ver errores anteriores)")
+
+    ordered_ids = [pair_ids[(p['master_scene_id'], p['slave_scene_id'], p['subswath'], p['pair_type'])]
+                   for p in pairs]
+    start = time.perf_counter()
+    db_queries.register_pair_msavis(msavi_links(ordered_ids, s2_ids, s2), chunk_size=chunk_size)
+    timings['register_pair_msavi'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    db_queries.update_slc_many(updates, chunk_size=chunk_size)
+    timings['update_slc'] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark escrituras BD: fila a fila vs bulk')
+    parser.add_argument('--products', type=int, default=2000,
+                        help='Productos SLC y S2 sintéticos (default: 2000)')
+    parser.add_argument('--chunk-size', type=int, default=db_queries.BULK_CHUNK_SIZE,
+                        help=f'Filas por INSERT en las variantes bulk (default: {db_queries.BULK_CHUNK_SIZE})')
+    parser.add_argument('--url', default=None,
+                        help='URL SQLAlchemy de una BD vacía (default: SQLite temporal)')
+    args = parser.parse_args()
+
+    # Los helpers registran cada fila a nivel INFO
+    logging.basicConfig(level=logging.WARNING)
+
+    engine, get_session, pk = connect(args.url)
+    db_queries.get_session = get_session
+    db_queries.DB_AVAILABLE = True
+
+    print("=" * 80)
+    print("BENCHMARK ESCRITURAS BD (FILA A FILA vs BULK)")
+    print("=" * 80)
+    print(f"\nBackend: {engine.dialect.name}, {args.products} productos SLC/S2, "
+          f"{args.products - 1} pares, bloques de {args.chunk_size} filas")
+
+    create_schema(engine, pk)
+    try:
+        slc, s2, pairs, updates = synthetic_workload(args.products)
+
+        row_timings = run_row_by_row(slc, s2, pairs, updates)
+        row_snapshot = snapshot(engine)
+        clear_tables(engine)
+
+        bulk_timings = run_bulk(slc, s2, pairs, updates, args.chunk_size)
+        bulk_snapshot = snapshot(engine)
+    finally:
+        drop_schema(engine)
+
+    print(f"\n  {'operación':<22}{'fila a fila':>14}{'bulk':>12}{'speedup':>10}")
+    for name in row_timings:
+        t_row, t_bulk = row_timings[name], bulk_timings[name]
+        print(f"  {name:<22}{t_row:12.3f} s{t_bulk:10.3f} s{t_row / max(t_bulk, 1e-9):9.0f}x")
+    t_row, t_bulk = sum(row_timings.values()), sum(bulk_timings.values())
+    print(f"  {'total':<22}{t_row:12.3f} s{t_bulk:10.3f} s{t_row / max(t_bulk, 1e-9):9.0f}x")
+
+    ok = True
+    for table in row_snapshot:
+        same = row_snapshot[table] == bulk_snapshot[table]
+        print(f"  {table}: {len(bulk_snapshot[table])} filas, idénticas={same}")
+        ok = ok and same and len(bulk_snapshot[table]) > 0
+
+    print("\n" + ("✓ Resultados equivalentes" if ok else "✗ Resultados NO equivalentes"))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark del CV local (entropía aproximada) de calculate_pair_statistics
+
+Compara calculate_entropy_cv() (filtros de caja vectorizados) con la
+implementación original basada en generic_filter sobre datos sintéticos
+tipo backscatter VV (speckle gamma + NaN), y verifica que los resultados
+coinciden dentro de tolerancia.
+
+Uso:
+    python scripts/benchmark_entropy_cv.py
+    python scripts/benchmark_entropy_cv.py --size 1000 --full-size 5000 --workers 4
+
+La referencia es muy lenta: --size limita el tamaño en el que se compara;
+--full-size mide solo la versión vectorizada sobre una escena grande.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add scripts to path
+script_dir = Path(__file__).parent
+if str(script_dir) not in sys.path:
+    sys.path.insert(0, str(script_dir))
+
+from calculate_pair_statistics_senitinel2 import (
+    calculate_entropy_cv,
+    calculate_entropy_cv_reference,
+)
+
+
+def synthetic_vv(size, nan_fraction=0.02, seed=0):
+    """Backscatter VV lineal sintético: speckle gamma sobre una textura suave"""
+    rng = np.random.default_rng(seed)
+    rows = np.linspace(0, 4 * np.pi, size)[:, None]
+    cols = np.linspace(0, 4 * np.pi, size)[None, :]
+    texture = 0.05 + 0.04 * np.sin(rows) * np.cos(cols)
+    vv = (texture * rng.gamma(4.0, 0.25, (size, size))).astype(np.float32)
+    vv[rng.random((size, size)) < nan_fraction] = np.nan
+    return vv
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CV local: generic_filter vs filtros de caja')
+    parser.add_argument('--size', type=int, default=500,
+                        help='Lado de la imagen para comparar con la referencia (default: 500)')
+    parser.add_argument('--full-size', type=int, default=5000,
+                        help='Lado de la imagen para medir solo la versión vectorizada (default: 5000, 0 = omitir)')
+    parser.add_argument('--window', type=int, default=7, help='Tamaño de ventana (default: 7)')
+    parser.add_argument('--workers', type=int, default=4, help='Hilos para la versión por franjas (default: 4)')
+    parser.add_argument('--rtol', type=float, default=1e-4, help='Tolerancia relativa (default: 1e-4)')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("BENCHMARK CV LOCAL (ENTROPÍA APROXIMADA)")
+    print("=" * 80)
+
+    vv = synthetic_vv(args.size)
+    print(f"\nImagen {args.size}x{args.size}, ventana {args.window}x{args.window}")
+
+    reference, t_reference = timed(calculate_entropy_cv_reference, vv, args.window)
+    fast, t_fast = timed(calculate_entropy_cv, vv, args.window)
+    tiled, t_tiled = timed(calculate_entropy_cv, vv, args.window,
+                           workers=args.workers, tile_rows=max(args.size // 8, 16))
+
+    print(f"  generic_filter:             {t_reference:8.3f} s")
+    print(f"  filtros de caja:            {t_fast:8.3f} s  (x{t_reference / max(t_fast, 1e-9):.0f})")
+    print(f"  filtros de caja ({args.workers} hilos): {t_tiled:8.3f} s  (x{t_reference / max(t_tiled, 1e-9):.0f})")
+
+    ok = True
+    for name, result in (('filtros de caja', fast), ('por franjas', tiled)):
+        same_nan = np.array_equal(np.isnan(reference), np.isnan(result))
+        close = np.allclose(result, reference, rtol=args.rtol, atol=1e-6, equal_nan=True)
+        valid = np.isfinite(reference)
+        max_diff = float(np.max(np.abs(result[valid] - reference[valid]))) if valid.any() else 0.0
+        print(f"  {name}: NaN idénticos={same_nan}, allclose={close}, max |Δ|={max_diff:.2e}")
+        ok = ok and same_nan and close
+
+    if args.full_size:
+        vv_full = synthetic_vv(args.full_size, seed=1)
+        print(f"\nImagen {args.full_size}x{args.full_size} (solo versión vectorizada)")
+        _, t_full = timed(calculate_entropy_cv, vv_full, args.window)
+        _, t_full_tiled = timed(calculate_entropy_cv, vv_full, args.window, workers=args.workers)
+        print(f"  filtros de caja:            {t_full:8.3f} s")
+        print(f"  filtros de caja ({args.workers} hilos): {t_full_tiled:8.3f} s")
+
+    print("\n" + ("✓ Resultados equivalentes" if ok else "✗ Resultados NO equivalentes"))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
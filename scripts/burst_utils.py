@@ -23,6 +23,7 @@ from processing_utils import (
     extract_date_from_filename,
     logger
 )
+from gpt_scheduler import run_gpt
 
 try:
     from shapely.geometry import Polygon, box
@@ -199,11 +200,11 @@ def merge_bursts_if_needed(input_products: List[str], output_dir: str) -> Option
             # Ejecutar GPT
             logger.info(f"   🔄 Fusionando {len(input_products)} bursts del {date_key}...")
 
-            result = subprocess.run(
-                ['gpt', xml_file, '-c', '16G', '-q', '4'],
-                capture_output=True,
-                text=True,
-                timeout=3600  # 60 min timeout (fusión es lenta)
+            result = run_gpt(
+                xml_file,
+                job_class='slice_assembly',
+                timeout=3600,  # 60 min timeout (fusión es lenta)
+                label=f"SliceAssembly {date_key}"
             )
 
             if result.returncode == 0 and os.path.exists(output_path):
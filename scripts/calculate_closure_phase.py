@@ -9,11 +9,20 @@ InSAR Closure Phase" - IEEE JSTARS, Vol. 17
 
 Uso:
   python3 scripts/calculate_closure_phase.py <ifg_12> <ifg_23> <ifg_13> [--output <dir>]
+  python3 scripts/calculate_closure_phase.py --stack <dir_insar> [--output <dir>] [--workers N]
 
 Fórmula (exponenciales complejas, robusta para zonas urbanas):
   Φ' = angle(e^(iφ₁₂) × e^(iφ₂₃) × e^(-iφ₁₃))
      = wrap(φ₁₂ + φ₂₃ - φ₁₃)
 
+  Se evalúa con la identidad wrap(φ₁₂ + φ₂₃ - φ₁₃) en float32, sin crear
+  arrays complejos, y por bloques (lecturas con ventana de rasterio): la
+  memoria no depende del tamaño de la escena.
+
+Modo stack (--stack): descubre todos los tripletes (i, i+1, i+2) de un
+directorio de interferogramas y los calcula en un solo proceso, con un
+pool de hilos sobre los bloques de cada triplete.
+
 Donde:
   φ₁₂ = fase del interferograma 1→2 (par corto)
   φ₂₃ = fase del interferograma 2→3 (par corto)
@@ -35,10 +44,14 @@ Output para PSLDA:
 """
 
 import os
+import re
 import sys
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 import rasterio
+from rasterio.windows import Window
 from pathlib import Path
 import logging
 
@@ -46,8 +59,12 @@ import logging
 sys.path.insert(0, str(Path(__file__).parent))
 from logging_utils import LoggerConfig
 
-# Logger se configurará en main() después de conocer el directorio de salida
-logger = None
+# Logger se reconfigurará en main() después de conocer el directorio de salida
+logger = logging.getLogger(__name__)
+
+# Bloques de lectura/cálculo (múltiplo del tile de salida de 256)
+DEFAULT_BLOCK_SIZE = 1024
+DEFAULT_WORKERS = 4
 
 
 def find_phase_band(dim_file):
@@ -135,147 +152,281 @@ def validate_dimensions(phase_files):
     return dimensions[0][0], dimensions[0][1], metadata[0]['transform'], metadata[0]['crs']
 
 
-def calculate_closure_phase_complex(phase_12, phase_23, phase_13):
+def log_closure_statistics(mean_cp, std_cp, mean_abs, max_abs):
     """
-    Calcula Closure Phase usando formulación de exponenciales complejas.
-    
-    Esta formulación es robusta en zonas urbanas porque evita problemas
-    de unwrapping al trabajar en el dominio complejo.
-    
-    Fórmula: Φ' = angle(e^(iφ₁₂) × e^(iφ₂₃) × e^(-iφ₁₃))
-    
+    Registra estadísticas e interpretación (Yan et al.) de un closure phase
+
     Args:
-        phase_12: Fase interferograma 1→2 (radianes, wrapped)
-        phase_23: Fase interferograma 2→3 (radianes, wrapped)
-        phase_13: Fase interferograma 1→3 (radianes, wrapped, par largo)
-        
+        mean_cp: Media de Φ' (rad)
+        std_cp: Desviación estándar de Φ' (rad)
+        mean_abs: Media de |Φ'| (rad)
+        max_abs: Máximo de |Φ'| (rad)
+    """
+    logger.info(f"\n  Estadísticas Closure Phase (Φ'):")
+    logger.info(f"    Media: {mean_cp:.4f} rad ({np.degrees(mean_cp):.2f}°)")
+    logger.info(f"    Std:   {std_cp:.4f} rad ({np.degrees(std_cp):.2f}°)")
+    
+    logger.info(f"\n  Estadísticas |Φ'| (para PSLDA):")
+    logger.info(f"    Media: {mean_abs:.4f} rad ({np.degrees(mean_abs):.2f}°)")
+    logger.info(f"    Max:   {max_abs:.4f} rad ({np.degrees(max_abs):.2f}°)")
+    
+    # Interpretación según Yan et al.
+    logger.info(f"\n  Interpretación:")
+    if mean_abs < 0.3:
+        logger.info(f"    ✓ |Φ'| bajo → Poca variación de humedad")
+    elif mean_abs < 0.7:
+        logger.info(f"    ⚠️  |Φ'| moderado → Variación de humedad moderada")
+    else:
+        logger.info(f"    ⚠️  |Φ'| alto → Alta variación de humedad (revisar posibles fugas)")
+    
+    # Calidad de datos
+    if std_cp < 0.5:
+        logger.info(f"    ✓ Calidad datos EXCELENTE (std < 0.5 rad)")
+    elif std_cp < 1.0:
+        logger.info(f"    ⚠️  Calidad datos ACEPTABLE (0.5 < std < 1.0 rad)")
+    else:
+        logger.info(f"    ✗ Calidad datos POBRE (std > 1.0 rad)")
+
+
+def wrap_phase_inplace(phase):
+    """
+    Envuelve una fase a [-π, π) in situ: ((φ + π) mod 2π) - π
+
+    Equivale a angle(e^(iφ)) sin pasar por números complejos.
+    """
+    np.add(phase, np.pi, out=phase)
+    np.remainder(phase, 2 * np.pi, out=phase)
+    np.subtract(phase, np.pi, out=phase)
+    return phase
+
+
+def closure_phase_block(phase_12, phase_23, phase_13):
+    """
+    Closure phase de un bloque: Φ' = wrap(φ₁₂ + φ₂₃ - φ₁₃)
+
+    Opera en float32 y reutiliza el buffer de phase_12 (se sobrescribe).
+
     Returns:
         tuple: (closure_phase, abs_closure_phase)
-            - closure_phase: Φ' en radianes [-π, π]
-            - abs_closure_phase: |Φ'| en radianes [0, π] (para PSLDA)
     """
-    logger.info("\nCalculando Closure Phase con formulación compleja...")
-    logger.info("  Fórmula: Φ' = angle(e^(iφ₁₂) × e^(iφ₂₃) × e^(-iφ₁₃))")
-    
-    # Convertir fases a exponenciales complejas
-    exp_12 = np.exp(1j * phase_12)
-    exp_23 = np.exp(1j * phase_23)
-    exp_13_conj = np.exp(-1j * phase_13)  # Conjugado (signo negativo)
-    
-    # Producto complejo
-    closure_complex = exp_12 * exp_23 * exp_13_conj
-    
-    # Extraer ángulo (closure phase) - automáticamente wrapped a [-π, π]
-    closure_phase = np.angle(closure_complex)
-    
-    # Valor absoluto para PSLDA: |Φ'| en rango [0, π]
-    # Según Yan et al.: "the absolute closure phase |Φ'| is often adopted 
-    # since its magnitude directly reflects the variation degree of moisture contents"
-    abs_closure_phase = np.abs(closure_phase)
-    
-    # Estadísticas
-    valid_mask = np.isfinite(closure_phase)
-    if np.any(valid_mask):
-        mean_cp = np.mean(closure_phase[valid_mask])
-        std_cp = np.std(closure_phase[valid_mask])
-        mean_abs = np.mean(abs_closure_phase[valid_mask])
-        max_abs = np.max(abs_closure_phase[valid_mask])
-        
-        logger.info(f"\n  Estadísticas Closure Phase (Φ'):")
-        logger.info(f"    Media: {mean_cp:.4f} rad ({np.degrees(mean_cp):.2f}°)")
-        logger.info(f"    Std:   {std_cp:.4f} rad ({np.degrees(std_cp):.2f}°)")
-        
-        logger.info(f"\n  Estadísticas |Φ'| (para PSLDA):")
-        logger.info(f"    Media: {mean_abs:.4f} rad ({np.degrees(mean_abs):.2f}°)")
-        logger.info(f"    Max:   {max_abs:.4f} rad ({np.degrees(max_abs):.2f}°)")
-        
-        # Interpretación según Yan et al.
-        logger.info(f"\n  Interpretación:")
-        if mean_abs < 0.3:
-            logger.info(f"    ✓ |Φ'| bajo → Poca variación de humedad")
-        elif mean_abs < 0.7:
-            logger.info(f"    ⚠️  |Φ'| moderado → Variación de humedad moderada")
-        else:
-            logger.info(f"    ⚠️  |Φ'| alto → Alta variación de humedad (revisar posibles fugas)")
-        
-        # Calidad de datos
-        if std_cp < 0.5:
-            logger.info(f"    ✓ Calidad datos EXCELENTE (std < 0.5 rad)")
-        elif std_cp < 1.0:
-            logger.info(f"    ⚠️  Calidad datos ACEPTABLE (0.5 < std < 1.0 rad)")
-        else:
-            logger.info(f"    ✗ Calidad datos POBRE (std > 1.0 rad)")
-    
-    return closure_phase, abs_closure_phase
+    closure_phase = np.add(phase_12, phase_23, out=phase_12)
+    np.subtract(closure_phase, phase_13, out=closure_phase)
+    wrap_phase_inplace(closure_phase)
+    return closure_phase, np.abs(closure_phase)
+
+
+def iter_windows(height, width, block_size=DEFAULT_BLOCK_SIZE):
+    """Ventanas de block_size×block_size que recorren el raster completo"""
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            yield Window(col, row, min(block_size, width - col), min(block_size, height - row))
 
 
-def save_closure_phase(closure_phase, abs_closure_phase, output_dir, 
-                       transform, crs, triplet_dates):
+def calculate_closure_phase_windowed(phase_files, output_dir, triplet_dates,
+                                     executor=None, block_size=DEFAULT_BLOCK_SIZE):
     """
-    Guarda Closure Phase como archivos GeoTIFF
-    
+    Calcula y guarda el closure phase de un triplete bloque a bloque
+
+    Cada hilo del pool abre sus propios datasets de lectura (los handles de
+    GDAL no se comparten entre hilos); las escrituras se serializan. Los
+    ficheros se escriben con nombre temporal y se publican al terminar.
+
     Args:
-        closure_phase: Array con closure phase Φ' en radianes [-π, π]
-        abs_closure_phase: Array con |Φ'| en radianes [0, π]
+        phase_files: Bandas de fase [φ₁₂, φ₂₃, φ₁₃] (.img)
         output_dir: Directorio de salida
-        transform: Transformación geográfica
-        crs: Sistema de coordenadas
         triplet_dates: Tupla (date1, date2, date3) para el filename
+        executor: ThreadPoolExecutor compartido (None = secuencial)
+        block_size: Lado de los bloques de lectura
+
+    Returns:
+        tuple: (combined_file, pslda_file): closure_<fechas>.tif con Φ' y |Φ'|
+            y closure_<fechas>_abs.tif con |Φ'| (entrada PSLDA)
     """
+    height, width, transform, crs = validate_dimensions(phase_files)
+
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
-    
-    # Generar nombre de archivo basado en fechas
     triplet_name = f"closure_{triplet_dates[0]}_{triplet_dates[1]}_{triplet_dates[2]}"
-    
-    # === Archivo 1: Closure Phase completo (2 bandas) ===
     combined_file = output_path / f"{triplet_name}.tif"
-    logger.info(f"\nGuardando Closure Phase (2 bandas): {combined_file}")
-    
-    with rasterio.open(
-        combined_file, 'w',
-        driver='GTiff',
-        height=closure_phase.shape[0],
-        width=closure_phase.shape[1],
-        count=2,
-        dtype=rasterio.float32,
-        crs=crs,
-        transform=transform,
-        compress='lzw',
-        nodata=np.nan
-    ) as dst:
-        dst.write(closure_phase.astype(np.float32), 1)
-        dst.write(abs_closure_phase.astype(np.float32), 2)
-        dst.set_band_description(1, 'Closure Phase Phi (radians) [-pi, pi]')
-        dst.set_band_description(2, 'Abs Closure Phase |Phi| (radians) [0, pi] - PSLDA input')
-    
-    logger.info(f"  ✓ Banda 1: Φ' (closure phase signed)")
-    logger.info(f"  ✓ Banda 2: |Φ'| (closure phase absoluto - para PSLDA)")
-    
-    # === Archivo 2: Solo |Φ'| para PSLDA (1 banda) ===
     pslda_file = output_path / f"{triplet_name}_abs.tif"
-    logger.info(f"\nGuardando |Φ'| para PSLDA: {pslda_file}")
-    
-    with rasterio.open(
-        pslda_file, 'w',
-        driver='GTiff',
-        height=abs_closure_phase.shape[0],
-        width=abs_closure_phase.shape[1],
-        count=1,
-        dtype=rasterio.float32,
-        crs=crs,
-        transform=transform,
-        compress='lzw',
-        nodata=np.nan
-    ) as dst:
-        dst.write(abs_closure_phase.astype(np.float32), 1)
-        dst.set_band_description(1, 'Abs Closure Phase |Phi| for PSLDA')
-    
+    combined_tmp = output_path / f".{triplet_name}.tif.tmp"
+    pslda_tmp = output_path / f".{triplet_name}_abs.tif.tmp"
+
+    profile = {
+        'driver': 'GTiff',
+        'height': height,
+        'width': width,
+        'dtype': rasterio.float32,
+        'crs': crs,
+        'transform': transform,
+        'compress': 'lzw',
+        'nodata': np.nan,
+        'tiled': True,
+        'blockxsize': 256,
+        'blockysize': 256,
+        'BIGTIFF': 'IF_SAFER'
+    }
+
+    local = threading.local()
+    opened = []
+    opened_lock = threading.Lock()
+    write_lock = threading.Lock()
+
+    def readers():
+        if not hasattr(local, 'sources'):
+            local.sources = [rasterio.open(f) for f in phase_files]
+            with opened_lock:
+                opened.extend(local.sources)
+        return local.sources
+
+    logger.info(f"\nCalculando Closure Phase por bloques de {block_size}×{block_size} (float32)...")
+    logger.info("  Fórmula: Φ' = wrap(φ₁₂ + φ₂₃ - φ₁₃)")
+
+    try:
+        with rasterio.open(combined_tmp, 'w', count=2, **profile) as combined_dst, \
+                rasterio.open(pslda_tmp, 'w', count=1, **profile) as pslda_dst:
+
+            def process_window(window):
+                phases = [src.read(1, window=window, out_dtype='float32') for src in readers()]
+                closure_phase, abs_closure_phase = closure_phase_block(*phases)
+
+                valid = np.isfinite(closure_phase)
+                n_valid = int(valid.sum())
+                partial = (n_valid, 0.0, 0.0, 0.0, 0.0)
+                if n_valid:
+                    valid_cp = closure_phase[valid]
+                    valid_abs = abs_closure_phase[valid]
+                    partial = (n_valid,
+                               float(valid_cp.sum(dtype=np.float64)),
+                               float(np.square(valid_cp, dtype=np.float64).sum()),
+                               float(valid_abs.sum(dtype=np.float64)),
+                               float(valid_abs.max()))
+
+                with write_lock:
+                    combined_dst.write(closure_phase, 1, window=window)
+                    combined_dst.write(abs_closure_phase, 2, window=window)
+                    pslda_dst.write(abs_closure_phase, 1, window=window)
+                return partial
+
+            windows = list(iter_windows(height, width, block_size))
+            if executor is None:
+                partials = [process_window(w) for w in windows]
+            else:
+                futures = [executor.submit(process_window, w) for w in windows]
+                partials = [f.result() for f in as_completed(futures)]
+
+            combined_dst.set_band_description(1, 'Closure Phase Phi (radians) [-pi, pi]')
+            combined_dst.set_band_description(2, 'Abs Closure Phase |Phi| (radians) [0, pi] - PSLDA input')
+            pslda_dst.set_band_description(1, 'Abs Closure Phase |Phi| for PSLDA')
+
+        os.replace(combined_tmp, combined_file)
+        os.replace(pslda_tmp, pslda_file)
+    finally:
+        for src in opened:
+            src.close()
+        for tmp in (combined_tmp, pslda_tmp):
+            if tmp.exists():
+                tmp.unlink()
+
+    # Estadísticas agregadas de todos los bloques
+    n_valid = sum(p[0] for p in partials)
+    total_pixels = height * width
+    logger.info(f"  Píxeles válidos: {n_valid}/{total_pixels} ({100 * n_valid / max(total_pixels, 1):.1f}%)")
+    if n_valid:
+        mean_cp = sum(p[1] for p in partials) / n_valid
+        std_cp = np.sqrt(max(sum(p[2] for p in partials) / n_valid - mean_cp ** 2, 0.0))
+        mean_abs = sum(p[3] for p in partials) / n_valid
+        max_abs = max(p[4] for p in partials if p[0])
+        log_closure_statistics(mean_cp, std_cp, mean_abs, max_abs)
+
+    logger.info(f"\n  ✓ Guardado: {combined_file}")
     logger.info(f"  ✓ Guardado: {pslda_file}")
-    
     return combined_file, pslda_file
 
 
+def find_triplets(insar_dir):
+    """
+    Descubre los tripletes (i, i+1, i+2) de fechas consecutivas de una serie
+
+    Un triplete necesita Ifg(A→B), Ifg(B→C) e Ifg(A→C) (par largo, _LONG).
+    Busca recursivamente, de modo que sirve tanto para fusion/insar/ como
+    para la estructura short/ + long/ de process_insar_gpt.py.
+
+    Args:
+        insar_dir: Directorio con los interferogramas Ifg_*.dim
+
+    Returns:
+        list: [{'ifg_12', 'ifg_23', 'ifg_13', 'dates': (A, B, C)}, ...] en orden temporal
+    """
+    ifgs = {}
+    for ifg_file in sorted(Path(insar_dir).rglob('Ifg_*.dim')):
+        date1, date2 = extract_dates_from_filename(ifg_file.name)
+        if date1 and date2:
+            ifgs.setdefault((date1, date2), ifg_file)
+
+    dates = sorted({d for pair in ifgs for d in pair})
+    triplets = []
+    for date_a, date_b, date_c in zip(dates, dates[1:], dates[2:]):
+        if all(key in ifgs for key in ((date_a, date_b), (date_b, date_c), (date_a, date_c))):
+            triplets.append({
+                'ifg_12': ifgs[(date_a, date_b)],
+                'ifg_23': ifgs[(date_b, date_c)],
+                'ifg_13': ifgs[(date_a, date_c)],
+                'dates': (date_a, date_b, date_c)
+            })
+    return triplets
+
+
+def calculate_closure_phase_stack(insar_dir, output_dir, workers=DEFAULT_WORKERS,
+                                  block_size=DEFAULT_BLOCK_SIZE, overwrite=False):
+    """
+    Calcula el closure phase de todos los tripletes de una serie en un proceso
+
+    Args:
+        insar_dir: Directorio con los interferogramas Ifg_*.dim
+        output_dir: Directorio de salida (closure_*.tif y closure_*_abs.tif)
+        workers: Hilos del pool de bloques
+        block_size: Lado de los bloques de lectura
+        overwrite: Recalcular tripletes cuyo resultado ya existe
+
+    Returns:
+        dict: {'triplets', 'computed', 'skipped', 'failed', 'outputs'}
+    """
+    triplets = find_triplets(insar_dir)
+    summary = {'triplets': len(triplets), 'computed': 0, 'skipped': 0, 'failed': 0, 'outputs': []}
+
+    if not triplets:
+        logger.warning(f"  No se encontraron tripletes válidos en {insar_dir}")
+        return summary
+
+    logger.info(f"  Tripletes encontrados: {len(triplets)} ({workers} hilos, bloques de {block_size})")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for idx, triplet in enumerate(triplets, 1):
+            dates = triplet['dates']
+            pslda_file = Path(output_dir) / f"closure_{dates[0]}_{dates[1]}_{dates[2]}_abs.tif"
+            logger.info(f"\n  Triplete {idx}/{len(triplets)}: {dates[0]} → {dates[1]} → {dates[2]}")
+
+            if pslda_file.exists() and not overwrite:
+                logger.info(f"    ✓ Ya calculado: {pslda_file.name}")
+                summary['skipped'] += 1
+                summary['outputs'].append(pslda_file)
+                continue
+
+            try:
+                phase_files = [find_phase_band(triplet[key]) for key in ('ifg_12', 'ifg_23', 'ifg_13')]
+                _, pslda_file = calculate_closure_phase_windowed(
+                    phase_files, output_dir, dates, executor=executor, block_size=block_size
+                )
+                summary['computed'] += 1
+                summary['outputs'].append(pslda_file)
+            except Exception as e:
+                logger.warning(f"    ✗ Error en triplete {dates}: {e}")
+                summary['failed'] += 1
+
+    return summary
+
+
 def extract_dates_from_filename(filename):
     """
     Extrae fechas del nombre de archivo de interferograma.
@@ -286,9 +437,7 @@ def extract_dates_from_filename(filename):
     Returns:
         tuple: (date1, date2) como strings 'YYYYMMDD'
     """
-    import re
-    pattern = r'Ifg_(\d{8})_(\d{8})'
-    match = re.search(pattern, filename)
+    match = re.search(r'Ifg_(\d{8})_(\d{8})', filename)
     if match:
         return match.groups()
     return None, None
@@ -306,6 +455,11 @@ Ejemplo:
     processed/insar/Ifg_20220101_20220125_LONG.dim \\
     --output processed/closure_phase/
 
+Serie completa (todos los tripletes consecutivos en un solo proceso):
+  python3 scripts/calculate_closure_phase.py \
+    --stack processing/<proyecto>/insar_desc_iw1/fusion/insar \
+    --output processing/<proyecto>/insar_desc_iw1/fusion/closure_phase --workers 8
+
 Interpretación para detección de fugas (Yan et al. 2024):
   |Φ'| ≈ 0  → No hay cambio de humedad (sin fuga)
   |Φ'| >> 0 → Cambio de humedad detectado (posible fuga)
@@ -314,14 +468,25 @@ El valor |Φ'| se usa como feature X₅ en el modelo PSLDA.
         """
     )
     
-    parser.add_argument('ifg_12', help='Interferograma 1→2 (.dim) - par corto')
-    parser.add_argument('ifg_23', help='Interferograma 2→3 (.dim) - par corto')
-    parser.add_argument('ifg_13', help='Interferograma 1→3 (.dim) - par largo (_LONG)')
+    parser.add_argument('ifg_12', nargs='?', help='Interferograma 1→2 (.dim) - par corto')
+    parser.add_argument('ifg_23', nargs='?', help='Interferograma 2→3 (.dim) - par corto')
+    parser.add_argument('ifg_13', nargs='?', help='Interferograma 1→3 (.dim) - par largo (_LONG)')
+    parser.add_argument('--stack', metavar='DIR_INSAR',
+                       help='Procesar todos los tripletes de un directorio de interferogramas')
     parser.add_argument('--output', '-o', default='processed/closure_phase',
                        help='Directorio de salida (default: processed/closure_phase/)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help=f'Hilos de procesamiento por bloques (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+                       help=f'Lado de los bloques de lectura en píxeles (default: {DEFAULT_BLOCK_SIZE})')
+    parser.add_argument('--overwrite', action='store_true',
+                       help='Recalcular tripletes ya calculados (modo --stack)')
     
     args = parser.parse_args()
 
+    if not args.stack and not all([args.ifg_12, args.ifg_23, args.ifg_13]):
+        parser.error("Indica los tres interferogramas del triplete o --stack DIR_INSAR")
+
     # Configurar logger usando el directorio de salida
     global logger
     logger = LoggerConfig.setup_aoi_logger(
@@ -333,6 +498,27 @@ El valor |Φ'| se usa como feature X₅ en el modelo PSLDA.
 
     LoggerConfig.log_section(logger, "CÁLCULO DE CLOSURE PHASE PARA PSLDA")
     logger.info("Ref: Yan et al. (2024) - IEEE JSTARS")
+
+    if args.stack:
+        logger.info(f"\nSerie de interferogramas: {args.stack}")
+        try:
+            summary = calculate_closure_phase_stack(
+                args.stack, args.output,
+                workers=args.workers,
+                block_size=args.block_size,
+                overwrite=args.overwrite
+            )
+        except Exception as e:
+            logger.error(f"\n✗ ERROR: {e}", exc_info=True)
+            return 1
+
+        LoggerConfig.log_section(logger, "RESUMEN")
+        logger.info(f"  Tripletes:  {summary['triplets']}")
+        logger.info(f"  Calculados: {summary['computed']}")
+        logger.info(f"  Existentes: {summary['skipped']}")
+        logger.info(f"  Fallidos:   {summary['failed']}")
+        return 1 if summary['failed'] else 0
+
     logger.info(f"\nTriplete de interferogramas:")
     logger.info(f"  φ₁₂ (corto): {args.ifg_12}")
     logger.info(f"  φ₂₃ (corto): {args.ifg_23}")
@@ -347,36 +533,8 @@ El valor |Φ'| se usa como feature X₅ en el modelo PSLDA.
             phase_file = find_phase_band(ifg)
             phase_files.append(phase_file)
         
-        # 2. Validar dimensiones
-        LoggerConfig.log_section(logger, "PASO 2: Validar dimensiones")
-        
-        height, width, transform, crs = validate_dimensions(phase_files)
-        
-        # 3. Leer fases
-        LoggerConfig.log_section(logger, "PASO 3: Leer bandas de fase")
-        
-        phases = []
-        for i, phase_file in enumerate(phase_files, 1):
-            logger.info(f"  Leyendo Ifg {i}...")
-            with rasterio.open(phase_file) as src:
-                phase = src.read(1).astype(np.float64)
-                phases.append(phase)
-                
-                valid_pixels = np.sum(np.isfinite(phase))
-                total_pixels = phase.size
-                logger.info(f"    Píxeles válidos: {valid_pixels}/{total_pixels} "
-                          f"({100*valid_pixels/total_pixels:.1f}%)")
-        
-        # 4. Calcular Closure Phase
-        LoggerConfig.log_section(logger, "PASO 4: Calcular Closure Phase")
-        
-        closure_phase, abs_closure_phase = calculate_closure_phase_complex(
-            phases[0], phases[1], phases[2]
-        )
-        
-        # 5. Extraer fechas para nombrar archivos
-        date1, _ = extract_dates_from_filename(Path(args.ifg_12).name)
-        _, date2 = extract_dates_from_filename(Path(args.ifg_12).name)
+        # 2. Extraer fechas para nombrar archivos
+        date1, date2 = extract_dates_from_filename(Path(args.ifg_12).name)
         _, date3 = extract_dates_from_filename(Path(args.ifg_23).name)
         
         if not all([date1, date2, date3]):
@@ -389,13 +547,14 @@ El valor |Φ'| se usa como feature X₅ en el modelo PSLDA.
         else:
             triplet_dates = (date1, date2, date3)
         
-        # 6. Guardar resultados
-        LoggerConfig.log_section(logger, "PASO 5: Guardar resultados")
+        # 3. Calcular y guardar por bloques (valida dimensiones)
+        LoggerConfig.log_section(logger, "PASO 2: Calcular Closure Phase")
         
-        combined_file, pslda_file = save_closure_phase(
-            closure_phase, abs_closure_phase,
-            args.output, transform, crs, triplet_dates
-        )
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            combined_file, pslda_file = calculate_closure_phase_windowed(
+                phase_files, args.output, triplet_dates,
+                executor=executor, block_size=args.block_size
+            )
         
         # Resumen final
         LoggerConfig.log_section(logger, "RESUMEN")
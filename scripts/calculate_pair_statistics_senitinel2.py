@@ -13,10 +13,16 @@ Uso: python scripts/calculate_pair_statistics.py
 import os
 import sys
 import glob
+import math
+import argparse
+import threading
 import numpy as np
 import rasterio
 from pathlib import Path
-from scipy.ndimage import generic_filter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rasterio.warp import reproject, Resampling
+from rasterio.windows import Window, transform as window_transform
+from scipy.ndimage import generic_filter, uniform_filter
 
 # Importar módulos locales
 sys.path.append(os.path.dirname(__file__))
@@ -26,64 +32,99 @@ from logging_utils import LoggerConfig
 # Logger se configurará según el directorio de trabajo
 logger = None
 
+# Hilos para el CV local (fallback sin GLCM) sobre franjas de filas
+ENTROPY_CV_WORKERS = min(4, os.cpu_count() or 1)
 
-def read_band_from_dim(dim_path, band_pattern):
+# Ventana del CV local
+ENTROPY_CV_WINDOW = 7
+
+# Modo por bloques: hilos, techo de memoria de los bloques en vuelo y bytes
+# por píxel de bloque (el CV local con halo usa ~8 arrays float64 por píxel)
+STREAM_WORKERS = min(4, os.cpu_count() or 1)
+STREAM_MAX_MEMORY_MB = 1024
+STREAM_BYTES_PER_PIXEL = 96
+
+
+def find_band_file(dim_path, band_pattern):
     """
-    Lee una banda específica de un producto BEAM-DIMAP
+    Busca el .img de una banda en un producto BEAM-DIMAP
 
     Args:
         dim_path: Ruta al archivo .dim
         band_pattern: Patrón de la banda a buscar (ej: 'coh', 'Sigma0_VV')
 
     Returns:
-        tuple: (data, profile) o (None, None) si falla
+        str: Ruta al primer .img cuyo nombre contiene el patrón, o None
     """
     data_dir = dim_path.replace('.dim', '.data')
 
     if not os.path.isdir(data_dir):
         logger.error(f"No existe directorio .data: {data_dir}")
-        return None, None
+        return None
 
-    try:
-        # Buscar archivos .img que contengan el patrón de banda
-        img_files = glob.glob(os.path.join(data_dir, '*.img'))
-        matching_files = [f for f in img_files if band_pattern.lower() in os.path.basename(f).lower()]
+    # Buscar archivos .img que contengan el patrón de banda
+    img_files = glob.glob(os.path.join(data_dir, '*.img'))
+    matching_files = [f for f in img_files if band_pattern.lower() in os.path.basename(f).lower()]
 
-        if not matching_files:
-            logger.warning(f"No se encontró banda '{band_pattern}' en {data_dir}")
-            return None, None
+    if not matching_files:
+        logger.warning(f"No se encontró banda '{band_pattern}' en {data_dir}")
+        return None
+
+    # Usar el primer archivo que coincida
+    return matching_files[0]
+
+
+def gtiff_profile(src):
+    """Profile GeoTIFF (LZW, teselas 256) a partir del de una banda fuente"""
+    profile = src.profile.copy()
+
+    # Limpiar opciones no compatibles con GeoTIFF
+    # Usar driver GTiff en lugar de ENVI para evitar warnings
+    profile.update({
+        'driver': 'GTiff',
+        'compress': 'lzw',
+        'tiled': True,
+        'blockxsize': 256,
+        'blockysize': 256
+    })
+
+    # Eliminar opciones específicas de ENVI
+    for key in ['interleave', 'INTERLEAVE']:
+        profile.pop(key, None)
+
+    return profile
+
+
+def read_band_from_dim(dim_path, band_pattern):
+    """
+    Lee una banda específica de un producto BEAM-DIMAP
+
+    Args:
+        dim_path: Ruta al archivo .dim
+        band_pattern: Patrón de la banda a buscar (ej: 'coh', 'Sigma0_VV')
 
-        # Usar el primer archivo que coincida
-        img_file = matching_files[0]
+    Returns:
+        tuple: (data, profile) o (None, None) si falla
+    """
+    try:
+        img_file = find_band_file(dim_path, band_pattern)
+        if img_file is None:
+            return None, None
 
         with rasterio.open(img_file) as src:
-            data = src.read(1)
-            profile = src.profile.copy()
-            
-            # Limpiar opciones no compatibles con GeoTIFF
-            # Usar driver GTiff en lugar de ENVI para evitar warnings
-            profile.update({
-                'driver': 'GTiff',
-                'compress': 'lzw',
-                'tiled': True,
-                'blockxsize': 256,
-                'blockysize': 256
-            })
-            
-            # Eliminar opciones específicas de ENVI
-            for key in ['interleave', 'INTERLEAVE']:
-                profile.pop(key, None)
-            
-            return data, profile
+            return src.read(1), gtiff_profile(src)
 
     except Exception as e:
         logger.error(f"Error leyendo {dim_path}: {e}")
         return None, None
 
 
-def calculate_entropy_cv(vv_data, window_size=7):
+def calculate_entropy_cv_reference(vv_data, window_size=7):
     """
-    Calcula entropía aproximada usando Coeficiente de Variación local (fallback)
+    Entropía aproximada (CV local) con generic_filter, píxel a píxel
+
+    Implementación original, lenta (callback Python por píxel). Se conserva
+    como referencia para validar y medir calculate_entropy_cv().
 
     Args:
         vv_data: Array numpy con datos de backscatter VV
@@ -108,6 +149,85 @@ def calculate_entropy_cv(vv_data, window_size=7):
     return entropy
 
 
+def _entropy_cv_block(vv_data, window_size, offset):
+    """
+    CV local de un bloque con sumas móviles de x, x² y número de válidos
+
+    Args:
+        vv_data: Bloque (con halo de window_size // 2 si es un tile interior)
+        window_size: Tamaño de ventana
+        offset: Valor restado antes de acumular (reduce la cancelación
+            numérica de E[x²] - E[x]²; la varianza no depende de él)
+
+    Returns:
+        Array float64 con el CV de cada píxel del bloque
+    """
+    values = np.asarray(vv_data, dtype=np.float64)
+    valid = ~np.isnan(values)
+    centered = np.where(valid, values - offset, 0.0)
+
+    # uniform_filter devuelve medias sobre la ventana completa (el padding
+    # constante 0 equivale a píxeles NaN fuera de la imagen): * n = sumas
+    n_window = window_size * window_size
+    count = np.rint(uniform_filter(valid.astype(np.float64), size=window_size,
+                                   mode='constant', cval=0.0) * n_window)
+    sum_x = uniform_filter(centered, size=window_size, mode='constant', cval=0.0) * n_window
+    sum_x2 = uniform_filter(centered * centered, size=window_size, mode='constant', cval=0.0) * n_window
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_centered = sum_x / count
+        variance = np.maximum(sum_x2 / count - mean_centered * mean_centered, 0.0)
+        entropy = np.sqrt(variance) / (np.abs(mean_centered + offset) + 1e-10)
+
+    entropy[count < 2] = np.nan
+    return entropy
+
+
+def calculate_entropy_cv(vv_data, window_size=7, workers=1, tile_rows=1024):
+    """
+    Calcula entropía aproximada usando Coeficiente de Variación local (fallback)
+
+    Versión vectorizada de calculate_entropy_cv_reference(): mismas reglas
+    (NaN ignorados, desviación poblacional, NaN si hay menos de 2 válidos en
+    la ventana, fuera de la imagen cuenta como NaN) pero con filtros de caja
+    sobre sumas de x, x² y recuento en lugar de un callback por píxel.
+
+    Args:
+        vv_data: Array numpy con datos de backscatter VV
+        window_size: Tamaño de ventana para cálculo local
+        workers: Hilos para procesar franjas de filas en paralelo (1 = sin pool)
+        tile_rows: Filas por franja cuando workers > 1
+
+    Returns:
+        Array numpy con valores de entropía aproximada (CV)
+    """
+    vv_data = np.asarray(vv_data)
+    valid_values = vv_data[np.isfinite(vv_data)]
+    offset = float(np.mean(valid_values, dtype=np.float64)) if valid_values.size else 0.0
+
+    height = vv_data.shape[0]
+    if workers <= 1 or height <= tile_rows:
+        return _entropy_cv_block(vv_data, window_size, offset).astype(np.float32)
+
+    # Franjas con halo: cada una ve las filas vecinas que cubre la ventana
+    halo = window_size // 2
+    entropy = np.empty(vv_data.shape, dtype=np.float32)
+
+    def process_tile(row_start):
+        row_end = min(row_start + tile_rows, height)
+        halo_start = max(row_start - halo, 0)
+        halo_end = min(row_end + halo, height)
+        block = _entropy_cv_block(vv_data[halo_start:halo_end], window_size, offset)
+        entropy[row_start:row_end] = block[row_start - halo_start:row_end - halo_start]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_tile, row) for row in range(0, height, tile_rows)]
+        for future in as_completed(futures):
+            future.result()
+
+    return entropy
+
+
 def get_glcm_bands_from_grd(grd_dim_path):
     """
     Extrae bandas GLCM (Entropy y Contrast) de un producto GRD procesado con SNAP.
@@ -162,7 +282,7 @@ def get_entropy_for_image(grd_dim_path, vv_data=None, vv_profile=None):
     # Fallback: calcular CV local si hay datos VV
     if vv_data is not None:
         logger.warning(f"      ⚠ No hay bandas GLCM - usando CV local como fallback")
-        entropy_cv = calculate_entropy_cv(vv_data)
+        entropy_cv = calculate_entropy_cv(vv_data, workers=ENTROPY_CV_WORKERS)
         return entropy_cv, None, vv_profile, False
 
     return None, None, None, False
@@ -285,6 +405,18 @@ def align_msavi_to_sar(msavi_file, reference_profile):
         return None, None
 
 
+def check_coherence_coverage(valid_pixels, total_pixels):
+    """Advierte (sin fallar) si menos del 10% de la coherencia es válida"""
+    valid_ratio = valid_pixels / total_pixels if total_pixels > 0 else 0
+
+    if valid_ratio < 0.10:  # Menos de 10% de datos válidos
+        logger.error(f"   ✗ ADVERTENCIA: Coherencia con datos insuficientes")
+        logger.error(f"      Solo {valid_pixels}/{total_pixels} píxeles válidos ({valid_ratio*100:.1f}%)")
+        logger.error(f"      El subswath seleccionado probablemente NO cubre el AOI")
+        logger.error(f"      RECOMENDACIÓN: Reprocesar con otro subswath (IW2 o IW3)")
+        # No fallar, pero advertir claramente
+
+
 def process_insar_pair(ifg_file, sar_dir, output_base_dir, insar_dir):
     """
     Procesa un par InSAR y extrae estadísticas de ambos días
@@ -347,20 +479,7 @@ def process_insar_pair(ifg_file, sar_dir, output_base_dir, insar_dir):
         try:
             with rasterio.open(cropped_file) as src:
                 coh_data = src.read(1)
-                coh_profile = src.profile.copy()
-                
-                # Limpiar opciones no compatibles y usar GTiff
-                coh_profile.update({
-                    'driver': 'GTiff',
-                    'compress': 'lzw',
-                    'tiled': True,
-                    'blockxsize': 256,
-                    'blockysize': 256
-                })
-                
-                # Eliminar opciones específicas de ENVI
-                for key in ['interleave', 'INTERLEAVE']:
-                    coh_profile.pop(key, None)
+                coh_profile = gtiff_profile(src)
                 
                 # Filtrar valores válidos [0, 1]
                 coh_data = np.where((coh_data >= 0) & (coh_data <= 1), coh_data, np.nan)
@@ -369,14 +488,7 @@ def process_insar_pair(ifg_file, sar_dir, output_base_dir, insar_dir):
                 valid_mask = np.isfinite(coh_data) & (coh_data != 0)
                 valid_pixels = np.sum(valid_mask)
                 total_pixels = coh_data.size
-                valid_ratio = valid_pixels / total_pixels if total_pixels > 0 else 0
-                
-                if valid_ratio < 0.10:  # Menos de 10% de datos válidos
-                    logger.error(f"   ✗ ADVERTENCIA: Coherencia con datos insuficientes")
-                    logger.error(f"      Solo {valid_pixels}/{total_pixels} píxeles válidos ({valid_ratio*100:.1f}%)")
-                    logger.error(f"      El subswath seleccionado probablemente NO cubre el AOI")
-                    logger.error(f"      RECOMENDACIÓN: Reprocesar con otro subswath (IW2 o IW3)")
-                    # No fallar, pero advertir claramente
+                check_coherence_coverage(valid_pixels, total_pixels)
                 
         except Exception as e:
             logger.error(f"   ✗ Error leyendo archivo recortado: {e}")
@@ -552,9 +664,383 @@ def process_insar_pair(ifg_file, sar_dir, output_base_dir, insar_dir):
     return success
 
 
+def stream_block_size(max_memory_mb=STREAM_MAX_MEMORY_MB, workers=STREAM_WORKERS):
+    """
+    Lado de bloque para que los bloques en vuelo (uno por hilo) no pasen de
+    max_memory_mb; múltiplo de 256 (teselas de salida), mínimo 256
+    """
+    pixels = max_memory_mb * 1024 * 1024 / (max(workers, 1) * STREAM_BYTES_PER_PIXEL)
+    return max(int(math.sqrt(pixels)) // 256 * 256, 256)
+
+
+def iter_windows(height, width, block_size):
+    """Ventanas de block_size×block_size que recorren el raster completo"""
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            yield Window(col, row, min(block_size, width - col), min(block_size, height - row))
+
+
+def stream_raster(output_path, profile, sources, compute, block_size, workers, description=None):
+    """
+    Escribe un GeoTIFF ventana a ventana, con bloques en paralelo
+
+    compute(readers, window) devuelve (bloque, parcial) para cada ventana de
+    la rejilla de salida; readers son los datasets de sources abiertos por el
+    hilo (los handles de GDAL no se comparten entre hilos). Las escrituras se
+    serializan y el fichero se publica con os.replace al terminar. En memoria
+    solo hay un bloque por hilo.
+
+    Returns:
+        list: Parciales de cada ventana (para agregar estadísticas)
+    """
+    tmp_path = f"{output_path}.tmp"
+    local = threading.local()
+    opened = []
+    opened_lock = threading.Lock()
+    write_lock = threading.Lock()
+
+    def readers():
+        if not hasattr(local, 'sources'):
+            local.sources = [rasterio.open(f) for f in sources]
+            with opened_lock:
+                opened.extend(local.sources)
+        return local.sources
+
+    try:
+        with rasterio.open(tmp_path, 'w', **profile) as dst:
+            dtype = dst.dtypes[0]
+
+            def process_window(window):
+                block, partial = compute(readers(), window)
+                with write_lock:
+                    dst.write(block.astype(dtype, copy=False), 1, window=window)
+                return partial
+
+            windows = list(iter_windows(profile['height'], profile['width'], block_size))
+            if workers > 1 and len(windows) > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(process_window, w) for w in windows]
+                    partials = [f.result() for f in as_completed(futures)]
+            else:
+                partials = [process_window(w) for w in windows]
+
+            if description:
+                dst.set_band_description(1, description)
+
+        os.replace(tmp_path, output_path)
+    finally:
+        for src in opened:
+            src.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return partials
+
+
+def _coherence_block(readers, window):
+    """Coherencia recortada: valores fuera de [0, 1] a NaN + recuento de válidos"""
+    coh = readers[0].read(1, window=window)
+    coh = np.where((coh >= 0) & (coh <= 1), coh, np.nan)
+    valid = int(np.count_nonzero(np.isfinite(coh) & (coh != 0)))
+    return coh, (valid, coh.size)
+
+
+def _raw_block(readers, window):
+    """Copia de la banda + (n finitos, suma) para la media global"""
+    data = readers[0].read(1, window=window)
+    finite = data[np.isfinite(data)]
+    return data, (finite.size, float(finite.sum(dtype=np.float64)))
+
+
+def _glcm_block(readers, window):
+    """Banda GLCM con los no finitos y negativos a NaN"""
+    data = readers[0].read(1, window=window)
+    return np.where(np.isfinite(data) & (data >= 0), data, np.nan).astype(np.float32), None
+
+
+def _entropy_cv_compute(offset, window_size=ENTROPY_CV_WINDOW):
+    """CV local por ventanas: cada ventana se lee con el halo que cubre el filtro"""
+    halo = window_size // 2
+
+    def compute(readers, window):
+        src = readers[0]
+        row0 = max(window.row_off - halo, 0)
+        col0 = max(window.col_off - halo, 0)
+        row1 = min(window.row_off + window.height + halo, src.height)
+        col1 = min(window.col_off + window.width + halo, src.width)
+        block = src.read(1, window=Window(col0, row0, col1 - col0, row1 - row0))
+        entropy = _entropy_cv_block(block, window_size, offset)
+        r = window.row_off - row0
+        c = window.col_off - col0
+        return entropy[r:r + window.height, c:c + window.width].astype(np.float32), None
+
+    return compute
+
+
+def _msavi_compute(dst_transform, dst_crs):
+    """MSAVI remuestreado (bilineal) a cada ventana de la rejilla SAR + estadísticas"""
+
+    def compute(readers, window):
+        src = readers[0]
+        block = np.empty((window.height, window.width), dtype=np.float32)
+        reproject(
+            source=rasterio.band(src, 1),
+            destination=block,
+            src_transform=src.transform,
+            src_crs=src.crs,
+            dst_transform=window_transform(window, dst_transform),
+            dst_crs=dst_crs,
+            resampling=Resampling.bilinear
+        )
+        valid = block[np.isfinite(block)]
+        if not valid.size:
+            return block, (0, np.inf, -np.inf, 0.0)
+        return block, (valid.size, float(valid.min()), float(valid.max()), float(valid.sum(dtype=np.float64)))
+
+    return compute
+
+
+def stream_grd_products(grd_file, role, pair_dir, block_size, workers):
+    """
+    VV, entropía (GLCM o CV local) y Contrast de un GRD, por bloques
+
+    Args:
+        grd_file: GRD .dim del día
+        role: 'master' o 'slave' (sufijo de los ficheros)
+        pair_dir: Directorio del par
+        block_size: Lado de las ventanas
+        workers: Hilos
+
+    Returns:
+        dict: Profile del VV escrito, o None si no hay VV
+    """
+    vv_file = find_band_file(grd_file, 'Sigma0_VV')
+    if vv_file is None:
+        logger.error(f"   ✗ No se pudo extraer VV del {role}")
+        return None
+
+    with rasterio.open(vv_file) as src:
+        vv_profile = gtiff_profile(src)
+
+    output_vv = os.path.join(pair_dir, f'vv_{role}.tif')
+    partials = stream_raster(output_vv, vv_profile, [vv_file], _raw_block, block_size, workers)
+    logger.info(f"   ✓ VV guardado: {output_vv}")
+
+    # Entropía: GLCM real o CV local como fallback
+    logger.info(f"   Extrayendo entropía {role}...")
+    entropy_file = find_band_file(grd_file, 'Entropy')
+    contrast_file = find_band_file(grd_file, 'Contrast')
+    output_entropy = os.path.join(pair_dir, f'entropy_{role}.tif')
+
+    if entropy_file is not None:
+        logger.info(f"      ✓ Banda GLCMEntropy encontrada")
+        with rasterio.open(entropy_file) as src:
+            entropy_profile = gtiff_profile(src)
+        stream_raster(output_entropy, entropy_profile, [entropy_file], _glcm_block, block_size, workers)
+        logger.info(f"   ✓ Entropía guardada: {output_entropy} (GLCM)")
+
+        if contrast_file is not None:
+            logger.info(f"      ✓ Banda GLCMContrast encontrada")
+            output_contrast = os.path.join(pair_dir, f'contrast_{role}.tif')
+            stream_raster(output_contrast, entropy_profile, [contrast_file], _glcm_block, block_size, workers)
+            logger.info(f"   ✓ Contrast guardado: {output_contrast}")
+    else:
+        logger.warning(f"      ⚠ No hay bandas GLCM - usando CV local como fallback")
+        n_finite = sum(p[0] for p in partials)
+        offset = sum(p[1] for p in partials) / n_finite if n_finite else 0.0
+        stream_raster(output_entropy, vv_profile, [vv_file], _entropy_cv_compute(offset),
+                      block_size, workers)
+        logger.info(f"   ✓ Entropía guardada: {output_entropy} (CV local)")
+
+    return vv_profile
+
+
+def stream_msavi(msavi_file, reference_profile, output_path, block_size, workers):
+    """
+    Alinea MSAVI a la rejilla SAR por bloques y registra rango y media
+
+    Returns:
+        bool: True si se escribió
+    """
+    profile = reference_profile.copy()
+    profile.update({
+        'dtype': 'float32',
+        'nodata': np.nan
+    })
+
+    try:
+        partials = stream_raster(
+            output_path, profile, [msavi_file],
+            _msavi_compute(reference_profile['transform'], reference_profile['crs']),
+            block_size, workers, description='MSAVI'
+        )
+    except Exception as e:
+        logger.error(f"      Error alineando MSAVI: {e}")
+        return False
+
+    n_valid = sum(p[0] for p in partials)
+    if n_valid > 0:
+        vmin = min(p[1] for p in partials)
+        vmax = max(p[2] for p in partials)
+        mean = sum(p[3] for p in partials) / n_valid
+        logger.info(f"      Rango: [{vmin:.3f}, {vmax:.3f}], Media: {mean:.3f}")
+    return True
+
+
+def process_insar_pair_streaming(ifg_file, sar_dir, output_base_dir, insar_dir,
+                                 block_size=None, workers=STREAM_WORKERS,
+                                 max_memory_mb=STREAM_MAX_MEMORY_MB):
+    """
+    Versión por bloques de process_insar_pair(), mismas salidas
+
+    Cada banda de entrada se recorre en ventanas alineadas con la rejilla de
+    salida: se lee, se transforma y se escribe sin cargar la imagen completa,
+    acumulando por ventana las estadísticas que se registran (cobertura de
+    coherencia, media VV para el CV local, rango/media MSAVI). El consumo de
+    memoria queda acotado por max_memory_mb (un bloque por hilo).
+
+    Args:
+        ifg_file: Path al interferograma .dim
+        sar_dir: Directorio con productos SAR procesados
+        output_base_dir: Directorio base para guardar resultados
+        insar_dir: Directorio con productos InSAR
+        block_size: Lado de las ventanas (None = derivado de max_memory_mb)
+        workers: Hilos para procesar ventanas en paralelo
+        max_memory_mb: Techo de memoria de los bloques en vuelo
+
+    Returns:
+        bool: True si exitoso
+    """
+    basename = os.path.basename(ifg_file)
+
+    # Extraer fechas del nombre: Ifg_YYYYMMDD_YYYYMMDD.dim
+    parts = basename.replace('Ifg_', '').replace('.dim', '').split('_')
+    if len(parts) != 2:
+        logger.error(f"Formato de nombre inválido: {basename}")
+        return False
+
+    master_date, slave_date = parts
+    pair_name = f"pair_{master_date}_{slave_date}"
+    pair_dir = os.path.join(output_base_dir, 'pairs', pair_name)
+
+    # Verificar si el par ya está completamente procesado
+    required_files = [
+        os.path.join(pair_dir, 'coherence.tif'),
+        os.path.join(pair_dir, 'vv_master.tif'),
+        os.path.join(pair_dir, 'vv_slave.tif')
+    ]
+
+    if all(os.path.exists(f) for f in required_files):
+        logger.info(f"✓ Par ya procesado: {master_date} → {slave_date}")
+        return True
+
+    os.makedirs(pair_dir, exist_ok=True)
+
+    if block_size is None:
+        block_size = stream_block_size(max_memory_mb, workers)
+
+    logger.info(f"{'='*60}")
+    logger.info(f"Par: {master_date} → {slave_date}")
+    logger.info(f"  (por bloques de {block_size}×{block_size}, {workers} hilos)")
+    logger.info(f"{'='*60}")
+
+    success = True
+
+    # 1. Extraer coherencia del interferograma
+    logger.info("1. Extrayendo coherencia...")
+    output_coh = os.path.join(pair_dir, 'coherence.tif')
+
+    # Buscar primero en cropped/ (archivos TIF ya recortados)
+    cropped_file = os.path.join(insar_dir, 'cropped', f'Ifg_{master_date}_{slave_date}_cropped.tif')
+
+    coh_written = False
+    if os.path.exists(cropped_file):
+        logger.info(f"   Usando archivo recortado: {os.path.basename(cropped_file)}")
+        try:
+            with rasterio.open(cropped_file) as src:
+                coh_profile = gtiff_profile(src)
+            partials = stream_raster(output_coh, coh_profile, [cropped_file], _coherence_block,
+                                     block_size, workers)
+            check_coherence_coverage(sum(p[0] for p in partials), sum(p[1] for p in partials))
+            coh_written = True
+        except Exception as e:
+            logger.error(f"   ✗ Error leyendo archivo recortado: {e}")
+    else:
+        logger.info(f"   No encontrado recortado, buscando en .dim...")
+        coh_file = find_band_file(ifg_file, 'coh')
+        if coh_file is not None:
+            with rasterio.open(coh_file) as src:
+                coh_profile = gtiff_profile(src)
+            stream_raster(output_coh, coh_profile, [coh_file], _raw_block, block_size, workers)
+            coh_written = True
+
+    if coh_written:
+        logger.info(f"   ✓ Guardado: {output_coh}")
+    else:
+        logger.error(f"   ✗ No se pudo extraer coherencia")
+        success = False
+
+    # 2-3. GRD master y slave: VV + entropía (+ Contrast)
+    vv_profiles = {}
+    for step, role, date in ((2, 'master', master_date), (3, 'slave', slave_date)):
+        logger.info(f"{step}. Procesando GRD {role} ({date})...")
+        grd_file = find_grd_for_date(sar_dir, date)
+
+        if not grd_file:
+            logger.error(f"   ✗ No se encontró GRD {role} para fecha {date}")
+            success = False
+            continue
+
+        logger.info(f"   Encontrado: {os.path.basename(grd_file)}")
+        vv_profiles[role] = stream_grd_products(grd_file, role, pair_dir, block_size, workers)
+        if vv_profiles[role] is None:
+            success = False
+
+    # Rejilla de referencia para MSAVI: VV master (o slave si el master falló)
+    vv_profile = vv_profiles.get('master') or vv_profiles.get('slave')
+
+    # 4-5. MSAVI master y slave alineados a la rejilla SAR
+    data_dir = os.path.dirname(output_base_dir)  # Subir un nivel desde fusion/
+    for step, role, date in ((4, 'master', master_date), (5, 'slave', slave_date)):
+        logger.info(f"{step}. Procesando MSAVI {role} ({date})...")
+        msavi_file = find_msavi_for_date(data_dir, date, date_window=2)
+
+        if not msavi_file:
+            logger.warning(f"   ⚠ No se encontró MSAVI {role} para fecha {date}")
+            logger.info(f"      Ejecuta: python scripts/process_sentinel2_msavi.py --date {date}")
+            continue
+
+        logger.info(f"   Encontrado: {os.path.basename(msavi_file)}")
+
+        if vv_profiles.get(role) is not None and vv_profile is not None:
+            output_msavi = os.path.join(pair_dir, f'msavi_{role}.tif')
+            if stream_msavi(msavi_file, vv_profile, output_msavi, block_size, workers):
+                logger.info(f"   ✓ MSAVI {role} guardado: {output_msavi}")
+            else:
+                logger.warning(f"   ⚠ No se pudo alinear MSAVI {role}")
+
+    if success:
+        logger.info(f"✅ Par {pair_name} completado")
+    else:
+        logger.warning(f"⚠️  Par {pair_name} completado con errores")
+
+    return success
+
+
 def main():
     global logger
 
+    parser = argparse.ArgumentParser(description='Estadísticas por par temporal (coherencia, VV, entropía, MSAVI)')
+    parser.add_argument('--mode', choices=['stream', 'memory'], default='stream',
+                        help='stream: por bloques con memoria acotada; memory: imagen completa (default: stream)')
+    parser.add_argument('--workers', type=int, default=STREAM_WORKERS,
+                        help=f'Hilos por par en modo stream (default: {STREAM_WORKERS})')
+    parser.add_argument('--block-size', type=int, default=None,
+                        help='Lado de bloque en píxeles (default: derivado de --max-memory-mb)')
+    parser.add_argument('--max-memory-mb', type=int, default=STREAM_MAX_MEMORY_MB,
+                        help=f'Techo de memoria de los bloques en vuelo (default: {STREAM_MAX_MEMORY_MB})')
+    args = parser.parse_args()
+
     # Cargar configuración primero
     config = load_config()
 
@@ -618,9 +1104,18 @@ def main():
     processed = 0
     failed = 0
 
+    if args.mode == 'stream':
+        block_size = args.block_size or stream_block_size(args.max_memory_mb, args.workers)
+        logger.info(f"Modo por bloques: {block_size}×{block_size} px, {args.workers} hilos")
+
     for ifg_file in ifg_files:
         try:
-            if process_insar_pair(ifg_file, sar_dir, output_dir, insar_dir):
+            if args.mode == 'stream':
+                ok = process_insar_pair_streaming(ifg_file, sar_dir, output_dir, insar_dir,
+                                                  block_size=block_size, workers=args.workers)
+            else:
+                ok = process_insar_pair(ifg_file, sar_dir, output_dir, insar_dir)
+            if ok:
                 processed += 1
             else:
                 failed += 1
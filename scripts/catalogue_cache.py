@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Caché local de búsquedas en el catálogo OData de Copernicus
+
+Evita repetir la misma búsqueda (colección, tipo, footprint, órbita...) en
+cada ejecución y en cada AOI de un batch. Cada entrada guarda los productos
+y la ventana temporal ya consultada:
+
+- Dentro del TTL, una ventana ya cubierta se sirve sin tocar la red.
+- Pasado el TTL, o si se pide una ventana mayor, solo se consultan los
+  huecos: productos más nuevos que la última fecha de adquisición cacheada
+  (con un pequeño solape para productos publicados con retraso) y, si la
+  nueva ventana empieza antes, el tramo anterior.
+
+Estructura en disco: <cache_dir>/<sha1 de la consulta>.json
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_HOURS = 12
+
+# Solape de la actualización incremental: productos ingeridos con retraso
+INCREMENTAL_OVERLAP = timedelta(days=2)
+
+CACHE_VERSION = 1
+
+
+def product_sensing_time(product: Dict) -> Optional[datetime]:
+    """Fecha de adquisición (ContentDate/Start) de un producto del catálogo"""
+    start = (product.get('ContentDate') or {}).get('Start')
+    if not start:
+        return None
+    try:
+        return datetime.strptime(start[:19], '%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        return None
+
+
+class CatalogueCache:
+    """Caché en disco de búsquedas del catálogo, con TTL y refresco incremental"""
+
+    def __init__(self, cache_dir: str, ttl_hours: float = DEFAULT_TTL_HOURS):
+        """
+        Args:
+            cache_dir: Directorio de la caché (se crea si no existe)
+            ttl_hours: Horas durante las que una entrada se considera fresca
+        """
+        self.cache_dir = cache_dir
+        self.ttl = timedelta(hours=ttl_hours)
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(query: Dict) -> str:
+        """
+        Clave estable de una consulta (sin fechas).
+
+        Args:
+            query: Dict con collection, product_type, footprint (WKT), orbit_direction...
+        """
+        canonical = json.dumps(query, sort_keys=True, default=str)
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('version') != CACHE_VERSION:
+            return None
+        return entry
+
+    def _save(self, key: str, entry: Dict) -> None:
+        # Escritura atómica: varios AOIs del batch pueden compartir entrada
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def search(
+        self,
+        query: Dict,
+        start_date: datetime,
+        end_date: datetime,
+        fetch: Callable[[datetime, datetime], Optional[List[Dict]]]
+    ) -> Optional[List[Dict]]:
+        """
+        Devuelve los productos de la consulta en [start_date, end_date].
+
+        Args:
+            query: Parámetros de la consulta sin fechas (ver make_key)
+            start_date: Inicio de la ventana
+            end_date: Fin de la ventana
+            fetch: Función que consulta el catálogo para una ventana y devuelve
+                la lista de productos (lista vacía si no hay, None si error)
+
+        Returns:
+            Lista de productos ordenada por fecha descendente, o None si la
+            consulta al catálogo falló y no hay datos cacheados que la cubran
+        """
+        # Granularidad de día, igual que el filtro OData de search_products()
+        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=0)
+
+        key = self.make_key(query)
+        entry = self._load(key)
+        now = datetime.now()
+
+        if entry is None:
+            self.misses += 1
+            products = fetch(start_date, end_date)
+            if products is None:
+                return None
+            entry = {
+                'version': CACHE_VERSION,
+                'query': query,
+                'covered_start': start_date.isoformat(),
+                'covered_end': end_date.isoformat(),
+                'fetched_at': now.isoformat(),
+                'products': products
+            }
+            self._save(key, entry)
+            return self._window(entry['products'], start_date, end_date)
+
+        covered_start = datetime.fromisoformat(entry['covered_start'])
+        covered_end = datetime.fromisoformat(entry['covered_end'])
+        fresh = now - datetime.fromisoformat(entry['fetched_at']) < self.ttl
+
+        gaps = []
+        if start_date < covered_start:
+            gaps.append((start_date, covered_start))
+        if not fresh or end_date > covered_end:
+            # Incremental: solo lo posterior a la última adquisición cacheada
+            sensing_times = [t for t in map(product_sensing_time, entry['products']) if t]
+            last_sensing = max(sensing_times) if sensing_times else covered_start
+            refresh_from = max(min(last_sensing, covered_end) - INCREMENTAL_OVERLAP, covered_start)
+            gaps.append((refresh_from, max(end_date, covered_end)))
+
+        if not gaps:
+            self.hits += 1
+            logger.info(f"   💾 Catálogo desde caché ({len(entry['products'])} productos)")
+            return self._window(entry['products'], start_date, end_date)
+
+        self.partial_hits += 1
+        by_id = {p['Id']: p for p in entry['products']}
+        for gap_start, gap_end in gaps:
+            logger.info(f"   💾 Caché parcial: consultando {gap_start.date()} → {gap_end.date()}")
+            new_products = fetch(gap_start, gap_end)
+            if new_products is None:
+                # Sin red: servir lo cacheado si cubre la ventana pedida
+                if covered_start <= start_date and covered_end >= end_date:
+                    logger.info("   ⚠️  Catálogo no disponible, usando caché")
+                    return self._window(entry['products'], start_date, end_date)
+                return None
+            for product in new_products:
+                by_id[product['Id']] = product
+
+        entry['products'] = list(by_id.values())
+        entry['covered_start'] = min(start_date, covered_start).isoformat()
+        entry['covered_end'] = max(end_date, covered_end).isoformat()
+        entry['fetched_at'] = now.isoformat()
+        self._save(key, entry)
+
+        return self._window(entry['products'], start_date, end_date)
+
+    @staticmethod
+    def _window(products: List[Dict], start_date: datetime, end_date: datetime) -> List[Dict]:
+        """Productos con ContentDate/Start en la ventana, del más reciente al más antiguo"""
+        selected = []
+        for product in products:
+            sensing = product_sensing_time(product)
+            if sensing is None or start_date <= sensing <= end_date:
+                selected.append(product)
+        selected.sort(key=lambda p: (p.get('ContentDate') or {}).get('Start', ''), reverse=True)
+        return selected
+
+    def stats(self) -> str:
+        """Resumen de uso para logs"""
+        return f"caché catálogo: {self.hits} hits, {self.partial_hits} parciales, {self.misses} misses"
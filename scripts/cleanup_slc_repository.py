@@ -27,6 +27,8 @@ import os
 import re
 import sys
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
@@ -39,6 +41,15 @@ from logging_utils import LoggerConfig
 # Logger se configurará en main()
 logger = None
 
+# Hilos para los stat() de productos (I/O: rinde por encima del nº de CPUs)
+DEFAULT_STAT_WORKERS = 16
+
+
+@lru_cache(maxsize=None)
+def get_repository(repo_base_dir: Path) -> InSARRepository:
+    """Repositorio (y su catálogo) compartido por todas las consultas de la limpieza"""
+    return InSARRepository(repo_base_dir=repo_base_dir)
+
 
 def analyze_repository_tracks(repo_base_dir: Path) -> Dict[int, Set[str]]:
     """
@@ -50,57 +61,40 @@ def analyze_repository_tracks(repo_base_dir: Path) -> Dict[int, Set[str]]:
     Returns:
         Dict[track_number, Set[fechas_YYYYMMDD]]
     """
-    repository = InSARRepository(repo_base_dir=repo_base_dir)
+    repository = get_repository(repo_base_dir)
     track_dates = defaultdict(set)
 
     logger.info("Analizando repositorio de productos procesados...")
 
-    # Buscar todos los directorios de tracks
-    for orbit_subswath_dir in repo_base_dir.iterdir():
-        if not orbit_subswath_dir.is_dir():
-            continue
-
-        for track_dir in orbit_subswath_dir.iterdir():
-            if not track_dir.is_dir() or not track_dir.name.startswith('t'):
-                continue
+    # Todos los tracks registrados en el catálogo
+    for track_summary in repository.list_tracks():
+        track_number = track_summary['track']
 
-            # Extraer track number
-            track_match = re.match(r't(\d+)', track_dir.name)
-            if not track_match:
-                continue
+        try:
+            metadata = repository.load_metadata(
+                track_summary['orbit_direction'], track_summary['subswath'], track_number
+            )
 
-            track_number = int(track_match.group(1))
+            # Extraer fechas de productos InSAR
+            for product in metadata.get('insar_products', []):
+                master_date = product.get('master_date')
+                slave_date = product.get('slave_date')
+                if master_date:
+                    track_dates[track_number].add(master_date)
+                if slave_date:
+                    track_dates[track_number].add(slave_date)
 
-            # Leer metadata
-            metadata_file = track_dir / "metadata.json"
-            if not metadata_file.exists():
-                logger.warning(f"  ⚠️  No existe metadata.json en {track_dir}")
-                continue
+            # Extraer fechas de productos polarimétricos
+            for product in metadata.get('polarimetry_products', []):
+                date = product.get('date')
+                if date:
+                    track_dates[track_number].add(date)
 
-            try:
-                with open(metadata_file, 'r') as f:
-                    metadata = json.load(f)
-
-                # Extraer fechas de productos InSAR
-                for product in metadata.get('insar_products', []):
-                    master_date = product.get('master_date')
-                    slave_date = product.get('slave_date')
-                    if master_date:
-                        track_dates[track_number].add(master_date)
-                    if slave_date:
-                        track_dates[track_number].add(slave_date)
-
-                # Extraer fechas de productos polarimétricos
-                for product in metadata.get('polarimetry_products', []):
-                    date = product.get('date')
-                    if date:
-                        track_dates[track_number].add(date)
-
-                logger.info(f"  ✓ Track {track_number:03d}: {len(track_dates[track_number])} fechas usadas")
+            logger.info(f"  ✓ Track {track_number:03d}: {len(track_dates[track_number])} fechas usadas")
 
-            except Exception as e:
-                logger.error(f"  ✗ Error leyendo metadata de {track_dir}: {e}")
-                continue
+        except Exception as e:
+            logger.error(f"  ✗ Error leyendo metadata de {track_summary['track_dir']}: {e}")
+            continue
 
     return dict(track_dates)
 
@@ -149,156 +143,200 @@ def scan_slc_files(slc_dir: Path, repository: InSARRepository) -> Dict[int, Dict
     return dict(track_slc_map)
 
 
-def verify_insar_products_exist(repo_base_dir: Path, track_number: int, slc_date: str) -> bool:
+def load_track_index(repository: InSARRepository, track_number: int) -> Optional[Dict]:
     """
-    Verifica que TODOS los pares InSAR esperados que usan este SLC existan en disco.
-
-    LÓGICA ROBUSTA:
-    1. Obtiene todas las fechas SLC disponibles para este track
-    2. Calcula TODOS los pares esperados (SHORT y LONG) que deberían usar este SLC
-    3. Verifica que TODOS esos pares existan físicamente en TODAS las subswaths
-    4. Solo retorna True si el SLC está COMPLETAMENTE procesado en todos los pares esperados
-
-    Pares esperados para un SLC en medio de la serie:
-    - 2 SHORT: como master (date→date+1) y como slave (date-1→date)
-    - 2 LONG: como master (date→date+2) y como slave (date-2→date)
-    - Total: 4 pares (si es fecha intermedia)
-
-    Args:
-        repo_base_dir: Directorio base del repositorio
-        track_number: Número de track
-        slc_date: Fecha SLC en formato YYYYMMDD
+    Carga una sola vez los metadatos de un track (todas sus subswaths) como índices hash
 
     Returns:
-        True si TODOS los pares esperados que usan este SLC existen en todas las subswaths
+        Dict con:
+            dates: fechas SLC usadas por productos InSAR (ordenadas)
+            subswaths: lista de dicts por orbit/subswath con track_dir,
+                pairs {(pair_type, master, slave): file} y
+                polarimetry {fecha: [files]}
+        o None si el track no existe o algún metadata no se pudo leer
     """
-    from datetime import datetime
-
-    # Buscar TODOS los directorios del track (puede estar en múltiples subswaths)
-    track_dirs = list(repo_base_dir.glob(f"*/t{track_number:03d}"))
-    if not track_dirs:
-        return False
+    tracks = repository.list_tracks(track=track_number)
+    if not tracks:
+        return None
 
-    # Obtener todas las fechas SLC disponibles para calcular pares esperados
     all_slc_dates = set()
-    existing_pairs = {'short': set(), 'long': set()}
-
-    for track_dir in track_dirs:
-        metadata_file = track_dir / "metadata.json"
-        if not metadata_file.exists():
-            continue
+    subswaths = []
 
+    for track_summary in tracks:
+        track_dir = track_summary['track_dir']
         try:
-            with open(metadata_file, 'r') as f:
-                metadata = json.load(f)
+            metadata = repository.load_metadata(
+                track_summary['orbit_direction'], track_summary['subswath'], track_number
+            )
+        except Exception as e:
+            if logger:
+                logger.debug(f"    ✗ Error leyendo metadata {track_dir}: {e}")
+            return None
+
+        pairs = {}
+        for product in metadata.get('insar_products', []):
+            master_date = product.get('master_date')
+            slave_date = product.get('slave_date')
+            pair_type = product.get('pair_type', product.get('type', 'short'))
+
+            if master_date:
+                all_slc_dates.add(master_date)
+            if slave_date:
+                all_slc_dates.add(slave_date)
+
+            # El primer producto de cada par es el que cuenta (como en el recorrido lineal)
+            if master_date and slave_date:
+                pairs.setdefault((pair_type, master_date, slave_date), product['file'])
+
+        polarimetry = defaultdict(list)
+        for product in metadata.get('polarimetry_products', []):
+            if product.get('date'):
+                polarimetry[product['date']].append(product['file'])
+
+        subswaths.append({
+            'track_dir': track_dir,
+            'pairs': pairs,
+            'polarimetry': polarimetry
+        })
+
+    return {
+        'dates': sorted(all_slc_dates),
+        'subswaths': subswaths
+    }
+
+
+def expected_pairs_for_date(sorted_dates: List[str], date_index: Dict[str, int],
+                            slc_date: str) -> List[Tuple[str, str, str]]:
+    """
+    Pares esperados (pair_type, master, slave) que usan un SLC
 
-            # Recopilar fechas SLC y pares existentes
-            for product in metadata.get('insar_products', []):
-                master_date = product.get('master_date')
-                slave_date = product.get('slave_date')
-                pair_type = product.get('pair_type', product.get('type', 'short'))
+    SHORT: consecutivos (i → i+1); LONG: salto de 1 (i → i+2). Para una fecha
+    intermedia son 4: dos como master y dos como slave.
+    """
+    idx = date_index.get(slc_date)
+    if idx is None:
+        return []
 
-                if master_date:
-                    all_slc_dates.add(master_date)
-                if slave_date:
-                    all_slc_dates.add(slave_date)
+    expected = []
+    for pair_type, step in (('short', 1), ('long', 2)):
+        for master_idx in (idx - step, idx):
+            slave_idx = master_idx + step
+            if master_idx >= 0 and slave_idx < len(sorted_dates):
+                expected.append((pair_type, sorted_dates[master_idx], sorted_dates[slave_idx]))
+    return expected
 
-                if master_date and slave_date:
-                    existing_pairs[pair_type].add((master_date, slave_date))
 
-        except Exception as e:
-            if logger:
-                logger.debug(f"    ✗ Error leyendo metadata {track_dir}: {e}")
-            return False
+def required_product_files(track_index: Dict, slc_date: str) -> Optional[List[Path]]:
+    """
+    Ficheros que deben existir para poder borrar un SLC
 
-    if not all_slc_dates:
-        return False
+    Returns:
+        Lista de paths, o None si falta algún par esperado en el metadata
+        (o el SLC no tiene pares esperados)
+    """
+    sorted_dates = track_index['dates']
+    expected = expected_pairs_for_date(sorted_dates, track_index['date_index'], slc_date)
+    if not expected:
+        return None
+
+    files = []
+    for subswath in track_index['subswaths']:
+        track_dir = subswath['track_dir']
+        for pair_key in expected:
+            product_file = subswath['pairs'].get(pair_key)
+            if product_file is None:
+                # Este par esperado no se ha procesado aún - NO eliminar SLC
+                if logger:
+                    pair_type, master, slave = pair_key
+                    logger.debug(f"    ⚠️  Par esperado no procesado: {master}→{slave} ({pair_type})")
+                    logger.debug(f"    → SLC {slc_date} todavía necesario en {track_dir.parent.name}/{track_dir.name}")
+                return None
+            files.append(track_dir / product_file)
+
+        for product_file in subswath['polarimetry'].get(slc_date, []):
+            files.append(track_dir / product_file)
+
+    return files
+
+
+def stat_paths(paths, workers: int = DEFAULT_STAT_WORKERS) -> Dict[Path, bool]:
+    """Comprueba la existencia de muchos paths en paralelo (stat() es I/O, no CPU)"""
+    paths = list(set(paths))
+    if workers <= 1 or len(paths) < 2:
+        return {path: path.exists() for path in paths}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(paths, executor.map(os.path.exists, paths)))
+
+
+def plan_deletable_dates(
+    repository: InSARRepository,
+    candidates: Dict[int, List[str]],
+    workers: int = DEFAULT_STAT_WORKERS
+) -> Dict[int, Dict[str, bool]]:
+    """
+    Decide en una sola pasada qué SLC están completamente procesados
 
-    # Convertir a lista ordenada
-    slc_dates_sorted = sorted(list(all_slc_dates))
+    Carga cada track una vez, construye índices hash de pares y ficheros,
+    reúne todos los ficheros que habría que comprobar y hace todos los stat()
+    juntos en un pool de hilos. Un SLC es eliminable si TODOS los pares
+    esperados que lo usan (SHORT y LONG, ver expected_pairs_for_date) están en
+    el metadata de TODAS las subswaths del track y existen en disco, igual que
+    sus productos polarimétricos.
 
-    # Calcular TODOS los pares esperados (SHORT y LONG)
-    expected_pairs = {'short': [], 'long': []}
+    Args:
+        repository: Repositorio de productos procesados
+        candidates: {track: [fechas SLC a evaluar]}
+        workers: Hilos para los stat()
 
-    # Pares SHORT: consecutivos (i → i+1)
-    for i in range(len(slc_dates_sorted) - 1):
-        expected_pairs['short'].append((slc_dates_sorted[i], slc_dates_sorted[i + 1]))
+    Returns:
+        {track: {fecha: True si se puede eliminar}}
+    """
+    required = {}
+    for track_number, dates in candidates.items():
+        track_index = load_track_index(repository, track_number)
+        if track_index is not None:
+            track_index['date_index'] = {d: i for i, d in enumerate(track_index['dates'])}
+
+        for slc_date in dates:
+            files = required_product_files(track_index, slc_date) if track_index else None
+            required[(track_number, slc_date)] = files
+
+    exists = stat_paths(
+        (path for files in required.values() if files for path in files),
+        workers=workers
+    )
 
-    # Pares LONG: salto de 1 (i → i+2)
-    for i in range(len(slc_dates_sorted) - 2):
-        expected_pairs['long'].append((slc_dates_sorted[i], slc_dates_sorted[i + 2]))
+    plan = defaultdict(dict)
+    for (track_number, slc_date), files in required.items():
+        missing = [path for path in files or [] if not exists[path]]
+        if missing and logger:
+            # Falta un producto esperado - NO se puede eliminar el SLC
+            logger.debug(f"    ⚠️  Producto esperado no existe: {missing[0]}")
+        plan[track_number][slc_date] = files is not None and not missing
 
-    # Filtrar pares que involucran el SLC a verificar
-    expected_pairs_for_slc = {'short': [], 'long': []}
-    for pair_type in ['short', 'long']:
-        for master, slave in expected_pairs[pair_type]:
-            if slc_date in [master, slave]:
-                expected_pairs_for_slc[pair_type].append((master, slave))
+        if plan[track_number][slc_date] and logger:
+            logger.debug(f"    ✓ {len(files)} productos verificados para {slc_date} (track {track_number:03d})")
 
-    total_expected = len(expected_pairs_for_slc['short']) + len(expected_pairs_for_slc['long'])
+    return dict(plan)
 
-    if total_expected == 0:
-        # Este SLC no debería tener pares (fecha fuera de rango?)
-        return False
 
-    # Verificar que TODOS los pares esperados existan en TODAS las subswaths
-    for track_dir in track_dirs:
-        metadata_file = track_dir / "metadata.json"
-        if not metadata_file.exists():
-            continue
+def verify_insar_products_exist(repo_base_dir: Path, track_number: int, slc_date: str) -> bool:
+    """
+    Verifica que TODOS los pares InSAR esperados que usan este SLC existan en disco.
 
-        try:
-            with open(metadata_file, 'r') as f:
-                metadata = json.load(f)
-
-            # Verificar cada par esperado
-            for pair_type in ['short', 'long']:
-                for master, slave in expected_pairs_for_slc[pair_type]:
-                    # Buscar este par en los productos
-                    pair_found = False
-
-                    for product in metadata.get('insar_products', []):
-                        prod_master = product.get('master_date')
-                        prod_slave = product.get('slave_date')
-                        prod_type = product.get('pair_type', product.get('type', 'short'))
-
-                        if prod_master == master and prod_slave == slave and prod_type == pair_type:
-                            pair_found = True
-                            product_file = track_dir / product['file']
-
-                            if not product_file.exists():
-                                # Falta un producto esperado - NO se puede eliminar el SLC
-                                if logger:
-                                    logger.debug(f"    ⚠️  Par esperado no existe: {product_file}")
-                                    logger.debug(f"    → SLC {slc_date} todavía necesario para {master}→{slave} ({pair_type})")
-                                return False
-                            break
-
-                    if not pair_found:
-                        # Este par esperado no se ha procesado aún - NO eliminar SLC
-                        if logger:
-                            logger.debug(f"    ⚠️  Par esperado no procesado: {master}→{slave} ({pair_type})")
-                            logger.debug(f"    → SLC {slc_date} todavía necesario en {track_dir.parent.name}/{track_dir.name}")
-                        return False
-
-            # Verificar productos polarimétricos
-            for product in metadata.get('polarimetry_products', []):
-                if product.get('date') == slc_date:
-                    product_file = track_dir / product['file']
-                    if not product_file.exists():
-                        if logger:
-                            logger.debug(f"    ⚠️  Producto polarimétrico no existe: {product_file}")
-                        return False
+    Atajo de plan_deletable_dates() para un único SLC.
 
-        except Exception as e:
-            if logger:
-                logger.debug(f"    ✗ Error verificando {track_dir}: {e}")
-            return False
+    Args:
+        repo_base_dir: Directorio base del repositorio
+        track_number: Número de track
+        slc_date: Fecha SLC en formato YYYYMMDD
 
-    # Si llegamos aquí, TODOS los pares esperados existen en TODAS las subswaths
-    if logger:
-        logger.debug(f"    ✓ Todos los pares esperados ({total_expected}) verificados en {len(track_dirs)} subswath(s) para {slc_date}")
-    return True
+    Returns:
+        True si TODOS los pares esperados que usan este SLC existen en todas las subswaths
+    """
+    plan = plan_deletable_dates(get_repository(repo_base_dir), {track_number: [slc_date]})
+    return plan[track_number][slc_date]
 
 
 def identify_deletable_slc(
@@ -306,7 +344,8 @@ def identify_deletable_slc(
     track_dates_used: Dict[int, Set[str]],
     repo_base_dir: Path,
     keep_first: int = 3,
-    keep_last: int = 3
+    keep_last: int = 3,
+    workers: int = DEFAULT_STAT_WORKERS
 ) -> Dict[int, Dict[str, List[Tuple[Path, str]]]]:
     """
     Identifica SLC que pueden ser eliminados de forma segura.
@@ -317,6 +356,7 @@ def identify_deletable_slc(
         repo_base_dir: Directorio base del repositorio
         keep_first: Número de primeros SLC a mantener
         keep_last: Número de últimos SLC a mantener
+        workers: Hilos para comprobar la existencia de productos
 
     Returns:
         Dict[track_number, Dict['keep'|'delete', List[(Path, reason)]]]
@@ -326,6 +366,18 @@ def identify_deletable_slc(
     logger.info(f"\nIdentificando SLC eliminables...")
     logger.info(f"  Regla: mantener {keep_first} primeros + {keep_last} últimos")
 
+    # SLC intermedios usados en productos: se verifican todos de una vez
+    candidates = {}
+    for track_number, slc_dates in track_slc_map.items():
+        dates_used = track_dates_used.get(track_number, set())
+        sorted_dates = sorted(slc_dates.keys())
+        middle = sorted_dates[keep_first:max(len(sorted_dates) - keep_last, keep_first)]
+        candidates[track_number] = [date for date in middle if date in dates_used]
+
+    plan = plan_deletable_dates(get_repository(repo_base_dir),
+                                {t: d for t, d in candidates.items() if d},
+                                workers=workers)
+
     for track_number in sorted(track_slc_map.keys()):
         slc_dates = track_slc_map[track_number]
         dates_used = track_dates_used.get(track_number, set())
@@ -364,7 +416,7 @@ def identify_deletable_slc(
                         keep_list.append((slc_file, "No procesado aún"))
                 else:
                     # Está usado: verificar que productos existan
-                    products_exist = verify_insar_products_exist(repo_base_dir, track_number, date)
+                    products_exist = plan[track_number][date]
 
                     if products_exist:
                         # Productos verificados: puede eliminarse
@@ -561,6 +613,8 @@ Ejemplos:
     parser.add_argument('--repo-dir', type=str,
                        default='data/processed_products',
                        help='Directorio del repositorio (default: data/processed_products)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_STAT_WORKERS,
+                       help=f'Hilos para comprobar productos en disco (default: {DEFAULT_STAT_WORKERS})')
 
     args = parser.parse_args()
 
@@ -598,7 +652,7 @@ Ejemplos:
     track_dates_used = analyze_repository_tracks(repo_base_dir)
 
     # Paso 2: Escanear SLC
-    repository = InSARRepository(repo_base_dir=repo_base_dir)
+    repository = get_repository(repo_base_dir)
     track_slc_map = scan_slc_files(slc_dir, repository)
 
     # Paso 3: Identificar eliminables
@@ -607,7 +661,8 @@ Ejemplos:
         track_dates_used,
         repo_base_dir,
         keep_first=args.keep_first,
-        keep_last=args.keep_last
+        keep_last=args.keep_last,
+        workers=args.workers
     )
 
     # Paso 4: Generar reporte
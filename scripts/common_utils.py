@@ -11,6 +11,7 @@ Este módulo proporciona utilidades comunes usadas en todo el proyecto:
 - Validación de archivos
 """
 
+import json
 import os
 import subprocess
 from datetime import datetime
@@ -21,6 +22,9 @@ SENTINEL1_DATE_FORMAT = '%Y%m%dT%H%M%S'
 ISO_DATE_FORMAT = '%Y-%m-%d'
 ISO_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
 
+# Sidecar escrito dentro del .SAFE cuando solo se extrajeron algunos subswaths/polarizaciones
+PARTIAL_EXTRACTION_SIDECAR = 'partial_extraction.json'
+
 def find_gpt():
     """
     Encuentra el ejecutable GPT de SNAP
@@ -372,3 +376,59 @@ def get_snap_orbits_dir():
 
 
 
+
+
+def load_partial_extraction_info(safe_dir):
+    """
+    Lee el sidecar de extracción parcial de un producto .SAFE
+
+    Args:
+        safe_dir: Directorio .SAFE
+
+    Returns:
+        dict: Contenido del sidecar (subswaths, polarisations, omitted_members...),
+              None si el producto se extrajo completo
+    """
+    sidecar = Path(safe_dir) / PARTIAL_EXTRACTION_SIDECAR
+    if not sidecar.exists():
+        return None
+
+    try:
+        with open(sidecar, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def partial_extraction_covers(safe_dir, subswaths=None, polarisations=None):
+    """
+    Indica si un .SAFE extraído contiene los subswaths/polarizaciones pedidos
+
+    Args:
+        safe_dir: Directorio .SAFE
+        subswaths: Lista de subswaths requeridos (None = producto completo)
+        polarisations: Lista de polarizaciones requeridas (None = todas)
+
+    Returns:
+        bool: True si el producto está completo o la extracción parcial los incluye
+    """
+    info = load_partial_extraction_info(safe_dir)
+    if info is None:
+        return True
+
+    extracted_swaths = info.get('subswaths')
+    extracted_pols = info.get('polarisations')
+
+    if extracted_swaths:
+        if not subswaths:
+            return False
+        if not {s.upper() for s in subswaths} <= {s.upper() for s in extracted_swaths}:
+            return False
+
+    if extracted_pols:
+        if not polarisations:
+            return False
+        if not {p.upper() for p in polarisations} <= {p.upper() for p in extracted_pols}:
+            return False
+
+    return True
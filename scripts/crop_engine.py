@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Motor de recorte al AOI por ventanas para productos BEAM-DIMAP
+
+Sustituye el patrón "os.walk + rasterio.mask banda a banda" de los scripts
+de recorte (InSAR, polarimetría, batch por BD):
+
+- Las bandas del producto se localizan con un único listado de .data/*.img
+- La ventana del AOI se calcula UNA vez por rejilla (crs, transform, tamaño)
+  y se reutiliza para todas las bandas y productos que la comparten
+- Solo se leen las filas/bloques que intersectan la ventana
+- Todas las bandas pedidas van a un único COG multibanda teselado
+- Los productos cuya rejilla no intersecta el AOI se descartan sin leer datos
+- Varios productos en paralelo con un pool de procesos
+- Fan-out multi-AOI: cada producto se lee una vez y de cada franja en
+  memoria se escriben los recortes de todos los AOI que lo intersectan
+
+Salida: {output_dir}/{producto}{suffix}.tif con las bandas en el orden de
+band_patterns (p.ej. coherencia como banda 1 para los interferogramas).
+
+Uso:
+    python scripts/crop_engine.py <aoi.wkt|WKT> <output_dir> <producto.dim>... \\
+        [--bands coh] [--workers 4]
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import rasterio
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.warp import transform_geom
+from rasterio.windows import Window, WindowError
+from shapely import wkt
+from shapely.geometry import mapping
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from s2_indices import write_cog
+
+logger = logging.getLogger(__name__)
+
+# Bandas por tipo de producto (orden = orden de bandas en el COG)
+INSAR_BANDS = ('coh',)
+POLARIMETRY_BANDS = ('entropy', 'alpha', 'anisotropy')
+
+DEFAULT_CROP_WORKERS = min(4, os.cpu_count() or 1)
+
+# Si vale '1', process_insar_series no recorta: lo hace el lote multi-AOI
+# (run_batch_aoi_workflow.py) con crop_products_multi_aoi
+DEFER_INSAR_CROP_ENV = 'GOSHAWK_DEFER_INSAR_CROP'
+
+# Filas por franja de lectura en crop_product_multi
+DEFAULT_STRIP_ROWS = 512
+
+# CRS de los WKT de AOI (config.txt, BD)
+AOI_CRS = 'EPSG:4326'
+
+# Caché por proceso: geometrías del AOI por CRS y ventana por rejilla
+_AOI_GEOMETRY_CACHE = {}
+_WINDOW_CACHE = {}
+
+
+def product_paths(product_path):
+    """
+    Nombre base y directorio .data de un producto (.dim o .data)
+
+    Returns:
+        tuple: (basename, data_dir)
+    """
+    product_path = str(product_path).rstrip(os.sep)
+    if product_path.endswith('.dim'):
+        return os.path.basename(product_path)[:-4], product_path[:-4] + '.data'
+    if product_path.endswith('.data'):
+        return os.path.basename(product_path)[:-5], product_path
+    return os.path.basename(product_path), product_path
+
+
+def find_band_files(data_dir, band_patterns):
+    """
+    Localiza las bandas .img de un producto con un único listado
+
+    Cada fichero se asigna al primer patrón (sin mayúsculas) que contiene y
+    que aún no tiene banda; cada patrón se queda con el primer fichero.
+
+    Returns:
+        dict: patrón → ruta .img (solo los patrones encontrados, en orden)
+    """
+    images = sorted(glob.glob(os.path.join(glob.escape(data_dir), '*.img')))
+    if not images:
+        # Algunos productos anidan las bandas un nivel más abajo
+        images = sorted(glob.glob(os.path.join(glob.escape(data_dir), '*', '*.img')))
+
+    found = {}
+    for image in images:
+        name = os.path.basename(image).lower()
+        for pattern in band_patterns:
+            if pattern not in found and pattern.lower() in name:
+                found[pattern] = image
+                break
+
+    return {pattern: found[pattern] for pattern in band_patterns if pattern in found}
+
+
+def aoi_geometries(aoi_wkt, crs):
+    """Geometría del AOI (WKT lon/lat) en el CRS de la rejilla, cacheada"""
+    key = (aoi_wkt, crs.to_string())
+    if key not in _AOI_GEOMETRY_CACHE:
+        geometry = mapping(wkt.loads(aoi_wkt))
+        if crs.to_epsg() != 4326:
+            geometry = transform_geom(AOI_CRS, crs, geometry)
+        _AOI_GEOMETRY_CACHE[key] = [geometry]
+    return _AOI_GEOMETRY_CACHE[key]
+
+
+def grid_key(src):
+    """Identificador de la rejilla de un dataset"""
+    crs = src.crs.to_string() if src.crs else None
+    return (crs, tuple(src.transform)[:6], src.width, src.height)
+
+
+def aoi_window(src, aoi_wkt):
+    """
+    Ventana del AOI en la rejilla de src, cacheada por rejilla
+
+    Equivale a rasterio.mask.mask(crop=True, all_touched=True): ventana que
+    cubre los bounds del AOI y máscara de los píxeles tocados por el polígono.
+
+    Returns:
+        tuple: (window, transform, outside) o None si el AOI no intersecta;
+               outside es True fuera del polígono
+    """
+    key = (aoi_wkt, grid_key(src))
+    if key not in _WINDOW_CACHE:
+        geoms = aoi_geometries(aoi_wkt, src.crs)
+        try:
+            window = geometry_window(src, geoms)
+        except WindowError:
+            _WINDOW_CACHE[key] = None
+        else:
+            transform = src.window_transform(window)
+            outside = geometry_mask(
+                geoms,
+                out_shape=(int(window.height), int(window.width)),
+                transform=transform,
+                all_touched=True
+            )
+            _WINDOW_CACHE[key] = (window, transform, outside)
+    return _WINDOW_CACHE[key]
+
+
+def _crop_result(product, aoi_name, output_path, status=None, error=None):
+    result = {
+        'product': product,
+        'aoi': aoi_name,
+        'output': output_path,
+        'status': status,
+        'bands': [],
+        'shape': None,
+        'source_shape': None
+    }
+    if error is not None:
+        result['error'] = error
+    return result
+
+
+def crop_product_multi(product_path, targets, band_patterns=INSAR_BANDS, blocksize=512,
+                       overwrite=False, strip_rows=DEFAULT_STRIP_ROWS):
+    """
+    Recorta un producto BEAM-DIMAP a varios AOI leyéndolo una sola vez
+
+    Se recorre la unión de las ventanas de los AOI por franjas de filas: cada
+    franja se lee una vez por banda (solo las columnas de los AOI activos en
+    ella) y de ese bloque en memoria se rellenan todos los recortes. Con un
+    único AOI equivale a leer su ventana.
+
+    Args:
+        product_path: .dim o .data del producto
+        targets: Lista de (aoi_name, aoi_wkt, output_path)
+        band_patterns: Patrones de banda, en el orden de salida
+        blocksize: Tamaño de tesela del COG
+        overwrite: Rehacer aunque exista la salida
+        strip_rows: Filas por franja de lectura
+
+    Returns:
+        list: Un dict por target (ver crop_product), con la clave 'aoi'
+    """
+    basename, data_dir = product_paths(product_path)
+    results = [_crop_result(basename, aoi_name, output_path) for aoi_name, _, output_path in targets]
+
+    pending = []
+    for result, (_, aoi_wkt, output_path) in zip(results, targets):
+        if os.path.exists(output_path) and not overwrite:
+            result['status'] = 'exists'
+        else:
+            pending.append((result, aoi_wkt))
+    if not pending:
+        return results
+
+    band_files = find_band_files(data_dir, band_patterns)
+    if not band_files:
+        for result, _ in pending:
+            result['status'] = 'no_bands'
+        return results
+
+    sources = [rasterio.open(path) for path in band_files.values()]
+    try:
+        reference = sources[0]
+        status = None
+        if reference.crs is None:
+            status = 'no_crs'
+        elif any(grid_key(src) != grid_key(reference) for src in sources[1:]):
+            status = 'grid_mismatch'
+        if status:
+            for result, _ in pending:
+                result['status'] = status
+            return results
+
+        # Ventana de cada AOI en la rejilla (los que no intersectan no se leen)
+        crops = []
+        for result, aoi_wkt in pending:
+            result['source_shape'] = reference.shape
+            crop = aoi_window(reference, aoi_wkt)
+            if crop is None:
+                result['status'] = 'no_overlap'
+                continue
+            window, transform, outside = crop
+            crops.append({
+                'result': result,
+                'row': int(window.row_off),
+                'col': int(window.col_off),
+                'height': int(window.height),
+                'width': int(window.width),
+                'transform': transform,
+                'outside': outside
+            })
+        if not crops:
+            return results
+
+        dtype = np.result_type(*[src.dtypes[0] for src in sources])
+        nodata = reference.nodata
+        fill = nodata if nodata is not None else 0
+        for crop in crops:
+            crop['stack'] = np.empty((len(sources), crop['height'], crop['width']), dtype=dtype)
+
+        # Franjas alineadas con los bloques nativos del producto
+        block_rows = reference.block_shapes[0][0]
+        strip_rows = max(block_rows, (strip_rows // block_rows) * block_rows)
+        row_start = min(crop['row'] for crop in crops)
+        row_stop = max(crop['row'] + crop['height'] for crop in crops)
+
+        for strip_start in range(row_start, row_stop, strip_rows):
+            strip_stop = min(strip_start + strip_rows, row_stop)
+            active = [crop for crop in crops
+                      if crop['row'] < strip_stop and crop['row'] + crop['height'] > strip_start]
+            if not active:
+                continue
+            col_start = min(crop['col'] for crop in active)
+            col_stop = max(crop['col'] + crop['width'] for crop in active)
+            strip = Window(col_start, strip_start, col_stop - col_start, strip_stop - strip_start)
+
+            for i, src in enumerate(sources):
+                block = src.read(1, window=strip)
+                for crop in active:
+                    r0 = max(strip_start, crop['row'])
+                    r1 = min(strip_stop, crop['row'] + crop['height'])
+                    c0 = crop['col'] - col_start
+                    crop['stack'][i, r0 - crop['row']:r1 - crop['row']] = \
+                        block[r0 - strip_start:r1 - strip_start, c0:c0 + crop['width']]
+
+        for crop in crops:
+            result = crop['result']
+            stack = crop.pop('stack')
+            stack[:, crop['outside']] = fill
+            try:
+                write_cog(
+                    stack, result['output'], crop['transform'], reference.crs,
+                    descriptions=list(band_files),
+                    tags={'source_product': basename},
+                    nodata=nodata,
+                    blocksize=blocksize
+                )
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = str(e)
+                continue
+            result['status'] = 'cropped'
+            result['bands'] = list(band_files)
+            result['shape'] = stack.shape[1:]
+    finally:
+        for src in sources:
+            src.close()
+
+    return results
+
+
+def crop_product(product_path, aoi_wkt, output_path, band_patterns=INSAR_BANDS,
+                 blocksize=512, overwrite=False):
+    """
+    Recorta un producto BEAM-DIMAP al AOI en un COG multibanda
+
+    Args:
+        product_path: .dim o .data del producto
+        aoi_wkt: WKT del AOI (EPSG:4326)
+        output_path: GeoTIFF de salida
+        band_patterns: Patrones de banda, en el orden de salida
+        blocksize: Tamaño de tesela del COG
+        overwrite: Rehacer aunque exista la salida
+
+    Returns:
+        dict: product, output, status ('cropped', 'exists', 'no_bands',
+              'no_crs', 'no_overlap', 'grid_mismatch'), bands, shape, source_shape
+    """
+    return crop_product_multi(product_path, [(None, aoi_wkt, output_path)], band_patterns,
+                              blocksize=blocksize, overwrite=overwrite)[0]
+
+
+def _crop_task(task):
+    """Tarea del pool: nunca lanza, los errores vuelven en el resultado"""
+    product_path, targets, band_patterns, blocksize, overwrite = task
+    try:
+        return crop_product_multi(product_path, targets, band_patterns,
+                                  blocksize=blocksize, overwrite=overwrite)
+    except Exception as e:
+        basename = product_paths(product_path)[0]
+        return [_crop_result(basename, aoi_name, output_path, 'failed', str(e))
+                for aoi_name, _, output_path in targets]
+
+
+def log_crop_result(result, log=None):
+    """Informa del resultado de crop_product en el logger indicado"""
+    log = log or logger
+    name = result['product']
+    if result.get('aoi'):
+        name = f"{name} → {result['aoi']}"
+    status = result['status']
+    if status == 'cropped':
+        rows, cols = result['source_shape']
+        out_rows, out_cols = result['shape']
+        log.info(f"  ✓ Recortado: {name} ({rows}x{cols} → {out_rows}x{out_cols}, "
+                    f"bandas: {', '.join(result['bands'])})")
+    elif status == 'exists':
+        log.info(f"  ✓ Ya recortado: {name}")
+    elif status == 'no_overlap':
+        log.info(f"  ⏭️  Sin intersección con el AOI: {name}")
+    elif status == 'no_bands':
+        log.warning(f"  ⚠️  No se encontraron bandas en {name}")
+    elif status == 'no_crs':
+        log.warning(f"  ⚠️  Producto sin CRS: {name}")
+    elif status == 'grid_mismatch':
+        log.warning(f"  ⚠️  Bandas con rejillas distintas: {name}")
+    else:
+        log.error(f"  ✗ Error recortando {name}: {result.get('error')}")
+
+
+def crop_products(products, aoi_wkt, output_dir, band_patterns=INSAR_BANDS, suffix='_cropped',
+                  workers=DEFAULT_CROP_WORKERS, blocksize=512, overwrite=False, log=None):
+    """
+    Recorta una lista de productos al AOI en paralelo
+
+    Args:
+        products: Rutas .dim/.data
+        aoi_wkt: WKT del AOI (EPSG:4326)
+        output_dir: Directorio de salida ({producto}{suffix}.tif)
+        band_patterns: Patrones de banda, en el orden de salida
+        suffix: Sufijo del fichero de salida
+        workers: Procesos (1 = secuencial, sin pool)
+        blocksize: Tamaño de tesela del COG
+        overwrite: Rehacer aunque exista la salida
+        log: Logger para el progreso (default: el del módulo)
+
+    Returns:
+        dict: cropped, skipped (ya existían), no_overlap, failed, outputs, results
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = []
+    for product in products:
+        basename, _ = product_paths(product)
+        output_path = os.path.join(output_dir, f"{basename}{suffix}.tif")
+        tasks.append((str(product), [(None, aoi_wkt, output_path)], tuple(band_patterns), blocksize, overwrite))
+
+    return summarize_crop_results(_run_crop_tasks(tasks, workers, log))
+
+
+def _run_crop_tasks(tasks, workers, log):
+    """Ejecuta las tareas de recorte (en un pool si workers > 1) y aplana los resultados"""
+    results = []
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            futures = [executor.submit(_crop_task, task) for task in tasks]
+            for future in as_completed(futures):
+                for result in future.result():
+                    log_crop_result(result, log)
+                    results.append(result)
+    else:
+        for task in tasks:
+            for result in _crop_task(task):
+                log_crop_result(result, log)
+                results.append(result)
+    return results
+
+
+def summarize_crop_results(results):
+    """Resumen de una lista de resultados de crop_product/crop_product_multi"""
+    return {
+        'cropped': sum(1 for r in results if r['status'] == 'cropped'),
+        'skipped': sum(1 for r in results if r['status'] == 'exists'),
+        'no_overlap': sum(1 for r in results if r['status'] == 'no_overlap'),
+        'failed': sum(1 for r in results if r['status'] not in ('cropped', 'exists', 'no_overlap')),
+        'outputs': sorted(r['output'] for r in results if r['status'] in ('cropped', 'exists')),
+        'results': results
+    }
+
+
+def build_product_targets(aoi_products, suffix='_cropped'):
+    """
+    Agrupa los AOI por los productos que necesitan recortar
+
+    Los productos se identifican por su ruta real, así los enlaces simbólicos
+    de distintos workspaces al mismo interferograma del repositorio se leen
+    una sola vez.
+
+    Args:
+        aoi_products: dict aoi_name → (aoi_wkt, output_dir, [productos .dim])
+        suffix: Sufijo del fichero de salida
+
+    Returns:
+        dict: producto (ruta real) → lista de (aoi_name, aoi_wkt, output_path)
+    """
+    product_targets = {}
+    for aoi_name, (aoi_wkt, output_dir, products) in aoi_products.items():
+        for product in products:
+            basename, _ = product_paths(product)
+            output_path = os.path.join(output_dir, f"{basename}{suffix}.tif")
+            product_targets.setdefault(os.path.realpath(product), []).append(
+                (aoi_name, aoi_wkt, output_path)
+            )
+    return product_targets
+
+
+def crop_products_multi_aoi(product_targets, band_patterns=INSAR_BANDS, workers=DEFAULT_CROP_WORKERS,
+                            blocksize=512, overwrite=False, log=None):
+    """
+    Fan-out: recorta cada producto para todos los AOI que lo usan en una lectura
+
+    El coste de E/S escala con el número de productos, no con productos x AOI.
+
+    Args:
+        product_targets: dict producto → lista de (aoi_name, aoi_wkt, output_path)
+                         (ver build_product_targets)
+        band_patterns: Patrones de banda, en el orden de salida
+        workers: Procesos (1 = secuencial, sin pool)
+        blocksize: Tamaño de tesela del COG
+        overwrite: Rehacer aunque exista la salida
+        log: Logger para el progreso (default: el del módulo)
+
+    Returns:
+        dict: products, totales (como crop_products) y by_aoi (resumen por AOI)
+    """
+    tasks = []
+    for product, targets in product_targets.items():
+        for _, _, output_path in targets:
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        tasks.append((str(product), list(targets), tuple(band_patterns), blocksize, overwrite))
+
+    results = _run_crop_tasks(tasks, workers, log)
+
+    by_aoi = {}
+    for result in results:
+        by_aoi.setdefault(result['aoi'], []).append(result)
+
+    summary = summarize_crop_results(results)
+    summary['products'] = len(tasks)
+    summary['by_aoi'] = {aoi_name: summarize_crop_results(aoi_results)
+                         for aoi_name, aoi_results in by_aoi.items()}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recorte por ventanas de productos BEAM-DIMAP al AOI')
+    parser.add_argument('aoi', help='WKT del AOI o fichero que lo contiene')
+    parser.add_argument('output_dir', help='Directorio de salida')
+    parser.add_argument('products', nargs='+', help='Productos .dim')
+    parser.add_argument('--bands', nargs='+', default=list(INSAR_BANDS),
+                        help='Patrones de banda, en orden de salida (default: coh)')
+    parser.add_argument('--suffix', default='_cropped', help='Sufijo de salida (default: _cropped)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_CROP_WORKERS,
+                        help=f'Procesos en paralelo (default: {DEFAULT_CROP_WORKERS})')
+    parser.add_argument('--overwrite', action='store_true', help='Rehacer recortes existentes')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    aoi_wkt = args.aoi
+    if os.path.isfile(aoi_wkt):
+        with open(aoi_wkt) as f:
+            aoi_wkt = f.read().strip()
+
+    summary = crop_products(args.products, aoi_wkt, args.output_dir, args.bands,
+                            suffix=args.suffix, workers=args.workers, overwrite=args.overwrite)
+    logger.info(f"\nRecortados: {summary['cropped']}, existentes: {summary['skipped']}, "
+                f"sin intersección: {summary['no_overlap']}, fallidos: {summary['failed']}")
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,22 +3,23 @@
 Script: crop_insar_to_aoi.py
 Descripción: Recorta productos InSAR al AOI manteniendo resolución nativa
              Optimizado para detección de fugas en tuberías de distribución de agua
-Uso: python scripts/crop_insar_to_aoi.py [workspace_dir]
+             Recorte por ventanas con crop_engine (coherencia como banda 1)
+Uso: python scripts/crop_insar_to_aoi.py [workspace_dir] [--workers N] [--bands coh ...]
 """
 
 import os
 import sys
 import glob
+import argparse
 import logging
-import rasterio
-from rasterio.mask import mask
-from shapely import wkt
-from shapely.geometry import mapping
 from pathlib import Path
 
 # Agregar directorio scripts al path si es necesario
 sys.path.insert(0, str(Path(__file__).parent))
 from logging_utils import LoggerConfig
+from crop_engine import (
+    INSAR_BANDS, DEFAULT_CROP_WORKERS, crop_product, crop_products, log_crop_result
+)
 
 # Logger se configurará en main() después de conocer el workspace
 logger = None
@@ -41,88 +42,57 @@ def load_config(config_file="config.txt"):
     return config
 
 
-def crop_insar_product(dim_file, aoi_wkt, output_dir):
+def crop_insar_product(dim_file, aoi_wkt, output_dir, band_patterns=INSAR_BANDS):
     """
     Recorta un producto InSAR .dim al AOI
-    
+
+    Lee solo la ventana del AOI de cada banda y escribe un COG con las bandas
+    pedidas (coherencia como banda 1).
+
     Args:
         dim_file: Ruta al archivo .dim
         aoi_wkt: WKT string del AOI
         output_dir: Directorio de salida
-        
+        band_patterns: Patrones de banda a incluir, en orden
+
     Returns:
         str: Ruta al producto recortado o None si falla
     """
+    basename = os.path.basename(dim_file).replace('.dim', '')
+    output_file = os.path.join(output_dir, f"{basename}_cropped.tif")
+
     try:
-        basename = os.path.basename(dim_file).replace('.dim', '')
-        output_file = os.path.join(output_dir, f"{basename}_cropped.tif")
-        
-        # Verificar si ya está procesado
-        if os.path.exists(output_file):
-            logger.info(f"  ✓ Ya recortado: {basename}")
-            return output_file
-        
-        data_dir = dim_file.replace('.dim', '.data')
-        
-        # Buscar banda de coherencia
-        coh_file = None
-        for root, dirs, files in os.walk(data_dir):
-            for f in files:
-                if 'coh' in f.lower() and f.endswith('.img'):
-                    coh_file = os.path.join(root, f)
-                    break
-            if coh_file:
-                break
-        
-        if not coh_file:
-            logger.warning(f"  No se encontró banda de coherencia en {basename}")
-            return None
-        
-        # Cargar AOI como geometría
-        aoi_geom = wkt.loads(aoi_wkt)
-        geoms = [mapping(aoi_geom)]
-        
-        # Abrir el raster y hacer crop
-        with rasterio.open(coh_file) as src:
-            if src.crs is None:
-                logger.warning(f"  Producto sin CRS: {basename}")
-                return None
-            
-            # Hacer el crop
-            out_image, out_transform = mask(src, geoms, crop=True, all_touched=True)
-            out_meta = src.meta.copy()
-            
-            # Actualizar metadata (mantener resolución nativa para detección de fugas)
-            out_meta.update({
-                "driver": "GTiff",
-                "height": out_image.shape[1],
-                "width": out_image.shape[2],
-                "transform": out_transform,
-                "compress": "lzw",
-                "tiled": True,
-                "blockxsize": 512,
-                "blockysize": 512
-            })
-            
-            # Guardar el producto recortado
-            output_file = os.path.join(output_dir, f"{basename}_cropped.tif")
-            with rasterio.open(output_file, "w", **out_meta) as dest:
-                dest.write(out_image)
-            
-            logger.info(f"  ✓ Recortado: {basename} ({src.shape[0]}x{src.shape[1]} → {out_image.shape[1]}x{out_image.shape[2]})")
-            return output_file
-            
+        result = crop_product(dim_file, aoi_wkt, output_file, band_patterns)
     except Exception as e:
         logger.error(f"  ✗ Error recortando {basename}: {e}")
         return None
 
+    log_crop_result(result, logger)
+    return output_file if result['status'] in ('cropped', 'exists') else None
+
+
+def find_insar_products(workspace_dir):
+    """Productos Ifg_*.dim de insar/short/ e insar/long/ del workspace, ordenados"""
+    insar_products = []
+    for subdir in ['short', 'long']:
+        subdir_path = os.path.join(workspace_dir, 'insar', subdir)
+        if os.path.isdir(subdir_path):
+            insar_products.extend(glob.glob(os.path.join(subdir_path, 'Ifg_*.dim')))
+    return sorted(insar_products)
+
 
 def main():
+    parser = argparse.ArgumentParser(description='Recorta productos InSAR al AOI')
+    parser.add_argument('workspace_dir', nargs='?', default=os.getcwd(),
+                        help='Directorio de trabajo (default: directorio actual)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_CROP_WORKERS,
+                        help=f'Productos en paralelo (default: {DEFAULT_CROP_WORKERS})')
+    parser.add_argument('--bands', nargs='+', default=list(INSAR_BANDS),
+                        help='Patrones de banda a incluir, coherencia primero (default: coh)')
+    args = parser.parse_args()
+
     # Determinar directorio de trabajo
-    if len(sys.argv) > 1:
-        workspace_dir = sys.argv[1]
-    else:
-        workspace_dir = os.getcwd()
+    workspace_dir = args.workspace_dir
 
     # Configurar logger con workspace
     global logger
@@ -153,15 +123,7 @@ def main():
         logger.error(f"No existe directorio: {insar_base_dir}")
         return 1
 
-    # Buscar en ambos subdirectorios
-    insar_products = []
-    for subdir in ['short', 'long']:
-        subdir_path = os.path.join(insar_base_dir, subdir)
-        if os.path.isdir(subdir_path):
-            products = glob.glob(os.path.join(subdir_path, 'Ifg_*.dim'))
-            insar_products.extend(products)
-
-    insar_products = sorted(insar_products)
+    insar_products = find_insar_products(workspace_dir)
 
     if not insar_products:
         logger.warning(f"No se encontraron productos InSAR en {insar_base_dir}/{{short,long}}/")
@@ -173,24 +135,23 @@ def main():
     output_dir = os.path.join(workspace_dir, 'insar/cropped')
     os.makedirs(output_dir, exist_ok=True)
     
-    # Procesar cada producto
-    cropped = 0
-    failed = 0
-    
-    for i, dim_file in enumerate(insar_products, 1):
-        logger.info(f"\n[{i}/{len(insar_products)}] {os.path.basename(dim_file)}")
-        result = crop_insar_product(dim_file, aoi_wkt, output_dir)
-        if result:
-            cropped += 1
-        else:
-            failed += 1
-    
+    # Recortar en paralelo (los productos sin intersección con el AOI se omiten)
+    summary = crop_products(
+        insar_products, aoi_wkt, output_dir,
+        band_patterns=args.bands,
+        workers=args.workers,
+        log=logger
+    )
+    cropped = summary['cropped'] + summary['skipped']
+    failed = summary['failed']
+
     # Resumen
     logger.info("")
     logger.info("=" * 80)
     logger.info("RESUMEN")
     logger.info("=" * 80)
     logger.info(f"Productos recortados: {cropped}/{len(insar_products)}")
+    logger.info(f"Sin intersección con el AOI: {summary['no_overlap']}")
     logger.info(f"Fallidos: {failed}")
     logger.info(f"Salida: {output_dir}")
     logger.info("")
@@ -2,22 +2,23 @@
 """
 Script: crop_polarimetry_to_aoi.py
 Descripción: Recorta productos polarimétricos (H/A/Alpha) al AOI manteniendo resolución nativa
-Uso: python scripts/crop_polarimetry_to_aoi.py [workspace_dir]
+             Salida: un COG por producto con Entropy/Alpha/Anisotropy como bandas 1-3
+Uso: python scripts/crop_polarimetry_to_aoi.py [workspace_dir] [--workers N]
 """
 
 import os
 import sys
 import glob
+import argparse
 import logging
-import rasterio
-from rasterio.mask import mask
-from shapely import wkt
-from shapely.geometry import mapping
 from pathlib import Path
 
 # Agregar directorio scripts al path si es necesario
 sys.path.insert(0, str(Path(__file__).parent))
 from logging_utils import LoggerConfig
+from crop_engine import (
+    POLARIMETRY_BANDS, DEFAULT_CROP_WORKERS, crop_product, crop_products, log_crop_result
+)
 
 # Logger se configurará en main() después de conocer el workspace
 logger = None
@@ -45,10 +46,12 @@ def crop_polarimetric_product(dim_file, aoi_wkt, output_dir):
     """
     Recorta un producto polarimétrico .dim al AOI
 
-    Extrae las bandas principales de H-Alpha decomposition:
-    - Entropy
-    - Alpha
-    - Anisotropy
+    Extrae las bandas principales de H-Alpha decomposition en un único COG
+    multibanda ({producto}_cropped.tif), leyendo solo la ventana del AOI:
+    - Banda 1: Entropy
+    - Banda 2: Alpha
+    - Banda 3: Anisotropy
+    (se omiten las que no existan en el producto; ver descripciones de banda)
 
     Args:
         dim_file: Ruta al archivo .dim
@@ -58,113 +61,31 @@ def crop_polarimetric_product(dim_file, aoi_wkt, output_dir):
     Returns:
         str: Ruta al producto recortado o None si falla
     """
-    try:
-        basename = os.path.basename(dim_file).replace('.dim', '')
-
-        data_dir = dim_file.replace('.dim', '.data')
-
-        if not os.path.exists(data_dir):
-            logger.warning(f"  No existe directorio .data: {basename}")
-            return None
-
-        # Buscar bandas principales de H-Alpha
-        bands_to_crop = {
-            'entropy': None,
-            'alpha': None,
-            'anisotropy': None
-        }
-
-        for root, dirs, files in os.walk(data_dir):
-            for f in files:
-                if not f.endswith('.img'):
-                    continue
-
-                f_lower = f.lower()
-                if 'entropy' in f_lower and bands_to_crop['entropy'] is None:
-                    bands_to_crop['entropy'] = os.path.join(root, f)
-                elif 'alpha' in f_lower and bands_to_crop['alpha'] is None:
-                    bands_to_crop['alpha'] = os.path.join(root, f)
-                elif 'anisotropy' in f_lower and bands_to_crop['anisotropy'] is None:
-                    bands_to_crop['anisotropy'] = os.path.join(root, f)
-
-        # Verificar que se encontró al menos una banda
-        found_bands = [k for k, v in bands_to_crop.items() if v is not None]
-
-        if not found_bands:
-            logger.warning(f"  No se encontraron bandas polariméricas en {basename}")
-            return None
-
-        logger.info(f"  Bandas encontradas: {', '.join(found_bands)}")
-
-        # Cargar AOI como geometría
-        aoi_geom = wkt.loads(aoi_wkt)
-        geoms = [mapping(aoi_geom)]
-
-        # Recortar cada banda encontrada
-        cropped_files = []
-
-        for band_name, band_file in bands_to_crop.items():
-            if band_file is None:
-                continue
-
-            output_file = os.path.join(output_dir, f"{basename}_{band_name}_cropped.tif")
-
-            # Verificar si ya está procesado
-            if os.path.exists(output_file):
-                logger.debug(f"    ✓ Ya recortado: {band_name}")
-                cropped_files.append(output_file)
-                continue
-
-            # Abrir el raster y hacer crop
-            with rasterio.open(band_file) as src:
-                if src.crs is None:
-                    logger.warning(f"    Banda sin CRS: {band_name}")
-                    continue
-
-                # Hacer el crop
-                out_image, out_transform = mask(src, geoms, crop=True, all_touched=True)
-                out_meta = src.meta.copy()
-
-                # Actualizar metadata
-                out_meta.update({
-                    "driver": "GTiff",
-                    "height": out_image.shape[1],
-                    "width": out_image.shape[2],
-                    "transform": out_transform,
-                    "compress": "lzw",
-                    "tiled": True,
-                    "blockxsize": 256,
-                    "blockysize": 256
-                })
-
-                # Guardar
-                with rasterio.open(output_file, "w", **out_meta) as dest:
-                    dest.write(out_image)
-
-                logger.debug(f"    ✓ Recortado: {band_name}")
-                cropped_files.append(output_file)
-
-        if cropped_files:
-            logger.info(f"  ✓ {len(cropped_files)} bandas recortadas: {basename}")
-            return cropped_files[0]  # Retornar primera banda como referencia
-        else:
-            return None
+    basename = os.path.basename(dim_file).replace('.dim', '')
+    output_file = os.path.join(output_dir, f"{basename}_cropped.tif")
 
+    try:
+        result = crop_product(dim_file, aoi_wkt, output_file, POLARIMETRY_BANDS, blocksize=256)
     except Exception as e:
-        logger.error(f"  ✗ Error recortando {os.path.basename(dim_file)}: {e}")
+        logger.error(f"  ✗ Error recortando {basename}: {e}")
         return None
 
+    log_crop_result(result, logger)
+    return output_file if result['status'] in ('cropped', 'exists') else None
+
 
 def main():
     global logger
 
-    # Obtener directorio de workspace
-    if len(sys.argv) > 1:
-        workspace_dir = sys.argv[1]
-    else:
-        workspace_dir = os.getcwd()
+    parser = argparse.ArgumentParser(description='Recorta productos polarimétricos al AOI')
+    parser.add_argument('workspace_dir', nargs='?', default=os.getcwd(),
+                        help='Directorio de trabajo (default: directorio actual)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_CROP_WORKERS,
+                        help=f'Productos en paralelo (default: {DEFAULT_CROP_WORKERS})')
+    args = parser.parse_args()
 
-    workspace_dir = os.path.abspath(workspace_dir)
+    # Obtener directorio de workspace
+    workspace_dir = os.path.abspath(args.workspace_dir)
 
     # Configurar logger
     logger = LoggerConfig.setup_series_logger(
@@ -208,17 +129,16 @@ def main():
     output_dir = os.path.join(workspace_dir, 'polarimetry/cropped')
     os.makedirs(output_dir, exist_ok=True)
 
-    # Procesar cada producto
-    cropped = 0
-    failed = 0
-
-    for i, dim_file in enumerate(polarimetry_products, 1):
-        logger.info(f"\n[{i}/{len(polarimetry_products)}] {os.path.basename(dim_file)}")
-        result = crop_polarimetric_product(dim_file, aoi_wkt, output_dir)
-        if result:
-            cropped += 1
-        else:
-            failed += 1
+    # Recortar en paralelo (los productos sin intersección con el AOI se omiten)
+    summary = crop_products(
+        polarimetry_products, aoi_wkt, output_dir,
+        band_patterns=POLARIMETRY_BANDS,
+        workers=args.workers,
+        blocksize=256,
+        log=logger
+    )
+    cropped = summary['cropped'] + summary['skipped']
+    failed = summary['failed']
 
     # Resumen
     logger.info("")
@@ -226,6 +146,7 @@ def main():
     logger.info("RESUMEN")
     logger.info("=" * 80)
     logger.info(f"Productos recortados: {cropped}/{len(polarimetry_products)}")
+    logger.info(f"Sin intersección con el AOI: {summary['no_overlap']}")
     logger.info(f"Fallidos: {failed}")
     logger.info(f"Salida: {output_dir}")
     logger.info("")
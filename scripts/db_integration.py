@@ -11,6 +11,7 @@ Version: 2.0
 import logging
 import os
 import re
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -26,6 +27,12 @@ except ImportError:
     DB_AVAILABLE = False
     logging.warning("satelit_db not available - database features disabled")
 
+# Granular-table helpers (importable both as scripts.db_integration and db_integration)
+try:
+    from scripts import db_queries
+except ImportError:
+    import db_queries
+
 logger = logging.getLogger(__name__)
 
 
@@ -85,9 +92,104 @@ class GoshawkDBIntegration:
         """
         self.enabled = enabled and DB_AVAILABLE
 
+        # Request-scoped status cache, only active inside status_cache()
+        self._status_cache: Optional[Dict[str, Dict[str, Optional[Dict]]]] = None
+
         if not self.enabled and enabled:
             logger.warning("Database integration requested but not available")
 
+    @contextmanager
+    def status_cache(self):
+        """
+        Memoize SLC/S2 status lookups for the duration of a block.
+
+        Inside the block each scene is read from the database at most once
+        (misses included); update_slc()/update_s2() evict the scene they write.
+        The cache is dropped when the outermost block exits, so statuses never
+        outlive the step that read them.
+
+        Example:
+            with db.status_cache():
+                iw1 = generate_s1_process_queue(db, 'IW1', track, orbit)
+                iw2 = generate_s1_process_queue(db, 'IW2', track, orbit)  # no queries
+        """
+        owner = self._status_cache is None
+        if owner:
+            self._status_cache = {"slc": {}, "s2": {}}
+        try:
+            yield self
+        finally:
+            if owner:
+                self._status_cache = None
+
+    def _cached_status_many(self, kind: str, scene_ids, fetch) -> Dict[str, Dict]:
+        """Look up scene_ids in the status cache and fetch the rest with one query."""
+        if not self.enabled:
+            return {}
+
+        scene_ids = list(dict.fromkeys(scene_ids))
+        if self._status_cache is None:
+            return fetch(scene_ids) if scene_ids else {}
+
+        cache = self._status_cache[kind]
+        missing = [scene_id for scene_id in scene_ids if scene_id not in cache]
+        if missing:
+            fetched = fetch(missing)
+            for scene_id in missing:
+                cache[scene_id] = fetched.get(scene_id)
+
+        return {
+            scene_id: cache[scene_id]
+            for scene_id in scene_ids
+            if cache[scene_id] is not None
+        }
+
+    def _evict_status(self, kind: str, scene_id: str):
+        if self._status_cache is not None:
+            self._status_cache[kind].pop(scene_id, None)
+
+    def get_slc_status_many(self, scene_ids) -> Dict[str, Dict]:
+        """
+        Get the status of many SLC products (see db_queries.get_slc_status_many).
+
+        Returns:
+            {scene_id: status} for the scenes present in the database
+        """
+        return self._cached_status_many("slc", scene_ids, db_queries.get_slc_status_many)
+
+    def get_slc_status(self, scene_id: str) -> Optional[Dict]:
+        """Get the status of one SLC product (None if not in the database)."""
+        return self.get_slc_status_many([scene_id]).get(scene_id)
+
+    def get_s2_status_many(self, scene_ids) -> Dict[str, Dict]:
+        """
+        Get the status of many Sentinel-2 products (see db_queries.get_s2_status_many).
+
+        Returns:
+            {scene_id: status} for the scenes present in the database
+        """
+        return self._cached_status_many("s2", scene_ids, db_queries.get_s2_status_many)
+
+    def get_s2_status(self, scene_id: str) -> Optional[Dict]:
+        """Get the status of one Sentinel-2 product (None if not in the database)."""
+        return self.get_s2_status_many([scene_id]).get(scene_id)
+
+    def update_slc(self, scene_id: str, **kwargs) -> bool:
+        """Update an SLC product (db_queries.update_slc) and evict its cached status."""
+        if not self.enabled:
+            return False
+        updated = db_queries.update_slc(scene_id, **kwargs)
+        self._evict_status("slc", scene_id)
+        return updated
+
+    def update_s2(self, scene_id: str, **kwargs) -> bool:
+        """Update a Sentinel-2 product (db_queries.update_s2) and evict its cached status."""
+        if not self.enabled:
+            return False
+        updated = db_queries.update_s2(scene_id, **kwargs)
+        self._evict_status("s2", scene_id)
+        return updated
+
     def register_slc_download(
         self,
         scene_id: str,
@@ -10,10 +10,10 @@ Version: 1.0
 
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Sequence, Tuple
 
 try:
-    from sqlalchemy import text, and_, or_
+    from sqlalchemy import text, bindparam, and_, or_
     from sqlalchemy.exc import IntegrityError
     from satelit_db.database import get_session
     
@@ -24,6 +24,25 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Rows per multi-row INSERT/UPDATE statement in the bulk functions
+BULK_CHUNK_SIZE = 500
+
+# Scene IDs per IN (...) list in the *_status_many lookups
+STATUS_CHUNK_SIZE = 1000
+
+SLC_STATUS_COLUMNS = """id, scene_id, acquisition_date, satellite_id,
+                           orbit_direction, track_number, subswath, file_path,
+                           downloaded, downloaded_date,
+                           fullswath_iw1_processed, fullswath_iw1_date, fullswath_iw1_version,
+                           fullswath_iw2_processed, fullswath_iw2_date, fullswath_iw2_version,
+                           fullswath_iw3_processed, fullswath_iw3_date, fullswath_iw3_version,
+                           polarimetry_processed, polarimetry_date, polarimetry_version"""
+
+S2_STATUS_COLUMNS = """id, scene_id, acquisition_date, satellite_id,
+                           cloud_cover_percent, aoi_coverage_percent,
+                           file_path, downloaded, downloaded_date,
+                           msavi_processed, msavi_file_path, msavi_date, msavi_version"""
+
 
 # ============================================================================
 # Sentinel-1 Functions
@@ -60,14 +79,8 @@ def get_slc_status(scene_id: str) -> Optional[Dict[str, Any]]:
     try:
         with get_session() as session:
             result = session.execute(
-                text("""
-                    SELECT id, scene_id, acquisition_date, satellite_id,
-                           orbit_direction, track_number, subswath, file_path,
-                           downloaded, downloaded_date,
-                           fullswath_iw1_processed, fullswath_iw1_date, fullswath_iw1_version,
-                           fullswath_iw2_processed, fullswath_iw2_date, fullswath_iw2_version,
-                           fullswath_iw3_processed, fullswath_iw3_date, fullswath_iw3_version,
-                           polarimetry_processed, polarimetry_date, polarimetry_version
+                text(f"""
+                    SELECT {SLC_STATUS_COLUMNS}
                     FROM satelit.slc_products
                     WHERE scene_id = :scene_id
                 """),
@@ -84,6 +97,45 @@ def get_slc_status(scene_id: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def _status_many(table: str, columns: str, scene_ids, label: str) -> Dict[str, Dict[str, Any]]:
+    """Fetch status rows for many scene IDs with one IN (...) query per chunk."""
+    scene_ids = sorted(set(scene_ids))
+    if not DB_AVAILABLE or not scene_ids:
+        return {}
+
+    try:
+        statuses = {}
+        with get_session() as session:
+            statement = text(f"""
+                SELECT {columns}
+                FROM satelit.{table}
+                WHERE scene_id IN :scene_ids
+            """).bindparams(bindparam("scene_ids", expanding=True))
+            for chunk in _chunks(scene_ids, STATUS_CHUNK_SIZE):
+                for row in session.execute(statement, {"scene_ids": list(chunk)}):
+                    statuses[row.scene_id] = dict(row._mapping)
+        return statuses
+
+    except Exception as e:
+        logger.error(f"Failed to get {label} status for {len(scene_ids)} scenes: {e}")
+        return {}
+
+
+def get_slc_status_many(scene_ids) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the status of many SLC products in one round trip.
+
+    Args:
+        scene_ids: Iterable of Sentinel-1 scene identifiers
+
+    Returns:
+        {scene_id: status} with the same fields as get_slc_status(). Scenes
+        not in the database are absent. Empty dict on error or if the
+        database is unavailable.
+    """
+    return _status_many("slc_products", SLC_STATUS_COLUMNS, scene_ids, "SLC")
+
+
 def update_slc(scene_id: str, **kwargs) -> bool:
     """
     Update an SLC product with new flags and timestamps.
@@ -217,8 +269,8 @@ def register_slc_download(
                         "downloaded_date": datetime.now()
                     }
                 )
-                session.commit()
                 product_id = result.fetchone()[0]
+                session.commit()
                 logger.info(f"✓ Registered SLC download: {scene_id} (ID: {product_id})")
                 return product_id
                 
@@ -363,9 +415,8 @@ def register_insar_pair(
                     "coherence_std": coherence_std
                 }
             )
-            session.commit()
-            
             pair_id = result.fetchone()[0]
+            session.commit()
             logger.info(f"✓ Registered InSAR pair: {master_scene_id}_{slave_scene_id} (ID: {pair_id})")
             return pair_id
             
@@ -492,11 +543,8 @@ def get_s2_status(scene_id: str) -> Optional[Dict[str, Any]]:
     try:
         with get_session() as session:
             result = session.execute(
-                text("""
-                    SELECT id, scene_id, acquisition_date, satellite_id,
-                           cloud_cover_percent, aoi_coverage_percent,
-                           file_path, downloaded, downloaded_date,
-                           msavi_processed, msavi_file_path, msavi_date, msavi_version
+                text(f"""
+                    SELECT {S2_STATUS_COLUMNS}
                     FROM satelit.s2_products
                     WHERE scene_id = :scene_id
                 """),
@@ -513,6 +561,21 @@ def get_s2_status(scene_id: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def get_s2_status_many(scene_ids) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the status of many Sentinel-2 products in one round trip.
+
+    Args:
+        scene_ids: Iterable of Sentinel-2 scene identifiers
+
+    Returns:
+        {scene_id: status} with the same fields as get_s2_status(). Scenes
+        not in the database are absent. Empty dict on error or if the
+        database is unavailable.
+    """
+    return _status_many("s2_products", S2_STATUS_COLUMNS, scene_ids, "S2")
+
+
 def update_s2(scene_id: str, **kwargs) -> bool:
     """
     Update a Sentinel-2 product with new flags and timestamps.
@@ -645,8 +708,8 @@ def register_s2_download(
                         "aoi_coverage": aoi_coverage_percent
                     }
                 )
-                session.commit()
                 product_id = result.fetchone()[0]
+                session.commit()
                 logger.info(f"✓ Registered S2 download: {scene_id} (ID: {product_id})")
                 return product_id
                 
@@ -677,6 +740,7 @@ def find_msavi_for_date(
             'scene_id': 'S2A_MSIL2A_...',
             'acquisition_date': datetime(...),
             'cloud_cover_percent': 12.5,
+            'file_path': '/path/to/S2A_MSIL2A_....SAFE',
             'msavi_file_path': '/path/to/msavi.tif',
             'date_offset_days': 3  # Days from target_date
         }
@@ -698,7 +762,7 @@ def find_msavi_for_date(
                 text(f"""
                     SELECT 
                         id, scene_id, acquisition_date, satellite_id,
-                        cloud_cover_percent, aoi_coverage_percent,
+                        cloud_cover_percent, aoi_coverage_percent, file_path,
                         msavi_file_path, msavi_date, msavi_version,
                         ABS(EXTRACT(DAY FROM acquisition_date - :target_date)) as date_offset_days
                     FROM satelit.s2_products
@@ -801,9 +865,8 @@ def register_pair_msavi(
                     "aligned_date": aligned_date
                 }
             )
-            session.commit()
-            
             integration_id = result.fetchone()[0]
+            session.commit()
             logger.info(f"✓ Registered InSAR-MSAVI integration (ID: {integration_id})")
             return integration_id
             
@@ -812,6 +875,480 @@ def register_pair_msavi(
         return None
 
 
+# ============================================================================
+# Bulk Functions
+# ============================================================================
+#
+# Batched variants of the register/update helpers above for callers that
+# write hundreds or thousands of rows (catalogue sync, migrations). Each call
+# opens a single session, sends one multi-row INSERT ... ON CONFLICT per chunk
+# of BULK_CHUNK_SIZE rows and commits once: either every chunk is stored or,
+# on error, nothing is.
+
+def _chunks(rows: Sequence, chunk_size: int) -> Iterator[Sequence]:
+    """Split rows into consecutive slices of at most chunk_size elements."""
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start:start + chunk_size]
+
+
+def _dedupe(rows: List[Dict[str, Any]], key) -> List[Dict[str, Any]]:
+    """
+    Keep the last row for each conflict key.
+
+    PostgreSQL rejects an INSERT ... ON CONFLICT DO UPDATE that touches the
+    same row twice, so duplicates must not reach the same statement.
+    """
+    return list({key(row): row for row in rows}.values())
+
+
+def _values_clause(columns: Sequence[str], rows: Sequence[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the VALUES list and bind parameters of a multi-row INSERT.
+
+    Returns:
+        ("(:scene_id_0, ...), (:scene_id_1, ...)", {"scene_id_0": ..., ...})
+    """
+    groups = []
+    params = {}
+    for i, row in enumerate(rows):
+        names = []
+        for column in columns:
+            params[f"{column}_{i}"] = row[column]
+            names.append(f":{column}_{i}")
+        groups.append(f"({', '.join(names)})")
+    return ",\n".join(groups), params
+
+
+def _slc_ids_by_scene(session, scene_ids) -> Dict[str, int]:
+    """Resolve SLC scene IDs to slc_products.id in one query."""
+    scene_ids = sorted(set(scene_ids))
+    if not scene_ids:
+        return {}
+    results = session.execute(
+        text("""
+            SELECT id, scene_id
+            FROM satelit.slc_products
+            WHERE scene_id IN :scene_ids
+        """).bindparams(bindparam("scene_ids", expanding=True)),
+        {"scene_ids": scene_ids}
+    ).fetchall()
+    return {row.scene_id: row.id for row in results}
+
+
+def register_slc_downloads(
+    products: List[Dict[str, Any]],
+    update_existing: bool = True,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> Optional[Dict[str, int]]:
+    """
+    Register many SLC products in one transaction (bulk register_slc_download).
+
+    Args:
+        products: Dicts with the register_slc_download() arguments
+                  (scene_id, acquisition_date, orbit_direction, track_number,
+                  file_path, optional satellite_id and subswath) plus an
+                  optional 'downloaded' flag (default True). Catalogue syncs
+                  pass downloaded=False to record products not yet on disk.
+        update_existing: If True, existing rows get file_path/downloaded/
+                         downloaded_date updated (same as register_slc_download).
+                         If False, existing rows are left untouched.
+        chunk_size: Rows per INSERT statement
+
+    Returns:
+        {scene_id: product_id} for every inserted or updated row (with
+        update_existing=False only newly inserted rows are returned).
+        None on error (the transaction is rolled back) or if the database
+        is unavailable.
+    """
+    if not DB_AVAILABLE:
+        return None
+    if not products:
+        return {}
+
+    now = datetime.now()
+    rows = []
+    for product in _dedupe(products, lambda p: p["scene_id"]):
+        downloaded = product.get("downloaded", True)
+        rows.append({
+            "scene_id": product["scene_id"],
+            "acquisition_date": product["acquisition_date"],
+            "satellite_id": product.get("satellite_id") or product["scene_id"][:3],
+            "orbit_direction": product["orbit_direction"],
+            "track_number": product["track_number"],
+            "subswath": product.get("subswath", "IW"),
+            "file_path": product["file_path"],
+            "downloaded": downloaded,
+            "downloaded_date": now if downloaded else None
+        })
+
+    columns = list(rows[0].keys())
+    if update_existing:
+        conflict = """DO UPDATE SET
+                        file_path = EXCLUDED.file_path,
+                        downloaded = EXCLUDED.downloaded,
+                        downloaded_date = EXCLUDED.downloaded_date"""
+    else:
+        conflict = "DO NOTHING"
+
+    try:
+        product_ids = {}
+        with get_session() as session:
+            for chunk in _chunks(rows, chunk_size):
+                values, params = _values_clause(columns, chunk)
+                results = session.execute(
+                    text(f"""
+                        INSERT INTO satelit.slc_products ({', '.join(columns)})
+                        VALUES {values}
+                        ON CONFLICT (scene_id)
+                        {conflict}
+                        RETURNING id, scene_id
+                    """),
+                    params
+                ).fetchall()
+                product_ids.update({row.scene_id: row.id for row in results})
+
+            session.commit()
+
+        logger.info(f"✓ Registered {len(product_ids)}/{len(rows)} SLC products in bulk")
+        return product_ids
+
+    except Exception as e:
+        logger.error(f"Failed to bulk register {len(rows)} SLC products: {e}")
+        return None
+
+
+def update_slc_many(updates: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> Optional[int]:
+    """
+    Apply many update_slc() calls in one transaction.
+
+    Updates sharing the same set of fields are sent together as one batched
+    UPDATE per chunk.
+
+    Args:
+        updates: Dicts with 'scene_id' plus the fields to update, e.g.
+                 [{'scene_id': 'S1A_...', 'fullswath_iw1_processed': True,
+                   'fullswath_iw1_date': datetime.now()}, ...]
+        chunk_size: Rows per batched UPDATE
+
+    Returns:
+        Number of rows updated, or None on error (the transaction is rolled
+        back) or if the database is unavailable
+    """
+    if not DB_AVAILABLE:
+        return None
+    if not updates:
+        return 0
+
+    # Group by field set: each group shares one UPDATE statement
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for update in _dedupe(updates, lambda u: u["scene_id"]):
+        fields = tuple(sorted(key for key in update if key != "scene_id"))
+        if not fields:
+            logger.warning(f"update_slc_many: no fields to update for {update['scene_id']}")
+            continue
+        groups.setdefault(fields, []).append(update)
+
+    try:
+        updated = 0
+        with get_session() as session:
+            for fields, rows in groups.items():
+                set_clause = ", ".join([f"{key} = :{key}" for key in fields])
+                statement = text(f"""
+                    UPDATE satelit.slc_products
+                    SET {set_clause}
+                    WHERE scene_id = :scene_id
+                """)
+                for chunk in _chunks(rows, chunk_size):
+                    result = session.execute(statement, list(chunk))
+                    updated += max(result.rowcount, 0)
+
+            session.commit()
+
+        logger.info(f"✓ Updated {updated} SLC products in bulk")
+        return updated
+
+    except Exception as e:
+        logger.error(f"Failed to bulk update {len(updates)} SLC products: {e}")
+        return None
+
+
+def register_insar_pairs(
+    pairs: List[Dict[str, Any]],
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> Optional[Dict[Tuple[str, str, str, str], int]]:
+    """
+    Register many processed InSAR pairs in one transaction (bulk register_insar_pair).
+
+    Master/slave scene IDs are resolved with a single query; pairs whose
+    SLCs are not in slc_products are logged and skipped.
+
+    Args:
+        pairs: Dicts with the register_insar_pair() arguments
+               (master_scene_id, slave_scene_id, pair_type, subswath,
+               temporal_baseline_days, file_path and the optional
+               perpendicular_baseline_m, coherence_mean, coherence_std,
+               processing_version)
+        chunk_size: Rows per INSERT statement
+
+    Returns:
+        {(master_scene_id, slave_scene_id, subswath, pair_type): pair_id}.
+        None on error (the transaction is rolled back) or if the database
+        is unavailable.
+    """
+    if not DB_AVAILABLE:
+        return None
+    if not pairs:
+        return {}
+
+    pairs = _dedupe(pairs, lambda p: (p["master_scene_id"], p["slave_scene_id"],
+                                      p["subswath"], p["pair_type"]))
+
+    try:
+        pair_ids = {}
+        with get_session() as session:
+            slc_ids = _slc_ids_by_scene(
+                session,
+                [p["master_scene_id"] for p in pairs] + [p["slave_scene_id"] for p in pairs]
+            )
+            scene_by_id = {slc_id: scene_id for scene_id, slc_id in slc_ids.items()}
+
+            now = datetime.now()
+            rows = []
+            for pair in pairs:
+                master_id = slc_ids.get(pair["master_scene_id"])
+                slave_id = slc_ids.get(pair["slave_scene_id"])
+                if master_id is None or slave_id is None:
+                    logger.error(f"Master or slave SLC not found: "
+                                 f"{pair['master_scene_id']}, {pair['slave_scene_id']}")
+                    continue
+                rows.append({
+                    "master_slc_id": master_id,
+                    "slave_slc_id": slave_id,
+                    "pair_type": pair["pair_type"],
+                    "subswath": pair["subswath"],
+                    "temporal_baseline_days": pair["temporal_baseline_days"],
+                    "perpendicular_baseline_m": pair.get("perpendicular_baseline_m"),
+                    "file_path": pair["file_path"],
+                    "processed_date": now,
+                    "processing_version": pair.get("processing_version"),
+                    "coherence_mean": pair.get("coherence_mean"),
+                    "coherence_std": pair.get("coherence_std")
+                })
+
+            if not rows:
+                return {}
+
+            columns = list(rows[0].keys())
+            for chunk in _chunks(rows, chunk_size):
+                values, params = _values_clause(columns, chunk)
+                results = session.execute(
+                    text(f"""
+                        INSERT INTO satelit.insar_pairs ({', '.join(columns)})
+                        VALUES {values}
+                        ON CONFLICT (master_slc_id, slave_slc_id, subswath, pair_type)
+                        DO UPDATE SET
+                            file_path = EXCLUDED.file_path,
+                            processed_date = EXCLUDED.processed_date,
+                            processing_version = EXCLUDED.processing_version,
+                            perpendicular_baseline_m = EXCLUDED.perpendicular_baseline_m,
+                            coherence_mean = EXCLUDED.coherence_mean,
+                            coherence_std = EXCLUDED.coherence_std
+                        RETURNING id, master_slc_id, slave_slc_id, subswath, pair_type
+                    """),
+                    params
+                ).fetchall()
+                for row in results:
+                    key = (scene_by_id[row.master_slc_id], scene_by_id[row.slave_slc_id],
+                           row.subswath, row.pair_type)
+                    pair_ids[key] = row.id
+
+            session.commit()
+
+        logger.info(f"✓ Registered {len(pair_ids)}/{len(pairs)} InSAR pairs in bulk")
+        return pair_ids
+
+    except Exception as e:
+        logger.error(f"Failed to bulk register {len(pairs)} InSAR pairs: {e}")
+        return None
+
+
+def register_s2_downloads(
+    products: List[Dict[str, Any]],
+    update_existing: bool = True,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> Optional[Dict[str, int]]:
+    """
+    Register many Sentinel-2 products in one transaction (bulk register_s2_download).
+
+    Args:
+        products: Dicts with the register_s2_download() arguments
+                  (scene_id, acquisition_date, file_path, optional
+                  satellite_id, cloud_cover_percent, aoi_coverage_percent)
+                  plus an optional 'downloaded' flag (default True)
+        update_existing: If True, existing rows are updated like
+                         register_s2_download() does (cloud/AOI coverage only
+                         overwritten when given). If False, they are left untouched.
+        chunk_size: Rows per INSERT statement
+
+    Returns:
+        {scene_id: product_id} for every inserted or updated row (with
+        update_existing=False only newly inserted rows are returned).
+        None on error (the transaction is rolled back) or if the database
+        is unavailable.
+    """
+    if not DB_AVAILABLE:
+        return None
+    if not products:
+        return {}
+
+    now = datetime.now()
+    rows = []
+    for product in _dedupe(products, lambda p: p["scene_id"]):
+        downloaded = product.get("downloaded", True)
+        rows.append({
+            "scene_id": product["scene_id"],
+            "acquisition_date": product["acquisition_date"],
+            "satellite_id": product.get("satellite_id") or product["scene_id"][:3],
+            "file_path": product["file_path"],
+            "downloaded": downloaded,
+            "downloaded_date": now if downloaded else None,
+            "cloud_cover_percent": product.get("cloud_cover_percent"),
+            "aoi_coverage_percent": product.get("aoi_coverage_percent")
+        })
+
+    columns = list(rows[0].keys())
+    if update_existing:
+        conflict = """DO UPDATE SET
+                        file_path = EXCLUDED.file_path,
+                        downloaded = EXCLUDED.downloaded,
+                        downloaded_date = EXCLUDED.downloaded_date,
+                        cloud_cover_percent = COALESCE(EXCLUDED.cloud_cover_percent, s2.cloud_cover_percent),
+                        aoi_coverage_percent = COALESCE(EXCLUDED.aoi_coverage_percent, s2.aoi_coverage_percent)"""
+    else:
+        conflict = "DO NOTHING"
+
+    try:
+        product_ids = {}
+        with get_session() as session:
+            for chunk in _chunks(rows, chunk_size):
+                values, params = _values_clause(columns, chunk)
+                results = session.execute(
+                    text(f"""
+                        INSERT INTO satelit.s2_products AS s2 ({', '.join(columns)})
+                        VALUES {values}
+                        ON CONFLICT (scene_id)
+                        {conflict}
+                        RETURNING id, scene_id
+                    """),
+                    params
+                ).fetchall()
+                product_ids.update({row.scene_id: row.id for row in results})
+
+            session.commit()
+
+        logger.info(f"✓ Registered {len(product_ids)}/{len(rows)} S2 products in bulk")
+        return product_ids
+
+    except Exception as e:
+        logger.error(f"Failed to bulk register {len(rows)} S2 products: {e}")
+        return None
+
+
+def register_pair_msavis(
+    links: List[Dict[str, Any]],
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> Optional[Dict[int, int]]:
+    """
+    Link many InSAR pairs to their MSAVI products in one transaction
+    (bulk register_pair_msavi).
+
+    The aligned date (InSAR master acquisition date) of every pair is read
+    with a single query; links to unknown pairs are logged and skipped.
+
+    Args:
+        links: Dicts with the register_pair_msavi() arguments
+               (insar_pair_id, master_s2_id, slave_s2_id, master_msavi_file,
+               slave_msavi_file, master_date_offset_days, slave_date_offset_days)
+        chunk_size: Rows per INSERT statement
+
+    Returns:
+        {insar_pair_id: integration_id}. None on error (the transaction is
+        rolled back) or if the database is unavailable.
+    """
+    if not DB_AVAILABLE:
+        return None
+    if not links:
+        return {}
+
+    links = _dedupe(links, lambda link: link["insar_pair_id"])
+
+    try:
+        integration_ids = {}
+        with get_session() as session:
+            results = session.execute(
+                text("""
+                    SELECT ip.id, m.acquisition_date
+                    FROM satelit.insar_pairs ip
+                    JOIN satelit.slc_products m ON ip.master_slc_id = m.id
+                    WHERE ip.id IN :pair_ids
+                """).bindparams(bindparam("pair_ids", expanding=True)),
+                {"pair_ids": sorted(link["insar_pair_id"] for link in links)}
+            ).fetchall()
+            aligned_dates = {row.id: row.acquisition_date for row in results}
+
+            rows = []
+            for link in links:
+                aligned_date = aligned_dates.get(link["insar_pair_id"])
+                if aligned_date is None:
+                    logger.error(f"InSAR pair not found: {link['insar_pair_id']}")
+                    continue
+                rows.append({
+                    "insar_pair_id": link["insar_pair_id"],
+                    "master_s2_id": link["master_s2_id"],
+                    "slave_s2_id": link["slave_s2_id"],
+                    "master_msavi_file": link["master_msavi_file"],
+                    "slave_msavi_file": link["slave_msavi_file"],
+                    "master_date_offset_days": link["master_date_offset_days"],
+                    "slave_date_offset_days": link["slave_date_offset_days"],
+                    "aligned_date": aligned_date
+                })
+
+            if not rows:
+                return {}
+
+            columns = list(rows[0].keys())
+            for chunk in _chunks(rows, chunk_size):
+                values, params = _values_clause(columns, chunk)
+                results = session.execute(
+                    text(f"""
+                        INSERT INTO satelit.insar_pair_msavi ({', '.join(columns)})
+                        VALUES {values}
+                        ON CONFLICT (insar_pair_id)
+                        DO UPDATE SET
+                            master_s2_id = EXCLUDED.master_s2_id,
+                            slave_s2_id = EXCLUDED.slave_s2_id,
+                            master_msavi_file = EXCLUDED.master_msavi_file,
+                            slave_msavi_file = EXCLUDED.slave_msavi_file,
+                            master_date_offset_days = EXCLUDED.master_date_offset_days,
+                            slave_date_offset_days = EXCLUDED.slave_date_offset_days,
+                            aligned_date = EXCLUDED.aligned_date
+                        RETURNING id, insar_pair_id
+                    """),
+                    params
+                ).fetchall()
+                integration_ids.update({row.insar_pair_id: row.id for row in results})
+
+            session.commit()
+
+        logger.info(f"✓ Registered {len(integration_ids)}/{len(links)} InSAR-MSAVI integrations in bulk")
+        return integration_ids
+
+    except Exception as e:
+        logger.error(f"Failed to bulk register {len(links)} InSAR-MSAVI integrations: {e}")
+        return None
+
+
 # ============================================================================
 # Convenience Functions
 # ============================================================================
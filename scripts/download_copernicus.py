@@ -13,14 +13,18 @@ import glob
 import json
 import logging
 import os
+import re
 import shutil
 import subprocess
 import sys
+import threading
 import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 from shapely import wkt as shapely_wkt
 from shapely.geometry import Polygon, box
 
@@ -32,16 +36,20 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 from aoi_utils import geojson_to_bbox
 from logging_utils import LoggerConfig
-from common_utils import get_snap_orbits_dir
+from common_utils import (
+    get_snap_orbits_dir, PARTIAL_EXTRACTION_SIDECAR, partial_extraction_covers
+)
 from insar_repository import InSARRepository
+from remote_slc_probe import RemoteSLCProbe
+from catalogue_cache import CatalogueCache, DEFAULT_TTL_HOURS
 
 # Database integration (optional - graceful degradation if not available)
 # ISSUE #5: Updated to use new db_queries API from Issue #2
 # ISSUE #6: Added S2 functions for Sentinel-2 tracking
 try:
     from scripts.db_queries import (
-        register_slc_download, get_slc_status,
-        register_s2_download, get_s2_status
+        register_slc_download, get_slc_status, get_slc_status_many,
+        register_s2_download, get_s2_status, get_s2_status_many
     )
     from scripts.db_integration import init_db
     DB_INTEGRATION_AVAILABLE = init_db()
@@ -56,14 +64,19 @@ except ImportError:
         return None
     def get_s2_status(*args, **kwargs):
         return None
+    def get_slc_status_many(*args, **kwargs):
+        return {}
+    def get_s2_status_many(*args, **kwargs):
+        return {}
 
 # importar las credenciales desde un archivo .env externo si existe
 from dotenv import load_dotenv
 load_dotenv()
 
 
-# Logger global - se configurará en main()
-logger = None
+# Logger global - se configurará en main(). Por defecto el del módulo, para
+# poder usar las funciones desde otros scripts (batch_download_planner...)
+logger = logging.getLogger(__name__)
 
 # Esta variable global se actualiza al parsear argumentos
 BBOX = None
@@ -77,6 +90,15 @@ AUTH_URL = "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/o
 BASE_DIR = os.path.join(parent_dir, "data")
 ORBITS_DIR = get_snap_orbits_dir()
 
+# Descargas concurrentes: CDSE permite hasta 4 conexiones simultáneas por usuario
+DEFAULT_DOWNLOAD_WORKERS = 4
+
+# Caché de búsquedas del catálogo (ver catalogue_cache.py)
+CATALOGUE_CACHE_DIR = os.path.join(BASE_DIR, ".catalogue_cache")
+
+# Tamaño de página OData ($top máximo admitido por CDSE)
+CATALOGUE_PAGE_SIZE = 1000
+
 
 class CopernicusAuth:
     """Maneja autenticación OAuth2 con Copernicus Dataspace"""
@@ -86,9 +108,27 @@ class CopernicusAuth:
         self.password = password
         self.token = None
         self.token_expiry = None
+        # Compartido entre workers de descarga: serializa la renovación del token
+        self._lock = threading.RLock()
 
     def get_token(self, force_refresh: bool = False) -> Optional[str]:
         """Obtiene un token de acceso válido"""
+        with self._lock:
+            return self._get_token_locked(force_refresh)
+
+    def refresh_token(self, stale_token: Optional[str]) -> Optional[str]:
+        """
+        Renueva el token tras un 401.
+
+        Si otro worker ya lo renovó (el token actual difiere del que falló),
+        devuelve el vigente sin volver a pedir uno nuevo al servidor.
+        """
+        with self._lock:
+            if self.token and self.token != stale_token:
+                return self.token
+            return self._get_token_locked(force_refresh=True)
+
+    def _get_token_locked(self, force_refresh: bool) -> Optional[str]:
         if not force_refresh and self.token and self.token_expiry:
             if datetime.now() < self.token_expiry:
                 return self.token
@@ -245,9 +285,16 @@ def search_products(
     max_cloud_cover: int = 30,
     satellite: Optional[str] = None,
     orbit_direction: Optional[str] = None,
-    aoi_name: Optional[str] = None
+    aoi_name: Optional[str] = None,
+    cache: Optional[CatalogueCache] = None
 ) -> Optional[List[Dict]]:
-    """Busca productos en el catálogo de Copernicus"""
+    """
+    Busca productos en el catálogo de Copernicus
+
+    Recorre todas las páginas de resultados (@odata.nextLink). Si se pasa una
+    CatalogueCache, la consulta se sirve desde disco cuando la ventana ya está
+    cubierta y solo se piden al catálogo los productos nuevos.
+    """
 
     logger.info("="*80)
     if satellite and collection == "SENTINEL-1":
@@ -278,9 +325,6 @@ def search_products(
     if not start_date:
         start_date = end_date - timedelta(days=180)  # 6 meses por defecto
 
-    start_str = start_date.strftime('%Y-%m-%dT00:00:00.000Z')
-    end_str = end_date.strftime('%Y-%m-%dT23:59:59.999Z')
-
     # Crear WKT polygon
     wkt = create_wkt_polygon(bbox)
 
@@ -317,16 +361,16 @@ def search_products(
 
         filter_query += (
             f"OData.CSC.Intersects(area=geography'SRID=4326;{wkt}') and "
-            f"ContentDate/Start gt {start_str} and "
-            f"ContentDate/Start lt {end_str}"
+            "ContentDate/Start gt {start} and "
+            "ContentDate/Start lt {end}"
         )
     elif collection == "SENTINEL-2":
         filter_query = (
             f"Collection/Name eq 'SENTINEL-2' and "
             f"contains(Name,'{product_type}') and "
             f"OData.CSC.Intersects(area=geography'SRID=4326;{wkt}') and "
-            f"ContentDate/Start gt {start_str} and "
-            f"ContentDate/Start lt {end_str} and "
+            "ContentDate/Start gt {start} and "
+            "ContentDate/Start lt {end} and "
             f"Attributes/OData.CSC.DoubleAttribute/any("
             f"att:att/Name eq 'cloudCover' and "
             f"att/OData.CSC.DoubleAttribute/Value lt {max_cloud_cover})"
@@ -347,29 +391,83 @@ def search_products(
     else:
         logger.info(f"   Nubosidad: < {max_cloud_cover}%")
 
-    # Realizar búsqueda
+    # Sentinel-2 necesita más tiempo por mayor volumen de productos
+    timeout = 180 if collection == "SENTINEL-2" else 60
+
+    def fetch(window_start: datetime, window_end: datetime) -> Optional[List[Dict]]:
+        query_filter = filter_query.replace(
+            '{start}', window_start.strftime('%Y-%m-%dT00:00:00.000Z')
+        ).replace(
+            '{end}', window_end.strftime('%Y-%m-%dT23:59:59.999Z')
+        )
+        return _query_catalogue_pages(query_filter, auth, timeout)
+
+    if cache is not None:
+        query = {
+            'collection': collection,
+            'product_type': product_type,
+            'footprint': wkt,
+            'orbit_direction': orbit_direction,
+            'satellite': satellite,
+            'max_cloud_cover': max_cloud_cover if collection == "SENTINEL-2" else None
+        }
+        products = cache.search(query, start_date, end_date, fetch)
+        logger.info(f"   {cache.stats()}")
+    else:
+        products = fetch(start_date, end_date)
+
+    if products is None:
+        return None
+
+    if not products:
+        logger.info("❌ No se encontraron productos")
+        return None
+
+    logger.info(f"✅ Encontrados {len(products)} productos")
+    return products
+
+
+def _query_catalogue_pages(filter_query: str, auth: CopernicusAuth, timeout: int) -> Optional[List[Dict]]:
+    """
+    Ejecuta una consulta OData recorriendo todas las páginas.
+
+    Sigue @odata.nextLink; si el servidor no lo devuelve pero la página viene
+    llena, pide la siguiente con $skip.
+
+    Returns:
+        Lista de productos (vacía si no hay resultados) o None si hay error de red
+    """
     url = f"{CATALOGUE_API}/Products"
     params = {
         "$filter": filter_query,
-        "$top": 1000,
+        "$top": CATALOGUE_PAGE_SIZE,
         "$orderby": "ContentDate/Start desc"
     }
-    headers = {"Authorization": f"Bearer {token}"}
-
-    # Sentinel-2 necesita más tiempo por mayor volumen de productos
-    timeout = 180 if collection == "SENTINEL-2" else 60
 
+    products = []
+    page = 0
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=timeout)
-        response.raise_for_status()
+        while url:
+            page += 1
+            token = auth.get_token()
+            headers = {"Authorization": f"Bearer {token}"}
+            response = requests.get(url, params=params, headers=headers, timeout=timeout)
+            response.raise_for_status()
 
-        products = response.json().get('value', [])
+            data = response.json()
+            values = data.get('value', [])
+            products.extend(values)
 
-        if not products:
-            logger.info("❌ No se encontraron productos")
-            return None
+            next_link = data.get('@odata.nextLink')
+            if next_link:
+                url, params = next_link, None
+            elif params is not None and len(values) == CATALOGUE_PAGE_SIZE:
+                params = dict(params, **{"$skip": params.get("$skip", 0) + CATALOGUE_PAGE_SIZE})
+            else:
+                url = None
 
-        logger.info(f"✅ Encontrados {len(products)} productos")
+        if page > 1:
+            logger.info(f"   📄 {page} páginas de resultados")
         return products
 
     except requests.exceptions.RequestException as e:
@@ -452,7 +550,8 @@ def calculate_product_coverage(product: Dict, aoi_bbox: Dict) -> Tuple[float, fl
 
 def filter_products_by_coverage(products: List[Dict], aoi_bbox: Dict, 
                                  min_coverage_pct: float = 10.0,
-                                 verbose: bool = True) -> List[Dict]:
+                                 verbose: bool = True,
+                                 remote_probe: Optional[RemoteSLCProbe] = None) -> List[Dict]:
     """
     Filtra productos por cobertura mínima del AOI.
     
@@ -461,6 +560,9 @@ def filter_products_by_coverage(products: List[Dict], aoi_bbox: Dict,
         aoi_bbox: AOI como dict
         min_coverage_pct: Porcentaje mínimo de cobertura requerido (default: 10%)
         verbose: Mostrar información de filtrado
+        remote_probe: Si se indica, los SLCs que pasan el filtro por footprint se
+            inspeccionan remotamente (HTTP Range) y se usa su cobertura a nivel
+            de burst. Si la sonda falla se conserva la cobertura del footprint.
     
     Returns:
         Lista de productos que cubren >= min_coverage_pct del AOI
@@ -485,6 +587,12 @@ def filter_products_by_coverage(products: List[Dict], aoi_bbox: Dict,
     
     for product in products:
         coverage_pct, intersection_area = calculate_product_coverage(product, aoi_bbox)
+
+        if remote_probe and coverage_pct >= min_coverage_pct:
+            burst_coverage = remote_probe.coverage_pct(product)
+            if burst_coverage is not None:
+                product['_aoi_footprint_coverage_pct'] = coverage_pct
+                coverage_pct = burst_coverage
         
         coverage_info.append({
             'product': product,
@@ -509,6 +617,9 @@ def filter_products_by_coverage(products: List[Dict], aoi_bbox: Dict,
                 if info['coverage_pct'] < min_coverage_pct:
                     name = info['product'].get('Name', 'Unknown')[:70]
                     logger.info(f"      - {name}... ({info['coverage_pct']:.1f}%)")
+
+        if remote_probe:
+            logger.info(f"   🛰️  {remote_probe.summary()}")
     
     return filtered
 
@@ -574,6 +685,88 @@ def display_products(products: List[Dict], limit: int = 20) -> float:
     return total_size_gb
 
 
+def select_slc_members(
+    namelist: List[str],
+    subswaths: Optional[List[str]] = None,
+    polarisations: Optional[List[str]] = None
+) -> Tuple[List[str], List[str]]:
+    """
+    Selecciona los miembros de un .zip SAFE necesarios para los subswaths/polarizaciones dados.
+
+    Solo se filtran los archivos de measurement/ y annotation/ (incluidos
+    calibration/, noise y rfi/), cuyo nombre codifica subswath y polarización:
+        measurement/s1a-iw1-slc-vv-20250928t055323-...-004.tiff
+        annotation/calibration/calibration-s1a-iw1-slc-vv-....xml
+    manifest.safe, support/ y preview/ (pequeños) se conservan siempre. Los
+    archivos sin subswath en el nombre (GRD: s1a-iw-grd-vv-...) solo se
+    filtran por polarización.
+
+    Args:
+        namelist: Miembros del .zip
+        subswaths: Ej ['IW1', 'IW2'] (None = todos)
+        polarisations: Ej ['VV'] (None = todas)
+
+    Returns:
+        Tuple (miembros_a_extraer, miembros_omitidos)
+    """
+    if not subswaths and not polarisations:
+        return list(namelist), []
+
+    wanted_swaths = {s.lower() for s in subswaths} if subswaths else None
+    wanted_pols = {p.lower() for p in polarisations} if polarisations else None
+
+    kept = []
+    omitted = []
+    for name in namelist:
+        parts = name.replace('\\', '/').split('/')
+        filename = parts[-1].lower()
+
+        if not filename or not ({'measurement', 'annotation'} & set(parts[:-1])):
+            kept.append(name)
+            continue
+
+        tokens = os.path.splitext(filename)[0].split('-')
+        swath_tokens = {t for t in tokens if re.fullmatch(r'(iw|ew)\d|s\d', t)}
+        pol_tokens = {t for t in tokens if t in ('vv', 'vh', 'hh', 'hv')}
+
+        if wanted_swaths and swath_tokens and not (swath_tokens & wanted_swaths):
+            omitted.append(name)
+        elif wanted_pols and pol_tokens and not (pol_tokens & wanted_pols):
+            omitted.append(name)
+        else:
+            kept.append(name)
+
+    return kept, omitted
+
+
+def _write_partial_extraction_sidecar(
+    zip_ref: zipfile.ZipFile,
+    extract_dir: str,
+    members: List[str],
+    omitted: List[str],
+    subswaths: Optional[List[str]],
+    polarisations: Optional[List[str]]
+) -> None:
+    """
+    Registra en <SAFE>/partial_extraction.json qué se omitió al extraer.
+
+    processing_utils.validate_product() lo usa para aceptar el producto
+    parcial, y download_product() para saber si hace falta re-descargarlo
+    cuando se piden otros subswaths.
+    """
+    sidecar = {
+        'product': os.path.basename(extract_dir),
+        'extracted_at': datetime.now().isoformat(),
+        'subswaths': [s.upper() for s in subswaths] if subswaths else None,
+        'polarisations': [p.upper() for p in polarisations] if polarisations else None,
+        'measurement_files': [m for m in members if '/measurement/' in m and not m.endswith('/')],
+        'omitted_members': omitted,
+        'omitted_bytes': sum(zip_ref.getinfo(name).file_size for name in omitted)
+    }
+    with open(os.path.join(extract_dir, PARTIAL_EXTRACTION_SIDECAR), 'w') as f:
+        json.dump(sidecar, f, indent=2)
+
+
 def _extract_zip_with_progress(zip_ref: zipfile.ZipFile, extract_path: str, namelist: list) -> None:
     """
     Extrae archivos de un ZIP de forma optimizada.
@@ -594,10 +787,13 @@ def _extract_zip_with_progress(zip_ref: zipfile.ZipFile, extract_path: str, name
     
     logger.info(f"   ⏳ Extrayendo {total_files} archivos ({total_size / (1024**3):.2f} GB)...")
     
+    # Extracción parcial (solo algunos subswaths/polarizaciones)
+    partial = total_files < len(zip_ref.infolist())
+
     # OPCIÓN 1: Usar extractall() de Python (RÁPIDO y confiable)
     # En pruebas, es más rápido y confiable que unzip en muchos sistemas
     try:
-        zip_ref.extractall(extract_path)
+        zip_ref.extractall(extract_path, members=namelist if partial else None)
         logger.info(f"   ✅ Extracción completada: {total_files}/{total_files} archivos")
         return
     except Exception as e:
@@ -612,8 +808,11 @@ def _extract_zip_with_progress(zip_ref: zipfile.ZipFile, extract_path: str, name
             timeout = max(900, estimated_timeout)  # Mínimo 15 minutos
             
             # unzip -q (silencioso) -o (sobrescribir) archivo.zip -d destino/
+            cmd = ['unzip', '-q', '-o', zip_path, '-d', extract_path]
+            if partial:
+                cmd += [name for name in namelist if not name.endswith('/')]
             result = subprocess.run(
-                ['unzip', '-q', '-o', zip_path, '-d', extract_path],
+                cmd,
                 capture_output=True,
                 text=True,
                 timeout=timeout
@@ -651,16 +850,51 @@ def _extract_zip_with_progress(zip_ref: zipfile.ZipFile, extract_path: str, name
     logger.info(f"Extracción completada: {extracted}/{total_files} archivos (método: extract)")
 
 
+def create_download_session(pool_size: int = DEFAULT_DOWNLOAD_WORKERS) -> requests.Session:
+    """
+    Crea una sesión HTTP con pool de conexiones para compartir entre workers.
+
+    El token NO se fija en la sesión: cada petición envía su propia cabecera
+    Authorization para que la renovación de un worker no afecte a los demás.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 def download_product(
     product: Dict,
     auth: CopernicusAuth,
-    download_dir: str
+    download_dir: str,
+    session: Optional[requests.Session] = None,
+    transfer_stats: Optional[Dict] = None,
+    extract: bool = True,
+    subswaths: Optional[List[str]] = None,
+    polarisations: Optional[List[str]] = None,
+    db_statuses: Optional[Dict[str, Dict]] = None
 ) -> bool:
     """
     Descarga un producto individual usando el Zipper API
 
     Añadido: soporte para reanudar descargas interrumpidas mediante el uso
     de cabeceras HTTP 'Range' cuando exista un archivo .zip parcial.
+
+    Args:
+        product: Producto del catálogo (Id, Name, Attributes...)
+        auth: Autenticación compartida (thread-safe)
+        download_dir: Directorio de descarga
+        session: Sesión HTTP compartida (ver create_download_session). Si es
+            None se crea una sesión propia para este producto.
+        transfer_stats: Dict opcional donde se acumulan 'bytes' descargados
+            y 'seconds' de transferencia (para el resumen de throughput)
+        extract: Si es False, se deja el .zip completo sin extraer (lo extrae
+            después extract_downloaded_product, ej. desde el modo pipeline)
+        subswaths: Subswaths a extraer (None = todos)
+        polarisations: Polarizaciones a extraer (None = todas)
+        db_statuses: Estados de BD ya leídos en bloque por nombre de producto
+            (ver prefetch_db_statuses). None = consultar la BD para este producto
     """
     product_id = product['Id']
     product_name = product['Name']
@@ -669,10 +903,9 @@ def download_product(
 
     # ISSUE #6: CHECK DATABASE: Verificar si ya está registrado como descargado (S1 or S2)
     if DB_INTEGRATION_AVAILABLE:
-        # Detect product type
-        is_s2 = product_name.startswith('S2')
-        
-        if is_s2:
+        if db_statuses is not None:
+            status = db_statuses.get(product_name)
+        elif product_name.startswith('S2'):
             status = get_s2_status(product_name)
         else:
             status = get_slc_status(product_name)
@@ -681,7 +914,8 @@ def download_product(
             # Verificar que el archivo local realmente existe
             if os.path.exists(extracted_dir):
                 manifest_file = os.path.join(extracted_dir, 'manifest.safe')
-                if os.path.exists(manifest_file):
+                if os.path.exists(manifest_file) and partial_extraction_covers(
+                        extracted_dir, subswaths, polarisations):
                     logger.info(f"⏭️  Ya descargado (BD): {product_name}")
                     return True
             # Si no existe localmente pero está en BD, continuar con descarga
@@ -691,9 +925,17 @@ def download_product(
     if os.path.exists(extracted_dir):
         # Verificar integridad: debe existir manifest.safe
         manifest_file = os.path.join(extracted_dir, 'manifest.safe')
-        if os.path.exists(manifest_file):
+        if os.path.exists(manifest_file) and partial_extraction_covers(
+                extracted_dir, subswaths, polarisations):
             logger.info(f"Ya existe (completo): {product_name}")
             return True
+        elif os.path.exists(manifest_file):
+            logger.info(f"Extracción parcial sin los subswaths/polarizaciones pedidos: {product_name}")
+            logger.info(f"Eliminando para re-descargar...")
+            try:
+                shutil.rmtree(extracted_dir)
+            except Exception:
+                pass
         else:
             logger.info(f"Directorio incompleto: {product_name}")
             logger.info(f"Eliminando directorio corrupto...")
@@ -716,10 +958,18 @@ def download_product(
                     namelist = zip_ref.namelist()
                     # Comprobar si contiene manifest.safe en raíz o subdir
                     if any('manifest.safe' in n for n in namelist):
+                        if not extract:
+                            logger.info(f"   ✅ Archivo .zip completo, pendiente de extracción")
+                            return True
                         logger.info(f"   ✅ Archivo .zip completo y contiene manifest.safe, extrayendo...")
-                        _extract_zip_with_progress(zip_ref, download_dir, namelist)
+                        members, omitted = select_slc_members(namelist, subswaths, polarisations)
+                        _extract_zip_with_progress(zip_ref, download_dir, members)
                         manifest_file = os.path.join(extracted_dir, 'manifest.safe')
                         if os.path.exists(manifest_file):
+                            if omitted:
+                                _write_partial_extraction_sidecar(
+                                    zip_ref, extracted_dir, members, omitted, subswaths, polarisations
+                                )
                             try:
                                 os.remove(output_file)
                             except Exception:
@@ -747,15 +997,41 @@ def download_product(
     # USAR ZIPPER API (no catalogue API)
     download_url = f"{ZIPPER_API}/Products({product_id})/$value"
 
+    own_session = session is None
+    if own_session:
+        session = create_download_session(pool_size=1)
+
+    try:
+        return _download_with_retries(
+            product, auth, session, token, download_url,
+            output_file, extracted_dir, download_dir, resume_from, transfer_stats,
+            extract, subswaths, polarisations
+        )
+    finally:
+        if own_session:
+            session.close()
+
+
+def _download_with_retries(
+    product: Dict,
+    auth: CopernicusAuth,
+    session: requests.Session,
+    token: str,
+    download_url: str,
+    output_file: str,
+    extracted_dir: str,
+    download_dir: str,
+    resume_from: int,
+    transfer_stats: Optional[Dict],
+    extract: bool = True,
+    subswaths: Optional[List[str]] = None,
+    polarisations: Optional[List[str]] = None
+) -> bool:
+    """Bucle de descarga con reintentos, Range-resume, extracción y registro en BD"""
     # Retries y backoff
     MAX_RETRIES = 5
     backoff = 2
 
-    session = requests.Session()
-    session.headers.update({
-        "Authorization": f"Bearer {token}"
-    })
-
     attempt = 0
     while attempt < MAX_RETRIES:
         attempt += 1
@@ -764,23 +1040,32 @@ def download_product(
             mode = 'wb'
             existing_size = 0
 
+            if attempt > 1 and os.path.exists(output_file):
+                # Reanudar desde lo ya escrito en intentos anteriores
+                resume_from = os.path.getsize(output_file)
+
             if resume_from and os.path.exists(output_file):
                 existing_size = resume_from
                 headers['Range'] = f'bytes={existing_size}-'
                 mode = 'ab'  # append
                 logger.info(f"Reanudando desde byte: {existing_size}")
 
+            # Token vigente (puede haberlo renovado otro worker)
+            token = auth.get_token() or token
+            headers['Authorization'] = f"Bearer {token}"
+
             logger.info("Conectando...")
             response = session.get(download_url, headers=headers, stream=True, timeout=300)
 
             # Si auth expiró
             if response.status_code == 401:
                 logger.info("Renovando token...")
-                token = auth.get_token(force_refresh=True)
+                response.close()
+                token = auth.refresh_token(token)
                 if not token:
                     logger.info("No se pudo renovar token")
                     return False
-                session.headers.update({"Authorization": f"Bearer {token}"})
+                headers['Authorization'] = f"Bearer {token}"
                 response = session.get(download_url, headers=headers, stream=True, timeout=300)
 
             # Si hicimos Range pero servidor respondió 200 OK (no soporta range), reiniciamos descarga
@@ -849,6 +1134,10 @@ def download_product(
 
             final_size = os.path.getsize(output_file)
 
+            if transfer_stats is not None:
+                transfer_stats['bytes'] = transfer_stats.get('bytes', 0) + (downloaded - existing_size)
+                transfer_stats['seconds'] = transfer_stats.get('seconds', 0.0) + (time.time() - start_time)
+
             # Validar descarga: si sabíamos total_size y final_size es cercano -> good
             if total_size and final_size < total_size * 0.99:
                 logger.info(f"Descarga incompleta ({final_size}/{total_size} bytes)")
@@ -859,112 +1148,13 @@ def download_product(
             avg_speed = (final_size / (1024**2)) / elapsed if elapsed > 0 else 0
             logger.info(f"   ✅ Completado en {elapsed/60:.1f} min (promedio: {avg_speed:.1f} MB/s)")
 
-            # Intentar extraer
-            logger.info(f"   📦 Extrayendo archivo...")
-            try:
-                extract_dir = output_file.replace('.zip', '')  # Remover extensión .zip
-
-                with zipfile.ZipFile(output_file, 'r') as zip_ref:
-                    logger.info(f"   📦 Extrayendo {len(zip_ref.namelist())} archivos...")
-                    _extract_zip_with_progress(zip_ref, download_dir, zip_ref.namelist())
-
-                # Verificar integridad de la extracción
-                manifest_file = os.path.join(extract_dir, 'manifest.safe')
-                if not os.path.exists(manifest_file):
-                    logger.info(f"Extracción incompleta: falta manifest.safe")
-                    logger.info(f"Archivo .zip conservado en: {output_file}")
-                    return False
-
-                logger.info(f"Extraído a: {os.path.basename(extract_dir)}")
-
-                # Eliminar .zip para ahorrar espacio
-                try:
-                    os.remove(output_file)
-                    logger.info(f"Archivo .zip eliminado (ahorrando {final_size/(1024**3):.2f} GB)")
-                except Exception:
-                    pass
-
-                # ISSUE #6: REGISTER IN DATABASE after successful download (S1 and S2)
-                if DB_INTEGRATION_AVAILABLE:
-                    try:
-                        # Extract metadata from product dict
-                        parsed = parse_product_name(product_name)
-                        acquisition_date = parsed.get('date')
-                        is_s2 = product_name.startswith('S2')
-                        
-                        if is_s2:
-                            # Sentinel-2 registration
-                            cloud_cover = None
-                            aoi_coverage = None
-                            
-                            # Extract cloud cover from attributes if available
-                            if 'Attributes' in product:
-                                for attr in product.get('Attributes', []):
-                                    if attr.get('Name') == 'cloudCover':
-                                        try:
-                                            cloud_cover = float(attr.get('Value', 0))
-                                        except:
-                                            pass
-                            
-                            if acquisition_date:
-                                product_id = register_s2_download(
-                                    scene_id=product_name,
-                                    acquisition_date=acquisition_date,
-                                    file_path=extracted_dir,
-                                    cloud_cover_percent=cloud_cover
-                                )
-                                
-                                if product_id:
-                                    cloud_info = f", cloud_cover={cloud_cover:.1f}%" if cloud_cover else ""
-                                    logger.info(f"   💾 Registered S2 in database (id={product_id}{cloud_info})")
-                                else:
-                                    logger.warning(f"   ⚠️  Failed to register S2 in database")
-                            else:
-                                logger.warning(f"   ⚠️  Missing date for S2 DB registration")
-                        else:
-                            # Sentinel-1 registration
-                            orbit_direction = "UNKNOWN"
-                            track_number = 0  # track_number = relative orbit for Sentinel-1
-
-                            if 'Attributes' in product:
-                                for attr in product.get('Attributes', []):
-                                    if attr.get('Name') == 'orbitDirection':
-                                        orbit_direction = attr.get('Value', 'UNKNOWN')
-                                    elif attr.get('Name') == 'relativeOrbitNumber':
-                                        track_number = int(attr.get('Value', 0))
-
-                            if acquisition_date and track_number > 0:
-                                product_id = register_slc_download(
-                                    scene_id=product_name,
-                                    acquisition_date=acquisition_date,
-                                    orbit_direction=orbit_direction,
-                                    track_number=track_number,
-                                    file_path=extracted_dir
-                                )
-
-                                if product_id:
-                                    logger.info(f"   💾 Registered S1 in database (id={product_id}, track={track_number})")
-                                else:
-                                    logger.warning(f"   ⚠️  Failed to register S1 in database")
-                            else:
-                                logger.warning(f"   ⚠️  Missing metadata for S1 DB registration (date={acquisition_date}, track={track_number})")
-
-                    except Exception as e:
-                        # Don't fail download if DB registration fails
-                        logger.warning(f"   ⚠️  Could not register in database: {e}")
-
-            except zipfile.BadZipFile:
-                logger.info(f"Error al extraer: archivo .zip corrupto")
-                # Mantener .zip para reanudar/inspección
-                return True
-            except Exception as e:
-                logger.info(f"Error al extraer: {e}")
-                logger.info(f"Archivo .zip conservado en: {output_file}")
-                # No fallar si la extracción falla, el .zip está disponible
+            if not extract:
+                # Modo pipeline: la extracción la hace otro worker
                 return True
 
-            session.close()
-            return True
+            return extract_downloaded_product(
+                product, download_dir, subswaths=subswaths, polarisations=polarisations
+            )
 
         except requests.exceptions.RequestException as e:
             # Retries en fallos de red
@@ -984,20 +1174,202 @@ def download_product(
     logger.info("Error: No se pudo completar la descarga")
     return False
 
+def extract_downloaded_product(
+    product: Dict,
+    download_dir: str,
+    subswaths: Optional[List[str]] = None,
+    polarisations: Optional[List[str]] = None
+) -> bool:
+    """
+    Extrae el .zip ya descargado de un producto, elimina el .zip y lo registra en BD.
+
+    Se usa tanto al final de download_product() como desde el worker de
+    extracción del modo pipeline (download_all_products(pipeline_extract=True)).
+
+    Args:
+        product: Producto del catálogo
+        download_dir: Directorio donde está <Name>.zip
+        subswaths: Si se indica (ej: ['IW1']), solo se extraen measurement/annotation
+            de esos subswaths (ver select_slc_members)
+        polarisations: Idem para polarizaciones (ej: ['VV'])
+    """
+    product_name = product['Name']
+    output_file = os.path.join(download_dir, f"{product_name}.zip")
+    extracted_dir = os.path.join(download_dir, product_name)
+    final_size = os.path.getsize(output_file)
+
+    # Intentar extraer
+    logger.info(f"   📦 Extrayendo archivo...")
+    try:
+        extract_dir = output_file.replace('.zip', '')  # Remover extensión .zip
+
+        with zipfile.ZipFile(output_file, 'r') as zip_ref:
+            namelist = zip_ref.namelist()
+            members, omitted = select_slc_members(namelist, subswaths, polarisations)
+            if omitted:
+                logger.info(f"   ✂️  Extracción parcial: {len(members)} de {len(namelist)} archivos "
+                            f"(subswaths={subswaths or 'todos'}, pol={polarisations or 'todas'})")
+            logger.info(f"   📦 Extrayendo {len(members)} archivos...")
+            _extract_zip_with_progress(zip_ref, download_dir, members)
+
+        # Verificar integridad de la extracción
+        manifest_file = os.path.join(extract_dir, 'manifest.safe')
+        if not os.path.exists(manifest_file):
+            logger.info(f"Extracción incompleta: falta manifest.safe")
+            logger.info(f"Archivo .zip conservado en: {output_file}")
+            return False
+
+        logger.info(f"Extraído a: {os.path.basename(extract_dir)}")
+
+        if omitted:
+            with zipfile.ZipFile(output_file, 'r') as zip_ref:
+                _write_partial_extraction_sidecar(
+                    zip_ref, extract_dir, members, omitted, subswaths, polarisations
+                )
+            logger.info(f"   📝 Omitidos {len(omitted)} archivos (ver {PARTIAL_EXTRACTION_SIDECAR})")
+
+        # Eliminar .zip para ahorrar espacio
+        try:
+            os.remove(output_file)
+            logger.info(f"Archivo .zip eliminado (ahorrando {final_size/(1024**3):.2f} GB)")
+        except Exception:
+            pass
+
+        # ISSUE #6: REGISTER IN DATABASE after successful download (S1 and S2)
+        if DB_INTEGRATION_AVAILABLE:
+            try:
+                # Extract metadata from product dict
+                parsed = parse_product_name(product_name)
+                acquisition_date = parsed.get('date')
+                is_s2 = product_name.startswith('S2')
+                
+                if is_s2:
+                    # Sentinel-2 registration
+                    cloud_cover = None
+                    aoi_coverage = None
+                    
+                    # Extract cloud cover from attributes if available
+                    if 'Attributes' in product:
+                        for attr in product.get('Attributes', []):
+                            if attr.get('Name') == 'cloudCover':
+                                try:
+                                    cloud_cover = float(attr.get('Value', 0))
+                                except:
+                                    pass
+                    
+                    if acquisition_date:
+                        product_id = register_s2_download(
+                            scene_id=product_name,
+                            acquisition_date=acquisition_date,
+                            file_path=extracted_dir,
+                            cloud_cover_percent=cloud_cover
+                        )
+                        
+                        if product_id:
+                            cloud_info = f", cloud_cover={cloud_cover:.1f}%" if cloud_cover else ""
+                            logger.info(f"   💾 Registered S2 in database (id={product_id}{cloud_info})")
+                        else:
+                            logger.warning(f"   ⚠️  Failed to register S2 in database")
+                    else:
+                        logger.warning(f"   ⚠️  Missing date for S2 DB registration")
+                else:
+                    # Sentinel-1 registration
+                    orbit_direction = "UNKNOWN"
+                    track_number = 0  # track_number = relative orbit for Sentinel-1
+
+                    if 'Attributes' in product:
+                        for attr in product.get('Attributes', []):
+                            if attr.get('Name') == 'orbitDirection':
+                                orbit_direction = attr.get('Value', 'UNKNOWN')
+                            elif attr.get('Name') == 'relativeOrbitNumber':
+                                track_number = int(attr.get('Value', 0))
+
+                    if acquisition_date and track_number > 0:
+                        product_id = register_slc_download(
+                            scene_id=product_name,
+                            acquisition_date=acquisition_date,
+                            orbit_direction=orbit_direction,
+                            track_number=track_number,
+                            file_path=extracted_dir
+                        )
+
+                        if product_id:
+                            logger.info(f"   💾 Registered S1 in database (id={product_id}, track={track_number})")
+                        else:
+                            logger.warning(f"   ⚠️  Failed to register S1 in database")
+                    else:
+                        logger.warning(f"   ⚠️  Missing metadata for S1 DB registration (date={acquisition_date}, track={track_number})")
+
+            except Exception as e:
+                # Don't fail download if DB registration fails
+                logger.warning(f"   ⚠️  Could not register in database: {e}")
+
+    except zipfile.BadZipFile:
+        logger.info(f"Error al extraer: archivo .zip corrupto")
+        # Mantener .zip para reanudar/inspección
+        return True
+    except Exception as e:
+        logger.info(f"Error al extraer: {e}")
+        logger.info(f"Archivo .zip conservado en: {output_file}")
+        # No fallar si la extracción falla, el .zip está disponible
+        return True
+
+    return True
+
+
+def prefetch_db_statuses(products: List[Dict]) -> Optional[Dict[str, Dict]]:
+    """
+    Lee de la BD el estado de todos los productos en una consulta por misión
+
+    Returns:
+        {nombre de producto: estado} (los ausentes en BD no aparecen), o None
+        si la BD no está disponible
+    """
+    if not DB_INTEGRATION_AVAILABLE:
+        return None
+
+    names = [p['Name'] for p in products]
+    statuses = get_s2_status_many([n for n in names if n.startswith('S2')])
+    statuses.update(get_slc_status_many([n for n in names if not n.startswith('S2')]))
+    return statuses
+
+
 def download_all_products(
     products: List[Dict],
     auth: CopernicusAuth,
     download_dir: str,
     product_type: str,
     auto_confirm: bool = False,
-    orbit_direction: Optional[str] = None
+    orbit_direction: Optional[str] = None,
+    workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    pipeline_extract: bool = False,
+    subswaths: Optional[List[str]] = None,
+    polarisations: Optional[List[str]] = None
 ) -> Dict:
-    """Descarga todos los productos seleccionados"""
+    """
+    Descarga todos los productos seleccionados
+
+    Con workers > 1 los productos se descargan en paralelo (ThreadPoolExecutor)
+    compartiendo una única sesión HTTP con pool de conexiones y el mismo
+    CopernicusAuth (la renovación del token está serializada). Cada worker
+    reanuda su propio .zip parcial mediante cabeceras Range.
+
+    Con pipeline_extract=True la extracción se desacopla de la descarga: cada
+    .zip completado se encola en un worker de extracción dedicado, de modo que
+    el producto N se descomprime mientras el N+1 se descarga. subswaths y
+    polarisations limitan los archivos extraídos (ver select_slc_members).
+    """
 
     os.makedirs(download_dir, exist_ok=True)
+    workers = max(1, min(workers, len(products))) if products else 1
 
     logger.info(f"Directorio: {download_dir}")
     logger.info(f"Productos: {len(products)}")
+    logger.info(f"Descargas simultáneas: {workers}")
+    if pipeline_extract:
+        logger.info("Extracción en pipeline: ACTIVA (descarga y descompresión solapadas)")
+    if subswaths or polarisations:
+        logger.info(f"Extracción parcial: subswaths={subswaths or 'todos'}, pol={polarisations or 'todas'}")
 
     # Saltar confirmación si se usa --yes
     if not auto_confirm:
@@ -1018,18 +1390,90 @@ def download_all_products(
     successful = 0
     failed = 0
     failed_products = []
+    transfer_stats = {'bytes': 0, 'seconds': 0.0}
+    stats_lock = threading.Lock()
+
+    session = create_download_session(pool_size=workers)
+    # Estado en BD de toda la cola en una sola consulta (no una por producto)
+    db_statuses = prefetch_db_statuses(products)
+    # Un único extractor: la descompresión está limitada por disco, no por CPU
+    extractor = ThreadPoolExecutor(max_workers=1) if pipeline_extract else None
+    pending_extractions = {}
+    wall_start = time.time()
+
+    def _download_one(idx: int, product: Dict) -> bool:
+        logger.info(f"[{idx}/{len(products)}] ⬇️  {product['Name']}")
+        product_stats = {}
+        ok = download_product(product, auth, download_dir, session=session,
+                              transfer_stats=product_stats,
+                              extract=not pipeline_extract,
+                              subswaths=subswaths, polarisations=polarisations,
+                              db_statuses=db_statuses)
+        with stats_lock:
+            transfer_stats['bytes'] += product_stats.get('bytes', 0)
+            transfer_stats['seconds'] += product_stats.get('seconds', 0.0)
+
+        zip_path = os.path.join(download_dir, f"{product['Name']}.zip")
+        if ok and extractor and os.path.exists(zip_path):
+            logger.info(f"[{idx}/{len(products)}] 📦 Encolado para extracción: {product['Name']}")
+            with stats_lock:
+                pending_extractions[product['Name']] = extractor.submit(
+                    extract_downloaded_product, product, download_dir,
+                    subswaths, polarisations
+                )
+            return ok
+
+        status = "✅" if ok else "❌"
+        logger.info(f"[{idx}/{len(products)}] {status} {product['Name']}")
+        return ok
+
+    download_results = {}
+    try:
+        if workers == 1:
+            for idx, product in enumerate(products, 1):
+                logger.info(f"{'='*80}")
+                logger.info(f"[{idx}/{len(products)}]")
+                logger.info(f"{'='*80}")
 
-    for idx, product in enumerate(products, 1):
-        logger.info(f"{'='*80}")
-        logger.info(f"[{idx}/{len(products)}]")
-        logger.info(f"{'='*80}")
+                download_results[product['Name']] = _download_one(idx, product)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(_download_one, idx, product): product
+                    for idx, product in enumerate(products, 1)
+                }
+
+                for future in as_completed(futures):
+                    product = futures[future]
+                    try:
+                        download_results[product['Name']] = future.result()
+                    except Exception as e:
+                        logger.error(f"❌ Excepción descargando {product['Name']}: {e}")
+                        download_results[product['Name']] = False
 
-        if download_product(product, auth, download_dir):
+        # Esperar a las extracciones pendientes del pipeline
+        if pending_extractions:
+            logger.info(f"⏳ Esperando {len(pending_extractions)} extracciones pendientes...")
+        for name, future in pending_extractions.items():
+            try:
+                download_results[name] = future.result()
+            except Exception as e:
+                logger.error(f"❌ Excepción extrayendo {name}: {e}")
+                download_results[name] = False
+    finally:
+        session.close()
+        if extractor:
+            extractor.shutdown(wait=True)
+
+    for product in products:
+        if download_results.get(product['Name']):
             successful += 1
         else:
             failed += 1
             failed_products.append(product['Name'])
 
+    wall_time = time.time() - wall_start
+
     # Resumen
     logger.info("" + "="*80)
     logger.info("RESUMEN")
@@ -1037,6 +1481,11 @@ def download_all_products(
     logger.info(f"✅ Exitosas: {successful}")
     logger.info(f"❌ Fallidas: {failed}")
 
+    downloaded_gb = transfer_stats['bytes'] / (1024**3)
+    aggregate_mb_s = (transfer_stats['bytes'] / (1024**2)) / wall_time if wall_time > 0 else 0
+    logger.info(f"📶 Descargado: {downloaded_gb:.2f} GB en {wall_time/60:.1f} min "
+                f"(throughput agregado: {aggregate_mb_s:.1f} MB/s, {workers} workers)")
+
     if failed_products:
         logger.info("❌ Productos fallidos:")
         for name in failed_products[:10]:
@@ -1057,6 +1506,10 @@ def download_all_products(
             'total_products': len(products),
             'successful': successful,
             'failed': failed,
+            'workers': workers,
+            'pipeline_extract': pipeline_extract,
+            'downloaded_bytes': transfer_stats['bytes'],
+            'wall_time_seconds': round(wall_time, 1),
             'products': products
         }, f, indent=2, ensure_ascii=False)
     logger.info(f"📋 Metadata: {metadata_file}")
@@ -1064,7 +1517,9 @@ def download_all_products(
     return {
         "successful": successful,
         "failed": failed,
-        "failed_products": failed_products
+        "failed_products": failed_products,
+        "downloaded_bytes": transfer_stats['bytes'],
+        "wall_time_seconds": wall_time
     }
 
 
@@ -1180,9 +1635,8 @@ def is_slc_fully_processed(product_name: str, repository: InSARRepository, orbit
     for orbit_dir in orbit_directions:
         for subswath in ['IW1', 'IW2', 'IW3']:
             track_dir = repository.get_track_dir(orbit_dir, subswath, track)
-            metadata_file = track_dir / 'metadata.json'
 
-            if not metadata_file.exists():
+            if not repository.has_track(orbit_dir, subswath, track):
                 continue
 
             try:
@@ -1222,7 +1676,8 @@ def calculate_missing_slcs_for_complete_processing(
     subswaths: List[str] = ['IW1', 'IW2', 'IW3'],
     repo_base_dir: str = "data/processed_products",
     required_short_pairs: int = 2,
-    required_long_pairs: int = 2
+    required_long_pairs: int = 2,
+    remote_probe: Optional[RemoteSLCProbe] = None
 ) -> Dict:
     """
     Calcula qué SLCs se necesitan descargar para completar el procesamiento.
@@ -1239,6 +1694,9 @@ def calculate_missing_slcs_for_complete_processing(
         repo_base_dir: Directorio del repositorio
         required_short_pairs: Número de pares short requeridos por fecha (default: 2)
         required_long_pairs: Número de pares long requeridos por fecha (default: 2)
+        remote_probe: Si se indica, para cada subswath solo se consideran las
+            fechas cuyo SLC tiene algún burst de ese subswath sobre el AOI
+            (inspección remota, sin descargar)
     
     Returns:
         Dict con información de SLCs necesarios por subswath/track
@@ -1274,23 +1732,30 @@ def calculate_missing_slcs_for_complete_processing(
     
     for subswath in subswaths:
         logger.info(f"\n--- Analizando {subswath} ---")
+
+        # Fechas disponibles con datos reales en este subswath
+        swath_available = available_dates
+        if remote_probe:
+            swath_available = {
+                date: entry for date, entry in available_dates.items()
+                if remote_probe.covers(entry['product'], subswath)
+            }
+            logger.info(f"  Fechas con bursts de {subswath} sobre el AOI: "
+                        f"{len(swath_available)}/{len(available_dates)}")
+        swath_dates = sorted(swath_available.keys())
         
         # Buscar tracks con productos procesados para este subswath
         orbit_short = orbit_direction.lower()[:4]
         subswath_lower = subswath.lower()
-        orbit_subswath_dir = repository.repo_base_dir / f"{orbit_short}_{subswath_lower}"
+        tracks = repository.list_tracks(orbit_direction, subswath)
         
-        if not orbit_subswath_dir.exists():
-            logger.info(f"  No existe directorio para {orbit_short}_{subswath_lower}")
+        if not tracks:
+            logger.info(f"  No hay tracks en el catálogo para {orbit_direction} {subswath}")
             continue
         
-        track_dirs = sorted(orbit_subswath_dir.glob("t*"))
-        
-        for track_dir in track_dirs:
-            track_num = int(track_dir.name[1:])
-            metadata = repository.load_metadata(orbit_direction, subswath, track_num)
-            
-            stats = metadata.get('statistics', {})
+        for track_summary in tracks:
+            track_num = track_summary['track']
+            stats = track_summary['statistics']
             if stats.get('total_insar_short', 0) == 0 and stats.get('total_insar_long', 0) == 0:
                 continue
             
@@ -1301,7 +1766,7 @@ def calculate_missing_slcs_for_complete_processing(
             pairs_by_date = defaultdict(lambda: {'short': [], 'long': []})
             processed_dates = set()
             
-            for p in metadata['insar_products']:
+            for p in repository.find_insar_pairs(orbit_direction, subswath, track_num):
                 master_date = p['master_date']
                 slave_date = p['slave_date']
                 pair_type = p['pair_type']
@@ -1317,7 +1782,7 @@ def calculate_missing_slcs_for_complete_processing(
             logger.info(f"    Fechas procesadas: {len(processed_dates)}")
             
             # Calcular fechas faltantes y pares incompletos
-            missing_dates = set(all_dates) - processed_dates
+            missing_dates = set(swath_dates) - processed_dates
             incomplete_dates = []
             
             for date in sorted(processed_dates):
@@ -1345,13 +1810,13 @@ def calculate_missing_slcs_for_complete_processing(
             
             # 1. Añadir fechas completamente faltantes
             for date in missing_dates:
-                if date in available_dates:
+                if date in swath_available:
                     needed_slcs.add(date)
             
             # 2. Añadir fechas para completar pares incompletos
             for item in incomplete_dates:
                 date = item['date']
-                date_idx = all_dates.index(date) if date in all_dates else -1
+                date_idx = swath_dates.index(date) if date in swath_dates else -1
                 
                 if date_idx == -1:
                     continue
@@ -1359,23 +1824,23 @@ def calculate_missing_slcs_for_complete_processing(
                 # Para pares short (6 días), necesitamos fecha-1 y fecha+1
                 if item['short_missing'] > 0:
                     if date_idx > 0:
-                        needed_slcs.add(all_dates[date_idx - 1])
-                    if date_idx < len(all_dates) - 1:
-                        needed_slcs.add(all_dates[date_idx + 1])
+                        needed_slcs.add(swath_dates[date_idx - 1])
+                    if date_idx < len(swath_dates) - 1:
+                        needed_slcs.add(swath_dates[date_idx + 1])
                 
                 # Para pares long (12 días), necesitamos fecha-2 y fecha+2
                 if item['long_missing'] > 0:
                     if date_idx > 1:
-                        needed_slcs.add(all_dates[date_idx - 2])
-                    if date_idx < len(all_dates) - 2:
-                        needed_slcs.add(all_dates[date_idx + 2])
+                        needed_slcs.add(swath_dates[date_idx - 2])
+                    if date_idx < len(swath_dates) - 2:
+                        needed_slcs.add(swath_dates[date_idx + 2])
             
             # Filtrar SLCs que ya están procesados
             needed_slcs_final = []
             for date in sorted(needed_slcs):
                 if date not in processed_dates:
-                    if date in available_dates:
-                        needed_slcs_final.append(available_dates[date]['product'])
+                    if date in swath_available:
+                        needed_slcs_final.append(swath_available[date]['product'])
             
             if needed_slcs_final:
                 logger.info(f"    ✓ SLCs necesarios: {len(needed_slcs_final)}")
@@ -1398,7 +1863,8 @@ def calculate_missing_slcs_for_complete_processing(
 def filter_products_for_complete_processing(
     products: List[Dict],
     orbit_direction: Optional[str] = None,
-    repo_base_dir: str = "data/processed_products"
+    repo_base_dir: str = "data/processed_products",
+    remote_probe: Optional[RemoteSLCProbe] = None
 ) -> Tuple[List[Dict], Dict]:
     """
     Filtra productos para descargar solo lo necesario para completar el procesamiento.
@@ -1407,6 +1873,7 @@ def filter_products_for_complete_processing(
         products: Lista de productos disponibles
         orbit_direction: Dirección de órbita
         repo_base_dir: Directorio base del repositorio
+        remote_probe: Sonda remota opcional (ver calculate_missing_slcs_for_complete_processing)
     
     Returns:
         Tuple de (productos_a_descargar, info_detallada)
@@ -1418,7 +1885,8 @@ def filter_products_for_complete_processing(
     analysis = calculate_missing_slcs_for_complete_processing(
         products,
         orbit_direction,
-        repo_base_dir=repo_base_dir
+        repo_base_dir=repo_base_dir,
+        remote_probe=remote_probe
     )
     
     if not analysis:
@@ -1509,6 +1977,20 @@ Ejemplos:
                        help='Desactivar modo inteligente (complete-processing). Por defecto el modo inteligente está ACTIVO.')
     parser.add_argument('--repo-dir', default='data/processed_products',
                        help='Directorio del repositorio de productos procesados (default: data/processed_products)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_DOWNLOAD_WORKERS,
+                       help=f'Descargas simultáneas (default: {DEFAULT_DOWNLOAD_WORKERS}, límite CDSE por usuario)')
+    parser.add_argument('--pipeline-extract', action='store_true',
+                       help='Extraer cada .zip en un worker dedicado mientras se descarga el siguiente')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='No usar la caché local de búsquedas del catálogo')
+    parser.add_argument('--cache-ttl-hours', type=float, default=DEFAULT_TTL_HOURS,
+                       help=f'Validez de la caché del catálogo en horas (default: {DEFAULT_TTL_HOURS})')
+    parser.add_argument('--remote-probe', action='store_true',
+                       help='Inspeccionar los SLC remotamente (HTTP Range) y filtrar por cobertura real de bursts antes de descargar')
+    parser.add_argument('--subswaths', type=lambda v: [s.strip().upper() for s in v.split(',') if s.strip()],
+                       help='Extraer solo estos subswaths (ej: IW1,IW2). Por defecto: todos')
+    parser.add_argument('--polarisations', type=lambda v: [p.strip().upper() for p in v.split(',') if p.strip()],
+                       help='Extraer solo estas polarizaciones (ej: VV). Por defecto: todas')
 
     args = parser.parse_args()
 
@@ -1599,7 +2081,8 @@ Ejemplos:
         start_date=start_date,
         end_date=end_date,
         orbit_direction=args.orbit_direction,
-        aoi_name=BBOX.get('aoi_name', 'AOI') if BBOX else None
+        aoi_name=BBOX.get('aoi_name', 'AOI') if BBOX else None,
+        cache=None if args.no_cache else CatalogueCache(CATALOGUE_CACHE_DIR, args.cache_ttl_hours)
     )
 
     if not products:
@@ -1616,13 +2099,24 @@ Ejemplos:
             logger.info(f"  Ningún producto coincide con los satélites seleccionados: {', '.join(args.satellites)}")
             return 1
 
+    # Sonda remota de bursts (solo SLC, requiere AOI)
+    remote_probe = None
+    if args.remote_probe and BBOX and args.collection == "SENTINEL-1" and args.product_type == "SLC":
+        remote_probe = RemoteSLCProbe(
+            auth, BBOX, ZIPPER_API,
+            session=create_download_session(),
+            polarisation=(args.polarisations or ['VV'])[0]
+        )
+        logger.info("🛰️  Sonda remota ACTIVA: cobertura por burst vía HTTP Range")
+
     # Filtrar por cobertura del AOI si está disponible
     if BBOX:
         products = filter_products_by_coverage(
             products,
             BBOX,
             min_coverage_pct=args.min_coverage,
-            verbose=True
+            verbose=True,
+            remote_probe=remote_probe
         )
 
         if not products:
@@ -1684,7 +2178,8 @@ Ejemplos:
             products_to_download, analysis = filter_products_for_complete_processing(
                 products,
                 orbit_direction=args.orbit_direction,
-                repo_base_dir=args.repo_dir
+                repo_base_dir=args.repo_dir,
+                remote_probe=remote_probe
             )
             
             # Marcar productos en la lista de display
@@ -1776,7 +2271,10 @@ Ejemplos:
         return 0
 
     # Descargar (download_dir ya está definido arriba)
-    stats = download_all_products(products, auth, download_dir, args.product_type, args.yes, args.orbit_direction)
+    stats = download_all_products(products, auth, download_dir, args.product_type, args.yes,
+                                  args.orbit_direction, workers=args.workers,
+                                  pipeline_extract=args.pipeline_extract,
+                                  subswaths=args.subswaths, polarisations=args.polarisations)
 
     return 0 if stats['failed'] == 0 else 1
 
@@ -14,18 +14,23 @@ Fecha: 2025-11-15
 """
 
 import argparse
+import hashlib
+import json
 import logging
 import os
 import re
 import sys
+import tempfile
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from io import BytesIO
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Set
 
 import requests
 import xmltodict
+from requests.adapters import HTTPAdapter
 # importar las credenciales desde un archivo .env externo si existe
 from dotenv import load_dotenv
 
@@ -54,18 +59,208 @@ ESA_ORBITS_URL = 'https://step.esa.int/auxdata/orbits/Sentinel-1/{product}/{sate
 
 HTTP_TIMEOUT = 30
 
+# Descargas de órbitas simultáneas (ficheros de ~4 MB, dominados por latencia)
+DEFAULT_ORBIT_WORKERS = 8
+
+# Índice persistente de órbitas ya presentes en SNAP y caché de listados remotos
+LOCAL_INDEX_FILE = os.path.join(ORBITS_DIR, "local_index.json")
+LISTING_CACHE_DIR = os.path.join(ORBITS_DIR, ".listing_cache")
+
+# Listados de meses recientes: POEORB se publica ~20 días después, pueden cambiar
+LISTING_TTL = timedelta(hours=6)
+# Pasado este margen desde el fin de mes, el listado ya no cambia (caché permanente)
+LISTING_STABLE_AFTER = timedelta(days=30)
+
+ORBIT_LINK_PATTERN = re.compile(
+    r'<a href="(S1\w_OPER_AUX_(POE|RES)ORB_OPOD_\d{8}T\d{6}_V\d{8}T\d{6}_\d{8}T\d{6}.EOF.zip)">'
+)
+
+# Fecha de adquisición de un SLC: S1A_IW_SLC__1SDV_20250928T055322_...
+SLC_NAME_PATTERN = re.compile(r'(S1[ABC])_\w{2}_SLC__\w{4}_(\d{8})T\d{6}_')
+
 # Offset para determinar cobertura temporal de órbitas RESORB
 OFFSET_START = timedelta(hours=1)
 OFFSET_END = timedelta(hours=1)
 
 
+def orbit_dates_covered(orbit_filename: str, product: str) -> List[str]:
+    """
+    Fechas (YYYY-MM-DD) cubiertas por un archivo de órbita según su nombre
+
+    Formato: S1A_OPER_AUX_POEORB_OPOD_20240222T070809_V20240201T225942_20240203T005942.EOF[.zip]
+
+    Raises:
+        ValueError: Si el nombre no se puede parsear o el producto es desconocido
+    """
+    base = orbit_filename
+    for suffix in ('.zip', '.EOF'):
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    parts = base.split('_')
+    start_time_str = parts[6][1:]  # Remover 'V' inicial
+    stop_time_str = parts[7]
+
+    start_time_dt = datetime.strptime(start_time_str, '%Y%m%dT%H%M%S')
+    stop_time_dt = datetime.strptime(stop_time_str, '%Y%m%dT%H%M%S')
+    interval = stop_time_dt - start_time_dt
+
+    # Determinar fechas cubiertas por esta órbita
+    if product == 'POEORB':
+        # POEORB cubre un día completo
+        if interval.days != 1:
+            raise ValueError(f"POEORB debería cubrir 1 día, cubre {interval.days}")
+        date_dts = [start_time_dt + timedelta(days=1)]
+    else:
+        raise ValueError(f"Producto desconocido: {product}")
+
+    return list(set([date_dt.strftime('%Y-%m-%d') for date_dt in date_dts]))
+
+
+def create_orbit_session(pool_size: int = DEFAULT_ORBIT_WORKERS) -> requests.Session:
+    """Sesión HTTP con pool de conexiones reutilizable entre hilos de descarga"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class LocalOrbitIndex:
+    """
+    Índice persistente de las órbitas presentes en el directorio de SNAP.
+
+    Guarda, por directorio <producto>/<satélite>/<año>/<mes>, su mtime y los
+    ficheros .EOF que contiene. Un directorio solo se vuelve a listar si su
+    mtime cambió, de modo que no hay que recorrer todo el árbol en cada
+    ejecución.
+    """
+
+    def __init__(self, snap_base: Path, index_file: str = LOCAL_INDEX_FILE):
+        self.snap_base = Path(snap_base)
+        self.index_file = index_file
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def files(self, product: str, satellite: str, year: int, month: int) -> List[str]:
+        """Ficheros .EOF presentes en un directorio mensual (vacío si no existe)"""
+        key = f"{product}/{satellite}/{year}/{month:02d}"
+        month_dir = self.snap_base / key
+        try:
+            mtime = month_dir.stat().st_mtime
+        except FileNotFoundError:
+            if self.entries.pop(key, None) is not None:
+                self.dirty = True
+            return []
+
+        entry = self.entries.get(key)
+        if entry is None or entry.get('mtime') != mtime:
+            entry = {
+                'mtime': mtime,
+                'files': sorted(p.name for p in month_dir.glob('*.EOF') if p.stat().st_size > 0)
+            }
+            self.entries[key] = entry
+            self.dirty = True
+        return entry['files']
+
+    def covered_dates(self, product: str, satellite: str, months: Set[Tuple[int, int]]) -> Set[str]:
+        """Fechas con órbita local en los directorios mensuales indicados"""
+        dates = set()
+        for year, month in months:
+            for filename in self.files(product, satellite, year, month):
+                try:
+                    dates.update(orbit_dates_covered(filename, product))
+                except ValueError:
+                    continue
+        return dates
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.index_file), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_file)
+        self.dirty = False
+
+
+def list_remote_orbits(
+    session: requests.Session,
+    url: str,
+    year: int,
+    month: int,
+    cache_dir: Optional[str] = LISTING_CACHE_DIR
+) -> List[str]:
+    """
+    Lista los archivos de órbita de un directorio mensual remoto, con caché en disco.
+
+    Los meses cerrados hace más de LISTING_STABLE_AFTER se cachean de forma
+    permanente; los recientes durante LISTING_TTL.
+
+    Raises:
+        requests.exceptions.HTTPError: Si el servidor responde con error (p.ej. 404)
+    """
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            fetched_at = datetime.fromisoformat(cached['fetched_at'])
+            next_month = datetime(year + (month == 12), month % 12 + 1, 1)
+            stable = fetched_at - next_month > LISTING_STABLE_AFTER
+            if stable or datetime.now() - fetched_at < LISTING_TTL:
+                return cached['files']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with session.get(url, timeout=HTTP_TIMEOUT) as response:
+        response.raise_for_status()
+        orbit_files = [m.group(1) for m in ORBIT_LINK_PATTERN.finditer(response.text)]
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'fetched_at': datetime.now().isoformat(), 'files': orbit_files}, f)
+        os.replace(tmp_path, cache_path)
+
+    return orbit_files
+
+
+def slc_dates_from_dirs(slc_dirs: List[str]) -> Dict[str, Set[str]]:
+    """
+    Fechas de adquisición de los SLC (.SAFE o .zip) presentes en uno o más directorios
+
+    Returns:
+        Dict {satélite: {'YYYY-MM-DD', ...}}
+    """
+    needed = {}
+    for slc_dir in slc_dirs:
+        if not os.path.isdir(slc_dir):
+            logger.warning(f"⚠️  Directorio SLC no encontrado: {slc_dir}")
+            continue
+        for name in os.listdir(slc_dir):
+            match = SLC_NAME_PATTERN.search(name)
+            if match:
+                date = datetime.strptime(match.group(2), '%Y%m%d').strftime('%Y-%m-%d')
+                needed.setdefault(match.group(1), set()).add(date)
+    return needed
+
+
 def download_orbit_file(
     satellite: str,
     product: str,
     orbit_filename: str,
     year: str,
     month: str,
-    base_url: str
+    base_url: str,
+    session: Optional[requests.Session] = None
 ) -> Tuple[bool, Optional[str], List[str]]:
     """
     Descarga un archivo de órbita individual directamente al directorio de SNAP
@@ -77,26 +272,8 @@ def download_orbit_file(
     snap_base = get_snap_orbits_dir()
 
     # Parsear nombre de órbita para determinar cobertura temporal
-    # Formato: S1A_OPER_AUX_POEORB_OPOD_20240222T070809_V20240201T225942_20240203T005942.EOF.zip
     try:
-        parts = orbit_filename[:-8].split('_')  # Remover .EOF.zip
-        start_time_str = parts[6][1:]  # Remover 'V' inicial
-        stop_time_str = parts[7]
-
-        start_time_dt = datetime.strptime(start_time_str, '%Y%m%dT%H%M%S')
-        stop_time_dt = datetime.strptime(stop_time_str, '%Y%m%dT%H%M%S')
-        interval = stop_time_dt - start_time_dt
-
-        # Determinar fechas cubiertas por esta órbita
-        if product == 'POEORB':
-            # POEORB cubre un día completo
-            assert interval.days == 1, f"POEORB debería cubrir 1 día, cubre {interval.days}"
-            date_dts = [start_time_dt + timedelta(days=1)]
-        else:
-            return False, f"Producto desconocido: {product}", []
-
-        dates_covered = list(set([date_dt.strftime('%Y-%m-%d') for date_dt in date_dts]))
-
+        dates_covered = orbit_dates_covered(orbit_filename, product)
     except Exception as e:
         return False, f"Error parseando nombre de órbita: {e}", []
 
@@ -113,9 +290,10 @@ def download_orbit_file(
 
     # Descargar archivo
     url = f"{base_url}/{orbit_filename}"
+    http = session or requests
 
     try:
-        with requests.get(url, timeout=HTTP_TIMEOUT) as response:
+        with http.get(url, timeout=HTTP_TIMEOUT) as response:
             response.raise_for_status()
 
             # Verificar que sea un ZIP válido
@@ -185,94 +363,150 @@ def download_orbits_for_period(
     satellite: str,
     orbit_type: str,
     start_date: datetime,
-    end_date: datetime
+    end_date: datetime,
+    needed_dates: Optional[Set[str]] = None,
+    workers: int = DEFAULT_ORBIT_WORKERS,
+    session: Optional[requests.Session] = None,
+    local_index: Optional[LocalOrbitIndex] = None,
+    base_url_template: str = ESA_ORBITS_URL,
+    listing_cache_dir: Optional[str] = LISTING_CACHE_DIR
 ) -> Dict:
     """
     Descarga órbitas para un satélite y periodo específico
+
+    Antes de tocar la red consulta el índice local (LocalOrbitIndex) y solo
+    descarga las fechas que faltan. Con needed_dates se limita a las fechas
+    de los SLC de la serie. Los listados mensuales remotos se cachean en disco
+    y los archivos se descargan en paralelo con una sesión HTTP compartida.
     """
     logger.info(f"\nDescargando órbitas {orbit_type} para {satellite}")
     logger.info(f"   Periodo: {start_date.date()} → {end_date.date()}")
 
-    # Determinar meses a cubrir
-    months_to_download = set()
-    current = start_date.replace(day=1)
-    end_month = end_date.replace(day=1)
+    if needed_dates is not None:
+        needed_dates = {d for d in needed_dates
+                        if start_date.date() <= datetime.strptime(d, '%Y-%m-%d').date() <= end_date.date()}
+        if not needed_dates:
+            logger.info("   Ningún SLC de la serie en el periodo")
+            return {'satellite': satellite, 'product': orbit_type, 'downloaded': 0, 'present': 0, 'errors': 0}
 
-    while current <= end_month:
-        months_to_download.add((current.year, current.month))
-        # Avanzar al siguiente mes
-        if current.month == 12:
-            current = current.replace(year=current.year + 1, month=1)
-        else:
-            current = current.replace(month=current.month + 1)
+    # Determinar meses a cubrir. Una órbita de día D tiene validez desde D-1,
+    # así que para fechas concretas se revisa también el mes del día anterior
+    months_to_download = set()
+    if needed_dates is not None:
+        for date_str in needed_dates:
+            date = datetime.strptime(date_str, '%Y-%m-%d')
+            for day in (date, date - timedelta(days=1)):
+                months_to_download.add((day.year, day.month))
+    else:
+        current = start_date.replace(day=1)
+        end_month = end_date.replace(day=1)
+
+        while current <= end_month:
+            months_to_download.add((current.year, current.month))
+            # Avanzar al siguiente mes
+            if current.month == 12:
+                current = current.replace(year=current.year + 1, month=1)
+            else:
+                current = current.replace(month=current.month + 1)
 
     logger.info(f"   Meses a revisar: {len(months_to_download)}")
 
-    total_downloaded = 0
+    # Fechas ya disponibles en SNAP (sin peticiones HTTP)
+    local_index = local_index or LocalOrbitIndex(get_snap_orbits_dir())
+    present_dates = local_index.covered_dates(orbit_type, satellite, months_to_download)
+    local_index.save()
+
+    if needed_dates is not None:
+        missing_dates = needed_dates - present_dates
+        logger.info(f"   Fechas SLC: {len(needed_dates)}, ya con órbita: {len(needed_dates) - len(missing_dates)}")
+        if not missing_dates:
+            logger.info("   ✅ Todas las órbitas necesarias ya están disponibles")
+            return {'satellite': satellite, 'product': orbit_type, 'downloaded': 0,
+                    'present': len(needed_dates), 'errors': 0}
+
+    session = session or create_orbit_session(workers)
     total_errors = 0
+    pending = []
 
     for year, month in sorted(months_to_download):
-        url = ESA_ORBITS_URL.format(
+        url = base_url_template.format(
             product=orbit_type,
             satellite=satellite,
             year=year,
             month=month
         )
 
-        logger.info(f"\n   📅 {year}-{month:02d}")
-
         try:
-            # Obtener lista de archivos disponibles
-            with requests.get(url, timeout=HTTP_TIMEOUT) as response:
-                response.raise_for_status()
-                lines = response.text.splitlines()
-
-                # Parsear HTML para extraer archivos de órbita
-                pattern = r'<a href="(S1\w_OPER_AUX_(POE|RES)ORB_OPOD_\d{8}T\d{6}_V\d{8}T\d{6}_\d{8}T\d{6}.EOF.zip)">'
-
-                orbit_files = []
-                for line in lines:
-                    match = re.search(pattern, line)
-                    if match:
-                        orbit_files.append(match.group(1))
-
-                logger.info(f"      Archivos disponibles: {len(orbit_files)}")
-
-                # Descargar cada archivo de órbita
-                for orbit_file in orbit_files:
-                    success, error, dates = download_orbit_file(
-                        satellite=satellite,
-                        product=orbit_type,
-                        orbit_filename=orbit_file,
-                        year=str(year),
-                        month=str(month),
-                        base_url=url
-                    )
-
-                    if success:
-                        total_downloaded += 1
-                    elif error:
-                        total_errors += 1
-                        if "XML corrupto" in error:
-                            logger.warning(f"      ⚠️  {orbit_file}: {error}")
-                            logger.warning(f"          Servidor devolvió archivo corrupto - reintenta más tarde")
-                        else:
-                            logger.info(f"      Error en {orbit_file}: {error}")
-
+            orbit_files = list_remote_orbits(session, url, year, month, listing_cache_dir)
         except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                logger.info(f"      No hay órbitas disponibles para este mes")
+            if e.response is not None and e.response.status_code == 404:
+                logger.info(f"   📅 {year}-{month:02d}: no hay órbitas disponibles para este mes")
             else:
-                logger.info(f"      Error HTTP {e.response.status_code}: {e}")
+                logger.info(f"   📅 {year}-{month:02d}: error HTTP {e}")
                 total_errors += 1
+            continue
         except Exception as e:
-            logger.info(f"      Error: {e}")
+            logger.info(f"   📅 {year}-{month:02d}: error {e}")
             total_errors += 1
+            continue
+
+        selected = []
+        for orbit_file in orbit_files:
+            try:
+                dates = set(orbit_dates_covered(orbit_file, orbit_type))
+            except ValueError:
+                continue
+            if dates <= present_dates:
+                continue
+            if needed_dates is not None and not dates & missing_dates:
+                continue
+            selected.append(orbit_file)
+
+        logger.info(f"   📅 {year}-{month:02d}: {len(orbit_files)} disponibles, {len(selected)} a descargar")
+        pending.extend((orbit_file, year, month, url) for orbit_file in selected)
+
+    total_downloaded = 0
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as executor:
+            futures = {
+                executor.submit(
+                    download_orbit_file,
+                    satellite=satellite,
+                    product=orbit_type,
+                    orbit_filename=orbit_file,
+                    year=str(year),
+                    month=str(month),
+                    base_url=url,
+                    session=session
+                ): orbit_file
+                for orbit_file, year, month, url in pending
+            }
+
+            for future in as_completed(futures):
+                orbit_file = futures[future]
+                success, error, dates = future.result()
+
+                if success:
+                    total_downloaded += 1
+                elif error:
+                    total_errors += 1
+                    if "XML corrupto" in error:
+                        logger.warning(f"      ⚠️  {orbit_file}: {error}")
+                        logger.warning(f"          Servidor devolvió archivo corrupto - reintenta más tarde")
+                    else:
+                        logger.info(f"      Error en {orbit_file}: {error}")
+
+    if needed_dates is not None:
+        still_missing = needed_dates - local_index.covered_dates(orbit_type, satellite, months_to_download)
+        local_index.save()
+        if still_missing:
+            logger.warning(f"   ⚠️  Sin órbita {orbit_type} publicada para: {', '.join(sorted(still_missing))}")
 
     return {
         'satellite': satellite,
         'product': orbit_type,
         'downloaded': total_downloaded,
+        'present': len(present_dates),
         'errors': total_errors
     }
 
@@ -289,6 +523,9 @@ Ejemplos:
 
   # Descargar para múltiples satélites
   python3 download_orbits.py --satellite S1A S1B --product POEORB --start-date 2025-01-01
+
+  # Solo las fechas de los SLC descargados (sin fechas: se toman de los SLC)
+  python3 download_orbits.py --satellite S1A S1C --slc-dir data/sentinel1_slc
         """
     )
 
@@ -302,6 +539,15 @@ Ejemplos:
     parser.add_argument('--end-date', help='Fecha fin (YYYY-MM-DD)')
     parser.add_argument('--log-dir', default='logs',
                        help='Directorio donde guardar logs (default: logs/)')
+    parser.add_argument('--slc-dir', nargs='+', metavar='DIR',
+                       help='Descargar solo las órbitas de las fechas de los SLC de estos directorios')
+    parser.add_argument('--workers', type=int, default=DEFAULT_ORBIT_WORKERS,
+                       help=f'Descargas simultáneas (default: {DEFAULT_ORBIT_WORKERS})')
+    parser.add_argument('--base-url', default=ESA_ORBITS_URL,
+                       help='Plantilla de URL del servidor de órbitas '
+                            '({product}, {satellite}, {year}, {month:02}); útil para espejos locales')
+    parser.add_argument('--no-listing-cache', action='store_true',
+                       help='No usar la caché de listados remotos')
 
     args = parser.parse_args()
 
@@ -320,17 +566,52 @@ Ejemplos:
     logger.info("="*80)
 
     satellites = args.satellite
-    start_date = datetime.strptime(args.start_date, '%Y-%m-%d')
-    end_date = datetime.strptime(args.end_date, '%Y-%m-%d')
 
-    # Descargar órbitas
+    # Fechas que necesitan los SLC de la serie (opcional)
+    needed = slc_dates_from_dirs(args.slc_dir) if args.slc_dir else None
+    if needed is not None:
+        all_dates = sorted(d for dates in needed.values() for d in dates)
+        logger.info(f"SLCs encontrados: {len(all_dates)} fechas en {len(needed)} satélites")
+        if not all_dates:
+            logger.info("✅ No hay SLCs: nada que descargar")
+            return 0
+        if not satellites:
+            satellites = sorted(needed)
+
+    if not satellites:
+        parser.error('--satellite es obligatorio si no se indica --slc-dir')
+
+    if args.start_date:
+        start_date = datetime.strptime(args.start_date, '%Y-%m-%d')
+    elif needed is not None:
+        start_date = datetime.strptime(all_dates[0], '%Y-%m-%d')
+    else:
+        parser.error('--start-date es obligatorio si no se indica --slc-dir')
+
+    if args.end_date:
+        end_date = datetime.strptime(args.end_date, '%Y-%m-%d')
+    elif needed is not None:
+        end_date = datetime.strptime(all_dates[-1], '%Y-%m-%d')
+    else:
+        end_date = datetime.now()
+
+    # Descargar órbitas (sesión e índice local compartidos entre satélites)
+    session = create_orbit_session(args.workers)
+    local_index = LocalOrbitIndex(get_snap_orbits_dir())
+
     results = []
     for satellite in satellites:
         result = download_orbits_for_period(
             satellite=satellite,
             orbit_type=args.orbit_type,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            needed_dates=needed.get(satellite, set()) if needed is not None else None,
+            workers=args.workers,
+            session=session,
+            local_index=local_index,
+            base_url_template=args.base_url,
+            listing_cache_dir=None if args.no_listing_cache else LISTING_CACHE_DIR
         )
         results.append(result)
 
@@ -343,7 +624,8 @@ Ejemplos:
     total_errors = sum(r['errors'] for r in results)
 
     for result in results:
-        logger.info(f"{result['satellite']}: {result['downloaded']} descargados, {result['errors']} errores")
+        logger.info(f"{result['satellite']}: {result['downloaded']} descargados, "
+                    f"{result['present']} fechas ya presentes, {result['errors']} errores")
 
     # Determinar directorio de SNAP usando función común
     snap_dir = get_snap_orbits_dir()
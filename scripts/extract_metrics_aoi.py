@@ -20,6 +20,9 @@ import sys
 import tempfile
 from pathlib import Path
 
+sys.path.insert(0, os.path.dirname(__file__))
+from gpt_scheduler import run_gpt
+
 
 def find_gpt():
     """Encuentra el ejecutable GPT de SNAP"""
@@ -156,13 +159,12 @@ def execute_gpt(xml_content, gpt_path, description, timeout=600):
         xml_file = f.name
     
     try:
-        cmd = [gpt_path, xml_file]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=timeout
+        result = run_gpt(
+            xml_file,
+            job_class='metrics',
+            timeout=timeout,
+            label=description,
+            gpt_path=gpt_path
         )
         
         os.unlink(xml_file)
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Script: gpt_scheduler.py
+Descripción: Planificador central de ejecuciones de SNAP gpt con presupuesto de RAM y núcleos
+
+Todas las llamadas a gpt del proyecto (subset, InSAR, SAR, fusión de bursts,
+polarimetría, métricas) pasan por run_gpt(). Cada llamada pertenece a una
+clase de trabajo que fija sus parámetros -c (caché de tiles) y -q (hilos) y
+la memoria que reserva del presupuesto del nodo.
+
+El presupuesto se comparte entre TODOS los procesos del nodo mediante un
+fichero de reservas con bloqueo (fcntl): dos series lanzadas a la vez
+esperan turno en lugar de saturar la memoria. Las reservas de procesos
+muertos se descartan automáticamente.
+
+Cada trabajo registra tiempo de espera, tiempo de ejecución y pico de RSS
+(suma del árbol de procesos gpt/java) en logs/gpt_jobs.jsonl.
+
+Configuración (variables de entorno):
+    GOSHAWK_GPT_MEMORY_GB   RAM disponible para gpt (default: 80% de la RAM física)
+    GOSHAWK_GPT_CORES       Núcleos disponibles para gpt (default: todos)
+    GOSHAWK_GPT_LEDGER      Fichero de reservas compartido (default: /tmp/goshawk_gpt_budget.json)
+    GOSHAWK_GPT_JOB_LOG     Registro de trabajos (default: logs/gpt_jobs.jsonl)
+
+Uso:
+    from gpt_scheduler import run_gpt
+    result = run_gpt(xml_file, job_class='insar_pair', timeout=7200)
+    result.returncode, result.stderr, result.wall_time_s, result.peak_rss_mb
+
+    python scripts/gpt_scheduler.py --status       # presupuesto y trabajos en curso
+    python scripts/gpt_scheduler.py --history 50   # últimos trabajos y resumen por clase
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Sin fcntl (Windows) el presupuesto solo se coordina dentro del proceso
+    FCNTL_AVAILABLE = False
+
+sys.path.insert(0, os.path.dirname(__file__))
+from common_utils import find_gpt
+
+logger = logging.getLogger(__name__)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+
+LEDGER_FILE = os.environ.get('GOSHAWK_GPT_LEDGER', '/tmp/goshawk_gpt_budget.json')
+JOB_LOG_FILE = os.environ.get('GOSHAWK_GPT_JOB_LOG', os.path.join(parent_dir, 'logs', 'gpt_jobs.jsonl'))
+
+# Fracción de la RAM física asignable a gpt si no se fija GOSHAWK_GPT_MEMORY_GB
+DEFAULT_MEMORY_FRACTION = 0.8
+
+# Intervalo de sondeo mientras se espera presupuesto y de muestreo de RSS
+WAIT_POLL_SECONDS = 2.0
+RSS_SAMPLE_SECONDS = 1.0
+
+# Clases de trabajo: caché de tiles (-c), hilos (-q) y memoria reservada (GB).
+# La reserva incluye la caché más la sobrecarga de la JVM; si el pico de RSS
+# medido la supera se avisa en el log para reajustarla.
+JOB_CLASSES = {
+    'subset': {'cache': '4G', 'threads': 2, 'memory_gb': 6},
+    'insar_pair': {'cache': '8G', 'threads': 8, 'memory_gb': 14},
+    'insar_stack': {'cache': '16G', 'threads': 8, 'memory_gb': 24},
+    'sar': {'cache': '8G', 'threads': 4, 'memory_gb': 12},
+    'slice_assembly': {'cache': '16G', 'threads': 4, 'memory_gb': 22},
+    'polarimetry': {'cache': '4G', 'threads': 8, 'memory_gb': 8},
+    'metrics': {'cache': '2G', 'threads': 2, 'memory_gb': 4},
+    'default': {'cache': '4G', 'threads': 4, 'memory_gb': 8},
+}
+
+
+def get_budget() -> Dict:
+    """
+    Presupuesto de recursos del nodo para gpt
+
+    Returns:
+        Dict con memory_gb y cores
+    """
+    memory_gb = os.environ.get('GOSHAWK_GPT_MEMORY_GB')
+    if memory_gb:
+        memory_gb = float(memory_gb)
+    else:
+        try:
+            physical = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 ** 3)
+        except (ValueError, OSError, AttributeError):
+            physical = 16.0
+        memory_gb = physical * DEFAULT_MEMORY_FRACTION
+
+    cores = os.environ.get('GOSHAWK_GPT_CORES')
+    cores = int(cores) if cores else (os.cpu_count() or 4)
+
+    return {'memory_gb': round(memory_gb, 1), 'cores': cores}
+
+
+def job_spec(job_class: str, budget: Optional[Dict] = None) -> Dict:
+    """
+    Parámetros de una clase de trabajo, limitados al presupuesto del nodo
+
+    Un trabajo nunca pide más que el presupuesto completo, de modo que
+    siempre puede ejecutarse (solo) aunque el nodo sea pequeño.
+    """
+    if job_class not in JOB_CLASSES:
+        logger.warning(f"Clase de trabajo gpt desconocida '{job_class}', usando 'default'")
+        job_class = 'default'
+    budget = budget or get_budget()
+    spec = dict(JOB_CLASSES[job_class], job_class=job_class)
+    spec['threads'] = max(1, min(spec['threads'], budget['cores']))
+    spec['memory_gb'] = min(spec['memory_gb'], budget['memory_gb'])
+    return spec
+
+
+def max_concurrent_jobs(job_class: str) -> int:
+    """Trabajos de una clase que caben a la vez en el presupuesto del nodo (mínimo 1)"""
+    budget = get_budget()
+    spec = job_spec(job_class, budget)
+    by_memory = int(budget['memory_gb'] // spec['memory_gb']) if spec['memory_gb'] else budget['cores']
+    by_cores = budget['cores'] // spec['threads']
+    return max(1, min(by_memory, by_cores))
+
+
+class ResourceLedger:
+    """
+    Reservas de RAM/núcleos compartidas entre procesos a través de un fichero JSON bloqueado
+
+    Estructura: {"<pid>-<id>": {"pid", "job_class", "memory_gb", "cores", "label", "since"}}
+    """
+
+    _thread_lock = threading.Lock()
+
+    def __init__(self, path: str = LEDGER_FILE):
+        self.path = path
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if not FCNTL_AVAILABLE:
+                state = getattr(self, '_memory_state', {})
+                yield state
+                self._memory_state = state
+                return
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a+', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    content = f.read()
+                    try:
+                        state = json.loads(content) if content.strip() else {}
+                    except ValueError:
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _prune(state: Dict) -> None:
+        """Elimina reservas de procesos que ya no existen"""
+        for job_id in list(state):
+            try:
+                os.kill(state[job_id]['pid'], 0)
+            except ProcessLookupError:
+                del state[job_id]
+            except (PermissionError, KeyError, TypeError):
+                continue
+
+    def try_reserve(self, job_id: str, spec: Dict, budget: Dict, label: str = '') -> bool:
+        """Reserva recursos si caben en el presupuesto (o si no hay nada en ejecución)"""
+        with self._locked() as state:
+            self._prune(state)
+            used_memory = sum(r['memory_gb'] for r in state.values())
+            used_cores = sum(r['cores'] for r in state.values())
+            fits = (used_memory + spec['memory_gb'] <= budget['memory_gb'] and
+                    used_cores + spec['threads'] <= budget['cores'])
+            if state and not fits:
+                return False
+            state[job_id] = {
+                'pid': os.getpid(),
+                'job_class': spec['job_class'],
+                'memory_gb': spec['memory_gb'],
+                'cores': spec['threads'],
+                'label': label,
+                'since': datetime.now().isoformat(timespec='seconds')
+            }
+            return True
+
+    def release(self, job_id: str) -> None:
+        with self._locked() as state:
+            state.pop(job_id, None)
+
+    def snapshot(self) -> Dict:
+        with self._locked() as state:
+            self._prune(state)
+            return dict(state)
+
+
+def _process_tree_rss_kb(pid: int) -> int:
+    """Suma de VmRSS (KB) de un proceso y sus descendientes (Linux /proc)"""
+    total = 0
+    pending = [pid]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f'/proc/{current}/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+                        break
+            task_dir = f'/proc/{current}/task'
+            for tid in os.listdir(task_dir):
+                with open(os.path.join(task_dir, tid, 'children'), 'r') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class _RSSSampler(threading.Thread):
+    """Muestrea periódicamente el RSS del árbol de procesos de gpt y guarda el pico"""
+
+    def __init__(self, pid: int):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak_kb = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self.peak_kb = max(self.peak_kb, _process_tree_rss_kb(self.pid))
+            self._stop_event.wait(RSS_SAMPLE_SECONDS)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join(timeout=5)
+
+
+class GPTResult(subprocess.CompletedProcess):
+    """CompletedProcess de gpt con métricas del planificador"""
+
+    def __init__(self, args, returncode, stdout, stderr, job_class: str,
+                 wait_time_s: float, wall_time_s: float, peak_rss_mb: Optional[float]):
+        super().__init__(args, returncode, stdout, stderr)
+        self.job_class = job_class
+        self.wait_time_s = wait_time_s
+        self.wall_time_s = wall_time_s
+        self.peak_rss_mb = peak_rss_mb
+
+
+def _record_job(entry: Dict) -> None:
+    """Añade un trabajo al registro JSONL (una línea por trabajo)"""
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(JOB_LOG_FILE)), exist_ok=True)
+        with open(JOB_LOG_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    except OSError as e:
+        logger.debug(f"No se pudo registrar el trabajo gpt: {e}")
+
+
+def run_gpt(
+    xml_file: str,
+    job_class: str = 'default',
+    timeout: Optional[float] = None,
+    label: Optional[str] = None,
+    extra_args: Optional[List[str]] = None,
+    gpt_path: Optional[str] = None,
+    ledger: Optional[ResourceLedger] = None
+) -> GPTResult:
+    """
+    Ejecuta un grafo con gpt cuando hay presupuesto de RAM y núcleos disponible
+
+    Args:
+        xml_file: Grafo XML de SNAP
+        job_class: Clase de trabajo (ver JOB_CLASSES), fija -c/-q y la memoria reservada
+        timeout: Timeout de ejecución en segundos (sin contar la espera en cola)
+        label: Descripción corta para logs y registro (p.ej. nombre del par)
+        extra_args: Argumentos adicionales para gpt
+        gpt_path: Ejecutable gpt (por defecto common_utils.find_gpt())
+        ledger: Reservas a usar (por defecto el fichero compartido del nodo)
+
+    Returns:
+        GPTResult (returncode, stdout, stderr, wall_time_s, peak_rss_mb...)
+
+    Raises:
+        subprocess.TimeoutExpired: Si gpt supera el timeout (el árbol de procesos se termina)
+    """
+    budget = get_budget()
+    spec = job_spec(job_class, budget)
+    ledger = ledger or ResourceLedger()
+    label = label or os.path.basename(str(xml_file))
+
+    cmd = [gpt_path or find_gpt() or 'gpt', str(xml_file), '-c', spec['cache'], '-q', str(spec['threads'])]
+    if extra_args:
+        cmd.extend(extra_args)
+
+    job_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    queued_at = time.monotonic()
+    waiting_logged = False
+    while not ledger.try_reserve(job_id, spec, budget, label):
+        if not waiting_logged:
+            logger.info(f"  ⏳ gpt en cola ({spec['job_class']}, {spec['memory_gb']:.0f} GB): "
+                        f"esperando presupuesto de RAM/núcleos")
+            waiting_logged = True
+        time.sleep(WAIT_POLL_SECONDS)
+    wait_time = time.monotonic() - queued_at
+
+    status = 'error'
+    stdout = stderr = None
+    returncode = None
+    sampler = None
+    start = time.monotonic()
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True  # gpt lanza una JVM hija: terminar el grupo completo
+        )
+        sampler = _RSSSampler(process.pid)
+        sampler.start()
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            status = 'timeout'
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            stdout, stderr = process.communicate()
+            raise subprocess.TimeoutExpired(cmd, timeout, output=stdout, stderr=stderr)
+        returncode = process.returncode
+        status = 'success' if returncode == 0 else 'failed'
+    finally:
+        wall_time = time.monotonic() - start
+        if sampler is not None:
+            sampler.stop()
+        ledger.release(job_id)
+
+        peak_rss_mb = sampler.peak_kb / 1024 if sampler is not None and sampler.peak_kb else None
+        _record_job({
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'job_class': spec['job_class'],
+            'label': label,
+            'cache': spec['cache'],
+            'threads': spec['threads'],
+            'reserved_gb': spec['memory_gb'],
+            'status': status,
+            'returncode': returncode,
+            'wait_time_s': round(wait_time, 1),
+            'wall_time_s': round(wall_time, 1),
+            'peak_rss_mb': round(peak_rss_mb, 1) if peak_rss_mb else None
+        })
+
+    if peak_rss_mb and peak_rss_mb > spec['memory_gb'] * 1024:
+        logger.warning(f"  ⚠️  gpt ({spec['job_class']}) superó su reserva: pico RSS "
+                       f"{peak_rss_mb / 1024:.1f} GB > {spec['memory_gb']:.0f} GB")
+
+    rss_info = f", pico RSS {peak_rss_mb / 1024:.1f} GB" if peak_rss_mb else ""
+    logger.debug(f"gpt {spec['job_class']} [{label}]: {wall_time:.0f}s (cola {wait_time:.0f}s{rss_info})")
+
+    return GPTResult(cmd, returncode, stdout, stderr, spec['job_class'], wait_time, wall_time, peak_rss_mb)
+
+
+def load_job_history(limit: Optional[int] = None) -> List[Dict]:
+    """Últimos trabajos registrados en JOB_LOG_FILE"""
+    if not os.path.exists(JOB_LOG_FILE):
+        return []
+    jobs = []
+    with open(JOB_LOG_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                jobs.append(json.loads(line))
+            except ValueError:
+                continue
+    return jobs[-limit:] if limit else jobs
+
+
+def summarize_jobs(jobs: List[Dict]) -> Dict[str, Dict]:
+    """Resumen por clase: número de trabajos, tiempo medio/máximo y pico de RSS máximo"""
+    summary = {}
+    for job in jobs:
+        entry = summary.setdefault(job.get('job_class', 'default'), {
+            'jobs': 0, 'failed': 0, 'wall_times': [], 'max_peak_rss_mb': 0.0, 'reserved_gb': job.get('reserved_gb')
+        })
+        entry['jobs'] += 1
+        if job.get('status') != 'success':
+            entry['failed'] += 1
+        entry['wall_times'].append(job.get('wall_time_s') or 0.0)
+        entry['max_peak_rss_mb'] = max(entry['max_peak_rss_mb'], job.get('peak_rss_mb') or 0.0)
+
+    for entry in summary.values():
+        times = entry.pop('wall_times')
+        entry['mean_wall_time_s'] = sum(times) / len(times) if times else 0.0
+        entry['max_wall_time_s'] = max(times) if times else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Estado del planificador de gpt (presupuesto, trabajos en curso e historial)'
+    )
+    parser.add_argument('--status', action='store_true',
+                        help='Mostrar presupuesto y reservas activas')
+    parser.add_argument('--history', type=int, metavar='N', nargs='?', const=50,
+                        help='Mostrar los últimos N trabajos y el resumen por clase (default: 50)')
+    args = parser.parse_args()
+
+    if not args.status and args.history is None:
+        args.status = True
+
+    if args.status:
+        budget = get_budget()
+        active = ResourceLedger().snapshot()
+        used_memory = sum(r['memory_gb'] for r in active.values())
+        used_cores = sum(r['cores'] for r in active.values())
+        print(f"Presupuesto gpt: {budget['memory_gb']:.1f} GB, {budget['cores']} núcleos")
+        print(f"En uso: {used_memory:.1f} GB, {used_cores} núcleos ({len(active)} trabajos)")
+        for job_id, r in sorted(active.items(), key=lambda item: item[1].get('since', '')):
+            print(f"  - pid {r['pid']:<7} {r['job_class']:<15} {r['memory_gb']:>5.1f} GB "
+                  f"{r['cores']:>3} hilos  desde {r['since']}  {r.get('label', '')}")
+
+    if args.history is not None:
+        jobs = load_job_history(args.history)
+        print(f"\nÚltimos {len(jobs)} trabajos ({JOB_LOG_FILE}):")
+        for job in jobs:
+            rss = f"{job['peak_rss_mb'] / 1024:.1f} GB" if job.get('peak_rss_mb') else "N/A"
+            print(f"  {job.get('finished_at', '')}  {job.get('job_class', ''):<15} {job.get('status', ''):<8} "
+                  f"{job.get('wall_time_s', 0):>7.0f}s  cola {job.get('wait_time_s', 0):>5.0f}s  "
+                  f"RSS {rss:>8}  {job.get('label', '')}")
+
+        print("\nResumen por clase:")
+        for job_class, entry in sorted(summarize_jobs(jobs).items()):
+            print(f"  {job_class:<15} {entry['jobs']:>4} trabajos ({entry['failed']} fallidos)  "
+                  f"medio {entry['mean_wall_time_s']:.0f}s  máx {entry['max_wall_time_s']:.0f}s  "
+                  f"pico RSS {entry['max_peak_rss_mb'] / 1024:.1f} GB (reserva {entry['reserved_gb']} GB)")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,9 +5,10 @@ Descripción: Gestiona repositorio compartido de productos InSAR y Polarimétric
 
 Estructura:
     data/processed_products/
+    ├── catalog.sqlite      # Catálogo indexado de tracks y productos (fuente de verdad)
     ├── desc_iw1/
     │   └── t088/
-    │       ├── metadata.json
+    │       ├── metadata.json   # Solo si se exporta (--export-json)
     │       ├── insar/
     │       │   ├── short/      # Pares contiguos (1→2, 2→3)
     │       │   └── long/       # Pares saltados (1→3, 2→4)
@@ -24,12 +25,14 @@ Uso:
 
     # Añadir productos al repositorio
     python scripts/insar_repository.py --add-products processing/proyecto/insar_desc_iw1 --orbit DESCENDING --subswath IW1
+
+    # Importar metadata.json existentes al catálogo / regenerarlos desde él
+    python scripts/insar_repository.py --import-json
+    python scripts/insar_repository.py --export-json
 """
 
 import os
-import json
 import re
-import shutil
 import logging
 from pathlib import Path
 from datetime import datetime
@@ -37,6 +40,9 @@ from typing import Dict, List, Optional, Tuple
 from shapely.geometry import shape, Polygon, box
 from shapely import wkt
 
+from product_ingest import DEFAULT_INGEST_WORKERS, INGEST_MODES, ingest_product
+from repository_catalog import CATALOG_FILENAME, RepositoryCatalog, update_metadata_summary
+
 # Database integration (optional - graceful degradation if not available)
 try:
     from db_integration import register_insar_product
@@ -53,11 +59,12 @@ logger = logging.getLogger(__name__)
 class InSARRepository:
     """Gestiona repositorio compartido de productos InSAR y Polarimétricos"""
 
-    def __init__(self, repo_base_dir=None):
+    def __init__(self, repo_base_dir=None, catalog_path=None):
         """
         Args:
             repo_base_dir: Directorio raíz del repositorio (opcional)
                           Si no se especifica, usa data/processed_products desde la raíz del proyecto
+            catalog_path: Fichero SQLite del catálogo (default: <repo>/catalog.sqlite)
         """
         if repo_base_dir is None:
             # Encontrar raíz del proyecto (directorio que contiene scripts/)
@@ -70,6 +77,14 @@ class InSARRepository:
         self.repo_base_dir.mkdir(parents=True, exist_ok=True)
         logger.info(f"Repositorio: {self.repo_base_dir}")
 
+        self.catalog = RepositoryCatalog(catalog_path or self.repo_base_dir / CATALOG_FILENAME)
+
+        # Migración única: importar los metadata.json de versiones anteriores
+        if self.catalog.get_info('json_imported') is None:
+            imported = self.catalog.import_json(self.repo_base_dir)
+            if imported:
+                logger.info(f"Catálogo: importados {imported} metadata.json")
+
     def extract_track_from_slc(self, slc_filename: str) -> Optional[int]:
         """
         Extrae track (órbita relativa) del nombre de archivo SLC Sentinel-1
@@ -170,20 +185,24 @@ class InSARRepository:
         return track_dir
 
     def get_metadata_file(self, orbit_direction: str, subswath: str, track: int) -> Path:
-        """Ruta al archivo metadata.json"""
+        """Ruta al archivo metadata.json (solo se escribe con export_metadata_json)"""
         track_dir = self.get_track_dir(orbit_direction, subswath, track)
         return track_dir / "metadata.json"
 
+    def has_track(self, orbit_direction: str, subswath: str, track: int) -> bool:
+        """True si el track está registrado en el catálogo"""
+        return self.catalog.has_track(orbit_direction, subswath, track)
+
     def load_metadata(self, orbit_direction: str, subswath: str, track: int) -> Dict:
         """
-        Carga metadata del track
+        Carga metadata del track desde el catálogo
 
         Returns:
             Dict con metadata o estructura vacía si no existe
         """
-        metadata_file = self.get_metadata_file(orbit_direction, subswath, track)
+        metadata = self.catalog.load_track(orbit_direction, subswath, track)
 
-        if not metadata_file.exists():
+        if metadata is None:
             return {
                 "track_id": f"{orbit_direction.lower()[:3]}_{subswath.lower()}_t{track:03d}",
                 "orbit": {
@@ -206,54 +225,82 @@ class InSARRepository:
                 }
             }
 
-        with open(metadata_file, 'r') as f:
-            return json.load(f)
+        return metadata
 
     def save_metadata(self, orbit_direction: str, subswath: str, track: int, metadata: Dict):
-        """Guarda metadata actualizada"""
-        metadata_file = self.get_metadata_file(orbit_direction, subswath, track)
-        metadata['processing_info']['last_updated'] = datetime.now().isoformat()
+        """
+        Guarda metadata actualizada en el catálogo (una transacción)
 
-        # Actualizar estadísticas
-        metadata['statistics']['total_insar_short'] = sum(
-            1 for p in metadata['insar_products'] if p.get('pair_type') == 'short'
-        )
-        metadata['statistics']['total_insar_long'] = sum(
-            1 for p in metadata['insar_products'] if p.get('pair_type') == 'long'
-        )
-        metadata['statistics']['total_polarimetry'] = len(metadata['polarimetry_products'])
-        metadata['statistics']['total_size_gb'] = (
-            sum(p['size_gb'] for p in metadata['insar_products']) +
-            sum(p['size_gb'] for p in metadata['polarimetry_products'])
-        )
+        Los productos se fusionan por 'file' con los ya registrados, así que
+        dos series que guardan el mismo track a la vez no pierden productos.
+        """
+        metadata['processing_info']['last_updated'] = datetime.now().isoformat()
 
-        # Actualizar rango temporal
-        dates = set()
-        for p in metadata['insar_products']:
-            dates.add(p['master_date'])
-            dates.add(p['slave_date'])
-        for p in metadata['polarimetry_products']:
-            dates.add(p['date'])
-
-        if dates:
-            sorted_dates = sorted(dates)
-            metadata['temporal_range'] = {
-                'start': sorted_dates[0],
-                'end': sorted_dates[-1],
-                'num_dates': len(sorted_dates)
-            }
+        # Actualizar estadísticas y rango temporal
+        update_metadata_summary(metadata)
 
         # Eliminar campos obsoletos si existen
         metadata.pop('slc_products', None)
         metadata.pop('spatial_coverage', None)
 
-        # Asegurar que existe el directorio
-        metadata_file.parent.mkdir(parents=True, exist_ok=True)
+        self.catalog.save_track(orbit_direction, subswath, track, metadata)
 
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        logger.debug(f"Metadata guardada: {orbit_direction} {subswath} t{track:03d}")
 
-        logger.debug(f"Metadata guardada: {metadata_file}")
+    def _new_track_info(self, orbit_direction: str, subswath: str, track: int) -> Dict:
+        """track_id y processing_info para registrar un track nuevo"""
+        return {
+            'track_id': f"{orbit_direction.lower()[:3]}_{subswath.lower()}_t{track:03d}",
+            'created': datetime.now().isoformat(),
+            'snap_version': "13.0.0"
+        }
+
+    def add_insar_product(self, orbit_direction: str, subswath: str, track: int,
+                          product_info: Dict):
+        """Registra un producto InSAR (dict de _extract_insar_info) sin reescribir el track"""
+        self.catalog.add_insar_products(orbit_direction, subswath, track, [product_info],
+                                        self._new_track_info(orbit_direction, subswath, track))
+
+    def add_polarimetry_product(self, orbit_direction: str, subswath: str, track: int,
+                                product_info: Dict):
+        """Registra un producto polarimétrico (dict de _extract_polarimetry_info)"""
+        self.catalog.add_polarimetry_products(orbit_direction, subswath, track, [product_info],
+                                              self._new_track_info(orbit_direction, subswath, track))
+
+    def find_insar_pairs(self, orbit_direction: str, subswath: str, track: Optional[int] = None,
+                         **filters) -> List[Dict]:
+        """
+        Productos InSAR registrados (consulta indexada en el catálogo)
+
+        Args:
+            **filters: master_date, slave_date, pair_type o date (master o slave)
+        """
+        return self.catalog.find_insar_pairs(orbit_direction, subswath, track, **filters)
+
+    def list_tracks(self, orbit_direction: Optional[str] = None,
+                    subswath: Optional[str] = None,
+                    track: Optional[int] = None) -> List[Dict]:
+        """
+        Tracks del catálogo con estadísticas y rango temporal (sin leer productos)
+
+        Returns:
+            Lista de dicts con orbit_direction, subswath, track, track_dir,
+            statistics y temporal_range (si hay fechas)
+        """
+        summaries = self.catalog.track_summaries(orbit_direction, subswath, track)
+        for summary in summaries:
+            summary['track_dir'] = self.get_track_dir(
+                summary['orbit_direction'], summary['subswath'], summary['track']
+            )
+        return summaries
+
+    def import_metadata_json(self) -> int:
+        """Importa (fusiona) todos los metadata.json del repositorio en el catálogo"""
+        return self.catalog.import_json(self.repo_base_dir)
+
+    def export_metadata_json(self) -> int:
+        """Escribe el metadata.json de cada track a partir del catálogo"""
+        return self.catalog.export_json(self.get_track_dir)
 
     def check_aoi_coverage(self, orbit_direction: str, subswath: str,
                           aoi_wkt: str) -> Optional[Dict]:
@@ -268,27 +315,17 @@ class InSARRepository:
         Returns:
             Dict con track info si encontrado, None si no
         """
-        orbit_short = orbit_direction.lower()[:3]
-        subswath_lower = subswath.lower()
-        orbit_subswath_dir = self.repo_base_dir / f"{orbit_short}_{subswath_lower}"
+        # Tracks registrados (estadísticas calculadas en el catálogo)
+        tracks = self.list_tracks(orbit_direction, subswath)
 
-        if not orbit_subswath_dir.exists():
-            logger.debug(f"No existe: {orbit_subswath_dir}")
-            return None
-
-        # Buscar todos los tracks
-        track_dirs = sorted(orbit_subswath_dir.glob("t*"))
-
-        if not track_dirs:
-            logger.debug(f"No hay tracks en: {orbit_subswath_dir}")
+        if not tracks:
+            logger.debug(f"No hay tracks en el catálogo para {orbit_direction} {subswath}")
             return None
 
         # Buscar track con productos
-        for track_dir in track_dirs:
-            track_num = int(track_dir.name[1:])  # t088 → 88
-            metadata = self.load_metadata(orbit_direction, subswath, track_num)
-
-            stats = metadata.get('statistics', {})
+        for track_summary in tracks:
+            track_num = track_summary['track']
+            stats = track_summary['statistics']
             total_products = (stats.get('total_insar_short', 0) + 
                             stats.get('total_insar_long', 0) + 
                             stats.get('total_polarimetry', 0))
@@ -301,8 +338,8 @@ class InSARRepository:
 
                 return {
                     'track': track_num,
-                    'track_dir': track_dir,
-                    'metadata': metadata,
+                    'track_dir': track_summary['track_dir'],
+                    'metadata': self.load_metadata(orbit_direction, subswath, track_num),
                     'coverage_quality': 'unknown'
                 }
 
@@ -310,9 +347,15 @@ class InSARRepository:
 
     def add_products(self, source_workspace: Path, orbit_direction: str,
                     subswath: str, track: int,
-                    spatial_coverage_wkt: Optional[str] = None) -> Dict:
+                    spatial_coverage_wkt: Optional[str] = None,
+                    ingest_mode: str = 'auto',
+                    workers: int = DEFAULT_INGEST_WORKERS) -> Dict:
         """
-        Copia productos InSAR y Polarimétricos al repositorio
+        Ingresa productos InSAR y Polarimétricos en el repositorio
+
+        Con el mismo sistema de ficheros no se copian datos (reflink/hardlink,
+        o rename con ingest_mode='move'); entre dispositivos se copia en
+        bloques en paralelo. Ver product_ingest.ingest_product().
 
         Args:
             source_workspace: Workspace del proyecto (ej: processing/proyecto/insar_desc_iw1)
@@ -320,24 +363,29 @@ class InSARRepository:
             subswath: 'IW1', 'IW2', 'IW3'
             track: Número de track
             spatial_coverage_wkt: WKT de cobertura (opcional)
+            ingest_mode: 'auto', 'move' o 'copy'
+            workers: Hilos para la copia entre dispositivos
 
         Returns:
             Dict con estadísticas de productos añadidos
         """
         source_workspace = Path(source_workspace)
         track_dir = self.ensure_track_structure(orbit_direction, subswath, track)
-        metadata = self.load_metadata(orbit_direction, subswath, track)
+        insar_added = []
+        polarimetry_added = []
 
         stats = {
             'insar_short_added': 0,
             'insar_long_added': 0,
             'polarimetry_added': 0,
             'insar_skipped': 0,
-            'polarimetry_skipped': 0
+            'polarimetry_skipped': 0,
+            'failed': 0,
+            'methods': {}
         }
 
         # 1. Copiar productos InSAR
-        logger.info(f"\n1. Copiando productos InSAR...")
+        logger.info(f"\n1. Ingresando productos InSAR...")
         source_insar = source_workspace / "fusion" / "insar"
 
         if source_insar.exists():
@@ -352,18 +400,14 @@ class InSARRepository:
                     stats['insar_skipped'] += 1
                     continue
 
-                # Copiar .dim
-                shutil.copy2(dim_file, dest_dim)
-
-                # Copiar .data
-                data_dir = dim_file.with_suffix('.data')
-                if data_dir.exists():
-                    dest_data = dest_dim.with_suffix('.data')
-                    shutil.copytree(data_dir, dest_data, dirs_exist_ok=True)
+                # Ingresar .dim + .data (tamaños verificados)
+                ingest = self._ingest(dim_file, dest_dim, ingest_mode, workers, stats)
+                if ingest is None:
+                    continue
 
                 # Añadir a metadata
-                product_info = self._extract_insar_info(dest_dim, pair_type)
-                metadata['insar_products'].append(product_info)
+                product_info = self._extract_insar_info(dest_dim, pair_type, ingest['size_bytes'])
+                insar_added.append(product_info)
 
                 if pair_type == 'short':
                     stats['insar_short_added'] += 1
@@ -397,7 +441,7 @@ class InSARRepository:
                         logger.debug(f"  Could not register in database: {e}")
 
         # 2. Copiar productos Polarimétricos
-        logger.info(f"\n2. Copiando productos Polarimétricos...")
+        logger.info(f"\n2. Ingresando productos Polarimétricos...")
         source_pol = source_workspace / "fusion" / "polarimetry"
 
         if source_pol.exists():
@@ -418,18 +462,14 @@ class InSARRepository:
                     stats['polarimetry_skipped'] += 1
                     continue
 
-                # Copiar .dim
-                shutil.copy2(dim_file, dest_dim)
-
-                # Copiar .data
-                data_dir = dim_file.with_suffix('.data')
-                if data_dir.exists():
-                    dest_data = dest_dim.with_suffix('.data')
-                    shutil.copytree(data_dir, dest_data, dirs_exist_ok=True)
+                # Ingresar .dim + .data (tamaños verificados)
+                ingest = self._ingest(dim_file, dest_dim, ingest_mode, workers, stats)
+                if ingest is None:
+                    continue
 
                 # Añadir a metadata
-                product_info = self._extract_polarimetry_info(dest_dim, date)
-                metadata['polarimetry_products'].append(product_info)
+                product_info = self._extract_polarimetry_info(dest_dim, date, ingest['size_bytes'])
+                polarimetry_added.append(product_info)
 
                 stats['polarimetry_added'] += 1
                 logger.info(f"  ✓ {date}/{dim_file.name} ({product_info['size_gb']:.2f} GB)")
@@ -475,13 +515,35 @@ class InSARRepository:
                     except Exception as e:
                         logger.debug(f"  Could not register polarimetry in database: {e}")
 
-        # 3. Guardar metadata (estadísticas y temporal_range se actualizan automáticamente en save_metadata)
-        self.save_metadata(orbit_direction, subswath, track, metadata)
+        # 3. Registrar en el catálogo (solo los productos nuevos; estadísticas y
+        #    temporal_range se calculan al leer)
+        track_info = self._new_track_info(orbit_direction, subswath, track)
+        self.catalog.add_insar_products(orbit_direction, subswath, track, insar_added, track_info)
+        self.catalog.add_polarimetry_products(orbit_direction, subswath, track, polarimetry_added, track_info)
 
         return stats
 
-    def _extract_insar_info(self, dim_file: Path, pair_type: str) -> Dict:
-        """Extrae info de producto InSAR"""
+    def _ingest(self, dim_file: Path, dest_dim: Path, ingest_mode: str, workers: int,
+                stats: Dict) -> Optional[Dict]:
+        """ingest_product() con recuento de métodos; None (y aviso) si falla"""
+        try:
+            ingest = ingest_product(dim_file, dest_dim, mode=ingest_mode, workers=workers)
+        except Exception as e:
+            logger.warning(f"  ✗ No se pudo ingresar {dim_file.name}: {e}")
+            stats['failed'] += 1
+            return None
+
+        stats['methods'][ingest['method']] = stats['methods'].get(ingest['method'], 0) + 1
+        return ingest
+
+    def _extract_insar_info(self, dim_file: Path, pair_type: str,
+                            size_bytes: Optional[int] = None) -> Dict:
+        """
+        Extrae info de producto InSAR
+
+        Args:
+            size_bytes: Tamaño ya medido en la ingesta (evita recorrer el .data)
+        """
         basename = dim_file.stem.replace('_LONG', '')
         parts = basename.replace('Ifg_', '').split('_')
 
@@ -497,7 +559,7 @@ class InSARRepository:
         else:
             temporal_baseline_days = 0
 
-        size_gb = self._calculate_size(dim_file)
+        size_gb = self._calculate_size(dim_file, size_bytes)
 
         return {
             'file': f"insar/{pair_type}/{dim_file.name}",
@@ -508,9 +570,10 @@ class InSARRepository:
             'size_gb': size_gb
         }
 
-    def _extract_polarimetry_info(self, dim_file: Path, date: str) -> Dict:
-        """Extrae info de producto polarimétrico"""
-        size_gb = self._calculate_size(dim_file)
+    def _extract_polarimetry_info(self, dim_file: Path, date: str,
+                                  size_bytes: Optional[int] = None) -> Dict:
+        """Extrae info de producto polarimétrico (size_bytes: ver _extract_insar_info)"""
+        size_gb = self._calculate_size(dim_file, size_bytes)
 
         return {
             'file': f"polarimetry/{date}/{dim_file.name}",
@@ -519,8 +582,11 @@ class InSARRepository:
             'size_gb': size_gb
         }
 
-    def _calculate_size(self, dim_file: Path) -> float:
-        """Calcula tamaño total .dim + .data en GB"""
+    def _calculate_size(self, dim_file: Path, size_bytes: Optional[int] = None) -> float:
+        """Calcula tamaño total .dim + .data en GB (usa size_bytes si ya se conoce)"""
+        if size_bytes is not None:
+            return size_bytes / (1024**3)
+
         size_bytes = 0
 
         if dim_file.exists():
@@ -551,23 +617,14 @@ class InSARRepository:
         total_size = 0.0
 
         for orbit, subswath in combinations:
-            orbit_short = orbit.lower()[:3]
-            subswath_lower = subswath.lower()
-            orbit_dir = self.repo_base_dir / f"{orbit_short}_{subswath_lower}"
-
-            if not orbit_dir.exists():
-                continue
+            tracks = self.list_tracks(orbit, subswath)
 
-            track_dirs = sorted(orbit_dir.glob("t*"))
-
-            if track_dirs:
+            if tracks:
                 print(f"\n{orbit:12} {subswath}:")
 
-                for track_dir in track_dirs:
-                    track_num = int(track_dir.name[1:])
-                    metadata = self.load_metadata(orbit, subswath, track_num)
-
-                    stats = metadata.get('statistics', {})
+                for track_summary in tracks:
+                    track_num = track_summary['track']
+                    stats = track_summary['statistics']
                     short = stats.get('total_insar_short', 0)
                     long = stats.get('total_insar_long', 0)
                     pol = stats.get('total_polarimetry', 0)
@@ -581,8 +638,8 @@ class InSARRepository:
 
                         print(f"  Track {track_num:03d}: {short:2}s + {long:2}l InSAR, {pol:2} Pol, {size_gb:6.2f} GB")
 
-                        if metadata.get('temporal_range'):
-                            tr = metadata['temporal_range']
+                        if track_summary.get('temporal_range'):
+                            tr = track_summary['temporal_range']
                             print(f"             {tr['start']} → {tr['end']} ({tr['num_dates']} fechas)")
 
         print("\n" + "-" * 80)
@@ -603,6 +660,15 @@ def main():
     parser.add_argument('--track', type=int, help='Número de track (1-175)')
     parser.add_argument('--add-products', help='Workspace con productos a añadir')
     parser.add_argument('--coverage-wkt', help='WKT de cobertura espacial')
+    parser.add_argument('--ingest-mode', choices=INGEST_MODES, default='auto',
+                        help='auto: reflink/hardlink en el mismo FS, copia en paralelo si no; '
+                             'move: rename + symlink en el workspace; copy: siempre copia (default: auto)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_INGEST_WORKERS,
+                        help=f'Hilos para la copia entre dispositivos (default: {DEFAULT_INGEST_WORKERS})')
+    parser.add_argument('--import-json', action='store_true',
+                        help='Importar (fusionar) los metadata.json de los tracks en el catálogo')
+    parser.add_argument('--export-json', action='store_true',
+                        help='Regenerar metadata.json de cada track desde el catálogo')
 
     args = parser.parse_args()
 
@@ -614,6 +680,16 @@ def main():
         repo.list_repository()
         return 0
 
+    elif args.import_json:
+        imported = repo.import_metadata_json()
+        print(f"\n✓ {imported} metadata.json importados en {repo.catalog.db_path}")
+        return 0
+
+    elif args.export_json:
+        exported = repo.export_metadata_json()
+        print(f"\n✓ {exported} metadata.json escritos desde {repo.catalog.db_path}")
+        return 0
+
     elif args.check_coverage:
         if not args.orbit or not args.subswath:
             print("Error: --check-coverage requiere --orbit y --subswath")
@@ -639,7 +715,9 @@ def main():
             args.orbit,
             args.subswath,
             args.track,
-            args.coverage_wkt
+            args.coverage_wkt,
+            ingest_mode=args.ingest_mode,
+            workers=args.workers
         )
 
         print(f"\n✓ Productos añadidos:")
@@ -647,6 +725,10 @@ def main():
         print(f"  InSAR long: {stats['insar_long_added']} añadidos")
         print(f"  Polarimetría: {stats['polarimetry_added']} añadidos")
         print(f"  Existentes: {stats['insar_skipped'] + stats['polarimetry_skipped']} skipped")
+        if stats['methods']:
+            print(f"  Métodos: {', '.join(f'{m}={n}' for m, n in sorted(stats['methods'].items()))}")
+        if stats['failed']:
+            print(f"  ✗ Fallidos: {stats['failed']}")
         return 0
 
     else:
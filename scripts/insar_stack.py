@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+insar_stack.py
+Modo stack co-registrado para el procesamiento InSAR
+
+En el modo por pares, cada par corto y largo repite Apply-Orbit-File,
+TOPSAR-Split, Back-Geocoding y ESD sobre sus dos productos: cada SLC se
+co-registra unas cuatro veces (dos como master y dos como slave).
+
+En modo stack:
+1. Se elige una referencia única (la adquisición central de la serie).
+2. Todos los SLCs se co-registran UNA vez contra ella en un único grafo
+   (Back-Geocoding multi-producto + ESD) y el stack se cachea en disco.
+3. Cada interferograma (corto o largo) se forma desde el stack con
+   MultiMasterInSAR, sin repetir órbitas, split ni co-registro.
+
+El stack se reutiliza mientras contenga todos los productos de la serie;
+si llegan fechas nuevas se reconstruye.
+
+Requiere SNAP >= 8 (operador MultiMasterInSAR y ESD multi-slave).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+# Importar utilidades comunes
+sys.path.insert(0, os.path.dirname(__file__))
+from processing_utils import (
+    extract_date_from_filename,
+    publish_dimap_product,
+    logger
+)
+from gpt_scheduler import run_gpt
+from split_cache import SplitCache
+
+# SNAP etiqueta las bandas del stack con fechas ddMMMyyyy en inglés
+# (i_VV_mst_05Jan2024, i_VV_slv1_17Jan2024): no depender del locale
+SNAP_MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+STACK_MANIFEST_VERSION = 1
+
+
+def snap_date_tag(date_str: str) -> str:
+    """
+    Convierte una fecha YYYYMMDD[THHMMSS] a la etiqueta de banda de SNAP
+
+    Ejemplo: '20240105T055322' -> '05Jan2024'
+    """
+    date = datetime.strptime(date_str[:8], '%Y%m%d')
+    return f"{date.day:02d}{SNAP_MONTHS[date.month - 1]}{date.year}"
+
+
+def select_stack_reference(slc_products: List[str]) -> str:
+    """
+    Elige la referencia del stack: la adquisición central de la serie
+
+    Minimiza la línea de base temporal máxima contra la referencia y con
+    ello la decorrelación en el co-registro de los extremos.
+    """
+    ordered = sorted(slc_products, key=lambda p: extract_date_from_filename(os.path.basename(p)) or '')
+    return ordered[len(ordered) // 2]
+
+
+def stack_key(slc_products: List[str], subswath: str) -> str:
+    """Identificador estable de un stack (productos + sub-swath)"""
+    names = sorted(os.path.basename(p) for p in slc_products)
+    canonical = json.dumps({'products': names, 'subswath': subswath}, sort_keys=True)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+def create_stack_coregistration_xml(
+    reference_path: Union[Path, str],
+    secondary_paths: List[Union[Path, str]],
+    output_path: Union[Path, str],
+    is_preprocessed: bool = False,
+    subswath: str = 'IW2'
+) -> str:
+    """
+    Crea el XML que co-registra todos los productos contra la referencia
+
+    Para pre-procesados: Read(N) → Back-Geocoding → ESD → Write
+    Para originales: Read(N) → ApplyOrbit(N) → TOPSAR-Split(N) → Back-Geocoding → ESD → Write
+
+    Args:
+        reference_path: Producto de referencia (master del stack)
+        secondary_paths: Resto de productos de la serie
+        output_path: .dim del stack co-registrado
+        is_preprocessed: Si los productos ya tienen órbitas y TOPSAR-Split
+        subswath: Sub-swath a procesar
+    """
+    products = [reference_path] + list(secondary_paths)
+    nodes = []
+    sources = []
+
+    for i, product in enumerate(products):
+        nodes.append(f"""  <node id="Read-{i}">
+    <operator>Read</operator>
+    <sources/>
+    <parameters>
+      <file>{product}</file>
+    </parameters>
+  </node>
+""")
+        last_node = f"Read-{i}"
+
+        if not is_preprocessed:
+            nodes.append(f"""  <node id="Apply-Orbit-File-{i}">
+    <operator>Apply-Orbit-File</operator>
+    <sources>
+      <sourceProduct refid="{last_node}"/>
+    </sources>
+    <parameters>
+      <orbitType>Sentinel Precise (Auto Download)</orbitType>
+      <polyDegree>3</polyDegree>
+      <continueOnFail>false</continueOnFail>
+    </parameters>
+  </node>
+
+  <node id="TOPSAR-Split-{i}">
+    <operator>TOPSAR-Split</operator>
+    <sources>
+      <sourceProduct refid="Apply-Orbit-File-{i}"/>
+    </sources>
+    <parameters>
+      <subswath>{subswath}</subswath>
+      <selectedPolarisations>VV,VH</selectedPolarisations>
+    </parameters>
+  </node>
+""")
+            last_node = f"TOPSAR-Split-{i}"
+
+        tag = 'sourceProduct' if i == 0 else f'sourceProduct.{i}'
+        sources.append(f'      <{tag} refid="{last_node}"/>')
+
+    sources_xml = '\n'.join(sources)
+
+    return f"""<graph id="InSAR_Stack_Coregistration">
+  <version>1.0</version>
+
+{''.join(nodes)}
+  <!-- Co-registro de todo el stack contra la referencia (primer producto) -->
+  <node id="Back-Geocoding">
+    <operator>Back-Geocoding</operator>
+    <sources>
+{sources_xml}
+    </sources>
+    <parameters>
+      <demName>Copernicus 30m Global DEM</demName>
+      <demResamplingMethod>BILINEAR_INTERPOLATION</demResamplingMethod>
+      <resamplingType>BILINEAR_INTERPOLATION</resamplingType>
+      <maskOutAreaWithoutElevation>true</maskOutAreaWithoutElevation>
+      <outputRangeAzimuthOffset>false</outputRangeAzimuthOffset>
+      <outputDerampDemodPhase>false</outputDerampDemodPhase>
+    </parameters>
+  </node>
+
+  <!-- Enhanced Spectral Diversity: mismos parámetros que el modo por pares -->
+  <node id="Enhanced-Spectral-Diversity">
+    <operator>Enhanced-Spectral-Diversity</operator>
+    <sources>
+      <sourceProduct refid="Back-Geocoding"/>
+    </sources>
+    <parameters>
+      <fineWinWidthStr>512</fineWinWidthStr>
+      <fineWinHeightStr>512</fineWinHeightStr>
+      <fineWinAccAzimuth>16</fineWinAccAzimuth>
+      <fineWinAccRange>16</fineWinAccRange>
+      <fineWinOversampling>128</fineWinOversampling>
+      <cohThreshold>0.3</cohThreshold>
+      <numBlocksPerOverlap>10</numBlocksPerOverlap>
+    </parameters>
+  </node>
+
+  <node id="Write">
+    <operator>Write</operator>
+    <sources>
+      <sourceProduct refid="Enhanced-Spectral-Diversity"/>
+    </sources>
+    <parameters>
+      <file>{output_path}</file>
+      <formatName>BEAM-DIMAP</formatName>
+    </parameters>
+  </node>
+
+</graph>"""
+
+
+def create_stack_pair_xml(
+    stack_path: Union[Path, str],
+    master_path: Union[Path, str],
+    slave_path: Union[Path, str],
+    output_path: Union[Path, str],
+    aoi_wkt: Optional[str] = None
+) -> str:
+    """
+    Crea el XML que forma un interferograma desde el stack co-registrado
+
+    Read(stack) → MultiMasterInSAR(par) → Deburst → TopoPhase → Multilook → Terrain → Subset → Write
+
+    La cadena posterior al interferograma es la misma que en el modo por
+    pares, de modo que los productos son intercambiables (bandas Phase_ifg_*
+    y coh_*, multilook 2x1, 10 m).
+
+    Args:
+        stack_path: .dim del stack co-registrado
+        master_path: Producto master del par (solo se usa su fecha)
+        slave_path: Producto slave del par (solo se usa su fecha)
+        output_path: .dim del interferograma
+        aoi_wkt: WKT del AOI para el subset final (opcional)
+    """
+    master_tag = snap_date_tag(extract_date_from_filename(os.path.basename(str(master_path))))
+    slave_tag = snap_date_tag(extract_date_from_filename(os.path.basename(str(slave_path))))
+
+    return f"""<graph id="InSAR_From_Stack">
+  <version>1.0</version>
+
+  <node id="Read-Stack">
+    <operator>Read</operator>
+    <sources/>
+    <parameters>
+      <file>{stack_path}</file>
+    </parameters>
+  </node>
+
+  <!-- Interferograma entre dos fechas cualesquiera del stack (ya co-registradas) -->
+  <node id="MultiMasterInSAR">
+    <operator>MultiMasterInSAR</operator>
+    <sources>
+      <sourceProduct refid="Read-Stack"/>
+    </sources>
+    <parameters>
+      <orbitDegree>3</orbitDegree>
+      <pairs>{master_tag}_{slave_tag}</pairs>
+      <includeWavenumber>false</includeWavenumber>
+      <includeIncidenceAngle>false</includeIncidenceAngle>
+      <includeLatLon>false</includeLatLon>
+      <cohWindowAz>3</cohWindowAz>
+      <cohWindowRg>10</cohWindowRg>
+    </parameters>
+  </node>
+
+  <node id="TOPSAR-Deburst">
+    <operator>TOPSAR-Deburst</operator>
+    <sources>
+      <sourceProduct refid="MultiMasterInSAR"/>
+    </sources>
+    <parameters>
+      <selectedPolarisations>VV,VH</selectedPolarisations>
+    </parameters>
+  </node>
+
+  <node id="TopoPhaseRemoval">
+    <operator>TopoPhaseRemoval</operator>
+    <sources>
+      <sourceProduct refid="TOPSAR-Deburst"/>
+    </sources>
+    <parameters>
+      <demName>Copernicus 30m Global DEM</demName>
+      <tileExtensionPercent>100</tileExtensionPercent>
+      <outputTopoPhaseBand>false</outputTopoPhaseBand>
+      <outputElevationBand>false</outputElevationBand>
+      <outputLatLonBands>false</outputLatLonBands>
+    </parameters>
+  </node>
+
+  <node id="Multilook">
+    <operator>Multilook</operator>
+    <sources>
+      <sourceProduct refid="TopoPhaseRemoval"/>
+    </sources>
+    <parameters>
+      <nRgLooks>2</nRgLooks>
+      <nAzLooks>1</nAzLooks>
+      <outputIntensity>false</outputIntensity>
+      <grSquarePixel>false</grSquarePixel>
+    </parameters>
+  </node>
+
+  <node id="Terrain-Correction">
+    <operator>Terrain-Correction</operator>
+    <sources>
+      <sourceProduct refid="Multilook"/>
+    </sources>
+    <parameters>
+      <demName>Copernicus 30m Global DEM</demName>
+      <demResamplingMethod>BILINEAR_INTERPOLATION</demResamplingMethod>
+      <imgResamplingMethod>BILINEAR_INTERPOLATION</imgResamplingMethod>
+      <pixelSpacingInMeter>10.0</pixelSpacingInMeter>
+      <mapProjection>WGS84(DD)</mapProjection>
+      <alignToStandardGrid>false</alignToStandardGrid>
+      <nodataValueAtSea>true</nodataValueAtSea>
+      <saveDEM>false</saveDEM>
+      <saveLatLon>false</saveLatLon>
+      <saveSelectedSourceBand>true</saveSelectedSourceBand>
+      <applyRadiometricNormalization>true</applyRadiometricNormalization>
+    </parameters>
+  </node>
+
+  <node id="Subset">
+    <operator>Subset</operator>
+    <sources>
+      <sourceProduct refid="Terrain-Correction"/>
+    </sources>
+    <parameters>
+      <geoRegion>{aoi_wkt if aoi_wkt else ''}</geoRegion>
+      <copyMetadata>true</copyMetadata>
+    </parameters>
+  </node>
+
+  <node id="Write">
+    <operator>Write</operator>
+    <sources>
+      <sourceProduct refid="{'Subset' if aoi_wkt else 'Terrain-Correction'}"/>
+    </sources>
+    <parameters>
+      <file>{output_path}</file>
+      <formatName>BEAM-DIMAP</formatName>
+    </parameters>
+  </node>
+
+</graph>"""
+
+
+def load_stack_manifest(stack_dir: Union[Path, str], subswath: str) -> Optional[Dict]:
+    """
+    Carga el manifiesto del último stack co-registrado de un sub-swath
+
+    Returns:
+        Dict con stack, reference, products, dates... o None si no hay stack
+        válido (manifiesto ausente, de otra versión o sin el .dim publicado)
+    """
+    manifest_file = Path(stack_dir) / f"stack_{subswath.lower()}.json"
+    if not manifest_file.exists():
+        return None
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != STACK_MANIFEST_VERSION:
+        return None
+    if not (Path(stack_dir) / manifest.get('stack', '')).is_file():
+        return None
+    return manifest
+
+
+def stack_covers(manifest: Optional[Dict], slc_products: List[str], is_preprocessed: bool) -> bool:
+    """Indica si el stack cacheado contiene todos los productos pedidos"""
+    if not manifest or manifest.get('preprocessed') != is_preprocessed:
+        return False
+    cached = set(manifest.get('products', []))
+    return all(os.path.basename(p) in cached for p in slc_products)
+
+
+def build_coregistered_stack(
+    slc_products: List[str],
+    stack_dir: Union[Path, str],
+    is_preprocessed: bool = False,
+    subswath: str = 'IW2'
+) -> Optional[Dict]:
+    """
+    Co-registra una serie completa contra una referencia única (una sola vez)
+
+    Si ya existe un stack del sub-swath que contiene todos los productos se
+    reutiliza sin ejecutar GPT. El stack se escribe en un directorio de
+    trabajo y se publica de forma atómica junto con su manifiesto.
+
+    Args:
+        slc_products: Productos de la serie (.SAFE o .dim)
+        stack_dir: Directorio de la caché de stacks
+        is_preprocessed: Si los productos ya tienen órbitas y TOPSAR-Split
+        subswath: Sub-swath a procesar
+
+    Returns:
+        Manifiesto del stack (ver load_stack_manifest) con 'path' absoluto,
+        o None si el co-registro falló
+    """
+    stack_dir = Path(stack_dir)
+    stack_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = load_stack_manifest(stack_dir, subswath)
+    if stack_covers(manifest, slc_products, is_preprocessed):
+        logger.info(f"📚 Stack co-registrado reutilizado: {manifest['stack']} "
+                    f"({len(manifest['products'])} fechas, referencia {manifest['reference_date']})")
+        manifest['path'] = str((stack_dir / manifest['stack']).absolute())
+        return manifest
+
+    reference = select_stack_reference(slc_products)
+    secondaries = [p for p in slc_products if p != reference]
+    reference_date = extract_date_from_filename(os.path.basename(reference))[:8]
+    stack_name = f"Stack_{subswath}_{reference_date}_{stack_key(slc_products, subswath)}.dim"
+
+    logger.info(f"📚 Co-registrando stack: {len(slc_products)} productos contra referencia {reference_date}")
+    logger.info(f"  → Tipo: {'Pre-procesado (.dim)' if is_preprocessed else 'Original (requiere TOPSAR-Split)'}")
+
+    work_dir = Path(tempfile.mkdtemp(prefix=".tmp_stack_", dir=stack_dir))
+    work_output = work_dir / stack_name
+
+    # Productos originales: Apply-Orbit + TOPSAR-Split desde la caché de split
+    split_cache = None
+    cached_splits = {}
+    if not is_preprocessed:
+        split_cache = SplitCache()
+        for product in slc_products:
+            cached = split_cache.acquire(product, subswath, consumer='insar_stack')
+            if not cached:
+                break
+            cached_splits[product] = cached
+        if len(cached_splits) < len(slc_products):
+            logger.warning("  ⚠️  Caché de split incompleta - Apply-Orbit + TOPSAR-Split dentro del grafo")
+
+    try:
+        if len(cached_splits) == len(slc_products):
+            xml = create_stack_coregistration_xml(cached_splits[reference],
+                                                  [cached_splits[p] for p in secondaries],
+                                                  work_output, True, subswath)
+        else:
+            xml = create_stack_coregistration_xml(reference, secondaries, work_output, is_preprocessed, subswath)
+        xml_file = work_dir / "stack_coregistration.xml"
+        xml_file.write_text(xml)
+
+        result = run_gpt(
+            str(xml_file),
+            job_class='insar_stack',
+            timeout=4 * 3600,
+            label=f"Stack {subswath} {len(slc_products)} fechas"
+        )
+
+        if result.returncode != 0:
+            logger.error(f"  ✗ Error co-registrando el stack (exit code {result.returncode})")
+            if result.stderr:
+                error_lines = [line for line in result.stderr.strip().split('\n')
+                               if 'Caused by:' in line or 'Error:' in line or 'Exception' in line]
+                for line in error_lines[:10]:
+                    logger.error(f"  {line.strip()}")
+            return None
+
+        if not work_output.exists() or not list(work_output.with_suffix('.data').glob('*.img')):
+            logger.error("  ✗ GPT completó pero el stack no tiene datos raster")
+            return None
+
+        # Publicar el stack nuevo y retirar el anterior del mismo sub-swath
+        publish_dimap_product(work_output, stack_dir / stack_name)
+        if manifest and manifest['stack'] != stack_name:
+            old_stack = stack_dir / manifest['stack']
+            shutil.rmtree(old_stack.with_suffix('.data'), ignore_errors=True)
+            if old_stack.exists():
+                old_stack.unlink()
+
+        manifest = {
+            'version': STACK_MANIFEST_VERSION,
+            'stack': stack_name,
+            'subswath': subswath,
+            'preprocessed': is_preprocessed,
+            'reference': os.path.basename(reference),
+            'reference_date': reference_date,
+            'products': sorted(os.path.basename(p) for p in slc_products),
+            'dates': sorted(extract_date_from_filename(os.path.basename(p))[:8] for p in slc_products),
+            'created_at': datetime.now().isoformat(),
+            'gpt_wall_time_s': getattr(result, 'wall_time_s', None)
+        }
+        manifest_file = stack_dir / f"stack_{subswath.lower()}.json"
+        tmp_manifest = work_dir / manifest_file.name
+        with open(tmp_manifest, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest, manifest_file)
+
+        logger.info(f"  ✅ Stack co-registrado: {stack_name}")
+        manifest['path'] = str((stack_dir / stack_name).absolute())
+        return manifest
+
+    except Exception as e:
+        logger.error(f"  ✗ Error co-registrando el stack: {e}")
+        return None
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        for cached in cached_splits.values():
+            split_cache.release(cached)
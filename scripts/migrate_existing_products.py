@@ -9,6 +9,7 @@ Este script:
 2. Si NO existe: lo copia al repositorio
 3. Elimina el archivo local
 4. Crea symlink desde workspace → repositorio
+5. Registra los pares migrados en la BD (insar_pairs) con un único upsert bulk
 
 Uso:
     python scripts/migrate_existing_products.py <workspace_path> [--dry-run]
@@ -25,6 +26,7 @@ import os
 import sys
 import shutil
 import argparse
+from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
@@ -32,7 +34,10 @@ from typing import Optional
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
 
+from db_integration import init_db
+from db_queries import register_insar_pairs
 from insar_repository import InSARRepository
+from product_ingest import ingest_product
 from logging_utils import LoggerConfig
 
 logger = None
@@ -161,23 +166,12 @@ def migrate_single_product(
                 # Asegurar que existe el directorio destino
                 dest_file.parent.mkdir(parents=True, exist_ok=True)
 
-                # Copiar .dim
-                shutil.copy2(local_file, dest_file)
+                # Ingresar .dim + .data/ (hardlink/reflink en el mismo FS, copia si no)
+                ingest = ingest_product(local_file, dest_file)
 
-                # Copiar .data/
-                if dest_data.exists():
-                    shutil.rmtree(dest_data)
-                shutil.copytree(local_data, dest_data, dirs_exist_ok=True)
-
-                # Actualizar metadata
-                metadata = repository.load_metadata(orbit_direction, subswath, track)
-                product_info = repository._extract_insar_info(dest_file, pair_type)
-
-                # Verificar que no esté ya en metadata (evitar duplicados)
-                existing_files = [p['file'] for p in metadata.get('insar_products', [])]
-                if product_info['file'] not in existing_files:
-                    metadata['insar_products'].append(product_info)
-                    repository.save_metadata(orbit_direction, subswath, track, metadata)
+                # Registrar en el catálogo (upsert por 'file': sin duplicados)
+                product_info = repository._extract_insar_info(dest_file, pair_type, ingest['size_bytes'])
+                repository.add_insar_product(orbit_direction, subswath, track, product_info)
 
                 logger.info(f"    ✓ Copiado al repositorio")
                 stats['copied'] += 1
@@ -227,6 +221,60 @@ def migrate_single_product(
     return stats
 
 
+def register_migrated_pairs(
+    workspace_path: Path,
+    repository: InSARRepository,
+    orbit_direction: str,
+    subswath: str,
+    track: int,
+    migrated: list
+) -> int:
+    """
+    Registra en la BD los pares migrados con una sola transacción
+
+    Los scene_id de master/slave se resuelven por fecha con los SLC del
+    workspace (slc/*.SAFE); los pares sin SLC local se omiten.
+
+    Args:
+        migrated: Lista de (nombre .dim, pair_type) migrados al repositorio
+
+    Returns:
+        Número de pares registrados
+    """
+    scene_by_date = {}
+    for safe in (workspace_path / "slc").glob("S1*.SAFE"):
+        scene_id = safe.name.replace('.SAFE', '')
+        scene_by_date[scene_id.split('_')[5][:8]] = scene_id
+
+    track_dir = repository.get_track_dir(orbit_direction, subswath, track)
+    pairs = []
+    for dim_name, pair_type in migrated:
+        dates = Path(dim_name).stem.replace('_LONG', '').replace('Ifg_', '').split('_')
+        if len(dates) < 2 or dates[0] not in scene_by_date or dates[1] not in scene_by_date:
+            logger.debug(f"  Sin SLC local para registrar {dim_name} en BD")
+            continue
+        master_dt = datetime.strptime(dates[0], '%Y%m%d')
+        slave_dt = datetime.strptime(dates[1], '%Y%m%d')
+        pairs.append({
+            'master_scene_id': scene_by_date[dates[0]],
+            'slave_scene_id': scene_by_date[dates[1]],
+            'pair_type': pair_type,
+            'subswath': subswath,
+            'temporal_baseline_days': abs((slave_dt - master_dt).days),
+            'file_path': str((track_dir / "insar" / pair_type / dim_name).absolute()),
+            'processing_version': '2.0'
+        })
+
+    if not pairs:
+        return 0
+
+    pair_ids = register_insar_pairs(pairs)
+    if pair_ids is None:
+        logger.error(f"❌ No se pudieron registrar {len(pairs)} pares en la BD (transacción revertida)")
+        return 0
+    return len(pair_ids)
+
+
 def migrate_workspace(workspace_path: Path, dry_run: bool = False) -> bool:
     """
     Migra todos los productos de un workspace al repositorio
@@ -283,6 +331,7 @@ def migrate_workspace(workspace_path: Path, dry_run: bool = False) -> bool:
         'already_symlink': 0,
         'error': 0
     }
+    migrated = []
 
     # Migrar productos InSAR SHORT
     insar_short_dir = workspace_path / "insar" / "short"
@@ -294,6 +343,8 @@ def migrate_workspace(workspace_path: Path, dry_run: bool = False) -> bool:
             )
             for key in total_stats:
                 total_stats[key] += stats[key]
+            if stats['error'] == 0:
+                migrated.append((dim_file.name, "short"))
         logger.info("")
 
     # Migrar productos InSAR LONG
@@ -306,6 +357,17 @@ def migrate_workspace(workspace_path: Path, dry_run: bool = False) -> bool:
             )
             for key in total_stats:
                 total_stats[key] += stats[key]
+            if stats['error'] == 0:
+                migrated.append((dim_file.name, "long"))
+        logger.info("")
+
+    # Registrar en BD todos los pares de una vez (en vez de uno por producto)
+    registered = 0
+    if migrated and not dry_run and init_db():
+        logger.info(f"💾 Registrando {len(migrated)} pares en la base de datos...")
+        registered = register_migrated_pairs(
+            workspace_path, repository, orbit_direction, subswath, track, migrated
+        )
         logger.info("")
 
     # Resumen
@@ -315,6 +377,7 @@ def migrate_workspace(workspace_path: Path, dry_run: bool = False) -> bool:
     logger.info(f"Productos copiados al repositorio: {total_stats['copied']}")
     logger.info(f"Productos reemplazados por symlinks: {total_stats['replaced_by_symlink']}")
     logger.info(f"Productos ya eran symlinks: {total_stats['already_symlink']}")
+    logger.info(f"Pares registrados en BD: {registered}")
     logger.info(f"Errores: {total_stats['error']}")
     logger.info("")
 
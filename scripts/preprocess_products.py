@@ -65,7 +65,6 @@ import glob
 import logging
 import os
 import re
-import subprocess
 import sys
 import tempfile
 import xml.etree.ElementTree as ET
@@ -79,6 +78,8 @@ from shapely.geometry import box
 # Agregar directorio scripts al path si es necesario
 sys.path.insert(0, str(Path(__file__).parent))
 from logging_utils import LoggerConfig
+from gpt_scheduler import run_gpt
+from split_cache import SplitCache
 
 # Predefinir nombres de módulos/imports para silenciar advertencias estáticas
 pyroSAR = None
@@ -681,52 +682,16 @@ def subset_product(product_path, aoi_wkt, output_dir, insar_mode=False, subswath
                 # - El Subset geográfico NO funciona en geometría radar (slant-range)
                 # - El subset se debe hacer DESPUÉS de Back-Geocoding en el pipeline InSAR principal
                 # - Aquí solo preparamos productos con estructura de bursts intacta
-                subset_xml = f"""<graph id="SLC_Split_ApplyOrbit_InSAR">
-  <version>1.0</version>
-
-  <node id="Read">
-    <operator>Read</operator>
-    <sources/>
-    <parameters>
-      <file>{product_path}</file>
-    </parameters>
-  </node>
-
-  <node id="TOPSAR-Split">
-    <operator>TOPSAR-Split</operator>
-    <sources>
-      <sourceProduct refid="Read"/>
-    </sources>
-    <parameters>
-      <subswath>{best_subswath}</subswath>
-      <selectedPolarisations>{polarizations}</selectedPolarisations>
-    </parameters>
-  </node>
-
-  <node id="Apply-Orbit-File">
-    <operator>Apply-Orbit-File</operator>
-    <sources>
-      <sourceProduct refid="TOPSAR-Split"/>
-    </sources>
-    <parameters>
-      <orbitType>Sentinel Precise (Auto Download)</orbitType>
-      <polyDegree>3</polyDegree>
-      <continueOnFail>false</continueOnFail>
-    </parameters>
-  </node>
-
-  <node id="Write">
-    <operator>Write</operator>
-    <sources>
-      <sourceProduct refid="Apply-Orbit-File"/>
-    </sources>
-    <parameters>
-      <file>{output_path}</file>
-      <formatName>BEAM-DIMAP</formatName>
-    </parameters>
-  </node>
-
-</graph>"""
+                # El intermedio se genera (o reutiliza) en la caché de split compartida
+                # y el workspace solo recibe un symlink referenciado
+                cache = SplitCache()
+                cached_dim = cache.get_or_create(product_path, best_subswath, polarizations, consumer='preprocess')
+                if not cached_dim:
+                    logger.error(f"  ✗ Error: no se pudo generar el split de {basename[:60]}")
+                    return None
+                cache.link(cached_dim, output_path)
+                logger.info(f"  ✓ Split enlazado desde caché: {output_path}")
+                return output_path
             else:
                 # Para SAR normal: TOPSAR-Split → Subset → TOPSAR-Deburst
                 # CORRECCIÓN CRÍTICA: Subset ANTES de Deburst para evitar artefactos en bordes
@@ -795,11 +760,11 @@ def subset_product(product_path, aoi_wkt, output_dir, insar_mode=False, subswath
         try:
             # Ejecutar GPT
             logger.info(f"  ⚙️  Ejecutando GPT para subset...")
-            result = subprocess.run(
-                ['gpt', xml_file, '-c', '4G'],
-                capture_output=True,
-                text=True,
-                timeout=600  # 10 minutos timeout
+            result = run_gpt(
+                xml_file,
+                job_class='subset',
+                timeout=600,  # 10 minutos timeout
+                label=f"Subset {os.path.basename(output_path)}"
             )
 
             # Verificar que el archivo se creó correctamente
@@ -1332,6 +1297,8 @@ def preprocess_products(product_dir, output_dir, aoi_wkt, product_type='GRD', cr
         logger.info(f"Productos fallidos: {failed}")
         logger.info(f"Total: {len(products)}")
 
+    if insar_mode:
+        logger.info(SplitCache().summary())
     logger.info(f"Productos pre-procesados guardados en: {output_dir}")
     logger.info("")
 
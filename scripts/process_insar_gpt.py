@@ -9,9 +9,10 @@ Workflow InSAR completo usando GPT/XML en lugar de snapista
 
 import os
 import sys
-import subprocess
+import shutil
 import tempfile
 import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional, List, Tuple, Literal, Union
 
@@ -20,10 +21,15 @@ sys.path.insert(0, os.path.dirname(__file__))
 from processing_utils import (
     load_config,
     extract_date_from_filename,
+    publish_dimap_product,
     logger
 )
 from burst_utils import select_representative_bursts
 from insar_repository import InSARRepository
+from product_ingest import ingest_product
+from gpt_scheduler import run_gpt, max_concurrent_jobs
+from insar_stack import build_coregistered_stack, create_stack_pair_xml
+from split_cache import SplitCache
 
 
 def create_insar_workflow_xml(
@@ -32,7 +38,8 @@ def create_insar_workflow_xml(
     output_path: Union[Path, str],
     is_preprocessed: bool = False,
     aoi_wkt: Optional[str] = None,
-    subswath: str = 'IW1'
+    subswath: str = 'IW1',
+    presplit: bool = False
 ) -> str:
     """
     Crea XML para workflow InSAR completo
@@ -49,6 +56,8 @@ def create_insar_workflow_xml(
     Args:
         aoi_wkt: WKT string del AOI para subset geográfico (ej: "POLYGON((lon lat, ...))")
         subswath: Sub-swath a procesar (default: 'IW1', fallback: 'IW2')
+        presplit: Productos originales ya pasados por la caché de split
+            (split_cache.py): se omiten Apply-Orbit-File y TOPSAR-Split
     """
     if is_preprocessed:
         # Workflow para productos pre-procesados (.dim) con --insar-mode
@@ -218,26 +227,13 @@ def create_insar_workflow_xml(
 </graph>"""
     else:
         # Workflow completo para productos SLC originales (.SAFE)
-        xml = f"""<graph id="InSAR_Complete">
-  <version>1.0</version>
-
-  <node id="Read-Master">
-    <operator>Read</operator>
-    <sources/>
-    <parameters>
-      <file>{master_path}</file>
-    </parameters>
-  </node>
-
-  <node id="Read-Slave">
-    <operator>Read</operator>
-    <sources/>
-    <parameters>
-      <file>{slave_path}</file>
-    </parameters>
-  </node>
-
-  <node id="Apply-Orbit-File-Master">
+        # Con presplit los productos vienen de la caché de split (órbitas y
+        # TOPSAR-Split ya aplicados): Read → Back-Geocoding directamente
+        if presplit:
+            orbit_split_nodes = "  <!-- Apply-Orbit-File + TOPSAR-Split servidos por la caché de split -->\n\n"
+            master_source, slave_source = 'Read-Master', 'Read-Slave'
+        else:
+            orbit_split_nodes = f"""  <node id="Apply-Orbit-File-Master">
     <operator>Apply-Orbit-File</operator>
     <sources>
       <sourceProduct refid="Read-Master"/>
@@ -283,11 +279,33 @@ def create_insar_workflow_xml(
     </parameters>
   </node>
 
-  <node id="Back-Geocoding">
+"""
+            master_source, slave_source = 'TOPSAR-Split-Master', 'TOPSAR-Split-Slave'
+
+        xml = f"""<graph id="InSAR_Complete">
+  <version>1.0</version>
+
+  <node id="Read-Master">
+    <operator>Read</operator>
+    <sources/>
+    <parameters>
+      <file>{master_path}</file>
+    </parameters>
+  </node>
+
+  <node id="Read-Slave">
+    <operator>Read</operator>
+    <sources/>
+    <parameters>
+      <file>{slave_path}</file>
+    </parameters>
+  </node>
+
+{orbit_split_nodes}  <node id="Back-Geocoding">
     <operator>Back-Geocoding</operator>
     <sources>
-      <sourceProduct refid="TOPSAR-Split-Master"/>
-      <sourceProduct.1 refid="TOPSAR-Split-Slave"/>
+      <sourceProduct refid="{master_source}"/>
+      <sourceProduct.1 refid="{slave_source}"/>
     </sources>
     <parameters>
       <demName>Copernicus 30m Global DEM</demName>
@@ -499,7 +517,8 @@ def process_pair_with_gpt(
     output_path: Union[Path, str],
     is_preprocessed: bool = False,
     aoi_wkt: Optional[str] = None,
-    configured_subswath: str = 'IW2'
+    configured_subswath: str = 'IW2',
+    stack_path: Optional[str] = None
 ) -> bool:
     """
     Procesa un par InSAR usando GPT con el sub-swath configurado
@@ -508,6 +527,13 @@ def process_pair_with_gpt(
     Esta función NO realiza fallback automático a otros subswaths, ya que
     esto es técnicamente incorrecto según los requisitos de SNAP Back-Geocoding.
 
+    GPT escribe en un directorio de trabajo propio del par (junto a la salida)
+    y el producto solo se publica en output_path tras validarlo, de modo que
+    varios pares pueden procesarse en paralelo y nunca queda un .dim a medias.
+
+    Con productos originales, Apply-Orbit-File + TOPSAR-Split se toman de la
+    caché de split (split_cache.py) en lugar de recalcularse en cada par.
+
     Args:
         master_path: Ruta al producto master
         slave_path: Ruta al producto slave
@@ -515,6 +541,8 @@ def process_pair_with_gpt(
         is_preprocessed: Si los productos ya están preprocesados
         aoi_wkt: AOI en formato WKT (opcional)
         configured_subswath: Sub-swath a usar (IW1/IW2/IW3), default IW2
+        stack_path: Stack co-registrado (modo --stack). Si se indica, el par
+            se forma desde el stack sin repetir órbitas, split ni co-registro
 
     Returns:
         True si el procesamiento fue exitoso, False en caso contrario
@@ -539,11 +567,37 @@ def process_pair_with_gpt(
 
     subswath = configured_subswath
 
+    # Directorio de trabajo del par (mismo sistema de ficheros que la salida)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    work_dir = Path(tempfile.mkdtemp(prefix=f".tmp_{output_path.stem}_", dir=output_path.parent))
+    work_output = work_dir / output_path.name
+
+    # Productos originales: Apply-Orbit + TOPSAR-Split desde la caché de split,
+    # compartida entre pares (cada SLC participa en hasta cuatro pares)
+    split_cache = None
+    cached_splits = []
+    if not is_preprocessed and not stack_path:
+        split_cache = SplitCache()
+        for product in (master_path, slave_path):
+            cached = split_cache.acquire(product, subswath, consumer='insar_pair')
+            if not cached:
+                break
+            cached_splits.append(cached)
+        if len(cached_splits) < 2:
+            logger.warning("  ⚠️  Caché de split no disponible - Apply-Orbit + TOPSAR-Split dentro del grafo")
+
     try:
         logger.info(f"  → Procesando con sub-swath: {subswath}")
 
         # Crear XML
-        xml = create_insar_workflow_xml(master_path, slave_path, output_path, is_preprocessed, aoi_wkt, subswath)
+        if stack_path:
+            xml = create_stack_pair_xml(stack_path, master_path, slave_path, work_output, aoi_wkt)
+        elif len(cached_splits) == 2:
+            xml = create_insar_workflow_xml(cached_splits[0], cached_splits[1], work_output, False, aoi_wkt,
+                                            subswath, presplit=True)
+        else:
+            xml = create_insar_workflow_xml(master_path, slave_path, work_output, is_preprocessed, aoi_wkt, subswath)
 
         # Guardar XML temporal
         with tempfile.NamedTemporaryFile(mode='w', suffix='.xml', delete=False) as tf:
@@ -553,13 +607,16 @@ def process_pair_with_gpt(
         try:
             # Ejecutar GPT
             logger.info("  ⚙️  Ejecutando GPT...")
-            logger.info(f"  → Workflow: {'Pre-procesado' if is_preprocessed else 'Completo'}")
+            if stack_path:
+                logger.info(f"  → Workflow: Desde stack co-registrado ({os.path.basename(stack_path)})")
+            else:
+                logger.info(f"  → Workflow: {'Pre-procesado' if is_preprocessed else 'Completo'}")
 
-            result = subprocess.run(
-                ['gpt', xml_file, '-c', '8G'],
-                capture_output=True,
-                text=True,
-                timeout=7200  # 120 min timeout (InSAR es más lento)
+            result = run_gpt(
+                xml_file,
+                job_class='insar_pair',
+                timeout=7200,  # 120 min timeout (InSAR es más lento)
+                label=f"InSAR {os.path.basename(str(output_path))} {subswath}"
             )
 
             # Validar el resultado
@@ -567,7 +624,7 @@ def process_pair_with_gpt(
                 logger.error(f"  ✗ Error en GPT con {subswath} (exit code {result.returncode})")
                 if result.stderr:
                     # Guardar error completo en archivo para depuración
-                    error_file = f"/tmp/gpt_error_{subswath}_{os.getpid()}.log"
+                    error_file = f"/tmp/gpt_error_{output_path.stem}_{subswath}_{os.getpid()}.log"
                     with open(error_file, 'w') as f:
                         f.write(result.stderr)
                     logger.error(f"  Error completo guardado en: {error_file}")
@@ -587,7 +644,7 @@ def process_pair_with_gpt(
 
             # GPT retornó exit code 0, pero verificar que realmente generó datos
             logger.info("  → Validando salida del procesamiento...")
-            if not validate_insar_output(output_path):
+            if not validate_insar_output(work_output):
                 logger.error(f"  ✗ GPT con {subswath} completó pero no generó datos válidos")
                 logger.error("  Esto puede deberse a:")
                 logger.error("    - Memoria insuficiente durante el procesamiento")
@@ -595,6 +652,7 @@ def process_pair_with_gpt(
                 logger.error("    - Bug en SNAP/GPT")
                 return False
 
+            publish_dimap_product(work_output, output_path)
             logger.info(f"  ✅ Procesamiento exitoso con {subswath}")
             return True
 
@@ -607,6 +665,11 @@ def process_pair_with_gpt(
         logger.error(f"  ✗ Error con {subswath}: {e}")
         return False
 
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        for cached in cached_splits:
+            split_cache.release(cached)
+
 
 def generate_insar_pairs(
     slc_products: List[str],
@@ -936,6 +999,162 @@ def extract_track_number_robust(slc_source, repository):
     return None
 
 
+def process_pending_pair(
+    pair: dict,
+    args,
+    repository: Optional[InSARRepository],
+    track_number: Optional[int],
+    orbit_direction: str,
+    subswath: str,
+    aoi_wkt: Optional[str],
+    db_available: bool,
+    stack_path: Optional[str] = None
+) -> bool:
+    """
+    Procesa un par pendiente y lo registra en repositorio y base de datos
+
+    Se puede ejecutar en paralelo para pares distintos (--jobs): cada par
+    escribe en su propio directorio de trabajo y el registro en el catálogo
+    del repositorio es transaccional.
+
+    Args:
+        pair: Dict con idx, total, master, slave, pair_type, pair_name,
+            output_file, master_date, slave_date, master_scene_id, slave_scene_id
+        args: Argumentos de línea de comandos de main()
+        repository: Repositorio compartido (o None)
+        track_number: Track del repositorio (o None)
+        orbit_direction: Dirección de órbita
+        subswath: Sub-swath configurado
+        aoi_wkt: AOI en WKT (o None)
+        db_available: Si la base de datos está disponible para registrar el par
+        stack_path: Stack co-registrado si se usa el modo --stack
+
+    Returns:
+        True si el par se procesó correctamente
+    """
+    idx, total_pairs = pair['idx'], pair['total']
+    master, slave, pair_type = pair['master'], pair['slave'], pair['pair_type']
+    pair_name, output_file = pair['pair_name'], pair['output_file']
+    master_date, slave_date = pair['master_date'], pair['slave_date']
+    master_scene_id, slave_scene_id = pair['master_scene_id'], pair['slave_scene_id']
+
+    logger.info(f"[{idx}/{total_pairs}] Procesando par: {pair_name} ({pair_type.upper()})")
+    logger.info(f"  Master: {os.path.basename(master)}")
+    logger.info(f"  Slave:  {os.path.basename(slave)}")
+
+    # Auto-detectar si son productos pre-procesados (.dim) o originales (.SAFE)
+    # IMPORTANTE: los productos generados por SliceAssembly tienen 'MERGED' en el nombre
+    # y aunque son .dim, no deben tratarse como pre-procesados (no tienen TOPSAR-Split)
+    basename_master = os.path.basename(master)
+    is_dim = master.endswith('.dim')
+    is_merged = 'MERGED' in basename_master.upper()
+
+    is_preprocessed = args.use_preprocessed or (is_dim and not is_merged)
+
+    if is_preprocessed:
+        logger.info(f"  → Tipo: Pre-procesado (.dim)")
+    else:
+        logger.info(f"  → Tipo: Original (.SAFE) or MERGED (requiere TOPSAR-Split)")
+
+    success = process_pair_with_gpt(master, slave, output_file, is_preprocessed=is_preprocessed, aoi_wkt=aoi_wkt,
+                                    configured_subswath=subswath, stack_path=stack_path)
+
+    if success:
+        logger.info(f"  ✅ Completado: {output_file}")
+
+        # GUARDAR AL REPOSITORIO SI ESTÁ HABILITADO
+        if repository and args.save_to_repository and track_number:
+            try:
+                # Copiar producto al repositorio
+                repo_track_dir = repository.ensure_track_structure(orbit_direction, subswath, track_number)
+                pair_subdir = "long" if pair_type == 'long' else "short"
+                dest_dir = repo_track_dir / "insar" / pair_subdir
+                dest_file = dest_dir / Path(output_file).name
+
+                if not dest_file.exists():
+                    # Ingresar .dim + .data (hardlink/reflink en el mismo FS, copia si no)
+                    ingest = ingest_product(output_file, dest_file)
+
+                    logger.info(f"  📦 Guardado en repositorio: track {track_number}/{pair_subdir}/")
+
+                    # OPTIMIZACIÓN: Reemplazar archivos locales por symlinks para ahorrar espacio
+                    try:
+                        # Verificar que la copia al repositorio fue exitosa
+                        dest_data = dest_file.with_suffix('.data')
+                        if dest_file.exists() and dest_data.exists():
+                            # Calcular tamaño para logging
+                            local_size_mb = Path(output_file).stat().st_size / (1024 * 1024)
+
+                            # Eliminar archivos locales
+                            logger.debug(f"  🗑️  Eliminando producto local para ahorrar espacio...")
+                            local_file = Path(output_file)
+                            local_data = Path(output_file).with_suffix('.data')
+
+                            if local_file.exists() and not local_file.is_symlink():
+                                local_file.unlink()
+                                logger.debug(f"    ✓ Eliminado: {local_file.name}")
+
+                            if local_data.exists() and not local_data.is_symlink():
+                                shutil.rmtree(local_data)
+                                logger.debug(f"    ✓ Eliminado: {local_data.name}/")
+
+                            # Crear symlinks desde workspace → repositorio
+                            local_file.symlink_to(dest_file.absolute())
+                            local_data.symlink_to(dest_data.absolute())
+
+                            logger.info(f"  🔗 Symlinks creados: workspace → repositorio (~{local_size_mb:.0f} MB ahorrados)")
+                        else:
+                            logger.warning(f"  ⚠️  Copia al repositorio incompleta - manteniendo archivos locales")
+                    except Exception as e:
+                        logger.warning(f"  ⚠️  Error creando symlinks: {e}")
+                        logger.warning(f"  Producto guardado en repositorio pero duplicado en workspace")
+
+                    # Registrar en el catálogo (transaccional: varios pares pueden terminar a la vez)
+                    product_info = repository._extract_insar_info(dest_file, pair_type, ingest['size_bytes'])
+                    repository.add_insar_product(orbit_direction, subswath, track_number, product_info)
+                else:
+                    logger.debug(f"  Producto ya existe en repositorio")
+
+            except Exception as e:
+                logger.warning(f"  ⚠️  Error guardando al repositorio: {e}")
+
+        # ISSUE #4: Register InSAR pair in database
+        try:
+            from scripts.db_queries import register_insar_pair
+            from datetime import datetime
+
+            if db_available:
+                # Calculate temporal baseline
+                from datetime import datetime as dt
+                master_dt = dt.strptime(master_date[:8], '%Y%m%d')
+                slave_dt = dt.strptime(slave_date[:8], '%Y%m%d')
+                temporal_baseline_days = abs((slave_dt - master_dt).days)
+
+                pair_id = register_insar_pair(
+                    master_scene_id=master_scene_id,
+                    slave_scene_id=slave_scene_id,
+                    pair_type=pair_type,
+                    subswath=subswath,
+                    temporal_baseline_days=temporal_baseline_days,
+                    file_path=str(Path(output_file).absolute()),
+                    processing_version='2.0'
+                )
+
+                if pair_id:
+                    logger.debug(f"  💾 Registered in database (pair_id={pair_id})")
+                else:
+                    logger.warning(f"  ⚠️  Failed to register pair in database")
+        except ImportError:
+            pass  # DB not available
+        except Exception as e:
+            logger.warning(f"  ⚠️  Error registering in database: {e}")
+
+        return True
+
+    logger.error(f"  ❌ FALLÓ")
+    return False
+
+
 def main() -> int:
     import argparse
 
@@ -952,6 +1171,12 @@ def main() -> int:
                         help='Fecha final (YYYY-MM-DD) - opcional, para compatibilidad')
     parser.add_argument('--no-long-pairs', action='store_true',
                         help='Desactivar generación de pares largos (solo pares consecutivos)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Pares a procesar en paralelo (default: 1). Se limita según el '
+                             'presupuesto de memoria de gpt (gpt_scheduler)')
+    parser.add_argument('--stack', action='store_true',
+                        help='Modo stack: co-registrar cada SLC una sola vez contra una referencia '
+                             'común y formar todos los pares desde el stack cacheado')
     args = parser.parse_args()
 
     logger.info("=" * 80)
@@ -1034,6 +1259,8 @@ def main() -> int:
     failed = 0
     skipped_from_repo = 0
     total_pairs = len(insar_pairs)
+    pending_pairs = []
+    insar_pair_exists = None
 
     for idx, (master, slave, pair_type) in enumerate(insar_pairs, 1):
         master_date = extract_date_from_filename(os.path.basename(master))
@@ -1112,128 +1339,71 @@ def main() -> int:
             except Exception as e:
                 logger.debug(f"  Error consultando repositorio: {e}")
 
-        logger.info(f"[{idx}/{total_pairs}] Procesando par: {pair_name} ({pair_type.upper()})")
-        logger.info(f"  Master: {os.path.basename(master)}")
-        logger.info(f"  Slave:  {os.path.basename(slave)}")
-
-        # Auto-detectar si son productos pre-procesados (.dim) o originales (.SAFE)
-        # IMPORTANTE: los productos generados por SliceAssembly tienen 'MERGED' en el nombre
-        # y aunque son .dim, no deben tratarse como pre-procesados (no tienen TOPSAR-Split)
-        basename_master = os.path.basename(master)
-        is_dim = master.endswith('.dim')
-        is_merged = 'MERGED' in basename_master.upper()
-
-        is_preprocessed = args.use_preprocessed or (is_dim and not is_merged)
-
-        if is_preprocessed:
-            logger.info(f"  → Tipo: Pre-procesado (.dim)")
+        pending_pairs.append({
+            'idx': idx,
+            'total': total_pairs,
+            'master': master,
+            'slave': slave,
+            'pair_type': pair_type,
+            'pair_name': pair_name,
+            'output_file': output_file,
+            'master_date': master_date,
+            'slave_date': slave_date,
+            'master_scene_id': master_scene_id,
+            'slave_scene_id': slave_scene_id
+        })
+
+    # Procesar pares pendientes (en paralelo con --jobs > 1)
+    db_available = getattr(insar_pair_exists, '_db_available', False) if insar_pair_exists else False
+
+    jobs = max(1, args.jobs)
+    memory_limit = max_concurrent_jobs('insar_pair')
+    if jobs > memory_limit:
+        logger.info(f"⚠️  --jobs {jobs} reducido a {memory_limit} por el presupuesto de memoria de gpt")
+        jobs = memory_limit
+    jobs = min(jobs, len(pending_pairs)) if pending_pairs else 1
+
+    if pending_pairs:
+        logger.info(f"\n⚙️  Pares pendientes: {len(pending_pairs)} ({jobs} en paralelo)")
+
+    # Modo stack: co-registro único de la serie antes de formar los pares
+    stack_path = None
+    if args.stack and pending_pairs:
+        series_is_dim = slc_products[0].endswith('.dim')
+        series_is_merged = any('MERGED' in os.path.basename(p).upper() for p in slc_products)
+        series_preprocessed = args.use_preprocessed or (series_is_dim and not series_is_merged)
+
+        stack = build_coregistered_stack(slc_products, os.path.join(output_dir, 'stack'),
+                                         is_preprocessed=series_preprocessed, subswath=subswath)
+        if stack:
+            stack_path = stack['path']
         else:
-            logger.info(f"  → Tipo: Original (.SAFE) or MERGED (requiere TOPSAR-Split)")
-
-        success = process_pair_with_gpt(master, slave, output_file, is_preprocessed=is_preprocessed, aoi_wkt=aoi_wkt, configured_subswath=subswath)
+            logger.warning("⚠️  Stack no disponible - procesando pares con co-registro individual")
 
-        if success:
-            logger.info(f"  ✅ Completado: {output_file}")
+    def run_pair(pair):
+        return process_pending_pair(pair, args, repository, track_number, orbit_direction,
+                                    subswath, aoi_wkt, db_available, stack_path)
 
-            # GUARDAR AL REPOSITORIO SI ESTÁ HABILITADO
-            if repository and args.save_to_repository and track_number:
+    if jobs == 1:
+        for pair in pending_pairs:
+            if run_pair(pair):
+                processed += 1
+            else:
+                failed += 1
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(run_pair, pair): pair for pair in pending_pairs}
+            for future in as_completed(futures):
+                pair = futures[future]
                 try:
-                    # Copiar producto al repositorio
-                    repo_track_dir = repository.ensure_track_structure(orbit_direction, subswath, track_number)
-                    pair_subdir = "long" if pair_type == 'long' else "short"
-                    dest_dir = repo_track_dir / "insar" / pair_subdir
-                    dest_file = dest_dir / Path(output_file).name
-
-                    if not dest_file.exists():
-                        import shutil
-                        # Copiar .dim
-                        shutil.copy2(output_file, dest_file)
-                        # Copiar .data
-                        output_data = Path(output_file).with_suffix('.data')
-                        if output_data.exists():
-                            dest_data = dest_file.with_suffix('.data')
-                            shutil.copytree(output_data, dest_data, dirs_exist_ok=True)
-
-                        logger.info(f"  📦 Guardado en repositorio: track {track_number}/{pair_subdir}/")
-
-                        # OPTIMIZACIÓN: Reemplazar archivos locales por symlinks para ahorrar espacio
-                        try:
-                            # Verificar que la copia al repositorio fue exitosa
-                            dest_data = dest_file.with_suffix('.data')
-                            if dest_file.exists() and dest_data.exists():
-                                # Calcular tamaño para logging
-                                local_size_mb = Path(output_file).stat().st_size / (1024 * 1024)
-
-                                # Eliminar archivos locales
-                                logger.debug(f"  🗑️  Eliminando producto local para ahorrar espacio...")
-                                local_file = Path(output_file)
-                                local_data = Path(output_file).with_suffix('.data')
-
-                                if local_file.exists() and not local_file.is_symlink():
-                                    local_file.unlink()
-                                    logger.debug(f"    ✓ Eliminado: {local_file.name}")
-
-                                if local_data.exists() and not local_data.is_symlink():
-                                    shutil.rmtree(local_data)
-                                    logger.debug(f"    ✓ Eliminado: {local_data.name}/")
-
-                                # Crear symlinks desde workspace → repositorio
-                                local_file.symlink_to(dest_file.absolute())
-                                local_data.symlink_to(dest_data.absolute())
-
-                                logger.info(f"  🔗 Symlinks creados: workspace → repositorio (~{local_size_mb:.0f} MB ahorrados)")
-                            else:
-                                logger.warning(f"  ⚠️  Copia al repositorio incompleta - manteniendo archivos locales")
-                        except Exception as e:
-                            logger.warning(f"  ⚠️  Error creando symlinks: {e}")
-                            logger.warning(f"  Producto guardado en repositorio pero duplicado en workspace")
-
-                        # Actualizar metadata
-                        metadata = repository.load_metadata(orbit_direction, subswath, track_number)
-                        product_info = repository._extract_insar_info(dest_file, pair_type)
-                        metadata['insar_products'].append(product_info)
-                        repository.save_metadata(orbit_direction, subswath, track_number, metadata)
-                    else:
-                        logger.debug(f"  Producto ya existe en repositorio")
-
+                    success = future.result()
                 except Exception as e:
-                    logger.warning(f"  ⚠️  Error guardando al repositorio: {e}")
-
-            # ISSUE #4: Register InSAR pair in database
-            try:
-                from scripts.db_queries import register_insar_pair
-                from datetime import datetime
-
-                if hasattr(insar_pair_exists, '_db_available') and insar_pair_exists._db_available:
-                    # Calculate temporal baseline
-                    from datetime import datetime as dt
-                    master_dt = dt.strptime(master_date[:8], '%Y%m%d')
-                    slave_dt = dt.strptime(slave_date[:8], '%Y%m%d')
-                    temporal_baseline_days = abs((slave_dt - master_dt).days)
-
-                    pair_id = register_insar_pair(
-                        master_scene_id=master_scene_id,
-                        slave_scene_id=slave_scene_id,
-                        pair_type=pair_type,
-                        subswath=subswath,
-                        temporal_baseline_days=temporal_baseline_days,
-                        file_path=str(Path(output_file).absolute()),
-                        processing_version='2.0'
-                    )
-
-                    if pair_id:
-                        logger.debug(f"  💾 Registered in database (pair_id={pair_id})")
-                    else:
-                        logger.warning(f"  ⚠️  Failed to register pair in database")
-            except ImportError:
-                pass  # DB not available
-            except Exception as e:
-                logger.warning(f"  ⚠️  Error registering in database: {e}")
-
-            processed += 1
-        else:
-            logger.error(f"  ❌ FALLÓ")
-            failed += 1
+                    logger.error(f"  ✗ Error procesando {pair['pair_name']}: {e}")
+                    success = False
+                if success:
+                    processed += 1
+                else:
+                    failed += 1
 
     logger.info("")
     logger.info("=" * 80)
@@ -1245,6 +1415,8 @@ def main() -> int:
         logger.info(f"  - Desde repositorio: {skipped_from_repo}")
     logger.info(f"Pares fallidos: {failed}")
     logger.info(f"Total pares: {total_pairs}")
+    if not args.use_preprocessed:
+        logger.info(SplitCache().summary())
     if include_long:
         logger.info(f"  - Pares cortos (salto +1): {short_pairs}")
         logger.info(f"  - Pares largos (salto +2): {long_pairs}")
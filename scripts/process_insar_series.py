@@ -44,8 +44,12 @@ from shapely.geometry import mapping
 # Importar utilidades de logging
 sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
 from process_insar_gpt import create_pol_decomposition_xml
+from split_cache import SplitCache
 from logging_utils import LoggerConfig
 from insar_repository import InSARRepository
+from product_ingest import ingest_product
+from gpt_scheduler import run_gpt
+from crop_engine import DEFER_INSAR_CROP_ENV
 
 # Logger se configurará después de crear el workspace
 logger = None
@@ -721,7 +725,7 @@ def run_preprocessing(workspace, config_file, required_slc_dates=None):
     # ISSUE #4: Check database for already processed full-swath products
     # Import DB functions
     try:
-        from scripts.db_queries import get_slc_status
+        from scripts.db_queries import get_slc_status_many
         from scripts.db_integration import init_db
         DB_AVAILABLE = init_db()
     except ImportError:
@@ -737,6 +741,10 @@ def run_preprocessing(workspace, config_file, required_slc_dates=None):
         slc_files = sorted(slc_dir.glob('*.SAFE'))
 
         if slc_files:
+            # Estado de todos los SLC en una sola consulta (se reutiliza abajo)
+            statuses = get_slc_status_many(p.name.replace('.SAFE', '') for p in slc_files)
+            processed_flag = f'fullswath_{subswath.lower()}_processed'
+
             db_skipped = 0
             for slc_path in slc_files:
                 scene_id = slc_path.name.replace('.SAFE', '')
@@ -747,9 +755,8 @@ def run_preprocessing(workspace, config_file, required_slc_dates=None):
                     if slc_date and slc_date[:8] not in required_slc_dates:
                         continue
 
-                status = get_slc_status(scene_id)
+                status = statuses.get(scene_id)
                 if status:
-                    processed_flag = f'fullswath_{subswath.lower()}_processed'
                     if status.get(processed_flag, False):
                         logger.info(f"  ✓ {scene_id[:30]}... already processed in DB (skip)")
                         db_skipped += 1
@@ -767,8 +774,7 @@ def run_preprocessing(workspace, config_file, required_slc_dates=None):
                         scene_id = slc_path.name.replace('.SAFE', '')
                         slc_date = extract_date_from_filename(scene_id)
                         if slc_date and slc_date[:8] in required_slc_dates:
-                            status = get_slc_status(scene_id)
-                            processed_flag = f'fullswath_{subswath.lower()}_processed'
+                            status = statuses.get(scene_id)
                             if not status or not status.get(processed_flag, False):
                                 filtered_dates.add(slc_date[:8])
 
@@ -1128,6 +1134,12 @@ def run_insar_crop(workspace, series_config):
     logger.info(f"PASO 4.5: RECORTE PRODUCTOS InSAR AL AOI")
     logger.info(f"{'=' * 80}\n")
 
+    # En lote multi-AOI el recorte se hace al final para todas las series a la vez
+    # (run_batch_aoi_workflow.py: cada interferograma se lee una sola vez)
+    if os.environ.get(DEFER_INSAR_CROP_ENV) == '1':
+        logger.info("  Recorte diferido al lote multi-AOI")
+        return True
+
     # No cambiar directorio - usar rutas absolutas
     original_dir = os.getcwd()
     workspace_abs = os.path.abspath(workspace['base'])
@@ -1836,23 +1848,39 @@ def run_polarimetric_processing(workspace, series_config, use_repository=False,
         try:
             # Detectar si el producto es preprocesado (.dim) o original (.SAFE)
             is_preprocessed = product.suffix == '.dim'
+            pol_input = product
+
+            split_cache = None
+            cached_split = None
 
             if is_preprocessed:
                 logger.debug(f"  → Producto preprocesado (.dim) - Skip Apply-Orbit-File")
             else:
-                logger.debug(f"  → Producto original (.SAFE) - Apply-Orbit-File incluido")
+                # Original: Apply-Orbit + TOPSAR-Split del sub-swath de la serie desde la caché de split
+                # (retenido mientras gpt lo lee para que no se desaloje)
+                split_cache = SplitCache()
+                cached_split = split_cache.acquire(product, subswath, consumer='polarimetry')
+                if cached_split:
+                    logger.debug(f"  → Producto original (.SAFE) - split desde caché")
+                    pol_input = Path(cached_split)
+                    is_preprocessed = True
+                else:
+                    logger.debug(f"  → Producto original (.SAFE) - Apply-Orbit-File incluido")
 
-            # 1. Generar XML
-            xml_content = create_pol_decomposition_xml(str(product), str(output_file), is_preprocessed=is_preprocessed)
-            
-            # 2. Guardar XML temporal
-            xml_path = pol_dir / "temp_pol.xml"
-            with open(xml_path, 'w') as f:
-                f.write(xml_content)
-            
-            # 3. Ejecutar GPT
-            cmd = ['gpt', str(xml_path), '-c', '4G', '-q', '8'] # -q 8 usa 8 hilos
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            try:
+                # 1. Generar XML
+                xml_content = create_pol_decomposition_xml(str(pol_input), str(output_file), is_preprocessed=is_preprocessed)
+
+                # 2. Guardar XML temporal
+                xml_path = pol_dir / "temp_pol.xml"
+                with open(xml_path, 'w') as f:
+                    f.write(xml_content)
+
+                # 3. Ejecutar GPT
+                result = run_gpt(str(xml_path), job_class='polarimetry', label=f"Polarimetría {product_name}")
+            finally:
+                if cached_split:
+                    split_cache.release(cached_split)
             
             if result.returncode == 0:
                 logger.info(f"  ✅ Éxito")
@@ -1866,13 +1894,8 @@ def run_polarimetric_processing(workspace, series_config, use_repository=False,
                         dest_file = dest_date_dir / output_file.name
 
                         if not dest_file.exists():
-                            # Copiar .dim
-                            shutil.copy2(output_file, dest_file)
-                            # Copiar .data
-                            output_data = output_file.with_suffix('.data')
-                            if output_data.exists():
-                                dest_data = dest_file.with_suffix('.data')
-                                shutil.copytree(output_data, dest_data, dirs_exist_ok=True)
+                            # Ingresar .dim + .data (hardlink/reflink en el mismo FS, copia si no)
+                            ingest = ingest_product(output_file, dest_file)
 
                             logger.info(f"  📦 Guardado en repositorio: track {track_number}/polarimetry/{product_date}/")
 
@@ -1907,11 +1930,9 @@ def run_polarimetric_processing(workspace, series_config, use_repository=False,
                                 logger.warning(f"  ⚠️  Error creando symlinks: {e}")
                                 logger.warning(f"  Producto guardado en repositorio pero duplicado en workspace")
 
-                            # Actualizar metadata
-                            metadata = repository.load_metadata(orbit_direction, subswath, track_number)
-                            product_info = repository._extract_polarimetry_info(dest_file, product_date)
-                            metadata['polarimetry_products'].append(product_info)
-                            repository.save_metadata(orbit_direction, subswath, track_number, metadata)
+                            # Registrar en el catálogo
+                            product_info = repository._extract_polarimetry_info(dest_file, product_date, ingest['size_bytes'])
+                            repository.add_polarimetry_product(orbit_direction, subswath, track_number, product_info)
                         else:
                             logger.debug(f"  Producto ya existe en repositorio")
 
@@ -1931,6 +1952,7 @@ def run_polarimetric_processing(workspace, series_config, use_repository=False,
             failed += 1
 
     logger.info(f"\nResumen Polarimetría: {processed} OK, {failed} Fallidos.")
+    logger.info(f"  {SplitCache().summary()}")
     if skipped_from_repo > 0:
         logger.info(f"  - Nuevos: {processed - skipped_from_repo}")
         logger.info(f"  - Desde repositorio: {skipped_from_repo}")
@@ -1958,21 +1980,14 @@ def get_existing_insar_pairs(repository, orbit_direction, subswath, track_number
     Returns:
         dict: {'short': [(master, slave), ...], 'long': [(master, slave), ...]}
     """
-    track_dir = repository.get_track_dir(orbit_direction, subswath, track_number)
-
     existing_pairs = {
         'short': [],
         'long': []
     }
 
-    if not track_dir.exists():
-        return existing_pairs
-
-    # Leer metadata para obtener pares procesados
+    # Pares procesados del track (consulta indexada en el catálogo)
     try:
-        metadata = repository.load_metadata(orbit_direction, subswath, track_number)
-
-        for product in metadata.get('insar_products', []):
+        for product in repository.find_insar_pairs(orbit_direction, subswath, track_number):
             master = product.get('master_date')
             slave = product.get('slave_date')
             pair_type = product.get('pair_type', 'short')  # CORRECCIÓN: era 'type', debe ser 'pair_type'
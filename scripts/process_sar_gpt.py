@@ -36,6 +36,7 @@ from processing_utils import (
     logging
 )
 from burst_utils import auto_merge_bursts, auto_select_grd_products
+from gpt_scheduler import run_gpt
 
 # Importar sistema de logging centralizado
 from logging_utils import LoggerConfig
@@ -416,11 +417,11 @@ def process_with_gpt(
             logger.info("  ⚙️  Ejecutando GPT...")
             logger.info(f"  → Workflow: {'Pre-procesado' if is_preprocessed else 'Completo'}")
 
-            result = subprocess.run(
-                ['gpt', xml_file, '-c', '8G'],
-                capture_output=True,
-                text=True,
-                timeout=7200  # 2 horas timeout (para GLCM con múltiples productos)
+            result = run_gpt(
+                xml_file,
+                job_class='sar',
+                timeout=7200,  # 2 horas timeout (para GLCM con múltiples productos)
+                label=f"SAR {os.path.basename(str(output_path))}"
             )
 
             if result.returncode == 0 or os.path.exists(output_path):
@@ -12,6 +12,10 @@ Bandas Sentinel-2 requeridas:
   - B8 (NIR): 842 nm, 10m
   - SCL: Scene Classification (máscara de nubes)
 
+Con --aoi-geojson solo se lee la ventana del tile que cubre el AOI (B04/B08
+a 10m y la ventana equivalente de SCL a 20m); MSAVI y la máscara de nubes se
+calculan únicamente sobre esa ventana.
+
 Uso:
   python scripts/process_sentinel2_msavi.py --date 20240315 --aoi-geojson aoi/arenys_munt.geojson
   python scripts/process_sentinel2_msavi.py --s2-product S2A_MSIL2A_20240315T105311_...
@@ -26,8 +30,12 @@ import rasterio
 from rasterio.warp import reproject
 from rasterio.enums import Resampling
 from rasterio.mask import mask
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.windows import WindowError
 from datetime import datetime, timedelta
-import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Agregar directorio de scripts al path
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -35,6 +43,10 @@ if script_dir not in sys.path:
     sys.path.insert(0, script_dir)
 
 from logging_utils import LoggerConfig
+from s2_indices import (
+    REFLECTANCE_SCALE, SCL_INVALID_CLASSES, covering_window, evaluate_indices,
+    load_aoi_geojson, load_aoi_geometries
+)
 
 # ISSUE #6: Database integration for S2 tracking
 try:
@@ -50,6 +62,14 @@ except ImportError:
 
 logger = None
 
+# Procesos del batch MSAVI (cada uno lee y escribe un producto completo)
+DEFAULT_MSAVI_WORKERS = min(4, os.cpu_count() or 1)
+
+# Entorno GDAL abierto una vez por proceso del pool (vive lo que vive el worker)
+_WORKER_GDAL_ENV = None
+
+GDAL_CACHE_MB = 512
+
 
 def find_sentinel2_products(data_dir, target_date=None, date_window=2):
     """
@@ -200,31 +220,16 @@ def calculate_msavi(red, nir):
     Returns:
         Array numpy con valores MSAVI
     """
-    # Convertir a float para evitar problemas con operaciones
-    red = red.astype(np.float32)
-    nir = nir.astype(np.float32)
-    
-    # Normalizar valores (Sentinel-2 L2A está en reflectancia * 10000)
-    # Dividir por 10000 para tener reflectancia [0, 1]
-    red = red / 10000.0
-    nir = nir / 10000.0
-    
-    # Aplicar fórmula MSAVI
-    with np.errstate(invalid='ignore', divide='ignore'):
-        term1 = 2 * nir + 1
-        term2 = np.sqrt(term1**2 - 8 * (nir - red))
-        msavi = (term1 - term2) / 2.0
-    
-    # Manejar valores no válidos
-    msavi = np.where(np.isfinite(msavi), msavi, np.nan)
-    
-    # Clip a rango válido [0, 1] (aunque MSAVI teóricamente puede ser negativo)
-    msavi = np.clip(msavi, -1, 1)
-    
-    return msavi.astype(np.float32)
+    # Misma implementación que el motor multi-índice (s2_indices):
+    # reflectancia = DN / 10000, float32 in situ, no finitos → NaN, clip [-1, 1]
+    bands = {
+        'B04': np.multiply(red, REFLECTANCE_SCALE, dtype=np.float32),
+        'B08': np.multiply(nir, REFLECTANCE_SCALE, dtype=np.float32)
+    }
+    return evaluate_indices(bands, ['MSAVI'])[0]
 
 
-def apply_cloud_mask(data, scl_data, scl_transform, data_transform, data_shape):
+def apply_cloud_mask(data, scl_data, scl_transform, data_transform, data_shape, crs=None):
     """
     Aplica máscara de nubes usando la banda SCL de Sentinel-2
     
@@ -248,6 +253,7 @@ def apply_cloud_mask(data, scl_data, scl_transform, data_transform, data_shape):
         scl_transform: Transform de SCL (20m)
         data_transform: Transform de datos (10m)
         data_shape: Shape de datos objetivo
+        crs: CRS común de SCL y datos (mismo tile, opcional)
     
     Returns:
         Array enmascarado
@@ -259,14 +265,15 @@ def apply_cloud_mask(data, scl_data, scl_transform, data_transform, data_shape):
         source=scl_data,
         destination=scl_resampled,
         src_transform=scl_transform,
+        src_crs=crs,
         dst_transform=data_transform,
+        dst_crs=crs,
         resampling=Resampling.nearest  # Usar nearest para clasificación
     )
     
     # Crear máscara: True para píxeles válidos
     # Rechazar: nubes (8, 9), cirrus (10), sombras (3), saturados (1), no data (0)
-    invalid_classes = [0, 1, 3, 8, 9, 10]
-    valid_mask = ~np.isin(scl_resampled, invalid_classes)
+    valid_mask = ~np.isin(scl_resampled, SCL_INVALID_CLASSES)
     
     # Aplicar máscara
     masked_data = np.where(valid_mask, data, np.nan)
@@ -274,6 +281,40 @@ def apply_cloud_mask(data, scl_data, scl_transform, data_transform, data_shape):
     return masked_data
 
 
+def read_aoi_window(b04_file, b08_file, aoi_geojson):
+    """
+    Lee B04 y B08 solo en la ventana que cubre el AOI
+    
+    Args:
+        b04_file: Ruta a la banda B04 (10m)
+        b08_file: Ruta a la banda B08 (10m)
+        aoi_geojson: Ruta al GeoJSON del AOI
+    
+    Returns:
+        tuple: (red, nir, profile, geometries) con el profile de la ventana,
+               o None si el AOI no solapa el tile
+    """
+    with rasterio.open(b04_file) as red_src:
+        geometries = load_aoi_geometries(aoi_geojson, red_src.crs)
+        try:
+            window = geometry_window(red_src, geometries)
+        except WindowError:
+            return None
+        
+        red = red_src.read(1, window=window)
+        profile = red_src.profile.copy()
+        profile.update({
+            'height': red.shape[0],
+            'width': red.shape[1],
+            'transform': red_src.window_transform(window)
+        })
+    
+    with rasterio.open(b08_file) as nir_src:
+        nir = nir_src.read(1, window=window)
+    
+    return red, nir, profile, geometries
+
+
 def crop_to_aoi(data, profile, aoi_geojson):
     """
     Recorta un raster al área de interés definida por un GeoJSON
@@ -286,17 +327,8 @@ def crop_to_aoi(data, profile, aoi_geojson):
     Returns:
         tuple: (cropped_data, cropped_profile)
     """
-    from shapely.geometry import shape
-    
-    # Leer geometría del AOI
-    with open(aoi_geojson, 'r') as f:
-        geojson = json.load(f)
-    
-    # Extraer geometría
-    if 'features' in geojson:
-        geometries = [shape(feature['geometry']) for feature in geojson['features']]
-    else:
-        geometries = [shape(geojson['geometry'])]
+    # Geometrías del AOI en el CRS del raster (tile UTM)
+    geometries = load_aoi_geometries(aoi_geojson, profile['crs'])
     
     # Crear un dataset temporal en memoria
     from rasterio.io import MemoryFile
@@ -320,7 +352,7 @@ def crop_to_aoi(data, profile, aoi_geojson):
 
 
 def process_sentinel2_to_msavi(product_path, output_path, aoi_geojson=None,
-                                apply_cloud_masking=True):
+                                apply_cloud_masking=True, update_db=True):
     """
     Procesa un producto Sentinel-2 L2A y calcula MSAVI
     
@@ -329,6 +361,8 @@ def process_sentinel2_to_msavi(product_path, output_path, aoi_geojson=None,
         output_path: Ruta donde guardar el MSAVI GeoTIFF
         aoi_geojson: Ruta al GeoJSON del AOI (opcional, para recorte)
         apply_cloud_masking: Si aplicar máscara de nubes (default: True)
+        update_db: Consultar/actualizar la BD para este producto (False en el
+            batch: el proceso principal actualiza la BD al final)
     
     Returns:
         bool: True si exitoso
@@ -337,7 +371,7 @@ def process_sentinel2_to_msavi(product_path, output_path, aoi_geojson=None,
     logger.info(f"Procesando: {product_name}")
     
     # ISSUE #6: CHECK DATABASE - Skip if already processed
-    if DB_INTEGRATION_AVAILABLE:
+    if DB_INTEGRATION_AVAILABLE and update_db:
         status = get_s2_status(product_name)
         if status and status.get('msavi_processed', False):
             # Verificar que el archivo existe
@@ -370,10 +404,22 @@ def process_sentinel2_to_msavi(product_path, output_path, aoi_geojson=None,
     elif apply_cloud_masking:
         logger.warning(f"  ⚠ No se encontró banda SCL - sin máscara de nubes")
     
-    # 2. Leer bandas
-    logger.info("  Leyendo bandas...")
-    red_data, red_profile = read_and_resample_band(b04_file)
-    nir_data, nir_profile = read_and_resample_band(b08_file)
+    # 2. Leer bandas (solo la ventana del AOI si se especifica)
+    use_aoi = bool(aoi_geojson and os.path.exists(aoi_geojson))
+    geometries = None
+    
+    if use_aoi:
+        logger.info("  Leyendo ventana del AOI...")
+        windowed = read_aoi_window(b04_file, b08_file, aoi_geojson)
+        if windowed is None:
+            logger.error(f"  ✗ El AOI no solapa el tile {product_name}")
+            return False
+        red_data, nir_data, red_profile, geometries = windowed
+        logger.info(f"  ✓ Ventana {red_data.shape[1]}x{red_data.shape[0]} px")
+    else:
+        logger.info("  Leyendo bandas...")
+        red_data, red_profile = read_and_resample_band(b04_file)
+        nir_data, nir_profile = read_and_resample_band(b08_file)
     
     # Verificar que ambas bandas tienen la misma forma
     if red_data.shape != nir_data.shape:
@@ -384,26 +430,41 @@ def process_sentinel2_to_msavi(product_path, output_path, aoi_geojson=None,
     logger.info("  Calculando MSAVI...")
     msavi = calculate_msavi(red_data, nir_data)
     
+    # Píxeles de referencia para la cobertura de nubes: el AOI o el tile
+    if use_aoi:
+        aoi_mask = geometry_mask(geometries, out_shape=msavi.shape,
+                                 transform=red_profile['transform'], invert=True)
+        msavi = np.where(aoi_mask, msavi, np.nan)
+        reference_pixels = int(np.sum(aoi_mask))
+    else:
+        reference_pixels = msavi.size
+    
     # 4. Aplicar máscara de nubes si está disponible
     if scl_file and apply_cloud_masking:
         logger.info("  Aplicando máscara de nubes...")
         with rasterio.open(scl_file) as scl_src:
-            scl_data = scl_src.read(1)
-            scl_transform = scl_src.transform
+            if use_aoi:
+                # Ventana SCL (20m) que cubre la ventana de 10m
+                bounds = rasterio.transform.array_bounds(
+                    msavi.shape[0], msavi.shape[1], red_profile['transform']
+                )
+                scl_window = covering_window(scl_src, bounds)
+                scl_data = scl_src.read(1, window=scl_window)
+                scl_transform = scl_src.window_transform(scl_window)
+            else:
+                scl_data = scl_src.read(1)
+                scl_transform = scl_src.transform
+            scl_crs = scl_src.crs
         
         msavi = apply_cloud_mask(msavi, scl_data, scl_transform, 
-                                red_profile['transform'], red_data.shape)
+                                red_profile['transform'], msavi.shape, crs=scl_crs)
         
         # Reportar cobertura de nubes
         valid_pixels = np.sum(np.isfinite(msavi))
-        total_pixels = msavi.size
-        cloud_coverage = (1 - valid_pixels / total_pixels) * 100
+        cloud_coverage = (1 - valid_pixels / max(reference_pixels, 1)) * 100
         logger.info(f"  Cobertura de nubes: {cloud_coverage:.1f}%")
     
-    # 5. Recortar al AOI si se especifica
-    if aoi_geojson and os.path.exists(aoi_geojson):
-        logger.info("  Recortando al AOI...")
-        msavi, red_profile = crop_to_aoi(msavi, red_profile, aoi_geojson)
+    # 5. Recortar al AOI: ya hecho al leer por ventana y enmascarar el polígono
     
     # 6. Guardar resultado
     logger.info(f"  Guardando MSAVI: {output_path}")
@@ -453,25 +514,162 @@ def process_sentinel2_to_msavi(product_path, output_path, aoi_geojson=None,
         logger.info(f"    Mediana:{np.median(msavi_valid):.3f}")
     
     # ISSUE #6: UPDATE DATABASE - Mark MSAVI as processed
-    if DB_INTEGRATION_AVAILABLE:
-        try:
-            success = update_s2(
-                product_name,
-                msavi_processed=True,
-                msavi_file_path=output_path,
-                msavi_date=datetime.now(),
-                msavi_version='1.0.0'
-            )
-            if success:
-                logger.info(f"  💾 Actualizado en base de datos")
-            else:
-                logger.warning(f"  ⚠️  No se pudo actualizar en BD (producto no registrado?)")
-        except Exception as e:
-            logger.warning(f"  ⚠️  Error actualizando BD: {e}")
+    if DB_INTEGRATION_AVAILABLE and update_db:
+        if record_msavi_in_db(product_name, output_path):
+            logger.info(f"  💾 Actualizado en base de datos")
+        else:
+            logger.warning(f"  ⚠️  No se pudo actualizar en BD (producto no registrado?)")
     
     return True
 
 
+def record_msavi_in_db(product_name, output_path, msavi_date=None):
+    """
+    Marca un producto Sentinel-2 como procesado (MSAVI) en la BD
+    
+    Returns:
+        bool: True si se actualizó
+    """
+    try:
+        return update_s2(
+            product_name,
+            msavi_processed=True,
+            msavi_file_path=output_path,
+            msavi_date=msavi_date or datetime.now(),
+            msavi_version='1.0.0'
+        )
+    except Exception as e:
+        logger.warning(f"  ⚠️  Error actualizando BD: {e}")
+        return False
+
+
+def _msavi_gdal_env(workers):
+    """Entorno GDAL del batch: los hilos de GDAL se reparten entre los procesos"""
+    gdal_threads = max(1, (os.cpu_count() or 1) // workers)
+    return rasterio.Env(GDAL_CACHEMAX=GDAL_CACHE_MB, GDAL_NUM_THREADS=str(gdal_threads))
+
+
+def _init_msavi_worker(aoi_geojson=None, workers=1):
+    """
+    Inicializa un proceso del pool: logger, entorno GDAL y geometría del AOI
+    
+    Se ejecuta una sola vez por proceso; el GeoJSON del AOI queda parseado en
+    la caché del módulo y cada producto solo reproyecta (también cacheado por CRS).
+    Solo para workers del pool: el entorno GDAL queda abierto hasta que el
+    proceso termina. En el proceso principal se usa _msavi_gdal_env() con with.
+    """
+    global logger, _WORKER_GDAL_ENV
+    
+    if logger is None:
+        logger = logging.getLogger('process_sentinel2_msavi')
+    
+    if _WORKER_GDAL_ENV is None:
+        _WORKER_GDAL_ENV = _msavi_gdal_env(workers)
+        _WORKER_GDAL_ENV.__enter__()
+    
+    if aoi_geojson and os.path.exists(aoi_geojson):
+        load_aoi_geojson(aoi_geojson)
+
+
+def _process_msavi_task(product_path, output_path, aoi_geojson, apply_cloud_masking):
+    """Procesa un producto dentro de un worker del batch (sin tocar la BD)"""
+    start = time.time()
+    try:
+        success = process_sentinel2_to_msavi(
+            product_path, output_path,
+            aoi_geojson=aoi_geojson,
+            apply_cloud_masking=apply_cloud_masking,
+            update_db=False
+        )
+        error = None if success else 'MSAVI no generado'
+    except Exception as e:
+        success, error = False, str(e)
+    
+    return {
+        'product': product_path,
+        'output': output_path,
+        'success': success,
+        'error': error,
+        'elapsed_s': time.time() - start
+    }
+
+
+def process_msavi_batch(tasks, aoi_geojson=None, workers=DEFAULT_MSAVI_WORKERS,
+                        apply_cloud_masking=True, update_db=True):
+    """
+    Calcula MSAVI para una lista de productos en un pool de procesos
+    
+    Cada worker inicializa GDAL (cpu_count // workers hilos) y la geometría
+    del AOI una sola vez. Las actualizaciones de BD (update_s2) se hacen al
+    final en el proceso principal, no una por worker.
+    
+    Args:
+        tasks: Lista de tuplas (product_path, output_path)
+        aoi_geojson: GeoJSON del AOI (común a todos los productos)
+        workers: Procesos en paralelo (1 = en el proceso actual)
+        apply_cloud_masking: Si aplicar máscara de nubes
+        update_db: Registrar en BD los productos procesados
+    
+    Returns:
+        dict: {'processed', 'failed', 'db_updated', 'results': [dict por producto]}
+    """
+    global logger
+    if logger is None:
+        logger = logging.getLogger('process_sentinel2_msavi')
+    
+    tasks = [(str(product), str(output)) for product, output in tasks]
+    aoi_geojson = str(aoi_geojson) if aoi_geojson else None
+    workers = max(1, min(workers, len(tasks) or 1))
+    results = []
+    
+    logger.info(f"🛰️  Batch MSAVI: {len(tasks)} productos, {workers} procesos")
+    
+    if workers == 1:
+        if aoi_geojson and os.path.exists(aoi_geojson):
+            load_aoi_geojson(aoi_geojson)
+        with _msavi_gdal_env(workers):
+            for product, output in tasks:
+                results.append(_process_msavi_task(product, output, aoi_geojson, apply_cloud_masking))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_msavi_worker,
+                                 initargs=(aoi_geojson, workers)) as executor:
+            futures = {
+                executor.submit(_process_msavi_task, product, output, aoi_geojson, apply_cloud_masking): product
+                for product, output in tasks
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'product': futures[future], 'output': None, 'success': False,
+                              'error': str(e), 'elapsed_s': 0.0}
+                results.append(result)
+                name = os.path.basename(result['product'])
+                if result['success']:
+                    logger.info(f"  ✓ {name} ({result['elapsed_s']:.1f}s)")
+                else:
+                    logger.warning(f"  ✗ {name}: {result['error']}")
+    
+    # BD: una pasada al final con todos los productos generados
+    db_updated = 0
+    if update_db and DB_INTEGRATION_AVAILABLE:
+        msavi_date = datetime.now()
+        for result in results:
+            if result['success']:
+                product_name = os.path.basename(result['product']).replace('.SAFE', '')
+                if record_msavi_in_db(product_name, result['output'], msavi_date):
+                    db_updated += 1
+        logger.info(f"  💾 BD actualizada: {db_updated} productos")
+    
+    processed = sum(1 for r in results if r['success'])
+    return {
+        'processed': processed,
+        'failed': len(results) - processed,
+        'db_updated': db_updated,
+        'results': results
+    }
+
+
 def main():
     global logger
     
@@ -494,6 +692,8 @@ def main():
                        help='GeoJSON del AOI para recorte')
     parser.add_argument('--no-cloud-mask', action='store_true',
                        help='No aplicar máscara de nubes')
+    parser.add_argument('--workers', type=int, default=DEFAULT_MSAVI_WORKERS,
+                       help=f'Productos en paralelo (default: {DEFAULT_MSAVI_WORKERS})')
     
     args = parser.parse_args()
     
@@ -534,30 +734,39 @@ def main():
     for p in products:
         logger.info(f"  - {os.path.basename(p)}")
     
-    # Procesar cada producto
-    success_count = 0
+    # Determinar rutas de salida
+    tasks = []
     for product in products:
-        # Determinar ruta de salida
-        if args.output:
+        if args.output and len(products) == 1:
             output_path = args.output
         else:
             # Extraer fecha del producto para nombre de salida
             basename = os.path.basename(product)
             date_str = basename.split('_')[2][:8]  # YYYYMMDD
-            output_dir = os.path.join(data_dir, 'sentinel2_msavi')
+            output_dir = args.output if args.output and os.path.isdir(args.output) \
+                else os.path.join(data_dir, 'sentinel2_msavi')
             os.makedirs(output_dir, exist_ok=True)
             output_path = os.path.join(output_dir, f'MSAVI_{date_str}.tif')
-        
-        # Procesar
-        if process_sentinel2_to_msavi(
-            product, 
+        tasks.append((product, output_path))
+    
+    # Procesar (pool de procesos si hay varios productos)
+    if len(tasks) == 1:
+        product, output_path = tasks[0]
+        success_count = int(process_sentinel2_to_msavi(
+            product,
             output_path,
             aoi_geojson=args.aoi_geojson,
             apply_cloud_masking=not args.no_cloud_mask
-        ):
-            success_count += 1
-        
-        logger.info("")
+        ))
+    else:
+        summary = process_msavi_batch(
+            tasks,
+            aoi_geojson=args.aoi_geojson,
+            workers=args.workers,
+            apply_cloud_masking=not args.no_cloud_mask
+        )
+        success_count = summary['processed']
+    logger.info("")
     
     # Resumen
     logger.info("="*80)
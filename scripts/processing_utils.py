@@ -8,6 +8,8 @@ import re
 import glob
 import logging
 
+from common_utils import load_partial_extraction_info, partial_extraction_covers
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -163,13 +165,19 @@ def find_grd_products(grd_dir, use_preprocessed=False):
     return grd_products
 
 
-def validate_product(product_path, use_preprocessed=False):
+def validate_product(product_path, use_preprocessed=False, subswath=None, polarisation=None):
     """
     Valida que un producto sea válido
 
+    Los .SAFE extraídos parcialmente (download_copernicus.py --subswaths/--polarisations)
+    se aceptan si conservan los archivos de medida registrados en su sidecar y,
+    cuando se indican, incluyen el subswath/polarización requeridos.
+
     Args:
         product_path: Ruta al producto
         use_preprocessed: Si True, valida .dim; si False, valida .SAFE
+        subswath: Subswath que se va a procesar (ej: 'IW1'), opcional
+        polarisation: Polarización que se va a procesar (ej: 'VV'), opcional
 
     Returns:
         bool: True si el producto es válido
@@ -197,6 +205,26 @@ def validate_product(product_path, use_preprocessed=False):
             if not os.path.exists(manifest):
                 logger.error(f"No se encuentra manifest.safe en {product_path}")
                 return False
+
+            partial = load_partial_extraction_info(product_path)
+            if partial:
+                subswaths = [subswath] if subswath else None
+                polarisations = [polarisation] if polarisation else None
+                if (subswath or polarisation) and not partial_extraction_covers(
+                        product_path,
+                        subswaths or partial.get('subswaths'),
+                        polarisations or partial.get('polarisations')):
+                    logger.error(f"Extracción parcial sin {subswath or ''} {polarisation or ''}: "
+                                 f"{os.path.basename(product_path)} "
+                                 f"(subswaths={partial.get('subswaths')}, pol={partial.get('polarisations')})")
+                    return False
+
+                safe_parent = os.path.dirname(product_path.rstrip(os.sep))
+                missing = [m for m in partial.get('measurement_files', [])
+                           if not os.path.exists(os.path.join(safe_parent, m))]
+                if missing:
+                    logger.error(f"Faltan {len(missing)} archivos de medida en {product_path}")
+                    return False
         # Para .zip, asumir que es válido (se validará al descomprimir)
 
         return True
@@ -260,3 +288,31 @@ def extract_orbit_from_manifest(product_path):
     except Exception as e:
         logger.error(f"Error extrayendo órbita de {manifest_path}: {e}")
         return None
+
+
+def publish_dimap_product(tmp_dim, final_dim):
+    """
+    Mueve un producto BEAM-DIMAP desde su directorio de trabajo a su ruta final
+
+    Primero se mueve el .data y al final el .dim, que es lo que los scripts
+    usan como marca de producto completo: un proceso interrumpido nunca deja
+    un .dim final a medio escribir. Ambas rutas deben estar en el mismo
+    sistema de ficheros (os.replace atómico).
+
+    Args:
+        tmp_dim: .dim generado en el directorio de trabajo
+        final_dim: Ruta final del .dim
+    """
+    import shutil
+
+    tmp_data = os.path.splitext(str(tmp_dim))[0] + '.data'
+    final_data = os.path.splitext(str(final_dim))[0] + '.data'
+
+    if os.path.islink(final_data):
+        os.unlink(final_data)
+    elif os.path.isdir(final_data):
+        shutil.rmtree(final_data)
+
+    if os.path.isdir(tmp_data):
+        os.replace(tmp_data, final_data)
+    os.replace(str(tmp_dim), str(final_dim))
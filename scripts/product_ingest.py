@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Ingesta de productos BEAM-DIMAP (.dim + .data) en el repositorio
+
+Copiar con shutil.copytree duplica I/O y disco cuando el workspace y el
+repositorio están en el mismo sistema de ficheros. ingest_product() elige
+el método más barato por fichero:
+
+- 'move':  rename atómico (mismo sistema de ficheros); en el origen queda
+           un symlink al repositorio para que el workspace siga funcionando.
+           Entre dispositivos se copia como 'copy' y el origen se conserva.
+- 'auto':  mismo sistema de ficheros → reflink (FICLONE: btrfs, xfs...) o,
+           si no se soporta, hardlink. Entre dispositivos → copia en bloques
+           en paralelo con copy_file_range (en kernel) o pread/pwrite.
+- 'copy':  siempre copia en bloques en paralelo (nunca comparte inodos).
+
+El producto se monta en <dest>.ingest-tmp y se publica con rename: primero
+.data y al final el .dim, que es lo que los llamadores usan como marca de
+"ya existe". Los tamaños de cada fichero se verifican contra el origen y el
+total queda registrado en el resultado (sin volver a recorrer el .data).
+"""
+
+import errno
+import fcntl
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODES = ('auto', 'move', 'copy')
+
+DEFAULT_INGEST_WORKERS = 4
+
+# Tamaño de bloque de la copia entre dispositivos
+COPY_CHUNK_BYTES = 64 * 1024 * 1024
+
+# ioctl FICLONE (linux/fs.h): clona un fichero completo compartiendo extents
+FICLONE = 0x40049409
+
+TMP_SUFFIX = '.ingest-tmp'
+
+
+class IngestError(Exception):
+    """La ingesta no pudo completarse o la verificación de tamaños falló"""
+
+
+def same_filesystem(source: Union[Path, str], dest_dir: Union[Path, str]) -> bool:
+    """True si source y dest_dir (o su primer ancestro existente) comparten dispositivo"""
+    dest_dir = Path(dest_dir)
+    while not dest_dir.exists() and dest_dir != dest_dir.parent:
+        dest_dir = dest_dir.parent
+    return os.stat(source).st_dev == os.stat(dest_dir).st_dev
+
+
+def product_files(dim_path: Path, dest_name: str = None) -> List[Tuple[Path, Path]]:
+    """
+    (fichero, ruta relativa de destino) del .dim y de todo el .data de un producto
+
+    Args:
+        dest_name: Nombre del .dim de destino (default: el mismo)
+    """
+    dest_dim = Path(dest_name or dim_path.name)
+    files = [(dim_path, dest_dim)]
+    data_dir = dim_path.with_suffix('.data')
+    if data_dir.is_dir():
+        for root, _, names in os.walk(data_dir):
+            for name in names:
+                path = Path(root) / name
+                files.append((path, dest_dim.with_suffix('.data') / path.relative_to(data_dir)))
+    return files
+
+
+def _reflink(source: Path, dest: Path) -> bool:
+    """Clona source en dest con FICLONE; False si el sistema de ficheros no lo soporta"""
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError as e:
+            if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+                pass
+            else:
+                raise
+    dest.unlink()
+    return False
+
+
+def _copy_chunk(source: Path, dest: Path, offset: int, length: int) -> int:
+    """
+    Copia [offset, offset+length) con copy_file_range o, si no se puede, pread/pwrite
+
+    Returns:
+        Bytes copiados
+    """
+    src_fd = os.open(source, os.O_RDONLY)
+    dst_fd = os.open(dest, os.O_WRONLY)
+    try:
+        end = offset + length
+        position = offset
+        use_kernel = hasattr(os, 'copy_file_range')
+        while position < end:
+            count = min(end - position, COPY_CHUNK_BYTES)
+            copied = 0
+            if use_kernel:
+                try:
+                    copied = os.copy_file_range(src_fd, dst_fd, count, position, position)
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                        raise
+                    use_kernel = False
+            if not use_kernel:
+                data = os.pread(src_fd, count, position)
+                copied = os.pwrite(dst_fd, data, position)
+            if copied <= 0:
+                raise IngestError(f"Copia truncada de {source} en el offset {position}")
+            position += copied
+    finally:
+        os.close(src_fd)
+        os.close(dst_fd)
+    return position - offset
+
+
+def _copy_files(pairs: List[Tuple[Path, Path]], workers: int) -> Dict[Path, int]:
+    """
+    Copia ficheros partidos en bloques de COPY_CHUNK_BYTES, en paralelo
+
+    Returns:
+        {destino: bytes copiados} (el destino se preasigna a su tamaño final,
+        así que el tamaño en disco no sirve para verificar la copia)
+    """
+    tasks = []
+    copied = {}
+    for source, dest in pairs:
+        size = source.stat().st_size
+        with open(dest, 'wb') as f:
+            f.truncate(size)
+        copied[dest] = 0
+        for offset in range(0, size, COPY_CHUNK_BYTES):
+            tasks.append((source, dest, offset, min(COPY_CHUNK_BYTES, size - offset)))
+
+    if workers > 1 and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_copy_chunk, *task): task[1] for task in tasks}
+            for future in as_completed(futures):
+                copied[futures[future]] += future.result()
+    else:
+        for task in tasks:
+            copied[task[1]] += _copy_chunk(*task)
+
+    for source, dest in pairs:
+        shutil.copystat(source, dest)
+    return copied
+
+
+def _remove(path: Path):
+    if path.is_symlink() or path.is_file():
+        path.unlink()
+    elif path.is_dir():
+        shutil.rmtree(path)
+
+
+def _publish(staging: Path, dest_dim: Path):
+    """Mueve el producto montado a su destino: .data primero, .dim al final"""
+    staged_data = staging / dest_dim.with_suffix('.data').name
+    if staged_data.exists():
+        dest_data = dest_dim.with_suffix('.data')
+        _remove(dest_data)
+        os.rename(staged_data, dest_data)
+    os.replace(staging / dest_dim.name, dest_dim)
+
+
+def ingest_product(source_dim: Union[Path, str], dest_dim: Union[Path, str],
+                   mode: str = 'auto', workers: int = DEFAULT_INGEST_WORKERS) -> Dict:
+    """
+    Lleva un producto .dim + .data al repositorio
+
+    Args:
+        source_dim: .dim de origen (workspace)
+        dest_dim: .dim de destino (repositorio)
+        mode: 'auto', 'move' o 'copy' (ver docstring del módulo)
+        workers: Hilos para la copia entre dispositivos
+
+    Returns:
+        Dict con method ('rename', 'reflink', 'hardlink', 'copy' o 'mixed'),
+        files y size_bytes (tamaño verificado del producto)
+
+    Raises:
+        IngestError: Si un fichero no coincide en tamaño con el origen
+    """
+    if mode not in INGEST_MODES:
+        raise ValueError(f"Modo de ingesta desconocido: {mode} (opciones: {', '.join(INGEST_MODES)})")
+
+    source_dim = Path(source_dim).absolute()
+    dest_dim = Path(dest_dim)
+    dest_dim.parent.mkdir(parents=True, exist_ok=True)
+
+    files = product_files(source_dim, dest_dim.name)
+    expected = {rel: path.stat().st_size for path, rel in files}
+    same_fs = same_filesystem(source_dim, dest_dim.parent)
+
+    staging = dest_dim.parent / f"{dest_dim.name}{TMP_SUFFIX}"
+    _remove(staging)
+    staging.mkdir()
+
+    methods = set()
+    copied = {}
+    try:
+        if mode == 'move' and same_fs:
+            source_data = source_dim.with_suffix('.data')
+            if source_data.is_dir():
+                os.rename(source_data, staging / dest_dim.with_suffix('.data').name)
+            os.rename(source_dim, staging / dest_dim.name)
+            methods.add('rename')
+        else:
+            to_copy = []
+            for path, rel in files:
+                dest = staging / rel
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                if mode == 'auto' and same_fs:
+                    if _reflink(path, dest):
+                        methods.add('reflink')
+                        continue
+                    try:
+                        os.link(path, dest)
+                        methods.add('hardlink')
+                        continue
+                    except OSError:
+                        pass
+                to_copy.append((path, dest))
+
+            if to_copy:
+                copied = _copy_files(to_copy, workers)
+                methods.add('copy')
+
+        # Verificar tamaños antes de publicar
+        size_bytes = 0
+        for rel, size in expected.items():
+            staged = staging / rel
+            if staged in copied:
+                actual = copied[staged]
+            else:
+                actual = staged.stat().st_size if staged.exists() else -1
+            if actual != size:
+                raise IngestError(f"Tamaño distinto en {rel}: {actual} != {size} bytes")
+            size_bytes += size
+
+        _publish(staging, dest_dim)
+
+    except BaseException:
+        if 'rename' in methods:
+            # Devolver el producto al workspace
+            for staged, original in ((staging / dest_dim.with_suffix('.data').name, source_dim.with_suffix('.data')),
+                                     (staging / dest_dim.name, source_dim)):
+                if staged.exists() and not original.exists():
+                    os.rename(staged, original)
+        raise
+    finally:
+        _remove(staging)
+
+    if 'rename' in methods:
+        # El workspace sigue viendo el producto a través de symlinks
+        dest_data = dest_dim.with_suffix('.data')
+        if dest_data.exists():
+            source_dim.with_suffix('.data').symlink_to(dest_data.absolute())
+        source_dim.symlink_to(dest_dim.absolute())
+
+    method = methods.pop() if len(methods) == 1 else 'mixed'
+    logger.debug(f"Ingestado {source_dim.name} → {dest_dim} ({method}, {size_bytes} bytes)")
+
+    return {
+        'method': method,
+        'files': len(files),
+        'size_bytes': size_bytes
+    }
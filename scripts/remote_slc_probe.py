@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Inspección remota de productos SLC mediante peticiones HTTP Range
+
+Permite decidir si un SLC cubre realmente el AOI ANTES de descargar sus
+4-8 GB: se lee solo el directorio central del .zip y los XML de anotación
+(unos cientos de KB) a través de cabeceras 'Range' contra el Zipper API.
+
+Con los XML de anotación se calcula la huella de cada burst (geolocationGrid
++ swathTiming/linesPerBurst) y la cobertura del AOI por subswath a nivel de
+burst, más precisa que el footprint del catálogo (que incluye los tres
+subswaths y todos los bursts del slice).
+
+Uso:
+    probe = RemoteSLCProbe(auth, aoi_bbox, ZIPPER_API)
+    info = probe.probe(product)          # dict por subswath, o None si falla
+    probe.coverage_pct(product)          # % del AOI cubierto (unión de subswaths)
+    probe.covers(product, 'IW1')         # ¿algún burst de IW1 toca el AOI?
+"""
+
+import io
+import logging
+import re
+import threading
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import Dict, List, Optional
+
+import requests
+from shapely.geometry import Polygon, box
+from shapely.ops import unary_union
+
+logger = logging.getLogger(__name__)
+
+# Buffer de lectura: el directorio central y cada XML se resuelven en pocas peticiones
+RANGE_BUFFER_SIZE = 256 * 1024
+
+# Anotación principal de un subswath: annotation/s1a-iw1-slc-vv-<...>.xml
+ANNOTATION_PATTERN = re.compile(r'/annotation/s1[a-d]-(iw[1-3])-slc-(vv|vh|hh|hv)-[^/]+\.xml$', re.IGNORECASE)
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    Fichero remoto de solo lectura con acceso aleatorio mediante HTTP Range.
+
+    Suficiente para que zipfile.ZipFile lea el directorio central y miembros
+    individuales sin descargar el archivo completo.
+    """
+
+    def __init__(self, session: requests.Session, url: str, auth, timeout: int = 60):
+        super().__init__()
+        self.session = session
+        self.url = url
+        self.auth = auth
+        self.timeout = timeout
+        self.bytes_fetched = 0
+        self.requests_made = 0
+        self._pos = 0
+        self._size = self._fetch_size()
+
+    def _get_range(self, start: int, end: int) -> requests.Response:
+        token = self.auth.get_token()
+        headers = {'Range': f'bytes={start}-{end}', 'Authorization': f'Bearer {token}'}
+        response = self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout)
+
+        if response.status_code == 401:
+            response.close()
+            token = self.auth.refresh_token(token)
+            headers['Authorization'] = f'Bearer {token}'
+            response = self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout)
+
+        if response.status_code != 206:
+            # Un 200 significaría descargar el producto entero: abortar
+            response.close()
+            raise IOError(f"El servidor no admite Range (HTTP {response.status_code})")
+
+        self.requests_made += 1
+        return response
+
+    def _fetch_size(self) -> int:
+        response = self._get_range(0, 0)
+        try:
+            content_range = response.headers.get('Content-Range', '')
+            total = content_range.split('/')[-1]
+            if not total.isdigit():
+                raise IOError(f"Content-Range sin tamaño total: '{content_range}'")
+            return int(total)
+        finally:
+            response.close()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self._size + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        if self._pos >= self._size or len(buffer) == 0:
+            return 0
+
+        end = min(self._pos + len(buffer), self._size) - 1
+        response = self._get_range(self._pos, end)
+        try:
+            data = response.content
+        finally:
+            response.close()
+
+        n = len(data)
+        buffer[:n] = data
+        self._pos += n
+        self.bytes_fetched += n
+        return n
+
+
+def parse_burst_footprints(annotation_xml: bytes) -> List[Polygon]:
+    """
+    Calcula la huella geográfica de cada burst a partir de un XML de anotación.
+
+    El geolocationGrid tiene filas en los límites de burst (line = i * linesPerBurst),
+    así que cada burst queda delimitado por la fila de grid más cercana a su primera
+    y a su última línea.
+
+    Args:
+        annotation_xml: Contenido del XML annotation/s1x-iwN-slc-pp-*.xml
+
+    Returns:
+        Lista de polígonos (lon, lat), uno por burst, en orden de adquisición
+    """
+    root = ET.fromstring(annotation_xml)
+
+    lines_per_burst_elem = root.find('.//swathTiming/linesPerBurst')
+    burst_list = root.find('.//swathTiming/burstList')
+    if lines_per_burst_elem is None or burst_list is None:
+        return []
+
+    lines_per_burst = int(lines_per_burst_elem.text)
+    burst_count = len(burst_list.findall('burst'))
+
+    rows = {}
+    for point in root.findall('.//geolocationGrid/geolocationGridPointList/geolocationGridPoint'):
+        try:
+            line = int(point.find('line').text)
+            pixel = int(point.find('pixel').text)
+            lon = float(point.find('longitude').text)
+            lat = float(point.find('latitude').text)
+        except (AttributeError, TypeError, ValueError):
+            continue
+        rows.setdefault(line, []).append((pixel, lon, lat))
+
+    if not rows or burst_count == 0:
+        return []
+
+    grid_lines = sorted(rows)
+
+    def nearest_row(line: int) -> List:
+        nearest = min(grid_lines, key=lambda g: abs(g - line))
+        return sorted(rows[nearest])
+
+    footprints = []
+    for i in range(burst_count):
+        top = nearest_row(i * lines_per_burst)
+        bottom = nearest_row((i + 1) * lines_per_burst - 1)
+        ring = [(lon, lat) for _, lon, lat in top] + [(lon, lat) for _, lon, lat in reversed(bottom)]
+        if len(ring) < 3:
+            continue
+        polygon = Polygon(ring)
+        if not polygon.is_valid:
+            polygon = polygon.buffer(0)
+        footprints.append(polygon)
+
+    return footprints
+
+
+class RemoteSLCProbe:
+    """
+    Sonda de cobertura a nivel de burst para SLCs remotos (Zipper API).
+
+    Los resultados se cachean por Id de producto, de forma que
+    filter_products_by_coverage() y calculate_missing_slcs_for_complete_processing()
+    pueden consultarla sin repetir peticiones. Es segura entre hilos.
+    """
+
+    def __init__(
+        self,
+        auth,
+        aoi_bbox: Dict,
+        zipper_api: str,
+        session: Optional[requests.Session] = None,
+        polarisation: str = 'VV'
+    ):
+        """
+        Args:
+            auth: CopernicusAuth (get_token / refresh_token)
+            aoi_bbox: AOI como dict con min_lon, max_lon, min_lat, max_lat
+            zipper_api: URL base del Zipper API
+            session: Sesión HTTP compartida (opcional)
+            polarisation: Polarización cuyas anotaciones se leen (la geometría
+                de los bursts es la misma para VV y VH)
+        """
+        self.auth = auth
+        self.aoi_polygon = box(aoi_bbox['min_lon'], aoi_bbox['min_lat'],
+                               aoi_bbox['max_lon'], aoi_bbox['max_lat'])
+        self.zipper_api = zipper_api
+        self.session = session or requests.Session()
+        self.polarisation = polarisation.lower()
+        self.bytes_fetched = 0
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def probe(self, product: Dict) -> Optional[Dict]:
+        """
+        Inspecciona remotamente un SLC y calcula su cobertura del AOI por subswath.
+
+        Args:
+            product: Producto del catálogo (Id, Name)
+
+        Returns:
+            Dict {'subswaths': {'IW1': {'bursts', 'bursts_aoi', 'coverage_pct'}, ...},
+                  (bursts_aoi: índices 1-based, como firstBurstIndex de TOPSAR-Split)
+                  'coverage_pct', 'bytes_fetched', 'zip_size'}
+            o None si el producto no es un SLC o la inspección falla
+        """
+        product_id = product.get('Id')
+        name = product.get('Name', '')
+        if not product_id or '_SLC_' not in name:
+            return None
+
+        with self._lock:
+            if product_id in self._results:
+                return self._results[product_id]
+
+        result = self._probe_uncached(product_id, name)
+
+        with self._lock:
+            self._results[product_id] = result
+            if result:
+                self.bytes_fetched += result['bytes_fetched']
+        return result
+
+    def _probe_uncached(self, product_id: str, name: str) -> Optional[Dict]:
+        url = f"{self.zipper_api}/Products({product_id})/$value"
+        try:
+            raw = HTTPRangeFile(self.session, url, self.auth)
+            with zipfile.ZipFile(io.BufferedReader(raw, buffer_size=RANGE_BUFFER_SIZE)) as zf:
+                # Una anotación por subswath, preferentemente de la polarización pedida
+                annotations = {}
+                for member in zf.namelist():
+                    match = ANNOTATION_PATTERN.search(member)
+                    if not match:
+                        continue
+                    subswath = match.group(1).upper()
+                    if subswath not in annotations or match.group(2).lower() == self.polarisation:
+                        annotations[subswath] = member
+
+                subswaths = {}
+                aoi_area = self.aoi_polygon.area
+                swath_hits = []
+                for subswath, member in sorted(annotations.items()):
+                    footprints = parse_burst_footprints(zf.read(member))
+                    hits = [i for i, fp in enumerate(footprints, 1) if fp.intersects(self.aoi_polygon)]
+                    covered = unary_union([footprints[i - 1] for i in hits]) if hits else None
+                    coverage = (covered.intersection(self.aoi_polygon).area / aoi_area * 100.0
+                                if covered is not None and aoi_area > 0 else 0.0)
+                    if covered is not None:
+                        swath_hits.append(covered)
+                    subswaths[subswath] = {
+                        'bursts': len(footprints),
+                        'bursts_aoi': hits,
+                        'coverage_pct': coverage
+                    }
+
+            union = unary_union(swath_hits) if swath_hits else None
+            total_coverage = (union.intersection(self.aoi_polygon).area / aoi_area * 100.0
+                              if union is not None and aoi_area > 0 else 0.0)
+
+            logger.debug(f"Sonda remota {name[:60]}: {total_coverage:.1f}% "
+                         f"({raw.bytes_fetched / 1024:.0f} KB en {raw.requests_made} peticiones)")
+
+            return {
+                'product': name,
+                'subswaths': subswaths,
+                'coverage_pct': total_coverage,
+                'bytes_fetched': raw.bytes_fetched,
+                'zip_size': raw.size
+            }
+
+        except (requests.exceptions.RequestException, IOError, zipfile.BadZipFile, ET.ParseError) as e:
+            logger.warning(f"Sonda remota falló para {name[:60]}: {e}")
+            return None
+
+    def coverage_pct(self, product: Dict, subswath: Optional[str] = None) -> Optional[float]:
+        """
+        % del AOI cubierto por bursts del producto (None si no se pudo inspeccionar).
+
+        Args:
+            product: Producto del catálogo
+            subswath: Si se indica, cobertura solo de ese subswath
+        """
+        info = self.probe(product)
+        if info is None:
+            return None
+        if subswath is None:
+            return info['coverage_pct']
+        swath_info = info['subswaths'].get(subswath.upper())
+        return swath_info['coverage_pct'] if swath_info else 0.0
+
+    def covers(self, product: Dict, subswath: str, min_coverage_pct: float = 0.0) -> bool:
+        """
+        Indica si algún burst del subswath cubre el AOI.
+
+        Si la sonda falla devuelve True (conservador: no descartar productos
+        por un error de red).
+        """
+        coverage = self.coverage_pct(product, subswath)
+        if coverage is None:
+            return True
+        return coverage > min_coverage_pct
+
+    def summary(self) -> str:
+        """Resumen para logs: productos inspeccionados y bytes leídos"""
+        with self._lock:
+            inspected = sum(1 for r in self._results.values() if r)
+            failed = sum(1 for r in self._results.values() if r is None)
+        mb = self.bytes_fetched / (1024 ** 2)
+        return f"{inspected} SLCs inspeccionados remotamente ({mb:.1f} MB leídos, {failed} fallos)"
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Catálogo indexado (SQLite) del repositorio de productos procesados
+
+Sustituye a los metadata.json por track como fuente de verdad de
+InSARRepository. Un único fichero <repo>/catalog.sqlite en modo WAL:
+
+- Lecturas concurrentes sin bloqueo mientras otra serie escribe.
+- Escrituras transaccionales (BEGIN IMMEDIATE): dos series que añaden
+  productos al mismo track a la vez ya no se pisan el metadata.json.
+- Añadir un producto es un INSERT, no reescribir el JSON completo.
+- Índices por (orbit, subswath, track, master_date, slave_date, pair_type)
+  para las consultas de pares y fechas.
+
+Los metadata.json existentes se importan una vez (import_json) y se pueden
+volver a generar en cualquier momento (export_json) para herramientas que
+todavía los lean.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILENAME = "catalog.sqlite"
+
+SCHEMA_VERSION = 1
+
+# Espera máxima (s) por el lock de escritura de otra serie
+DEFAULT_BUSY_TIMEOUT = 60
+
+# Columnas propias de cada tabla; el resto de claves del dict se guardan en 'extra'
+TRACK_FIELDS = ('track_id', 'created', 'last_updated', 'snap_version')
+INSAR_FIELDS = ('file', 'master_date', 'slave_date', 'pair_type',
+                'temporal_baseline_days', 'size_gb')
+POLARIMETRY_FIELDS = ('file', 'date', 'decomposition', 'size_gb')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    orbit_direction TEXT NOT NULL,
+    subswath TEXT NOT NULL,
+    track INTEGER NOT NULL,
+    track_id TEXT,
+    created TEXT,
+    last_updated TEXT,
+    snap_version TEXT,
+    extra TEXT,
+    PRIMARY KEY (orbit_direction, subswath, track)
+);
+
+CREATE TABLE IF NOT EXISTS insar_products (
+    orbit_direction TEXT NOT NULL,
+    subswath TEXT NOT NULL,
+    track INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    master_date TEXT,
+    slave_date TEXT,
+    pair_type TEXT,
+    temporal_baseline_days INTEGER,
+    size_gb REAL DEFAULT 0,
+    extra TEXT,
+    PRIMARY KEY (orbit_direction, subswath, track, file)
+);
+
+CREATE INDEX IF NOT EXISTS idx_insar_pairs
+    ON insar_products (orbit_direction, subswath, track, master_date, slave_date, pair_type);
+CREATE INDEX IF NOT EXISTS idx_insar_master ON insar_products (master_date);
+CREATE INDEX IF NOT EXISTS idx_insar_slave ON insar_products (slave_date);
+
+CREATE TABLE IF NOT EXISTS polarimetry_products (
+    orbit_direction TEXT NOT NULL,
+    subswath TEXT NOT NULL,
+    track INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    date TEXT,
+    decomposition TEXT,
+    size_gb REAL DEFAULT 0,
+    extra TEXT,
+    PRIMARY KEY (orbit_direction, subswath, track, file)
+);
+
+CREATE INDEX IF NOT EXISTS idx_polarimetry_date
+    ON polarimetry_products (orbit_direction, subswath, track, date);
+"""
+
+
+def update_metadata_summary(metadata: Dict) -> Dict:
+    """
+    Recalcula 'statistics' y 'temporal_range' de un dict de metadata de track
+
+    Returns:
+        El mismo dict, actualizado
+    """
+    insar = metadata.get('insar_products', [])
+    polarimetry = metadata.get('polarimetry_products', [])
+
+    statistics = metadata.setdefault('statistics', {})
+    statistics['total_insar_short'] = sum(1 for p in insar if p.get('pair_type') == 'short')
+    statistics['total_insar_long'] = sum(1 for p in insar if p.get('pair_type') == 'long')
+    statistics['total_polarimetry'] = len(polarimetry)
+    statistics['total_size_gb'] = (
+        sum(p.get('size_gb', 0.0) for p in insar) +
+        sum(p.get('size_gb', 0.0) for p in polarimetry)
+    )
+
+    dates = set()
+    for p in insar:
+        dates.add(p['master_date'])
+        dates.add(p['slave_date'])
+    for p in polarimetry:
+        dates.add(p['date'])
+
+    if dates:
+        sorted_dates = sorted(dates)
+        metadata['temporal_range'] = {
+            'start': sorted_dates[0],
+            'end': sorted_dates[-1],
+            'num_dates': len(sorted_dates)
+        }
+
+    return metadata
+
+
+def _split_fields(record: Dict, fields: Iterable[str]) -> List:
+    """Valores de las columnas propias + JSON con el resto de claves"""
+    extra = {k: v for k, v in record.items() if k not in fields}
+    return [record.get(f) for f in fields] + [json.dumps(extra) if extra else None]
+
+
+def _merge_extra(row: sqlite3.Row, fields: Iterable[str]) -> Dict:
+    """Dict de un registro: columnas propias (sin NULL) + claves de 'extra'"""
+    record = {f: row[f] for f in fields if row[f] is not None}
+    if row['extra']:
+        record.update(json.loads(row['extra']))
+    return record
+
+
+class RepositoryCatalog:
+    """Catálogo SQLite (WAL) de tracks y productos del repositorio"""
+
+    def __init__(self, db_path, busy_timeout: float = DEFAULT_BUSY_TIMEOUT):
+        """
+        Args:
+            db_path: Ruta al fichero SQLite (se crea si no existe)
+            busy_timeout: Segundos de espera por el lock de escritura
+        """
+        self.db_path = Path(db_path)
+        self.busy_timeout = busy_timeout
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute(
+                "INSERT OR IGNORE INTO catalog_info (key, value) VALUES ('schema_version', ?)",
+                (str(SCHEMA_VERSION),)
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Conexión propia por operación (seguro entre hilos y procesos)"""
+        conn = sqlite3.connect(str(self.db_path), timeout=self.busy_timeout,
+                               isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Transacción de escritura: toma el lock al empezar (BEGIN IMMEDIATE)"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def get_info(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM catalog_info WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def set_info(self, key: str, value: str):
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO catalog_info (key, value) VALUES (?, ?)",
+                         (key, value))
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _upsert_track(conn, orbit_direction, subswath, track, track_info: Dict):
+        """Crea el track si no existe y actualiza last_updated (y el resto si se pasan)"""
+        now = datetime.now().isoformat()
+        values = _split_fields(track_info, TRACK_FIELDS)
+        conn.execute(
+            """
+            INSERT INTO tracks (orbit_direction, subswath, track,
+                                track_id, created, last_updated, snap_version, extra)
+            VALUES (?, ?, ?, ?, COALESCE(?, ?), ?, ?, ?)
+            ON CONFLICT (orbit_direction, subswath, track) DO UPDATE SET
+                track_id = COALESCE(excluded.track_id, tracks.track_id),
+                last_updated = excluded.last_updated,
+                snap_version = COALESCE(excluded.snap_version, tracks.snap_version),
+                extra = COALESCE(excluded.extra, tracks.extra)
+            """,
+            (orbit_direction, subswath, track,
+             values[0], values[1], now, now, values[3], values[4])
+        )
+
+    @staticmethod
+    def _upsert_products(conn, table, fields, orbit_direction, subswath, track, products):
+        columns = ', '.join(fields)
+        placeholders = ', '.join('?' * (len(fields) + 4))
+        updates = ', '.join(f"{f} = excluded.{f}" for f in fields[1:] + ('extra',))
+        conn.executemany(
+            f"""
+            INSERT INTO {table} (orbit_direction, subswath, track, {columns}, extra)
+            VALUES ({placeholders})
+            ON CONFLICT (orbit_direction, subswath, track, file) DO UPDATE SET {updates}
+            """,
+            [[orbit_direction, subswath, track] + _split_fields(p, fields) for p in products]
+        )
+
+    def save_track(self, orbit_direction: str, subswath: str, track: int, metadata: Dict):
+        """
+        Guarda un track completo en una transacción
+
+        Los productos se fusionan por 'file' (insertar o actualizar); nunca se
+        borran productos que otra serie haya añadido mientras tanto.
+        """
+        orbit_direction, subswath = orbit_direction.upper(), subswath.upper()
+        track_info = dict(metadata.get('processing_info', {}))
+        track_info['track_id'] = metadata.get('track_id')
+
+        with self._transaction() as conn:
+            self._upsert_track(conn, orbit_direction, subswath, track, track_info)
+            self._upsert_products(conn, 'insar_products', INSAR_FIELDS,
+                                  orbit_direction, subswath, track,
+                                  metadata.get('insar_products', []))
+            self._upsert_products(conn, 'polarimetry_products', POLARIMETRY_FIELDS,
+                                  orbit_direction, subswath, track,
+                                  metadata.get('polarimetry_products', []))
+
+    def add_insar_products(self, orbit_direction: str, subswath: str, track: int,
+                           products: List[Dict], track_info: Optional[Dict] = None):
+        """
+        Añade (o actualiza) productos InSAR de un track, creándolo si no existe
+
+        Args:
+            track_info: track_id / processing_info para un track nuevo
+        """
+        orbit_direction, subswath = orbit_direction.upper(), subswath.upper()
+        with self._transaction() as conn:
+            self._upsert_track(conn, orbit_direction, subswath, track, track_info or {})
+            self._upsert_products(conn, 'insar_products', INSAR_FIELDS,
+                                  orbit_direction, subswath, track, products)
+
+    def add_polarimetry_products(self, orbit_direction: str, subswath: str, track: int,
+                                 products: List[Dict], track_info: Optional[Dict] = None):
+        """Añade (o actualiza) productos polarimétricos de un track (ver add_insar_products)"""
+        orbit_direction, subswath = orbit_direction.upper(), subswath.upper()
+        with self._transaction() as conn:
+            self._upsert_track(conn, orbit_direction, subswath, track, track_info or {})
+            self._upsert_products(conn, 'polarimetry_products', POLARIMETRY_FIELDS,
+                                  orbit_direction, subswath, track, products)
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def has_track(self, orbit_direction: str, subswath: str, track: int) -> bool:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM tracks WHERE orbit_direction = ? AND subswath = ? AND track = ?",
+                (orbit_direction.upper(), subswath.upper(), track)
+            ).fetchone()
+        return row is not None
+
+    def load_track(self, orbit_direction: str, subswath: str, track: int) -> Optional[Dict]:
+        """
+        Metadata de un track con la misma estructura que el antiguo metadata.json
+
+        Returns:
+            Dict o None si el track no está en el catálogo
+        """
+        orbit_direction, subswath = orbit_direction.upper(), subswath.upper()
+        key = (orbit_direction, subswath, track)
+        where = "WHERE orbit_direction = ? AND subswath = ? AND track = ?"
+
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT * FROM tracks {where}", key).fetchone()
+            if row is None:
+                return None
+            insar = conn.execute(
+                f"SELECT * FROM insar_products {where} ORDER BY master_date, slave_date, file", key
+            ).fetchall()
+            polarimetry = conn.execute(
+                f"SELECT * FROM polarimetry_products {where} ORDER BY date, file", key
+            ).fetchall()
+
+        processing_info = _merge_extra(row, TRACK_FIELDS)
+        track_id = processing_info.pop('track_id', None)
+
+        metadata = {
+            "track_id": track_id,
+            "orbit": {
+                "direction": orbit_direction,
+                "relative_orbit": track
+            },
+            "subswath": subswath,
+            "insar_products": [_merge_extra(r, INSAR_FIELDS) for r in insar],
+            "polarimetry_products": [_merge_extra(r, POLARIMETRY_FIELDS) for r in polarimetry],
+            "statistics": {},
+            "processing_info": processing_info
+        }
+        return update_metadata_summary(metadata)
+
+    def track_summaries(self, orbit_direction: Optional[str] = None,
+                        subswath: Optional[str] = None,
+                        track: Optional[int] = None) -> List[Dict]:
+        """
+        Estadísticas de cada track calculadas en SQL (sin cargar productos)
+
+        Returns:
+            Lista de dicts (orbit_direction, subswath, track, statistics,
+            temporal_range) ordenada por orbit, subswath y track
+        """
+        conditions, params = [], []
+        for column, value in (('orbit_direction', orbit_direction and orbit_direction.upper()),
+                              ('subswath', subswath and subswath.upper()),
+                              ('track', track)):
+            if value is not None:
+                conditions.append(f"t.{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        query = f"""
+            SELECT t.orbit_direction, t.subswath, t.track,
+                   (SELECT COUNT(*) FROM insar_products i
+                     WHERE i.orbit_direction = t.orbit_direction AND i.subswath = t.subswath
+                       AND i.track = t.track AND i.pair_type = 'short') AS total_insar_short,
+                   (SELECT COUNT(*) FROM insar_products i
+                     WHERE i.orbit_direction = t.orbit_direction AND i.subswath = t.subswath
+                       AND i.track = t.track AND i.pair_type = 'long') AS total_insar_long,
+                   (SELECT COUNT(*) FROM polarimetry_products p
+                     WHERE p.orbit_direction = t.orbit_direction AND p.subswath = t.subswath
+                       AND p.track = t.track) AS total_polarimetry,
+                   (SELECT COALESCE(SUM(size_gb), 0) FROM insar_products i
+                     WHERE i.orbit_direction = t.orbit_direction AND i.subswath = t.subswath
+                       AND i.track = t.track)
+                 + (SELECT COALESCE(SUM(size_gb), 0) FROM polarimetry_products p
+                     WHERE p.orbit_direction = t.orbit_direction AND p.subswath = t.subswath
+                       AND p.track = t.track) AS total_size_gb
+            FROM tracks t {where}
+            ORDER BY t.orbit_direction, t.subswath, t.track
+        """
+        dates_query = """
+            SELECT MIN(d), MAX(d), COUNT(DISTINCT d) FROM (
+                SELECT master_date AS d FROM insar_products
+                 WHERE orbit_direction = ? AND subswath = ? AND track = ?
+                UNION SELECT slave_date FROM insar_products
+                 WHERE orbit_direction = ? AND subswath = ? AND track = ?
+                UNION SELECT date FROM polarimetry_products
+                 WHERE orbit_direction = ? AND subswath = ? AND track = ?
+            ) WHERE d IS NOT NULL
+        """
+
+        summaries = []
+        with self._connect() as conn:
+            for row in conn.execute(query, params).fetchall():
+                key = (row['orbit_direction'], row['subswath'], row['track'])
+                start, end, num_dates = conn.execute(dates_query, key * 3).fetchone()
+                summary = {
+                    'orbit_direction': key[0],
+                    'subswath': key[1],
+                    'track': key[2],
+                    'statistics': {
+                        'total_insar_short': row['total_insar_short'],
+                        'total_insar_long': row['total_insar_long'],
+                        'total_polarimetry': row['total_polarimetry'],
+                        'total_size_gb': row['total_size_gb']
+                    }
+                }
+                if num_dates:
+                    summary['temporal_range'] = {'start': start, 'end': end, 'num_dates': num_dates}
+                summaries.append(summary)
+
+        return summaries
+
+    def find_insar_pairs(self, orbit_direction: Optional[str] = None,
+                         subswath: Optional[str] = None,
+                         track: Optional[int] = None,
+                         master_date: Optional[str] = None,
+                         slave_date: Optional[str] = None,
+                         pair_type: Optional[str] = None,
+                         date: Optional[str] = None) -> List[Dict]:
+        """
+        Productos InSAR que cumplen los filtros dados (consulta indexada)
+
+        Args:
+            date: Fecha usada como master o slave
+
+        Returns:
+            Lista de dicts de producto con orbit_direction, subswath y track
+        """
+        conditions, params = [], []
+        for column, value in (('orbit_direction', orbit_direction and orbit_direction.upper()),
+                              ('subswath', subswath and subswath.upper()),
+                              ('track', track),
+                              ('master_date', master_date),
+                              ('slave_date', slave_date),
+                              ('pair_type', pair_type)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if date is not None:
+            conditions.append("(master_date = ? OR slave_date = ?)")
+            params.extend([date, date])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM insar_products {where} "
+                f"ORDER BY orbit_direction, subswath, track, master_date, slave_date",
+                params
+            ).fetchall()
+
+        products = []
+        for row in rows:
+            product = _merge_extra(row, INSAR_FIELDS)
+            product.update(orbit_direction=row['orbit_direction'],
+                           subswath=row['subswath'], track=row['track'])
+            products.append(product)
+        return products
+
+    # ------------------------------------------------------------------
+    # Importar / exportar metadata.json
+    # ------------------------------------------------------------------
+
+    def import_json(self, repo_base_dir) -> int:
+        """
+        Importa todos los <orbit>_<iw>/tNNN/metadata.json del repositorio
+
+        Se puede repetir: los productos se fusionan por 'file'.
+
+        Returns:
+            Número de tracks importados
+        """
+        imported = 0
+        for metadata_file in sorted(Path(repo_base_dir).glob("*/t*/metadata.json")):
+            try:
+                with open(metadata_file, 'r') as f:
+                    metadata = json.load(f)
+
+                orbit_direction = metadata['orbit']['direction']
+                subswath = metadata['subswath']
+                track = int(metadata['orbit'].get('relative_orbit') or metadata_file.parent.name[1:])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"  ⚠️  metadata.json no importable ({metadata_file}): {e}")
+                continue
+
+            self.save_track(orbit_direction, subswath, track, metadata)
+            imported += 1
+            logger.debug(f"Importado: {metadata_file}")
+
+        self.set_info('json_imported', datetime.now().isoformat())
+        return imported
+
+    def export_json(self, track_dir_for) -> int:
+        """
+        Escribe el metadata.json de cada track (escritura atómica)
+
+        Args:
+            track_dir_for: Función (orbit_direction, subswath, track) -> Path del track
+
+        Returns:
+            Número de ficheros escritos
+        """
+        exported = 0
+        for summary in self.track_summaries():
+            key = (summary['orbit_direction'], summary['subswath'], summary['track'])
+            metadata = self.load_track(*key)
+            track_dir = Path(track_dir_for(*key))
+            track_dir.mkdir(parents=True, exist_ok=True)
+
+            fd, tmp_path = tempfile.mkstemp(dir=track_dir, prefix='.metadata.', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(metadata, f, indent=2)
+                os.replace(tmp_path, track_dir / "metadata.json")
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            exported += 1
+
+        return exported
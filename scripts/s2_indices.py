@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Motor de índices Sentinel-2 en una sola pasada
+
+Lee cada banda necesaria UNA vez por producto (solo la ventana del AOI o de
+unos bounds), calcula en una pasada vectorizada el conjunto de índices
+pedido (float32, operaciones in situ) y escribe un único COG multibanda:
+
+    banda 1..N: índices en el orden pedido (MSAVI, NDVI, NDMI, NDWI...)
+    banda N+1..: bandas de reflectancia opcionales (B04, B08, B11...)
+
+Las bandas de 20m (B11, SCL...) se remuestrean a la rejilla de 10m de la
+ventana. La máscara de nubes (SCL) se aplica una vez a todo el stack.
+
+Uso:
+    python scripts/s2_indices.py <producto.SAFE> <salida.tif> \\
+        [--indices MSAVI NDVI NDMI] [--bands B04 B08 B11] [--aoi-geojson aoi.geojson]
+"""
+
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.enums import Resampling
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.warp import reproject, transform_bounds, transform_geom
+from rasterio.windows import Window, WindowError
+
+logger = logging.getLogger(__name__)
+
+# Resolución nativa (directorio IMG_DATA) de cada banda L2A
+BAND_RESOLUTION = {
+    'B02': 'R10m', 'B03': 'R10m', 'B04': 'R10m', 'B08': 'R10m',
+    'B05': 'R20m', 'B06': 'R20m', 'B07': 'R20m', 'B8A': 'R20m',
+    'B11': 'R20m', 'B12': 'R20m', 'SCL': 'R20m',
+}
+
+# Banda que define la rejilla de salida (10m)
+REFERENCE_BAND = 'B04'
+
+# L2A: reflectancia * 10000
+REFLECTANCE_SCALE = 1.0 / 10000.0
+
+# SCL rechazadas: no data (0), saturados (1), sombras (3), nubes (8, 9), cirrus (10)
+SCL_INVALID_CLASSES = [0, 1, 3, 8, 9, 10]
+
+EPSILON = 1e-10
+
+# Caché por proceso: GeoJSON parseado y geometrías reproyectadas por CRS
+_AOI_GEOJSON_CACHE = {}
+_AOI_GEOMETRY_CACHE = {}
+
+
+def msavi_index(bands, out):
+    """MSAVI = (2·NIR + 1 - sqrt((2·NIR + 1)² - 8·(NIR - RED))) / 2"""
+    nir, red = bands['B08'], bands['B04']
+    np.multiply(nir, 2.0, out=out)
+    np.add(out, 1.0, out=out)
+    root = np.square(out)
+    diff = np.subtract(nir, red)
+    np.multiply(diff, 8.0, out=diff)
+    np.subtract(root, diff, out=root)
+    np.sqrt(root, out=root)
+    np.subtract(out, root, out=out)
+    np.multiply(out, 0.5, out=out)
+    return out
+
+
+def _normalized_difference(a, b, out):
+    """(a - b) / (a + b) in situ sobre out"""
+    np.subtract(a, b, out=out)
+    denominator = np.add(a, b)
+    np.add(denominator, EPSILON, out=denominator)
+    np.divide(out, denominator, out=out)
+    return out
+
+
+def ndvi_index(bands, out):
+    """NDVI = (NIR - RED) / (NIR + RED)"""
+    return _normalized_difference(bands['B08'], bands['B04'], out)
+
+
+def ndmi_index(bands, out):
+    """NDMI = (NIR - SWIR) / (NIR + SWIR)"""
+    return _normalized_difference(bands['B08'], bands['B11'], out)
+
+
+def ndwi_index(bands, out):
+    """NDWI (McFeeters) = (GREEN - NIR) / (GREEN + NIR)"""
+    return _normalized_difference(bands['B03'], bands['B08'], out)
+
+
+# Índices disponibles: bandas que necesitan y función (bands, out) -> out
+INDEX_DEFINITIONS = {
+    'MSAVI': {
+        'bands': ('B04', 'B08'),
+        'func': msavi_index,
+        'formula': '(2*NIR+1-sqrt((2*NIR+1)^2-8*(NIR-RED)))/2'
+    },
+    'NDVI': {
+        'bands': ('B04', 'B08'),
+        'func': ndvi_index,
+        'formula': '(NIR-RED)/(NIR+RED)'
+    },
+    'NDMI': {
+        'bands': ('B08', 'B11'),
+        'func': ndmi_index,
+        'formula': '(NIR-SWIR)/(NIR+SWIR)'
+    },
+    'NDWI': {
+        'bands': ('B03', 'B08'),
+        'func': ndwi_index,
+        'formula': '(GREEN-NIR)/(GREEN+NIR)'
+    },
+}
+
+DEFAULT_INDICES = ('MSAVI', 'NDVI', 'NDMI')
+
+
+def evaluate_indices(bands, indices, out=None):
+    """
+    Evalúa varios índices sobre bandas de reflectancia ya leídas
+
+    Args:
+        bands: Dict {banda: array float32 de reflectancia} (misma forma)
+        indices: Nombres de INDEX_DEFINITIONS
+        out: Array (len(indices), h, w) float32 preasignado (opcional)
+
+    Returns:
+        Array float32 (len(indices), h, w); no finitos → NaN, recortado a [-1, 1]
+    """
+    shape = next(iter(bands.values())).shape
+    if out is None:
+        out = np.empty((len(indices),) + shape, dtype=np.float32)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i, name in enumerate(indices):
+            INDEX_DEFINITIONS[name]['func'](bands, out[i])
+
+    out[~np.isfinite(out)] = np.nan
+    np.clip(out, -1, 1, out=out)
+    return out
+
+
+def find_s2_band(product_path, band_name):
+    """
+    Busca el JP2 de una banda dentro de un producto .SAFE L2A
+
+    Returns:
+        str: Ruta al archivo o None
+    """
+    resolution = BAND_RESOLUTION.get(band_name, 'R10m')
+    suffix = resolution[1:]
+    pattern = os.path.join(str(product_path), 'GRANULE', '*', 'IMG_DATA', resolution,
+                           f'*_{band_name}_{suffix}.jp2')
+    matches = glob.glob(pattern)
+    return matches[0] if matches else None
+
+
+def load_aoi_geojson(aoi_geojson):
+    """GeoJSON del AOI parseado (una vez por proceso)"""
+    key = os.path.abspath(aoi_geojson)
+    if key not in _AOI_GEOJSON_CACHE:
+        with open(aoi_geojson, 'r') as f:
+            _AOI_GEOJSON_CACHE[key] = json.load(f)
+    return _AOI_GEOJSON_CACHE[key]
+
+
+def load_aoi_geometries(aoi_geojson, dst_crs):
+    """
+    Lee las geometrías de un GeoJSON de AOI y las reproyecta al CRS del raster
+
+    Los AOI del proyecto están en lon/lat (CRS84/EPSG:4326); los tiles
+    Sentinel-2 en UTM.
+
+    Args:
+        aoi_geojson: Ruta al archivo GeoJSON con el AOI
+        dst_crs: CRS destino (el de las bandas)
+
+    Returns:
+        list: Geometrías (dicts GeoJSON) en dst_crs
+    """
+    cache_key = (os.path.abspath(aoi_geojson), str(dst_crs))
+    if cache_key in _AOI_GEOMETRY_CACHE:
+        return _AOI_GEOMETRY_CACHE[cache_key]
+
+    geojson = load_aoi_geojson(aoi_geojson)
+    if 'features' in geojson:
+        geometries = [feature['geometry'] for feature in geojson['features']]
+    else:
+        geometries = [geojson.get('geometry', geojson)]
+
+    geometries = [transform_geom('EPSG:4326', dst_crs, geom) for geom in geometries]
+    _AOI_GEOMETRY_CACHE[cache_key] = geometries
+    return geometries
+
+
+def covering_window(src, bounds, pad=1):
+    """
+    Ventana de src que cubre completamente unos bounds (offsets hacia abajo,
+    extremos hacia arriba), ampliada pad píxeles y limitada al raster
+
+    Se usa para leer la ventana de SCL (20m) equivalente a la de B04/B08 (10m).
+    """
+    window = src.window(*bounds)
+    col_start = max(math.floor(window.col_off) - pad, 0)
+    row_start = max(math.floor(window.row_off) - pad, 0)
+    col_end = min(math.ceil(window.col_off + window.width) + pad, src.width)
+    row_end = min(math.ceil(window.row_off + window.height) + pad, src.height)
+    return Window(col_start, row_start, col_end - col_start, row_end - row_start)
+
+
+def read_band_on_grid(band_file, transform, shape, crs, resampling=Resampling.bilinear,
+                      dtype=np.float32):
+    """
+    Lee una banda en la rejilla de salida (ventana de 10m)
+
+    Las bandas de 10m se leen directamente con la ventana; las de 20m se leen
+    en la ventana que cubre los mismos bounds y se remuestrean.
+    """
+    bounds = rasterio.transform.array_bounds(shape[0], shape[1], transform)
+    with rasterio.open(band_file) as src:
+        if src.transform.a == transform.a and src.transform.e == transform.e:
+            window = src.window(*bounds).round_offsets().round_lengths()
+            return src.read(1, window=window, out_dtype=dtype, boundless=True, fill_value=0)
+
+        window = covering_window(src, bounds)
+        data = src.read(1, window=window)
+        resampled = np.zeros(shape, dtype=dtype)
+        reproject(
+            source=data,
+            destination=resampled,
+            src_transform=src.window_transform(window),
+            src_crs=src.crs,
+            dst_transform=transform,
+            dst_crs=crs,
+            resampling=resampling
+        )
+        return resampled
+
+
+def write_cog(stack, output_path, transform, crs, descriptions, tags=None,
+              nodata=np.nan, blocksize=256):
+    """
+    Escribe un stack (bandas, filas, columnas) como Cloud Optimized GeoTIFF
+
+    DEFLATE con predictor (3 para float, 2 para enteros) y overviews. Se
+    escribe un GTiff temporal y se convierte con el driver COG a otro
+    temporal que se renombra al final, así output_path nunca queda a medias;
+    si la versión de GDAL no tiene COG, queda el GTiff teselado.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.tmp.tif"
+    cog_tmp_path = f"{output_path}.cog.tmp"
+    is_float = np.issubdtype(stack.dtype, np.floating)
+    profile = {
+        'driver': 'GTiff',
+        'height': stack.shape[1],
+        'width': stack.shape[2],
+        'count': stack.shape[0],
+        'dtype': stack.dtype.name,
+        'crs': crs,
+        'transform': transform,
+        'nodata': nodata,
+        'tiled': True,
+        'blockxsize': blocksize,
+        'blockysize': blocksize,
+        'compress': 'deflate',
+        'predictor': 3 if is_float else 2
+    }
+
+    try:
+        with rasterio.open(tmp_path, 'w', **profile) as dst:
+            dst.write(stack)
+            for i, description in enumerate(descriptions, 1):
+                dst.set_band_description(i, description)
+            if tags:
+                dst.update_tags(**tags)
+
+        with rasterio.Env() as env:
+            has_cog = 'COG' in env.drivers()
+        if has_cog:
+            rasterio.shutil.copy(tmp_path, cog_tmp_path, driver='COG',
+                                 COMPRESS='DEFLATE', PREDICTOR='YES', BLOCKSIZE=blocksize)
+            os.replace(cog_tmp_path, output_path)
+        else:
+            os.replace(tmp_path, output_path)
+    finally:
+        for path in (tmp_path, cog_tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def compute_indices(product_path, output_path, indices=DEFAULT_INDICES, include_bands=(),
+                    aoi_geojson=None, bounds=None, bounds_crs=None, apply_cloud_masking=True):
+    """
+    Calcula un conjunto de índices de un producto S2 en una sola pasada
+
+    Args:
+        product_path: Producto .SAFE L2A
+        output_path: COG multibanda de salida
+        indices: Índices de INDEX_DEFINITIONS (bandas 1..N)
+        include_bands: Bandas de reflectancia a añadir tras los índices
+        aoi_geojson: Limitar a la ventana del AOI y enmascarar el polígono
+        bounds: Alternativa al AOI: (left, bottom, right, top) a cubrir
+        bounds_crs: CRS de bounds (default: el del tile)
+        apply_cloud_masking: Enmascarar con SCL
+
+    Returns:
+        dict: {'output', 'bands', 'shape', 'valid_pixels', 'cloud_masked'} o None si falla
+    """
+    indices = [name.upper() for name in indices]
+    include_bands = [name.upper() for name in include_bands]
+    unknown = [name for name in indices if name not in INDEX_DEFINITIONS]
+    if unknown:
+        raise ValueError(f"Índices desconocidos: {', '.join(unknown)}")
+
+    required = []
+    for name in indices:
+        required.extend(INDEX_DEFINITIONS[name]['bands'])
+    required.extend(include_bands)
+    required = list(dict.fromkeys(required))
+
+    band_files = {band: find_s2_band(product_path, band) for band in required + [REFERENCE_BAND]}
+    missing = [band for band, path in band_files.items() if path is None]
+    if missing:
+        logger.error(f"  ✗ Bandas no encontradas en {os.path.basename(str(product_path))}: {', '.join(missing)}")
+        return None
+
+    # 1. Rejilla de salida: ventana de 10m del AOI/bounds (o tile completo)
+    geometries = None
+    with rasterio.open(band_files[REFERENCE_BAND]) as ref:
+        crs = ref.crs
+        try:
+            if aoi_geojson:
+                geometries = load_aoi_geometries(aoi_geojson, crs)
+                window = geometry_window(ref, geometries)
+            elif bounds is not None:
+                if bounds_crs is not None and bounds_crs != crs:
+                    bounds = transform_bounds(bounds_crs, crs, *bounds)
+                window = covering_window(ref, bounds, pad=0)
+                window = window.intersection(Window(0, 0, ref.width, ref.height))
+            else:
+                window = Window(0, 0, ref.width, ref.height)
+        except WindowError:
+            logger.error(f"  ✗ El área pedida no solapa {os.path.basename(str(product_path))}")
+            return None
+        transform = ref.window_transform(window)
+        shape = (int(window.height), int(window.width))
+
+    # 2. Cada banda se lee una sola vez y se pasa a reflectancia in situ
+    bands = {}
+    for band in required:
+        data = read_band_on_grid(band_files[band], transform, shape, crs)
+        np.multiply(data, REFLECTANCE_SCALE, out=data)
+        bands[band] = data
+
+    # 3. Índices + bandas en un único stack
+    descriptions = indices + [f"{band} reflectance" for band in include_bands]
+    stack = np.empty((len(descriptions),) + shape, dtype=np.float32)
+    evaluate_indices(bands, indices, out=stack[:len(indices)])
+    for offset, band in enumerate(include_bands, len(indices)):
+        stack[offset] = bands[band]
+    del bands
+
+    # 4. Máscaras: nubes (SCL) y polígono del AOI, una vez para todo el stack
+    invalid = np.zeros(shape, dtype=bool)
+    cloud_masked = False
+    scl_file = find_s2_band(product_path, 'SCL') if apply_cloud_masking else None
+    if scl_file:
+        scl = read_band_on_grid(scl_file, transform, shape, crs,
+                                resampling=Resampling.nearest, dtype=np.uint8)
+        invalid |= np.isin(scl, SCL_INVALID_CLASSES)
+        cloud_masked = True
+    elif apply_cloud_masking:
+        logger.warning("  ⚠ No se encontró banda SCL - sin máscara de nubes")
+
+    if geometries is not None:
+        invalid |= geometry_mask(geometries, out_shape=shape, transform=transform)
+
+    stack[:, invalid] = np.nan
+
+    # 5. COG multibanda
+    write_cog(
+        stack, output_path, transform, crs, descriptions,
+        tags={
+            'INDICES': ','.join(indices),
+            'BANDS': ','.join(include_bands),
+            'FORMULAS': '; '.join(f"{name}={INDEX_DEFINITIONS[name]['formula']}" for name in indices),
+            'SOURCE_PRODUCT': os.path.basename(str(product_path)),
+            'PROCESSING_DATE': datetime.now().isoformat()
+        }
+    )
+
+    valid_pixels = int(np.sum(np.isfinite(stack[0]))) if len(descriptions) else 0
+    logger.info(f"  ✓ Índices {', '.join(descriptions)} → {os.path.basename(str(output_path))} "
+                f"({shape[1]}x{shape[0]} px, {valid_pixels} válidos)")
+
+    return {
+        'output': str(output_path),
+        'bands': descriptions,
+        'shape': shape,
+        'valid_pixels': valid_pixels,
+        'cloud_masked': cloud_masked
+    }
+
+
+def band_index(raster_path, name):
+    """Número de banda (1-based) con descripción name en un COG de índices, o None"""
+    with rasterio.open(raster_path) as src:
+        for i, description in enumerate(src.descriptions, 1):
+            if description and description.split()[0].upper() == name.upper():
+                return i
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Índices Sentinel-2 en una sola pasada (COG multibanda)')
+    parser.add_argument('product', help='Producto Sentinel-2 L2A (.SAFE)')
+    parser.add_argument('output', help='COG de salida')
+    parser.add_argument('--indices', nargs='+', default=list(DEFAULT_INDICES),
+                        help=f"Índices ({', '.join(INDEX_DEFINITIONS)}; default: {' '.join(DEFAULT_INDICES)})")
+    parser.add_argument('--bands', nargs='*', default=[],
+                        help='Bandas de reflectancia a incluir (ej: B04 B08 B11)')
+    parser.add_argument('--aoi-geojson', help='GeoJSON del AOI para recorte')
+    parser.add_argument('--no-cloud-mask', action='store_true', help='No aplicar máscara de nubes')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    result = compute_indices(
+        args.product, args.output,
+        indices=args.indices,
+        include_bands=args.bands,
+        aoi_geojson=args.aoi_geojson,
+        apply_cloud_masking=not args.no_cloud_mask
+    )
+    return 0 if result else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
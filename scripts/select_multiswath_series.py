@@ -32,9 +32,13 @@ import logging
 logger = None
 
 
-def fetch_copernicus_products(auth, aoi_bbox, start_date, end_date, orbit_direction, satellites_filter=None):
+def fetch_copernicus_products(auth, aoi_bbox, start_date, end_date, orbit_direction, satellites_filter=None,
+                              use_cache=True):
     """
     Consulta la API de Copernicus para obtener productos disponibles.
+
+    Usa la misma caché de catálogo que download_copernicus.py, de modo que
+    la búsqueda posterior de descarga (o la de otro AOI) no repite la consulta.
     
     Args:
         auth: Objeto CopernicusAuth
@@ -43,11 +47,13 @@ def fetch_copernicus_products(auth, aoi_bbox, start_date, end_date, orbit_direct
         end_date: Fecha de fin
         orbit_direction: Dirección de órbita
         satellites_filter: Lista de satélites a filtrar (ej: ['S1A', 'S1C'])
+        use_cache: Usar la caché local de búsquedas del catálogo
     
     Returns:
         Lista de productos disponibles en Copernicus
     """
-    from download_copernicus import search_products, parse_product_name
+    from download_copernicus import search_products, parse_product_name, CATALOGUE_CACHE_DIR
+    from catalogue_cache import CatalogueCache
     
     logger.info("\n" + "=" * 80)
     logger.info("CONSULTANDO API DE COPERNICUS")
@@ -62,7 +68,8 @@ def fetch_copernicus_products(auth, aoi_bbox, start_date, end_date, orbit_direct
         end_date=end_date,
         bbox=aoi_bbox,
         orbit_direction=orbit_direction,
-        aoi_name=aoi_bbox.get('aoi_name')
+        aoi_name=aoi_bbox.get('aoi_name'),
+        cache=CatalogueCache(CATALOGUE_CACHE_DIR) if use_cache else None
     )
     
     if not products:
@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+"""
+Script: split_cache.py
+Descripción: Caché direccionada por contenido de productos intermedios Apply-Orbit-File + TOPSAR-Split
+
+Los grafos de preprocesado, InSAR por pares, stack y polarimetría aplicaban
+TOPSAR-Split y Apply-Orbit-File a los mismos SLCs una y otra vez (y en cada
+workspace). Esta caché guarda cada producto intermedio una sola vez,
+identificado por el contenido que lo determina:
+
+    (escena SLC, sub-swath, polarizaciones, rango de bursts,
+     fichero de órbita disponible, versión del grafo)
+
+Si aparece una órbita mejor (RESORB → POEORB) o cambia el grafo, la clave
+cambia y el intermedio se regenera; los antiguos acaban saliendo por LRU.
+
+- Referencias: los workspaces enlazan los productos con symlinks y los
+  procesos en curso los retienen mientras gpt los lee. Las referencias de
+  proceso ('pid:<pid>') se cuentan por acquire(): varios hilos del mismo
+  proceso (pares en paralelo con --jobs) pueden retener el mismo intermedio
+  y cada release() libera solo una. Una entrada con referencias vivas nunca
+  se desaloja.
+- Creación serializada por clave (lock en el proceso + flock de
+  <clave>/.lock): si dos pares en paralelo piden el mismo intermedio, solo
+  uno ejecuta gpt y el otro espera y reutiliza lo publicado. Un .dim ya
+  publicado nunca se sobrescribe (podría estar leyéndolo otro gpt).
+- Límite de tamaño: al superarlo se desalojan las entradas sin referencias
+  menos usadas recientemente (LRU); nunca una clave que se está creando.
+- Índice compartido entre procesos (JSON con bloqueo fcntl) con estadísticas
+  de aciertos por consumidor.
+
+Estructura en disco:
+    <cache_dir>/index.json
+    <cache_dir>/<clave>/<escena>_<IWn>_split.dim (+ .data)
+    <cache_dir>/<clave>/.lock           # bloqueo de creación (no se borra)
+    <cache_dir>/<clave>/.tmp_*/         # trabajo de gpt en curso
+
+Configuración (variables de entorno):
+    GOSHAWK_SPLIT_CACHE_DIR     Directorio de la caché (default: data/split_cache)
+    GOSHAWK_SPLIT_CACHE_GB      Tamaño máximo en GB (default: 200)
+
+Uso:
+    cache = SplitCache()
+    dim = cache.acquire(safe_path, 'IW2', consumer='insar_pair')   # retenido por este proceso
+    ...
+    cache.release(dim)
+    cache.link(dim, workspace_dim)                                 # symlink referenciado
+
+    python scripts/split_cache.py --stats     # tamaño, entradas y tasa de aciertos
+    python scripts/split_cache.py --evict     # aplicar el límite de tamaño ahora
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Sin fcntl (Windows) el índice solo se coordina dentro del proceso
+    FCNTL_AVAILABLE = False
+
+sys.path.insert(0, os.path.dirname(__file__))
+from common_utils import get_snap_orbits_dir
+from gpt_scheduler import run_gpt
+from processing_utils import publish_dimap_product
+
+logger = logging.getLogger(__name__)
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+
+SPLIT_CACHE_DIR = os.environ.get('GOSHAWK_SPLIT_CACHE_DIR', os.path.join(parent_dir, 'data', 'split_cache'))
+SPLIT_CACHE_MAX_GB = float(os.environ.get('GOSHAWK_SPLIT_CACHE_GB', '200'))
+
+# Cambiar al modificar el grafo de create_split_xml(): invalida las entradas previas
+GRAPH_VERSION = 'split-orbit-v1'
+
+# S1A_IW_SLC__1SDV_20240105T055322_...
+SCENE_PATTERN = re.compile(r'(S1[ABCD])_IW_SLC__\w{4}_(\d{8}T\d{6})_')
+
+
+def scene_id(product_path: Union[Path, str]) -> str:
+    """Identificador de escena: nombre del producto sin extensión"""
+    name = os.path.basename(str(product_path).rstrip('/'))
+    for suffix in ('.SAFE', '.zip', '.dim'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+def orbit_version(product_path: Union[Path, str]) -> str:
+    """
+    Fichero de órbita que Apply-Orbit-File usará para una escena
+
+    Busca en el directorio de órbitas de SNAP un POEORB (o, si no hay, un
+    RESORB) cuya validez cubra la adquisición. Si no hay ninguno local,
+    SNAP lo descargará: se devuelve 'auto' y la entrada se regenerará en
+    cuanto la órbita precisa esté en disco.
+    """
+    match = SCENE_PATTERN.search(os.path.basename(str(product_path)))
+    if not match:
+        return 'auto'
+    satellite = match.group(1)
+    sensing = datetime.strptime(match.group(2), '%Y%m%dT%H%M%S')
+
+    orbits_dir = get_snap_orbits_dir()
+    for orbit_type in ('POEORB', 'RESORB'):
+        # Un POEORB del día D se publica en el directorio del mes de D-1
+        for month_dir in {(sensing.year, sensing.month),
+                          ((sensing.year - 1, 12) if sensing.month == 1 else (sensing.year, sensing.month - 1))}:
+            directory = orbits_dir / orbit_type / satellite / str(month_dir[0]) / f"{month_dir[1]:02d}"
+            if not directory.is_dir():
+                continue
+            for orbit_file in sorted(directory.iterdir()):
+                parts = orbit_file.name.split('.')[0].split('_')
+                try:
+                    start = datetime.strptime(parts[6][1:], '%Y%m%dT%H%M%S')
+                    stop = datetime.strptime(parts[7], '%Y%m%dT%H%M%S')
+                except (IndexError, ValueError):
+                    continue
+                if start <= sensing <= stop:
+                    return orbit_file.name.split('.')[0]
+    return 'auto'
+
+
+def create_split_xml(
+    product_path: Union[Path, str],
+    output_path: Union[Path, str],
+    subswath: str,
+    polarisations: str = 'VV,VH',
+    bursts: Tuple[Optional[int], Optional[int]] = (None, None)
+) -> str:
+    """
+    Grafo canónico del intermedio: Read → TOPSAR-Split → Apply-Orbit-File → Write
+
+    Es el mismo grafo que usaba preprocess_products.py en modo InSAR: la
+    salida conserva la estructura de bursts (sin Deburst ni Subset).
+    """
+    first_burst, last_burst = bursts
+    burst_params = ''
+    if first_burst and last_burst:
+        burst_params = f"""
+      <firstBurstIndex>{first_burst}</firstBurstIndex>
+      <lastBurstIndex>{last_burst}</lastBurstIndex>"""
+
+    return f"""<graph id="SLC_Split_ApplyOrbit_Cache">
+  <version>1.0</version>
+
+  <node id="Read">
+    <operator>Read</operator>
+    <sources/>
+    <parameters>
+      <file>{product_path}</file>
+    </parameters>
+  </node>
+
+  <node id="TOPSAR-Split">
+    <operator>TOPSAR-Split</operator>
+    <sources>
+      <sourceProduct refid="Read"/>
+    </sources>
+    <parameters>
+      <subswath>{subswath}</subswath>
+      <selectedPolarisations>{polarisations}</selectedPolarisations>{burst_params}
+    </parameters>
+  </node>
+
+  <node id="Apply-Orbit-File">
+    <operator>Apply-Orbit-File</operator>
+    <sources>
+      <sourceProduct refid="TOPSAR-Split"/>
+    </sources>
+    <parameters>
+      <orbitType>Sentinel Precise (Auto Download)</orbitType>
+      <polyDegree>3</polyDegree>
+      <continueOnFail>false</continueOnFail>
+    </parameters>
+  </node>
+
+  <node id="Write">
+    <operator>Write</operator>
+    <sources>
+      <sourceProduct refid="Apply-Orbit-File"/>
+    </sources>
+    <parameters>
+      <file>{output_path}</file>
+      <formatName>BEAM-DIMAP</formatName>
+    </parameters>
+  </node>
+
+</graph>"""
+
+
+def _product_size(dim_path: Path) -> int:
+    """Bytes de un producto BEAM-DIMAP (.dim + .data)"""
+    total = dim_path.stat().st_size if dim_path.exists() else 0
+    data_dir = dim_path.with_suffix('.data')
+    for root, _, files in os.walk(data_dir):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+class SplitCache:
+    """Caché de intermedios Split + Apply-Orbit con referencias y límite LRU"""
+
+    _thread_lock = threading.Lock()
+    # Locks de creación por clave dentro del proceso (los hilos de --jobs)
+    _key_locks = {}
+    _key_locks_guard = threading.Lock()
+
+    def __init__(self, cache_dir: str = SPLIT_CACHE_DIR, max_gb: float = SPLIT_CACHE_MAX_GB):
+        """
+        Args:
+            cache_dir: Directorio de la caché (se crea si no existe)
+            max_gb: Tamaño máximo; al superarlo se desalojan entradas sin referencias
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_gb * 1024 ** 3)
+        self.index_file = self.cache_dir / 'index.json'
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """Índice {'entries': {...}, 'stats': {...}} bajo bloqueo exclusivo"""
+        with self._thread_lock:
+            if not FCNTL_AVAILABLE:
+                state = getattr(self, '_memory_state', None) or {'entries': {}, 'stats': {}}
+                yield state
+                self._memory_state = state
+                return
+
+            with open(self.index_file, 'a+', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    content = f.read()
+                    try:
+                        state = json.loads(content) if content.strip() else {}
+                    except ValueError:
+                        state = {}
+                    state.setdefault('entries', {})
+                    state.setdefault('stats', {})
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f, indent=1)
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _creation_lock(self, key: str, blocking: bool = True):
+        """
+        Bloqueo exclusivo de creación/borrado de una clave
+
+        Combina un lock por clave dentro del proceso y un flock sobre
+        <clave>/.lock entre procesos. Con blocking=False devuelve False si otro
+        hilo o proceso lo tiene (p.ej. está generando la entrada).
+        """
+        with self._key_locks_guard:
+            thread_lock = self._key_locks.setdefault(key, threading.Lock())
+        if not thread_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            if not FCNTL_AVAILABLE:
+                yield True
+                return
+            entry_dir = self.cache_dir / key
+            entry_dir.mkdir(parents=True, exist_ok=True)
+            with open(entry_dir / '.lock', 'a+') as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
+
+    @staticmethod
+    def make_key(
+        product_path: Union[Path, str],
+        subswath: str,
+        polarisations: str = 'VV,VH',
+        bursts: Tuple[Optional[int], Optional[int]] = (None, None)
+    ) -> Tuple[str, Dict]:
+        """
+        Clave de contenido de un intermedio
+
+        Returns:
+            (clave sha1, dict con los campos que la determinan)
+        """
+        fields = {
+            'scene': scene_id(product_path),
+            'subswath': subswath.upper(),
+            'polarisations': ','.join(sorted(polarisations.upper().split(','))),
+            'bursts': list(bursts),
+            'orbit': orbit_version(product_path),
+            'graph': GRAPH_VERSION
+        }
+        canonical = json.dumps(fields, sort_keys=True)
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:20], fields
+
+    @staticmethod
+    def _prune_refs(entry: Dict) -> None:
+        """Descarta referencias muertas: symlinks borrados o procesos terminados"""
+        live = []
+        entry_dim = Path(entry['dim']).resolve() if entry.get('dim') else None
+        for ref in entry.get('refs', []):
+            if ref.startswith('pid:'):
+                try:
+                    os.kill(int(ref.split(':')[1]), 0)
+                except ProcessLookupError:
+                    continue
+                except (PermissionError, ValueError):
+                    pass
+                live.append(ref)
+            elif os.path.islink(ref) and entry_dim and Path(ref).resolve() == entry_dim:
+                live.append(ref)
+        entry['refs'] = live
+
+    @staticmethod
+    def _count(state: Dict, consumer: str, outcome: str) -> None:
+        stats = state['stats']
+        stats[outcome] = stats.get(outcome, 0) + 1
+        by_consumer = stats.setdefault('by_consumer', {}).setdefault(consumer, {})
+        by_consumer[outcome] = by_consumer.get(outcome, 0) + 1
+
+    @staticmethod
+    def _add_ref(entry: Dict, holder: Optional[str]) -> None:
+        """Registra holder: las referencias de proceso se cuentan, los symlinks no se repiten"""
+        if holder and (holder.startswith('pid:') or holder not in entry['refs']):
+            entry['refs'].append(holder)
+
+    def _lookup(self, key: str, consumer: str, holder: Optional[str], count_miss: bool = True) -> Optional[str]:
+        with self._locked() as state:
+            entry = state['entries'].get(key)
+            if entry is None or not Path(entry['dim']).exists():
+                state['entries'].pop(key, None)
+                if count_miss:
+                    self._count(state, consumer, 'misses')
+                return None
+            entry['last_used'] = datetime.now().isoformat(timespec='seconds')
+            self._add_ref(entry, holder)
+            self._count(state, consumer, 'hits')
+            return entry['dim']
+
+    def _register(self, key: str, fields: Dict, final_dim: Path, holder: Optional[str]) -> None:
+        """Da de alta en el índice un intermedio publicado en final_dim"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._locked() as state:
+            refs = state['entries'].get(key, {}).get('refs', [])
+            state['entries'][key] = dict(
+                fields,
+                dim=str(final_dim.absolute()),
+                size_bytes=_product_size(final_dim),
+                created_at=now,
+                last_used=now,
+                refs=refs
+            )
+            self._add_ref(state['entries'][key], holder)
+
+    def get_or_create(
+        self,
+        product_path: Union[Path, str],
+        subswath: str,
+        polarisations: str = 'VV,VH',
+        bursts: Tuple[Optional[int], Optional[int]] = (None, None),
+        consumer: str = 'default',
+        holder: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Devuelve el intermedio de una escena, generándolo con gpt si falta
+
+        Args:
+            product_path: SLC original (.SAFE/.zip) o producto .dim sin split
+            subswath: Sub-swath (IW1/IW2/IW3)
+            polarisations: Polarizaciones a conservar ('VV,VH')
+            bursts: (firstBurstIndex, lastBurstIndex) 1-based, o (None, None) para todos
+            consumer: Nombre del consumidor para las estadísticas de aciertos
+            holder: Referencia a registrar ('pid:<pid>' o ruta de symlink)
+
+        Returns:
+            Ruta absoluta al .dim cacheado, o None si gpt falló
+        """
+        subswath = subswath.upper()
+        key, fields = self.make_key(product_path, subswath, polarisations, bursts)
+
+        # El fallo se cuenta una vez, tras comprobarlo con el lock de creación
+        dim = self._lookup(key, consumer, holder, count_miss=False)
+        if dim:
+            logger.info(f"  💾 Split cacheado: {fields['scene'][:40]} {subswath} (órbita {fields['orbit'][:20]})")
+            return dim
+
+        entry_dir = self.cache_dir / key
+        final_dim = entry_dir / f"{fields['scene']}_{subswath}_split.dim"
+
+        with self._creation_lock(key):
+            # Otro hilo/proceso pudo generarla mientras esperábamos el lock
+            dim = self._lookup(key, consumer, holder)
+            if dim:
+                logger.info(f"  💾 Split generado por otro proceso: {fields['scene'][:40]} {subswath}")
+                return dim
+
+            if final_dim.exists():
+                # Publicado pero sin entrada en el índice (proceso interrumpido
+                # tras publicar): el .dim se mueve el último, el producto está completo
+                logger.info(f"  💾 Split huérfano recuperado: {fields['scene'][:40]} {subswath}")
+            else:
+                work_dir = Path(tempfile.mkdtemp(prefix='.tmp_', dir=entry_dir))
+                work_dim = work_dir / final_dim.name
+
+                logger.info(f"  ⚙️  Generando split: {fields['scene'][:40]} {subswath}")
+                try:
+                    xml_file = work_dir / 'split.xml'
+                    xml_file.write_text(create_split_xml(product_path, work_dim, subswath, polarisations, bursts))
+                    result = run_gpt(
+                        str(xml_file),
+                        job_class='subset',
+                        timeout=1800,
+                        label=f"Split {fields['scene'][:40]} {subswath}"
+                    )
+                    if result.returncode != 0 or not work_dim.exists():
+                        logger.error(f"  ✗ Error generando split (exit code {result.returncode})")
+                        if result.stderr:
+                            logger.error(f"  STDERR: {result.stderr[-1000:]}")
+                        return None
+                    publish_dimap_product(work_dim, final_dim)
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+
+            self._register(key, fields, final_dim, holder)
+
+        self.evict(keep=key)
+        return str(final_dim.absolute())
+
+    def acquire(self, product_path: Union[Path, str], subswath: str, **kwargs) -> Optional[str]:
+        """
+        get_or_create() retenido por este proceso hasta release()
+
+        Cada llamada suma una referencia 'pid:<pid>': hay que emparejarla con
+        exactamente un release() (también desde hilos distintos).
+        """
+        return self.get_or_create(product_path, subswath, holder=f"pid:{os.getpid()}", **kwargs)
+
+    def release(self, dim_path: Union[Path, str], holder: Optional[str] = None) -> None:
+        """Libera una referencia de este proceso (o la indicada) sobre un intermedio"""
+        holder = holder or f"pid:{os.getpid()}"
+        dim_path = str(Path(dim_path).absolute())
+        with self._locked() as state:
+            for entry in state['entries'].values():
+                if entry['dim'] == dim_path and holder in entry['refs']:
+                    entry['refs'].remove(holder)
+
+    def link(self, dim_path: Union[Path, str], dest_dim: Union[Path, str]) -> Path:
+        """
+        Enlaza un intermedio en un workspace (.dim y .data) y registra la referencia
+
+        Returns:
+            Ruta del symlink .dim creado
+        """
+        dim_path = Path(dim_path).absolute()
+        dest_dim = Path(dest_dim)
+        dest_dim.parent.mkdir(parents=True, exist_ok=True)
+
+        for source, dest in ((dim_path, dest_dim), (dim_path.with_suffix('.data'), dest_dim.with_suffix('.data'))):
+            if dest.is_symlink() or dest.is_file():
+                dest.unlink()
+            elif dest.is_dir():
+                shutil.rmtree(dest)
+            dest.symlink_to(source)
+
+        ref = str(dest_dim.absolute())
+        with self._locked() as state:
+            for entry in state['entries'].values():
+                if entry['dim'] == str(dim_path) and ref not in entry['refs']:
+                    entry['refs'].append(ref)
+        return dest_dim
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Aplica el límite de tamaño desalojando entradas sin referencias (LRU)
+
+        Args:
+            keep: Clave que no se desaloja (la entrada recién creada)
+
+        Returns:
+            Número de entradas desalojadas
+        """
+        evicted = []
+        with self._locked() as state:
+            entries = state['entries']
+            for entry in entries.values():
+                self._prune_refs(entry)
+            total = sum(e.get('size_bytes', 0) for e in entries.values())
+            if total <= self.max_bytes:
+                return 0
+
+            candidates = sorted((e['last_used'], key) for key, e in entries.items()
+                                if not e['refs'] and key != keep)
+            for _, key in candidates:
+                if total <= self.max_bytes:
+                    break
+                total -= entries[key].get('size_bytes', 0)
+                evicted.append(key)
+                del entries[key]
+            state['stats']['evictions'] = state['stats'].get('evictions', 0) + len(evicted)
+
+        removed = [key for key in evicted if self._remove_entry_files(key)]
+        if len(removed) < len(evicted):
+            logger.info(f"  Caché de split: {len(evicted) - len(removed)} entradas en creación, no se borran")
+        if evicted:
+            logger.info(f"  🧹 Caché de split: {len(evicted)} entradas desalojadas (LRU)")
+        return len(evicted)
+
+    def _remove_entry_files(self, key: str) -> bool:
+        """
+        Borra del disco una entrada ya quitada del índice
+
+        Solo si nadie la está creando: con el lock de creación tomado no hay
+        directorios .tmp_* de trabajo vivos. Si entretanto se volvió a
+        publicar la clave, no se toca. El fichero .lock se conserva para que
+        quien espere en él y quien llegue después compartan el mismo bloqueo.
+        """
+        with self._creation_lock(key, blocking=False) as acquired:
+            if not acquired:
+                return False
+            with self._locked() as state:
+                if key in state['entries']:
+                    return False
+            entry_dir = self.cache_dir / key
+            if not entry_dir.is_dir():
+                return True
+            for child in entry_dir.iterdir():
+                if child.name == '.lock':
+                    continue
+                if child.is_dir() and not child.is_symlink():
+                    shutil.rmtree(child, ignore_errors=True)
+                else:
+                    child.unlink()
+            return True
+
+    def stats(self) -> Dict:
+        """Estado de la caché: entradas, tamaño, referencias y aciertos por consumidor"""
+        with self._locked() as state:
+            for entry in state['entries'].values():
+                self._prune_refs(entry)
+            entries = state['entries']
+            stats = dict(state['stats'])
+        hits, misses = stats.get('hits', 0), stats.get('misses', 0)
+        return {
+            'entries': len(entries),
+            'size_gb': round(sum(e.get('size_bytes', 0) for e in entries.values()) / 1024 ** 3, 2),
+            'max_gb': round(self.max_bytes / 1024 ** 3, 1),
+            'referenced': sum(1 for e in entries.values() if e['refs']),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses) * 100, 1) if hits + misses else 0.0,
+            'evictions': stats.get('evictions', 0),
+            'by_consumer': stats.get('by_consumer', {})
+        }
+
+    def summary(self) -> str:
+        """Resumen para logs"""
+        s = self.stats()
+        return (f"caché split: {s['hits']} hits, {s['misses']} misses ({s['hit_rate']}%), "
+                f"{s['entries']} entradas, {s['size_gb']}/{s['max_gb']} GB")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Caché de intermedios Apply-Orbit + TOPSAR-Split')
+    parser.add_argument('--stats', action='store_true', help='Mostrar tamaño, entradas y tasa de aciertos')
+    parser.add_argument('--evict', action='store_true', help='Aplicar el límite de tamaño (LRU)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    cache = SplitCache()
+
+    if args.evict:
+        cache.evict()
+
+    stats = cache.stats()
+    print(f"Caché de split: {cache.cache_dir}")
+    print(f"  Entradas: {stats['entries']} ({stats['referenced']} referenciadas)")
+    print(f"  Tamaño: {stats['size_gb']} / {stats['max_gb']} GB")
+    print(f"  Aciertos: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']}%)")
+    print(f"  Desalojos: {stats['evictions']}")
+    for consumer, counts in sorted(stats['by_consumer'].items()):
+        c_hits, c_misses = counts.get('hits', 0), counts.get('misses', 0)
+        rate = c_hits / (c_hits + c_misses) * 100 if c_hits + c_misses else 0.0
+        print(f"    {consumer:<12} {c_hits:>5} hits {c_misses:>5} misses ({rate:.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
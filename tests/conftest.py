@@ -0,0 +1,216 @@
+"""
+Fixtures compartidas de los tests
+
+Los scripts se importan igual que desde la línea de comandos (directorio
+scripts/ en sys.path). Los servicios remotos se sustituyen por servidores
+HTTP locales en un hilo, sin tocar la red.
+"""
+
+import json
+import logging
+import re
+import sys
+import threading
+import zipfile
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+for path in (ROOT_DIR, ROOT_DIR / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+class StubServer:
+    """Servidor HTTP local que registra las peticiones recibidas"""
+
+    def __init__(self, handler_class):
+        self.requests = []
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+        self.httpd.stub = self
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Base de los handlers: registra la petición y silencia el log de http.server"""
+
+    def setup(self):
+        super().setup()
+        self.stub = self.server.stub
+
+    def send_body(self, body: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# ============================================================================
+# CATÁLOGO ODATA (CDSE)
+# ============================================================================
+
+ODATA_WINDOW_PATTERN = re.compile(r"ContentDate/Start gt (\S+) and ContentDate/Start lt (\S+)")
+
+
+def make_odata_product(index: int, start: str) -> dict:
+    """Producto mínimo del catálogo con fecha de adquisición 'YYYY-MM-DDTHH:MM:SS'"""
+    compact = start.replace('-', '').replace(':', '')
+    return {
+        'Id': f"id-{index:04d}",
+        'Name': f"S1A_IW_SLC__1SDV_{compact}_{compact}_0{index:05d}_000000_0000.SAFE",
+        'ContentDate': {'Start': f"{start}.000Z"}
+    }
+
+
+class ODataHandler(StubHandler):
+    """
+    /odata/v1/Products con el subconjunto de OData que usa search_products():
+    ventana de ContentDate/Start en $filter, $top, $skip y @odata.nextLink
+    """
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        self.stub.requests.append(params)
+
+        if self.stub.fail:
+            self.send_body(b'{"error": "unavailable"}', 'application/json', status=503)
+            return
+
+        match = ODATA_WINDOW_PATTERN.search(params.get('$filter', ''))
+        window_start, window_end = match.groups() if match else ('', '9999')
+        selected = sorted(
+            (p for p in self.stub.products
+             if window_start < p['ContentDate']['Start'] < window_end),
+            key=lambda p: p['ContentDate']['Start'],
+            reverse=True
+        )
+
+        top = int(params.get('$top', 1000))
+        skip = int(params.get('$skip', 0))
+        page = selected[skip:skip + top]
+        body = {'value': page}
+        if self.stub.next_links and skip + top < len(selected):
+            next_params = dict(params, **{'$skip': skip + top})
+            body['@odata.nextLink'] = f"{self.stub.url}{parts.path}?{urlencode(next_params)}"
+
+        self.send_body(json.dumps(body).encode('utf-8'), 'application/json')
+
+
+class FakeAuth:
+    """Sustituto de CopernicusAuth: token fijo, sin servidor de identidad"""
+
+    def get_token(self, force_refresh=False):
+        return 'test-token'
+
+
+@pytest.fixture
+def fake_auth():
+    return FakeAuth()
+
+
+@pytest.fixture
+def odata_server(monkeypatch):
+    """
+    Catálogo OData local. download_copernicus.CATALOGUE_API apunta a él.
+
+    Atributos del servidor: products (lista editable), next_links (devolver
+    @odata.nextLink o forzar la paginación por $skip), fail (responder 503) y
+    requests (parámetros de cada petición recibida).
+    """
+    import download_copernicus
+
+    server = StubServer(ODataHandler)
+    server.products = []
+    server.next_links = True
+    server.fail = False
+    monkeypatch.setattr(download_copernicus, 'CATALOGUE_API', f"{server.url}/odata/v1")
+    yield server
+    server.close()
+
+
+# ============================================================================
+# SERVIDOR DE ÓRBITAS (step.esa.int)
+# ============================================================================
+
+def make_orbit_filename(satellite: str, date: str) -> str:
+    """Nombre POEORB (.EOF.zip) que cubre la fecha 'YYYY-MM-DD'"""
+    day = datetime.strptime(date, '%Y-%m-%d')
+    start = day - timedelta(days=1) + timedelta(hours=22, minutes=59, seconds=42)
+    stop = start + timedelta(hours=26)
+    published = day + timedelta(days=20)
+    return (f"{satellite}_OPER_AUX_POEORB_OPOD_{published:%Y%m%dT070809}_"
+            f"V{start:%Y%m%dT%H%M%S}_{stop:%Y%m%dT%H%M%S}.EOF.zip")
+
+
+class OrbitDirectoryHandler(StubHandler):
+    """
+    Directorio <producto>/<satélite>/<año>/<mes>/ con el listado HTML de
+    Apache que publica ESA y los .EOF.zip que contiene
+    """
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.stub.requests.append(path)
+
+        directory, _, filename = path.rstrip('/').rpartition('/')
+        if filename in self.stub.files.get(directory, []):
+            buffer = BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as zip_out:
+                zip_out.writestr(filename[:-4], b'<Earth_Explorer_File><Data_Block/></Earth_Explorer_File>')
+            self.send_body(buffer.getvalue(), 'application/zip')
+            return
+
+        directory = path.rstrip('/')
+        if directory not in self.stub.files:
+            self.send_body(b'Not Found', 'text/plain', status=404)
+            return
+        links = ''.join(f'<a href="{name}">{name}</a>\n' for name in self.stub.files[directory])
+        self.send_body(f"<html><body><pre>{links}</pre></body></html>".encode('utf-8'), 'text/html')
+
+
+@pytest.fixture
+def orbit_server(monkeypatch, tmp_path):
+    """
+    Servidor local de órbitas y directorios aislados para download_orbits.
+
+    server.add(satellite, dates) publica una órbita POEORB por fecha;
+    server.url_template sustituye a ESA_ORBITS_URL; server.snap_dir es el
+    directorio de órbitas de SNAP; server.requests, las rutas pedidas.
+    """
+    import download_orbits
+
+    server = StubServer(OrbitDirectoryHandler)
+    server.files = {}
+
+    def add(satellite, dates):
+        for date in dates:
+            filename = make_orbit_filename(satellite, date)
+            directory = f"/POEORB/{satellite}/{date[:4]}/{date[5:7]}"
+            server.files.setdefault(directory, []).append(filename)
+
+    server.add = add
+    server.url_template = server.url + '/{product}/{satellite}/{year}/{month:02}'
+    server.snap_dir = tmp_path / 'snap'
+    server.snap_dir.mkdir()
+
+    monkeypatch.setattr(download_orbits, 'get_snap_orbits_dir', lambda: server.snap_dir)
+    monkeypatch.setattr(download_orbits, 'ORBITS_DIR', str(tmp_path / 'orbits'))
+    monkeypatch.setattr(download_orbits, 'logger', logging.getLogger('download_orbits'))
+    yield server
+    server.close()
@@ -0,0 +1,163 @@
+"""
+Tests de la búsqueda paginada en el catálogo y de CatalogueCache
+
+Se ejecutan contra el catálogo OData local del fixture odata_server.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import download_copernicus
+from catalogue_cache import INCREMENTAL_OVERLAP, CatalogueCache
+from conftest import make_odata_product
+
+BBOX = {'min_lon': 2.0, 'min_lat': 41.0, 'max_lon': 2.2, 'max_lat': 41.2}
+START = datetime(2025, 1, 1)
+END = datetime(2025, 1, 31)
+
+
+@pytest.fixture
+def catalogue(odata_server, monkeypatch):
+    """Catálogo con 5 productos en enero de 2025 y páginas de 2 productos"""
+    monkeypatch.setattr(download_copernicus, 'CATALOGUE_PAGE_SIZE', 2)
+    odata_server.products.extend(
+        make_odata_product(i, f"2025-01-{day:02d}T06:00:00") for i, day in enumerate((3, 9, 15, 21, 27))
+    )
+    return odata_server
+
+
+def search(auth, cache=None, start=START, end=END):
+    return download_copernicus.search_products(
+        auth, start_date=start, end_date=end, bbox=BBOX,
+        orbit_direction='DESCENDING', cache=cache
+    )
+
+
+# ============================================================================
+# PAGINACIÓN
+# ============================================================================
+
+def test_paging_follows_next_link(catalogue, fake_auth):
+    products = search(fake_auth)
+
+    assert len(products) == 5
+    assert len({p['Id'] for p in products}) == 5
+    assert len(catalogue.requests) == 3
+    assert [r.get('$skip') for r in catalogue.requests] == [None, '2', '4']
+
+
+def test_paging_falls_back_to_skip_without_next_link(catalogue, fake_auth):
+    catalogue.next_links = False
+
+    products = search(fake_auth)
+
+    assert len(products) == 5
+    # Última página incompleta: no se pide una cuarta
+    assert [r.get('$skip') for r in catalogue.requests] == [None, '2', '4']
+
+
+def test_paging_error_returns_none(catalogue, fake_auth):
+    catalogue.fail = True
+
+    assert search(fake_auth) is None
+
+
+# ============================================================================
+# CACHÉ
+# ============================================================================
+
+def test_cache_hit_makes_no_request(catalogue, fake_auth, tmp_path):
+    cache = CatalogueCache(str(tmp_path))
+    first = search(fake_auth, cache)
+    requests_after_first = len(catalogue.requests)
+
+    second = search(fake_auth, cache)
+
+    assert [p['Id'] for p in second] == [p['Id'] for p in first]
+    assert len(catalogue.requests) == requests_after_first
+    assert (cache.misses, cache.hits, cache.partial_hits) == (1, 1, 0)
+
+
+def test_cache_serves_narrower_window(catalogue, fake_auth, tmp_path):
+    cache = CatalogueCache(str(tmp_path))
+    search(fake_auth, cache)
+    requests_after_first = len(catalogue.requests)
+
+    products = search(fake_auth, cache, start=datetime(2025, 1, 10), end=datetime(2025, 1, 20))
+
+    assert [p['ContentDate']['Start'][:10] for p in products] == ['2025-01-15']
+    assert len(catalogue.requests) == requests_after_first
+    assert cache.hits == 1
+
+
+def test_cache_is_shared_between_instances(catalogue, fake_auth, tmp_path):
+    search(fake_auth, CatalogueCache(str(tmp_path)))
+    requests_after_first = len(catalogue.requests)
+
+    cache = CatalogueCache(str(tmp_path))
+    assert len(search(fake_auth, cache)) == 5
+    assert len(catalogue.requests) == requests_after_first
+    assert cache.hits == 1
+
+
+def queries(server):
+    """Consultas distintas recibidas (primera página de cada una)"""
+    return [r['$filter'] for r in server.requests if '$skip' not in r]
+
+
+def expire(cache_dir, hours):
+    """Retrasa fetched_at de todas las entradas de la caché"""
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        fetched_at = datetime.fromisoformat(entry['fetched_at']) - timedelta(hours=hours)
+        entry['fetched_at'] = fetched_at.isoformat()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+
+
+def test_ttl_expiry_refreshes_only_after_last_acquisition(catalogue, fake_auth, tmp_path):
+    cache = CatalogueCache(str(tmp_path), ttl_hours=1)
+    search(fake_auth, cache)
+    catalogue.products.append(make_odata_product(99, "2025-01-30T06:00:00"))
+
+    # Dentro del TTL el producto nuevo no aparece
+    assert len(search(fake_auth, cache)) == 5
+
+    expire(str(tmp_path), hours=2)
+    catalogue.requests.clear()
+    products = search(fake_auth, cache)
+
+    assert len(products) == 6
+    assert products[0]['Id'] == 'id-0099'
+    assert cache.partial_hits == 1
+    # Una sola consulta incremental desde la última adquisición menos el solape
+    assert len(queries(catalogue)) == 1
+    refresh_from = (datetime(2025, 1, 27, 6) - INCREMENTAL_OVERLAP).strftime('%Y-%m-%dT00:00:00.000Z')
+    assert f"ContentDate/Start gt {refresh_from}" in queries(catalogue)[0]
+
+
+def test_expired_entry_served_when_catalogue_is_down(catalogue, fake_auth, tmp_path):
+    cache = CatalogueCache(str(tmp_path), ttl_hours=1)
+    search(fake_auth, cache)
+    expire(str(tmp_path), hours=2)
+    catalogue.fail = True
+
+    assert len(search(fake_auth, cache)) == 5
+
+
+def test_wider_window_fetches_only_the_gap(catalogue, fake_auth, tmp_path):
+    cache = CatalogueCache(str(tmp_path))
+    search(fake_auth, cache, start=datetime(2025, 1, 10))
+    catalogue.requests.clear()
+
+    products = search(fake_auth, cache)
+
+    assert len(products) == 5
+    assert len(queries(catalogue)) == 1
+    assert "ContentDate/Start gt 2025-01-01T00:00:00.000Z" in queries(catalogue)[0]
+    assert "ContentDate/Start lt 2025-01-10T23:59:59.999Z" in queries(catalogue)[0]
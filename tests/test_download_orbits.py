@@ -0,0 +1,129 @@
+"""
+Tests del descargador de órbitas: índice local y caché de listados
+
+Se ejecutan contra el directorio de órbitas local del fixture orbit_server.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+import download_orbits
+from conftest import make_orbit_filename
+from download_orbits import LISTING_TTL, LocalOrbitIndex, download_orbits_for_period, list_remote_orbits
+
+JANUARY = [f"2025-01-{day:02d}" for day in range(5, 10)]
+
+
+def add_local_orbits(snap_dir, satellite, dates):
+    """Crea en SNAP los .EOF de las fechas indicadas"""
+    for date in dates:
+        month_dir = snap_dir / 'POEORB' / satellite / date[:4] / date[5:7]
+        month_dir.mkdir(parents=True, exist_ok=True)
+        (month_dir / make_orbit_filename(satellite, date)[:-4]).write_text('<Earth_Explorer_File/>')
+
+
+def run(server, tmp_path, needed_dates=None, start='2025-01-01', end='2025-01-31'):
+    return download_orbits_for_period(
+        satellite='S1A',
+        orbit_type='POEORB',
+        start_date=datetime.strptime(start, '%Y-%m-%d'),
+        end_date=datetime.strptime(end, '%Y-%m-%d'),
+        needed_dates=needed_dates,
+        workers=2,
+        local_index=LocalOrbitIndex(server.snap_dir, index_file=str(tmp_path / 'local_index.json')),
+        base_url_template=server.url_template,
+        listing_cache_dir=str(tmp_path / 'listing_cache')
+    )
+
+
+# ============================================================================
+# ÍNDICE LOCAL
+# ============================================================================
+
+def test_local_index_avoids_requests(orbit_server, tmp_path):
+    orbit_server.add('S1A', JANUARY)
+    add_local_orbits(orbit_server.snap_dir, 'S1A', JANUARY)
+
+    result = run(orbit_server, tmp_path, needed_dates=set(JANUARY[:3]))
+
+    assert result['downloaded'] == 0
+    assert result['present'] == 3
+    assert orbit_server.requests == []
+
+
+def test_only_missing_dates_are_downloaded(orbit_server, tmp_path):
+    orbit_server.add('S1A', JANUARY)
+    add_local_orbits(orbit_server.snap_dir, 'S1A', JANUARY[:2])
+
+    result = run(orbit_server, tmp_path, needed_dates=set(JANUARY[1:4]))
+
+    assert result['downloaded'] == 2
+    assert result['errors'] == 0
+    downloaded = sorted(p for p in orbit_server.requests if p.endswith('.EOF.zip'))
+    assert downloaded == sorted(f"/POEORB/S1A/2025/01/{make_orbit_filename('S1A', d)}" for d in JANUARY[2:4])
+    for date in JANUARY[2:4]:
+        assert (orbit_server.snap_dir / 'POEORB' / 'S1A' / '2025' / '01' /
+                make_orbit_filename('S1A', date)[:-4]).exists()
+
+
+def test_local_index_is_persisted_and_reused(orbit_server, tmp_path):
+    add_local_orbits(orbit_server.snap_dir, 'S1A', JANUARY)
+    index_file = str(tmp_path / 'local_index.json')
+    index = LocalOrbitIndex(orbit_server.snap_dir, index_file=index_file)
+    assert len(index.files('POEORB', 'S1A', 2025, 1)) == len(JANUARY)
+    index.save()
+
+    reloaded = LocalOrbitIndex(orbit_server.snap_dir, index_file=index_file)
+    assert reloaded.covered_dates('POEORB', 'S1A', {(2025, 1)}) == set(JANUARY)
+    # Directorio sin cambios: no se vuelve a escanear ni a guardar
+    assert not reloaded.dirty
+
+
+# ============================================================================
+# CACHÉ DE LISTADOS REMOTOS
+# ============================================================================
+
+def test_cached_listing_is_reused_without_request(orbit_server, tmp_path):
+    orbit_server.add('S1A', JANUARY)
+
+    first = run(orbit_server, tmp_path)
+    assert first['downloaded'] == len(JANUARY)
+    assert sum(1 for p in orbit_server.requests if not p.endswith('.zip')) == 1
+
+    orbit_server.requests.clear()
+    second = run(orbit_server, tmp_path)
+
+    assert second['downloaded'] == 0
+    assert orbit_server.requests == []
+
+
+def test_recent_listing_expires_after_ttl(orbit_server, tmp_path):
+    now = datetime.now()
+    dates = [now.strftime('%Y-%m-%d')]
+    orbit_server.add('S1A', dates)
+    url = orbit_server.url_template.format(product='POEORB', satellite='S1A', year=now.year, month=now.month)
+    cache_dir = str(tmp_path / 'listing_cache')
+    session = download_orbits.create_orbit_session(1)
+
+    assert list_remote_orbits(session, url, now.year, now.month, cache_dir) == [make_orbit_filename('S1A', dates[0])]
+    list_remote_orbits(session, url, now.year, now.month, cache_dir)
+    assert len(orbit_server.requests) == 1
+
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        cached['fetched_at'] = (now - LISTING_TTL - timedelta(minutes=1)).isoformat()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(cached, f)
+
+    list_remote_orbits(session, url, now.year, now.month, cache_dir)
+    assert len(orbit_server.requests) == 2
+
+
+def test_missing_month_is_not_an_error(orbit_server, tmp_path):
+    result = run(orbit_server, tmp_path, start='2025-02-01', end='2025-02-28')
+
+    assert result['downloaded'] == 0
+    assert result['errors'] == 0
@@ -0,0 +1,106 @@
+"""
+Tests de la caché de splits: creación concurrente de la misma clave y desalojo
+
+gpt se sustituye por una función que escribe un producto BEAM-DIMAP mínimo.
+"""
+
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import split_cache
+from split_cache import SplitCache
+
+SLC = '/data/S1A_IW_SLC__1SDV_20250105T055322_20250105T055349_057312_070E4A_1A2B.SAFE'
+SLC_2 = '/data/S1A_IW_SLC__1SDV_20250117T055322_20250117T055349_057487_071547_3C4D.SAFE'
+
+
+@pytest.fixture
+def fake_gpt(monkeypatch):
+    """run_gpt falso: escribe el .dim/.data del grafo tras un pequeño retardo"""
+    calls = []
+
+    def run_gpt(xml_file, **kwargs):
+        calls.append(xml_file)
+        with open(xml_file, encoding='utf-8') as f:
+            output = re.findall(r'<file>(.*?)</file>', f.read())[-1]
+        time.sleep(0.2)
+        data_dir = output[:-4] + '.data'
+        split_cache.Path(data_dir).mkdir()
+        split_cache.Path(data_dir, 'i_VV.img').write_bytes(b'\0' * 1024)
+        split_cache.Path(output).write_text('<Dimap_Document/>')
+        return subprocess.CompletedProcess([xml_file], 0, '', '')
+
+    monkeypatch.setattr(split_cache, 'run_gpt', run_gpt)
+    return calls
+
+
+def test_concurrent_misses_run_gpt_once(tmp_path, fake_gpt):
+    cache = SplitCache(str(tmp_path))
+    barrier = threading.Barrier(4)
+
+    def acquire():
+        barrier.wait()
+        dim = cache.acquire(SLC, 'IW2', consumer='insar_pair')
+        data_inode = split_cache.Path(dim).with_suffix('.data').stat().st_ino
+        return dim, data_inode
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: acquire(), range(4)))
+
+    assert len(fake_gpt) == 1
+    assert len(set(results)) == 1
+    stats = cache.stats()
+    assert stats['entries'] == 1
+    assert stats['misses'] == 1 and stats['hits'] == 3
+
+    dim = results[0][0]
+    for _ in range(4):
+        cache.release(dim)
+    assert cache.stats()['referenced'] == 0
+
+
+def test_published_dim_is_not_overwritten(tmp_path, fake_gpt):
+    cache = SplitCache(str(tmp_path))
+    dim = cache.acquire(SLC, 'IW2')
+    data_dir = split_cache.Path(dim).with_suffix('.data')
+    inode = data_dir.stat().st_ino
+
+    # Índice perdido: la entrada publicada se recupera sin regenerarla
+    (tmp_path / 'index.json').unlink()
+    assert cache.acquire(SLC, 'IW2') == dim
+    assert len(fake_gpt) == 1
+    assert data_dir.stat().st_ino == inode
+
+
+def test_evict_skips_keys_being_created(tmp_path, fake_gpt):
+    cache = SplitCache(str(tmp_path), max_gb=0)
+    dim = cache.get_or_create(SLC, 'IW2')
+    key = split_cache.Path(dim).parent.name
+
+    # Otro proceso la está regenerando: tiene el lock y su directorio de trabajo
+    work_dir = tmp_path / key / '.tmp_other'
+    with cache._creation_lock(key):
+        work_dir.mkdir()
+        cache.get_or_create(SLC_2, 'IW2')   # dispara evict() con la primera sin referencias
+        assert work_dir.exists()
+        assert split_cache.Path(dim).exists()
+
+    # Quien tenía el lock encuentra el producto publicado y lo recupera sin gpt
+    assert cache.get_or_create(SLC, 'IW2') == dim
+    assert len(fake_gpt) == 2
+
+
+def test_evict_keeps_lock_file(tmp_path, fake_gpt):
+    cache = SplitCache(str(tmp_path), max_gb=0)
+    dim = cache.get_or_create(SLC, 'IW2')
+    key = split_cache.Path(dim).parent.name
+
+    assert cache.evict() == 1
+    assert not split_cache.Path(dim).exists()
+    assert not split_cache.Path(dim).with_suffix('.data').exists()
+    assert (tmp_path / key / '.lock').exists()